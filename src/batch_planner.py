@@ -0,0 +1,244 @@
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from logger import setup_logger
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a characters-per-token heuristic
+    tiktoken = None
+
+logger = setup_logger(__name__)
+
+CHARS_PER_TOKEN = 4
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+    except (KeyError, ValueError):
+        # Unknown (e.g. Ollama or HuggingFace) model names: OpenAI's BPE is a close enough estimate
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count the tokens of `text` with tiktoken, or estimate them if it is not installed.
+
+    Args:
+        text: Text to measure
+        model: Model name used to pick the tiktoken encoding (default: cl100k_base)
+
+    Returns:
+        int: Token count (len(text) / 4, rounded up, without tiktoken)
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+    return len(encoding.encode(text or "", disallowed_special=()))
+
+
+@dataclass
+class PlannedBatch:
+    """One packed batch and the token counts predicted for it."""
+
+    keywords: List[str]
+    prompt_tokens: int
+    completion_tokens: int
+    completion_budget: int
+
+    @property
+    def predicted_fill(self) -> float:
+        """Predicted completion tokens as a fraction of the max_tokens budget."""
+        return self.completion_tokens / self.completion_budget
+
+
+class BatchPlanner:
+    """
+    Packs keywords into batches that fit a completion token budget.
+
+    A summary batch's reply grows with the number of keywords times the
+    summaries requested per keyword, so fixed-size batches either get cut off
+    at max_tokens or pay the system prompt for very little output. The planner
+    estimates every keyword's reply size and fills each batch up to
+    `target_fill` of max_tokens, keeping keyword order. After each call,
+    record_actual() stores the real completion size so fill_report() can
+    compare predicted and actual fill per batch.
+    """
+
+    def __init__(
+        self,
+        build_prompt: Callable[[List[str]], str],
+        system_prompt: str,
+        max_completion_tokens: int,
+        summaries_per_keyword: int,
+        tokens_per_summary: int,
+        target_fill: float = 0.8,
+        max_batch_size: Optional[int] = None,
+        max_prompt_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+    ):
+        """
+        Args:
+            build_prompt: Builds the user prompt for a list of keywords
+            system_prompt: System prompt sent with every batch
+            max_completion_tokens: max_tokens of each call
+            summaries_per_keyword: Summaries the prompt asks for per keyword
+            tokens_per_summary: Expected completion tokens of one summary (JSON included)
+            target_fill: Fraction of max_completion_tokens to plan for (default: 0.8),
+                leaving headroom for replies longer than estimated
+            max_batch_size: Optional cap on keywords per batch
+            max_prompt_tokens: Optional cap on system + user prompt tokens per batch
+            model: Model name used to pick the tokenizer
+
+        Raises:
+            ValueError: If target_fill is not in (0, 1]
+        """
+        if not 0 < target_fill <= 1:
+            raise ValueError(f"target_fill must be in (0, 1], got {target_fill}")
+        self.build_prompt = build_prompt
+        self.system_prompt = system_prompt
+        self.max_completion_tokens = max_completion_tokens
+        self.summaries_per_keyword = summaries_per_keyword
+        self.tokens_per_summary = tokens_per_summary
+        self.target_fill = target_fill
+        self.max_batch_size = max_batch_size
+        self.max_prompt_tokens = max_prompt_tokens
+        self.model = model
+        self.batches: List[PlannedBatch] = []
+        self._actual: Dict[int, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def estimate_completion(self, keywords: List[str]) -> int:
+        """Expected completion tokens for a batch of `keywords`."""
+        # Every summary echoes its keyword in "key_words"
+        echoed = sum(count_tokens(k, self.model) for k in keywords) * self.summaries_per_keyword
+        return len(keywords) * self.summaries_per_keyword * self.tokens_per_summary + echoed
+
+    def estimate_prompt(self, keywords: List[str]) -> int:
+        """Prompt tokens (system + user message) for a batch of `keywords`."""
+        return count_tokens(self.system_prompt, self.model) + count_tokens(self.build_prompt(keywords), self.model)
+
+    def _fits(self, keywords: List[str]) -> bool:
+        if self.max_batch_size is not None and len(keywords) > self.max_batch_size:
+            return False
+        if self.estimate_completion(keywords) > self.target_fill * self.max_completion_tokens:
+            return False
+        return self.max_prompt_tokens is None or self.estimate_prompt(keywords) <= self.max_prompt_tokens
+
+    def plan(self, keywords: List[str]) -> List[List[str]]:
+        """
+        Greedily pack `keywords`, in order, into batches within the token budget.
+
+        A keyword that does not fit even on its own still gets a batch of its own.
+
+        Args:
+            keywords: Keywords to distribute
+
+        Returns:
+            list[list[str]]: Keyword batches (details in self.batches)
+        """
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        for keyword in keywords:
+            if current and not self._fits(current + [keyword]):
+                chunks.append(current)
+                current = []
+            current.append(keyword)
+        if current:
+            chunks.append(current)
+
+        self.batches = [
+            PlannedBatch(
+                keywords=chunk,
+                prompt_tokens=self.estimate_prompt(chunk),
+                completion_tokens=self.estimate_completion(chunk),
+                completion_budget=self.max_completion_tokens,
+            )
+            for chunk in chunks
+        ]
+        with self._lock:
+            self._actual = {}
+        return chunks
+
+    def record_actual(self, batch_idx: int, reply: str, completion_tokens: Optional[int] = None, summaries: int = 0) -> None:
+        """
+        Record the completion size of a finished batch.
+
+        Args:
+            batch_idx: Index into the planned batches
+            reply: Raw reply text, counted with the tokenizer if the backend
+                reported no completion_tokens
+            completion_tokens: Completion tokens reported by the backend
+            summaries: Number of summaries parsed from the reply
+        """
+        if completion_tokens is None:
+            completion_tokens = count_tokens(reply, self.model)
+        with self._lock:
+            self._actual[batch_idx] = {"completion_tokens": completion_tokens, "summaries": summaries}
+
+    def fill_report(self) -> Dict[str, object]:
+        """
+        Compare predicted and actual fill per batch.
+
+        Returns:
+            dict: 'batches' (per-batch keywords, predicted/actual completion tokens and
+            fill ratios), 'mean_predicted_fill', 'mean_actual_fill', 'truncation_risk'
+            (batches that used at least 98% of max_tokens) and
+            'observed_tokens_per_summary' to calibrate tokens_per_summary
+        """
+        with self._lock:
+            actual = dict(self._actual)
+
+        rows = []
+        for idx, batch in enumerate(self.batches):
+            row = {
+                "batch": idx,
+                "keywords": len(batch.keywords),
+                "prompt_tokens": batch.prompt_tokens,
+                "predicted_completion_tokens": batch.completion_tokens,
+                "predicted_fill": round(batch.predicted_fill, 4),
+                "actual_completion_tokens": None,
+                "actual_fill": None,
+            }
+            if idx in actual:
+                row["actual_completion_tokens"] = actual[idx]["completion_tokens"]
+                row["actual_fill"] = round(actual[idx]["completion_tokens"] / batch.completion_budget, 4)
+            rows.append(row)
+
+        finished = [row for row in rows if row["actual_fill"] is not None]
+        summaries = sum(entry["summaries"] for entry in actual.values())
+        return {
+            "target_fill": self.target_fill,
+            "tokens_per_summary": self.tokens_per_summary,
+            "mean_predicted_fill": sum(r["predicted_fill"] for r in rows) / len(rows) if rows else None,
+            "mean_actual_fill": sum(r["actual_fill"] for r in finished) / len(finished) if finished else None,
+            "truncation_risk": [r["batch"] for r in finished if r["actual_fill"] >= 0.98],
+            "observed_tokens_per_summary": (
+                sum(entry["completion_tokens"] for entry in actual.values() if entry["summaries"]) / summaries
+                if summaries else None
+            ),
+            "batches": rows,
+        }
+
+    def write_report(self, output_dir: str, filename: str = "summary_batch_fill.json") -> str:
+        """
+        Write fill_report() as JSON to output_dir.
+
+        Returns:
+            str: Path of the written report
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.fill_report(), f, indent=2)
+        return path
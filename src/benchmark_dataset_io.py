@@ -0,0 +1,98 @@
+from dataset_operations import iter_data
+from json_codec import CODECS, get_codec, write_json
+from logger import setup_logger
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+logger = setup_logger(__name__)
+
+SIZES = [1_000, 10_000, 100_000]
+LOAD_WORKERS = os.cpu_count() or 1
+FILE_PATTERN = "*e.json"
+REPORT_PATH = None  # set to a path to also write the results as JSON
+
+
+def make_record(i):
+    """Build a transcription-sized record shaped like the pipeline's output files."""
+    return {
+        "call_id": f"{i}-record-{1700000000000 + i}_ms",
+        "participants": ["CALLER", "NURSE"],
+        "transcription": [
+            {"speaker": "CALLER" if turn % 2 == 0 else "NURSE",
+             "text": f"Turn {turn} of call {i}: my baby has had a fever since last night and won’t eat."}
+            for turn in range(12)
+        ],
+        "summary": {
+            "text": [f"Caller reports fever in a {i % 12 + 1}-month-old infant.", "No rash.", "Feeding reduced."],
+            "key_words": ["fever", "feeding"],
+        },
+    }
+
+
+def benchmark_size(count, codecs=None, workers=LOAD_WORKERS):
+    """
+    Write `count` record files and time saving and loading them.
+
+    Args:
+        count (int): Number of files
+        codecs (list[str], optional): Codecs to compare (default: all installed)
+        workers (int): Processes for the parallel load
+
+    Returns:
+        list[dict]: One row per codec with 'files', 'codec', 'save_files_per_sec',
+        'load_files_per_sec', 'parallel_load_files_per_sec' and 'mb'
+    """
+    rows = []
+    for name in codecs or sorted(CODECS):
+        codec = get_codec(name)
+        data_dir = tempfile.mkdtemp(prefix="dataset_io_")
+        try:
+            start = time.perf_counter()
+            for i in range(1, count + 1):
+                write_json(os.path.join(data_dir, f"{i}e.json"), make_record(i), codec=codec)
+            save_seconds = time.perf_counter() - start
+            size_mb = sum(entry.stat().st_size for entry in os.scandir(data_dir)) / 2**20
+
+            start = time.perf_counter()
+            loaded = sum(1 for _ in iter_data(data_dir, FILE_PATTERN, codec=name))
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded_parallel = sum(1 for _ in iter_data(data_dir, FILE_PATTERN, codec=name, workers=workers))
+            parallel_seconds = time.perf_counter() - start
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+        if loaded != count or loaded_parallel != count:
+            raise RuntimeError(f"Loaded {loaded}/{loaded_parallel} of {count} files with codec {name}")
+        rows.append({
+            "files": count,
+            "codec": name,
+            "workers": workers,
+            "mb": size_mb,
+            "save_files_per_sec": count / save_seconds,
+            "load_files_per_sec": count / load_seconds,
+            "parallel_load_files_per_sec": count / parallel_seconds,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    logger.info(f"{'files':>8}  {'codec':<8}{'MB':>8}{'save/s':>10}{'load/s':>10}{'par load/s':>12}")
+    results = []
+    for size in SIZES:
+        for row in benchmark_size(size):
+            results.append(row)
+            logger.info(
+                f"{row['files']:>8}  {row['codec']:<8}{row['mb']:>8.1f}{row['save_files_per_sec']:>10.0f}"
+                f"{row['load_files_per_sec']:>10.0f}{row['parallel_load_files_per_sec']:>12.0f}"
+            )
+
+    if REPORT_PATH:
+        with open(REPORT_PATH, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Wrote benchmark results to {REPORT_PATH}")
@@ -0,0 +1,81 @@
+from llms.llm_factory import get_llm_client
+from logger import setup_logger
+import config
+
+import time
+
+logger = setup_logger(__name__)
+
+MODEL_ID = "utter-project/EuroLLM-1.7B-Instruct"
+DEVICE = "cpu"
+MAX_TOKENS = 128
+WARMUP_RUNS = 1
+RUNS = 3
+SYSTEM_PROMPT = config.TRANSCRIPTION_GENERATOR_SYSTEM_PROMPT
+USER_PROMPT = (
+    "Generate a transcription for the following text:"
+    "['Baby of 9 months has had a runny nose and mild cough for two days.']"
+)
+
+# Each entry is one execution mode compared against the fp32 eager baseline
+MODES = [
+    {"label": "fp32", "client_kwargs": {}},
+    {"label": "int8", "client_kwargs": {"quantization": "int8"}},
+    {"label": "compiled", "client_kwargs": {"generation_mode": "compiled"}},
+]
+
+
+def benchmark_mode(label, client_kwargs):
+    """
+    Load the model in one execution mode and measure footprint and decode speed.
+
+    Args:
+        label (str): Name of the mode used in the report
+        client_kwargs (dict): Extra arguments for get_llm_client()
+
+    Returns:
+        dict: 'mode', 'load_seconds', 'memory_mb', 'tokens_per_sec' and
+        'ms_per_token' averaged over RUNS generations
+    """
+    start = time.perf_counter()
+    client = get_llm_client("huggingface", model=MODEL_ID, device=DEVICE, **client_kwargs)
+    load_seconds = time.perf_counter() - start
+
+    # Compiled mode pays its compilation cost here rather than in the timed runs
+    prompt_len = len(client.tokenizer(f"{SYSTEM_PROMPT}\n{USER_PROMPT}")["input_ids"])
+    client.warmup(prompt_lengths=[prompt_len], max_tokens=MAX_TOKENS)
+    for _ in range(WARMUP_RUNS):
+        client.conv(USER_PROMPT, system_message=SYSTEM_PROMPT, max_tokens=MAX_TOKENS)
+
+    generated_tokens = 0
+    elapsed = 0.0
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        reply = client.conv(USER_PROMPT, system_message=SYSTEM_PROMPT, max_tokens=MAX_TOKENS)
+        elapsed += time.perf_counter() - start
+        generated_tokens += len(client.tokenizer(reply, add_special_tokens=False)["input_ids"])
+
+    tokens_per_sec = generated_tokens / elapsed if elapsed else 0.0
+    return {
+        "mode": label,
+        "load_seconds": load_seconds,
+        "memory_mb": client.memory_footprint() / (1024 * 1024),
+        "tokens_per_sec": tokens_per_sec,
+        "ms_per_token": 1000.0 / tokens_per_sec if tokens_per_sec else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    results = []
+    for mode in MODES:
+        logger.info(f"Benchmarking {MODEL_ID} in {mode['label']} mode")
+        results.append(benchmark_mode(mode["label"], mode["client_kwargs"]))
+
+    baseline = results[0]
+    logger.info(f"{'mode':<10}{'load s':>10}{'memory MB':>12}{'tok/s':>10}{'ms/tok':>10}{'speedup':>10}")
+    for r in results:
+        speedup = r["tokens_per_sec"] / baseline["tokens_per_sec"] if baseline["tokens_per_sec"] else 0.0
+        logger.info(
+            f"{r['mode']:<10}{r['load_seconds']:>10.1f}{r['memory_mb']:>12.1f}"
+            f"{r['tokens_per_sec']:>10.1f}{r['ms_per_token']:>10.1f}{speedup:>9.2f}x"
+        )
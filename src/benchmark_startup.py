@@ -0,0 +1,86 @@
+from logger import setup_logger
+
+import json
+import os
+import subprocess
+import sys
+
+logger = setup_logger(__name__)
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = [
+    "generate_keywords",
+    "generate_summary",
+    "generate_transcription",
+    "generate_keywords_langchain",
+    "generate_summary_langchain",
+    "generate_transcription_langchain",
+]
+# Modules an OpenAI-only run must never import
+HEAVY_MODULES = ["torch", "transformers"]
+RUNS = 3
+
+# Runs in a fresh interpreter so earlier imports can't hide the cost
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "max_rss_mb": rss_kb / 1024,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_startup(module):
+    """
+    Import an entry point in a fresh interpreter and measure its startup cost.
+
+    Args:
+        module (str): Module name inside src/ (e.g. "generate_summary")
+
+    Returns:
+        dict: 'module', 'import_seconds', 'max_rss_mb' and 'heavy_modules'
+        (torch/transformers found in sys.modules), or 'error' if the import failed
+    """
+    env = dict(os.environ)
+    # Entry points build clients at import time; a placeholder key is enough for that
+    env.setdefault("OPENAI_API_KEY", "sk-startup-benchmark")
+
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        last_line = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+        return {"module": module, "error": last_line}
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["module"] = module
+    return result
+
+
+if __name__ == "__main__":
+    logger.info(f"{'entry point':<36}{'import s':>10}{'RSS MB':>10}  heavy modules")
+    regressions = []
+    for module in ENTRY_POINTS:
+        runs = [measure_startup(module) for _ in range(RUNS)]
+        if "error" in runs[0]:
+            logger.warning(f"{module:<36} failed to import: {runs[0]['error']}")
+            continue
+
+        best = min(runs, key=lambda r: r["import_seconds"])
+        heavy = ", ".join(best["heavy_modules"]) or "-"
+        logger.info(f"{module:<36}{best['import_seconds']:>10.2f}{best['max_rss_mb']:>10.0f}  {heavy}")
+        if best["heavy_modules"]:
+            regressions.append(module)
+
+    if regressions:
+        logger.error(f"OpenAI-only startup imports {HEAVY_MODULES} in: {regressions}")
+        raise SystemExit(1)
@@ -1,8 +1,60 @@
 OUTPUT_DIR = "UNS dataset/json_english_gpt_5_mini_langchain"
 KEYWORDS_PATH = OUTPUT_DIR + "/keywords.json"
 METADATA_PATH = OUTPUT_DIR + "/metadata.json"
-
-CLIENT_TYPE = "openai"  # Options: "openai", "huggingface", "ollama"
+# Keep an SQLite index of record files and their completed stages in OUTPUT_DIR (manifest.sqlite),
+# so stages find pending records without scanning every file; rebuild with `python src/manifest.py`
+USE_MANIFEST = True
+# How records are laid out in OUTPUT_DIR: "json_dir" (one file per record, the original layout),
+# "sharded_dir" (files in 256 hash-named subdirectories), "jsonl" (size-rolled JSONL shards;
+# options max_shard_bytes, compression="zstd") or "sqlite" (one table). USE_MANIFEST only applies
+# to "json_dir"; convert existing data with `python src/dataset_store.py`
+DATASET_STORE = "json_dir"
+DATASET_STORE_OPTIONS = {}
+# Write record files on a background thread (atomic temp-file renames, one fsync round per
+# batch) so LLM workers never wait for the disk; the queue holds at most WRITER_QUEUE_SIZE files.
+# Only the json_dir and sharded_dir stores use it; jsonl and sqlite write each batch synchronously
+WRITE_BEHIND = True
+WRITER_QUEUE_SIZE = 1000
+WRITER_BATCH_SIZE = 64
+
+CLIENT_TYPE = "openai"  # Options: "openai", "huggingface", "ollama", "router", "simulated"
+# CLIENT_TYPE "router" spreads calls over the Ollama servers listed in the comma-separated
+# OLLAMA_BASE_URLS env var; if set, this OpenAI model serves calls no Ollama server could
+ROUTER_FALLBACK_MODEL = None
+# CLIENT_TYPE "simulated" answers every stage offline with schema-valid JSON, for throughput
+# benchmarks without network or cost; these settings are passed to SimulatedLLM
+SIMULATION = {
+    "latency_distribution": "lognormal",  # "fixed", "uniform", "exponential" or "lognormal"
+    "latency_mean": 1.0,  # seconds of per-call overhead (median for lognormal)
+    "latency_sigma": 0.5,
+    "tokens_per_second": 80,  # decode speed added on top of the overhead
+    "error_rate": 0.01,  # injected 503s
+    "rate_limit_rate": 0.02,  # injected 429s
+    "truncation_rate": 0.01,  # replies cut off mid-JSON
+    "seed": 42,
+}
+HF_QUANTIZATION = None  # "int8" for dynamic int8 quantization of HuggingFace models on CPU
+HF_GENERATION_MODE = "eager"  # "compiled" for a static KV cache with a compiled decode step
+OLLAMA_STREAM = False  # Stream Ollama completions; JSON-format calls stop once the reply is closed
+# On-disk LLM response cache shared by all stages and processes.
+# Per-stage policy: "off", "read_through" (reuse cached replies, call the LLM on a miss)
+# or "replay_only" (never call the LLM; uncached requests fail)
+RESPONSE_CACHE_PATH = "~/.cache/baby_calls/responses.sqlite"
+KEYWORD_CACHE_POLICY = "off"  # keyword sampling relies on fresh replies to the same prompt
+# Off by default: with the cache on, rerunning the summary stage replays the cached replies and
+# saves them again as new records. Turn it on to resume interrupted runs or iterate on prompts.
+SUMMARY_CACHE_POLICY = "off"
+TRANSCRIPTION_CACHE_POLICY = "off"
+# Adaptive rate limiter shared by all worker threads of a stage. Limits are learned from the
+# x-ratelimit-* response headers (OpenAI); set RPM/TPM explicitly for backends without them.
+RATE_LIMIT = True
+RATE_LIMIT_RPM = None
+RATE_LIMIT_TPM = None
+# Attempts per LLM call for transient failures (429, 5xx, timeouts, invalid JSON); 1 disables retries
+RETRY_MAX_ATTEMPTS = 5
+# Seconds a call waits for a backend that looks down (open circuit breaker) before failing
+# with CircuitOpenError; None waits until it recovers
+CIRCUIT_BREAKER_MAX_PAUSE = None
 LLM = "gpt-5-mini"
 KEYWORD_GENERATOR_LLM_MODEL = LLM
 KEYWORD_GENERATOR_TEMPERATURE = 0.9
@@ -37,6 +89,8 @@ KEYWORD_GENERATOR_SYSTEM_PROMPT = """
 SUMMARY_GENERATOR_LLM_MODEL = LLM
 SUMMARY_GENERATOR_TEMPERATURE = 0.6
 SUMMARY_GENERATOR_MAX_TOKENS = 10000
+# Sent as prompt_cache_key (OpenAI) so calls sharing the system prompt hit the same prompt cache
+SUMMARY_PROMPT_CACHE_KEY = "baby-calls-summary"
 SUMMARY_GENERATOR_SYSTEM_PROMPT = """
 You are a clinical case summarizer specializing in parent–doctor conversation notes for pediatric consultations.
 
@@ -101,6 +155,8 @@ Rules:
 TRANSCRIPTION_GENERATOR_LLM_MODEL = LLM
 TRANSCRIPTION_GENERATOR_TEMPERATURE = 0.6
 TRANSCRIPTION_GENERATOR_MAX_TOKENS = 10000
+# Sent as prompt_cache_key (OpenAI) so calls sharing the system prompt hit the same prompt cache
+TRANSCRIPTION_PROMPT_CACHE_KEY = "baby-calls-transcription"
 TRANSCRIPTION_GENERATOR_SYSTEM_PROMPT = """
 You are a clinical call transcriber. Convert a brief bullet-style case summary into a realistic, two-speaker phone conversation transcript.
 
@@ -1,19 +1,154 @@
 import os
 import json
 import time
+import fnmatch
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
 from pathlib import Path
+from json_codec import get_codec, write_json
 from logger import setup_logger
 
 logger = setup_logger(__name__)
 
 
-def get_data(data_dir, file_pattern):
+def _decode_file(file_path, codec, predicate, keep):
+    """
+    Read, filter and project one file.
+
+    Returns:
+        tuple: (status, data, error) with status 'loaded', 'filtered' or 'failed'
+    """
+    try:
+        with open(file_path, "rb") as f:
+            data = codec.loads(f.read())
+    except (OSError, ValueError) as e:
+        # Also covers files removed between listing and reading
+        return "failed", None, str(e)
+
+    if predicate is not None and not predicate(data):
+        return "filtered", None, None
+    if keep is not None and isinstance(data, dict):
+        data = {key: data[key] for key in keep if key in data}
+    return "loaded", data, None
+
+
+def _decode_chunk(file_paths, codec_name, predicate, keep):
+    """Process-pool task: _decode_file() for a batch of files."""
+    codec = get_codec(codec_name)
+    return [(file_path, *_decode_file(file_path, codec, predicate, keep)) for file_path in file_paths]
+
+
+def iter_data(data_dir, file_pattern, predicate=None, fields=None, stats=None,
+              workers=None, chunk_size=256, codec=None):
+    """
+    Lazily yield JSON files matching a pattern from a directory.
+
+    Files are read in sorted order and yielded as they are decoded, so memory
+    use does not grow with the corpus: only the sorted list of file names is
+    held up front. Documents rejected by `predicate` are dropped right after
+    parsing, and `fields` keeps only the top-level keys a stage needs.
+
+    With workers > 1, batches of `chunk_size` files are decoded in a process
+    pool (a few batches ahead of the consumer); results are still yielded in
+    sorted order. `predicate` must then be picklable (a module-level function,
+    not a lambda).
+
+    Args:
+        data_dir (str): Directory path containing JSON files
+        file_pattern (str): Glob pattern to match file names (e.g., "*e.json")
+        predicate (callable, optional): Called with each parsed document; files for
+            which it returns a falsy value are skipped
+        fields (iterable[str], optional): Top-level keys to keep in 'data' (all by default)
+        stats (dict, optional): Updated in place with 'loaded', 'filtered' and 'failed' counts
+        workers (int, optional): Decoding processes (default: decode on the calling thread)
+        chunk_size (int, optional): Files per process-pool task. Defaults to 256
+        codec (str, optional): JSON codec name, see json_codec.get_codec() (default: fastest installed)
+
+    Yields:
+        dict: {'file_path': path to the JSON file, 'data': parsed (projected) content}
+
+    Raises:
+        FileNotFoundError: If data_dir does not exist
+
+    Examples:
+        >>> pending = iter_data("UNS dataset/json", "*e.json",
+        ...                     predicate=lambda d: "transcription" not in d,
+        ...                     fields=("call_id", "summary"))
+        >>> next(pending)["file_path"]
+        'UNS dataset/json/1e.json'
+    """
+    folder_path = Path(data_dir)
+
+    if not folder_path.exists():
+        raise FileNotFoundError(f"Folder not found: {folder_path}")
+
+    with os.scandir(folder_path) as entries:
+        names = sorted(entry.name for entry in entries if fnmatch.fnmatch(entry.name, file_pattern))
+
+    yield from iter_files([str(folder_path / name) for name in names], predicate=predicate, fields=fields,
+                          stats=stats, workers=workers, chunk_size=chunk_size, codec=codec)
+
+
+def iter_files(file_paths, predicate=None, fields=None, stats=None, workers=None, chunk_size=256, codec=None):
+    """
+    Lazily yield the given JSON files, in order.
+
+    Same as iter_data() for an explicit list of files, e.g. the pending
+    records listed by a Manifest.
+
+    Args:
+        file_paths (list[str]): Files to read
+        predicate, fields, stats, workers, chunk_size, codec: See iter_data()
+
+    Yields:
+        dict: {'file_path': path to the JSON file, 'data': parsed (projected) content}
+    """
+    if stats is not None:
+        for key in ("loaded", "filtered", "failed"):
+            stats.setdefault(key, 0)
+
+    keep = tuple(fields) if fields is not None else None
+    if workers is not None and workers > 1 and len(file_paths) > chunk_size:
+        results = _iter_decoded_chunks(file_paths, workers, chunk_size, codec, predicate, keep)
+    else:
+        decoder = get_codec(codec)
+        results = ((path, *_decode_file(path, decoder, predicate, keep)) for path in file_paths)
+
+    for file_path, status, data, error in results:
+        if stats is not None:
+            stats[status] += 1
+        if status == "failed":
+            logger.error(f"Error decoding {file_path}: {error}")
+        elif status == "loaded":
+            yield {"file_path": file_path, "data": data}
+
+
+def _iter_decoded_chunks(file_paths, workers, chunk_size, codec, predicate, keep):
+    """Decode file chunks in a process pool, in order, keeping at most 2 * workers chunks in flight."""
+    chunks = iter_batches(file_paths, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(_decode_chunk, chunk, codec, predicate, keep))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def get_data(data_dir, file_pattern, workers=None, store=None):
     """
     Load JSON files matching a pattern from a directory.
 
+    Reads everything into memory; prefer iter_data() for large corpora.
+
     Args:
         data_dir (str): Directory path containing JSON files
         file_pattern (str): Glob pattern to match files (e.g., "*e.json")
+        workers (int, optional): Decode in this many processes (see iter_data())
+        store (DatasetStore, optional): Load every record of this store instead
+            (data_dir and file_pattern are then ignored)
 
     Returns:
         list[dict]: List of dictionaries, each containing:
@@ -28,42 +163,126 @@ def get_data(data_dir, file_pattern):
         >>> print(len(data))
         150
     """
-    folder_path = Path(data_dir)
+    if store is not None:
+        all_data = list(store.iter_records(workers=workers))
+    else:
+        all_data = list(iter_data(data_dir, file_pattern, workers=workers))
+    logger.info(f"Loaded {len(all_data)} files successfully")
+    return all_data
 
-    if not folder_path.exists():
-        raise FileNotFoundError(f"Folder not found: {folder_path}")
 
-    json_files = sorted(folder_path.glob(file_pattern))
-    all_data = []
+def iter_batches(items, size):
+    """
+    Group an iterable into lists of up to `size` items without materializing it.
 
-    for file_path in json_files:
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                # Return both the data and the file path
-                all_data.append({"file_path": str(file_path), "data": data})
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding {file_path}: {e}")
+    Args:
+        items (iterable): Items to group
+        size (int): Maximum group size
 
-    logger.info(f"Loaded {len(all_data)} files successfully")
-    return all_data
+    Yields:
+        list: Consecutive groups; the last one may be shorter
+    """
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def map_bounded(fn, items, max_workers, max_pending=None):
+    """
+    Run `fn` over a (possibly lazy) iterable on a thread pool, in completion order.
+
+    Items are pulled from the iterable only as earlier tasks finish, so at most
+    `max_pending` items are in memory (queued or running) at any time, unlike
+    submitting everything to ThreadPoolExecutor up front.
+
+    Args:
+        fn (callable): Called with one item per task
+        items (iterable): Work items, e.g. an iter_data() generator
+        max_workers (int): Worker threads
+        max_pending (int, optional): Tasks submitted but not yet collected
+            (default: 2 * max_workers, so workers never wait for the reader)
+
+    Yields:
+        Results of fn, as tasks complete. Exceptions raised by fn propagate.
+    """
+    max_workers = max(1, int(max_workers))
+    max_pending = max(max_workers, int(max_pending or 2 * max_workers))
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(fn, item))
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def next_record_number(output_dir, suffix="e.json", manifest=None):
+    """
+    Return the first unused record number in output_dir.
+
+    Args:
+        output_dir (str): Directory holding numbered record files
+        suffix (str, optional): File suffix/extension. Defaults to "e.json"
+        manifest (Manifest, optional): Index of output_dir, used instead of a directory listing
+
+    Returns:
+        int: Number for the next record file
+    """
+    if manifest is not None:
+        number = manifest.next_number()
+        # Files added behind the manifest's back must still never be overwritten
+        while os.path.exists(os.path.join(output_dir, f"{number}{suffix}")):
+            number += 1
+        return number
+
+    # Get next available number based on existing files
+    existing_files = [
+        f
+        for f in os.listdir(output_dir)
+        if f.endswith(suffix) and f.split(suffix)[0].isdigit()
+    ]
+    existing_numbers = [int(f.split(suffix)[0]) for f in existing_files]
+    return max(existing_numbers, default=0) + 1
 
 
-def save_summaries(summaries, output_dir, suffix="e.json"):
+def save_summaries(summaries, output_dir, suffix="e.json", manifest=None, writer=None, start_index=None, store=None):
     """
     Save summary dictionaries to numbered JSON files with auto-incrementing names.
 
     Scans existing files in output_dir to determine the next available number,
     ensuring no files are overwritten. Each summary is enriched with a unique
-    call_id before saving.
+    call_id before saving. With a manifest, the next number comes from the
+    index instead of a directory listing, and the new files are indexed.
+    Files are replaced atomically, so an interrupted run never leaves a
+    half-written record.
 
     Args:
         summaries (list[dict]): List of summary dictionaries to save
         output_dir (str): Target directory for output files
         suffix (str, optional): File suffix/extension. Defaults to "e.json"
+        manifest (Manifest, optional): Index of output_dir to number and record files with
+        writer (WriteBehindWriter, optional): Hand the files to this background writer
+            instead of writing them on the calling thread
+        start_index (int, optional): Number of the first file, for callers saving
+            several groups while earlier ones are still queued (default: next_record_number())
+        store (DatasetStore, optional): Save the records in this store instead of
+            files in output_dir (the store's own writer is used)
 
     Returns:
-        None
+        int: Number for the next record file
 
     Side effects:
         - Creates output_dir if it doesn't exist
@@ -77,15 +296,21 @@ def save_summaries(summaries, output_dir, suffix="e.json"):
     """
     os.makedirs(output_dir, exist_ok=True)
 
-    # Get next available number based on existing files
-    existing_files = [
-        f
-        for f in os.listdir(output_dir)
-        if f.endswith(suffix) and f.split(suffix)[0].isdigit()
-    ]
-    existing_numbers = [int(f.split(suffix)[0]) for f in existing_files]
-    start_index = max(existing_numbers, default=0) + 1
-
+    if start_index is None:
+        if store is not None and manifest is None:
+            start_index = store.next_key()
+        else:
+            start_index = next_record_number(output_dir, suffix, manifest)
+    if store is not None:
+        writer = store.writer
+
+    def on_written(i, call_id):
+        def callback(file_path, error):
+            if error is None and manifest is not None:
+                manifest.add(i, file_path, call_id, stages=["summary"])
+        return callback
+
+    records = []
     for i, summary in enumerate(summaries, start=start_index):
         # Create unique call_id (with timestamp)
         call_id = f"{i}-record-{int((time.time() * 1000) + i)}_ms"
@@ -94,18 +319,37 @@ def save_summaries(summaries, output_dir, suffix="e.json"):
             "call_id": call_id,
             **{k: v for k, v in summary.items() if k != "call_id"},
         }
-
-        # Create filename like 1e.json, 2e.json, ...
-        file_name = f"{i}{suffix}"
-        file_path = os.path.join(output_dir, file_name)
-
-        # Save file
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2, ensure_ascii=False)
-
-        logger.info(f"Saved {file_name}")
-
-    logger.info(f"Total {len(summaries)} summaries saved at {output_dir}")
+        records.append((i, call_id, summary))
+
+    saved = []
+    if store is not None:
+        # Queued records are indexed by their callbacks, the others below in one transaction
+        store.put_many([
+            (i, summary, on_written(i, call_id) if writer is not None else None)
+            for i, call_id, summary in records
+        ])
+        if writer is None:
+            saved = [(i, store.location(i), call_id, ["summary"]) for i, call_id, _ in records]
+    else:
+        for i, call_id, summary in records:
+            # Create filename like 1e.json, 2e.json, ...
+            file_name = f"{i}{suffix}"
+            file_path = os.path.join(output_dir, file_name)
+
+            # Save file
+            if writer is not None:
+                writer.submit(file_path, summary, callback=on_written(i, call_id))
+                logger.info(f"Queued {file_name}")
+            else:
+                write_json(file_path, summary)
+                saved.append((i, file_path, call_id, ["summary"]))
+                logger.info(f"Saved {file_name}")
+
+    if manifest is not None and saved:
+        manifest.add_many(saved)
+    destination = store.root if store is not None else output_dir
+    logger.info(f"Total {len(summaries)} summaries {'queued for' if writer is not None else 'saved at'} {destination}")
+    return start_index + len(summaries)
 
 
 def create_metadata_file(config_module, filepath):
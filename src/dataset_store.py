@@ -0,0 +1,587 @@
+import hashlib
+import io
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional: JSONL shards are then left uncompressed
+    zstandard = None
+
+from dataset_operations import iter_batches, iter_files
+from json_codec import JsonCodec, get_codec, read_json, write_json
+from logger import setup_logger
+from manifest import record_number
+
+logger = setup_logger(__name__)
+
+# `python src/dataset_store.py` copies every record of config.DATASET_STORE in config.OUTPUT_DIR
+# into a MIGRATE_TARGET store in MIGRATE_TARGET_DIR (default: "<OUTPUT_DIR>_<MIGRATE_TARGET>")
+MIGRATE_TARGET = "jsonl"
+MIGRATE_TARGET_DIR = None
+MIGRATE_TARGET_OPTIONS = {}
+MIGRATE_BATCH_SIZE = 1000
+
+# One record as handed to put_many(): (key, document, callback or None)
+Record = Tuple[int, Any, Optional[Any]]
+
+
+def _select(data: Any, predicate, keep) -> Tuple[str, Any]:
+    """Apply iter_data()-style filtering and projection to a decoded document."""
+    if predicate is not None and not predicate(data):
+        return "filtered", None
+    if keep is not None and isinstance(data, dict):
+        data = {key: data[key] for key in keep if key in data}
+    return "loaded", data
+
+
+class DatasetStore(ABC):
+    """
+    Storage for the numbered records a pipeline run produces.
+
+    Records are JSON documents addressed by their record number (the `12` of
+    `12e.json`). Every backend yields the same items as iter_data(), plus
+    the record 'key', so the stages do not care how records are laid out.
+    """
+
+    name = "base"
+    # Whether put_many() hands records to a WriteBehindWriter
+    uses_writer = False
+
+    def __init__(self, root: str, suffix: str = "e.json", writer=None, codec: Optional[JsonCodec] = None):
+        """
+        Args:
+            root: Directory holding the store
+            suffix: Record file suffix, for the directory backends (default: "e.json")
+            writer: WriteBehindWriter, for the backends with `uses_writer` (the
+                directory ones); the others write in one append or transaction
+                per put_many()
+            codec: JSON codec (default: get_codec())
+
+        Raises:
+            ValueError: If a writer is given to a backend that does not use one
+        """
+        if writer is not None and not self.uses_writer:
+            raise ValueError(f"The {self.name} store writes synchronously and does not take a writer")
+        self.root = root
+        self.suffix = suffix
+        self.writer = writer
+        self.codec = codec or get_codec()
+        os.makedirs(root, exist_ok=True)
+
+    @abstractmethod
+    def location(self, key: int) -> str:
+        """Return where record `key` is stored (a file path for the directory backends)."""
+
+    @abstractmethod
+    def keys(self) -> List[int]:
+        """List the stored record numbers in ascending order."""
+
+    @abstractmethod
+    def get(self, key: int) -> Optional[Any]:
+        """Return record `key`, or None if it does not exist."""
+
+    @abstractmethod
+    def put_many(self, records: Iterable[Record]) -> None:
+        """
+        Store (or replace) several records.
+
+        Each callback is called with (location, None) once its record is
+        written, or (location, error) if a background writer failed to write
+        it. Without a background writer, failures raise instead.
+        """
+
+    @abstractmethod
+    def iter_records(self, predicate=None, fields=None, stats=None, workers=None,
+                     keys: Optional[Iterable[int]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield records.
+
+        Args:
+            predicate, fields, stats: See dataset_operations.iter_data()
+            workers (int, optional): Decoding processes (directory backends only)
+            keys (iterable[int], optional): Only these records (default: all)
+
+        Yields:
+            dict: {'key': record number, 'file_path': location(key), 'data': parsed (projected) content}
+        """
+
+    def put(self, key: int, doc: Any, callback=None) -> None:
+        """Store (or replace) one record; see put_many()."""
+        self.put_many([(key, doc, callback)])
+
+    def next_key(self) -> int:
+        """Return the number after the highest stored record (1 for an empty store)."""
+        return max(self.keys(), default=0) + 1
+
+    def count(self) -> int:
+        """Return the number of stored records."""
+        return len(self.keys())
+
+    def flush(self) -> None:
+        """Block until every record put so far is written."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self) -> None:
+        """Flush and release files and connections."""
+        self.flush()
+
+    def __enter__(self) -> "DatasetStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class JsonDirStore(DatasetStore):
+    """One file per record in a flat directory (`<root>/12e.json`), the pipeline's original layout."""
+
+    name = "json_dir"
+    uses_writer = True
+
+    def location(self, key: int) -> str:
+        return os.path.join(self.root, f"{key}{self.suffix}")
+
+    def _file_keys(self, directory: str) -> List[int]:
+        with os.scandir(directory) as entries:
+            numbers = (record_number(entry.name, self.suffix) for entry in entries if entry.is_file())
+            return [number for number in numbers if number is not None]
+
+    def keys(self) -> List[int]:
+        return sorted(self._file_keys(self.root))
+
+    def get(self, key: int) -> Optional[Any]:
+        try:
+            return read_json(self.location(key), codec=self.codec)
+        except FileNotFoundError:
+            return None
+
+    def put_many(self, records: Iterable[Record]) -> None:
+        for key, doc, callback in records:
+            file_path = self.location(key)
+            if self.writer is not None:
+                self.writer.submit(file_path, doc, callback=callback)
+                continue
+            write_json(file_path, doc, codec=self.codec)
+            if callback is not None:
+                callback(file_path, None)
+
+    def iter_records(self, predicate=None, fields=None, stats=None, workers=None, keys=None):
+        keys = self.keys() if keys is None else list(keys)
+        for item in iter_files([self.location(key) for key in keys], predicate=predicate, fields=fields,
+                               stats=stats, workers=workers, codec=self.codec.name):
+            yield {"key": record_number(os.path.basename(item["file_path"]), self.suffix), **item}
+
+
+class ShardedDirStore(JsonDirStore):
+    """
+    One file per record in 256 hash-named subdirectories (`<root>/3f/12e.json`).
+
+    Keeps directories small enough that listing and opening files stays fast
+    on bind mounts with hundreds of thousands of records.
+    """
+
+    name = "sharded_dir"
+    SHARDS = 256
+
+    def __init__(self, root: str, suffix: str = "e.json", writer=None, codec: Optional[JsonCodec] = None):
+        super().__init__(root, suffix=suffix, writer=writer, codec=codec)
+        for shard in range(self.SHARDS):
+            os.makedirs(os.path.join(root, f"{shard:02x}"), exist_ok=True)
+
+    def location(self, key: int) -> str:
+        shard = hashlib.md5(str(key).encode()).hexdigest()[:2]
+        return os.path.join(self.root, shard, f"{key}{self.suffix}")
+
+    def keys(self) -> List[int]:
+        numbers = []
+        for shard in range(self.SHARDS):
+            numbers.extend(self._file_keys(os.path.join(self.root, f"{shard:02x}")))
+        return sorted(numbers)
+
+
+class JsonlStore(DatasetStore):
+    """
+    Records as lines of size-rolled JSONL shards (`<root>/shard-000000.jsonl`).
+
+    Each line is `{"key": 12, "data": {...}}`. Writes append to the newest
+    shard; replacing a record appends its new version and the latest line
+    wins, so rewrite the store with migrate() to reclaim the space. Once a
+    shard reaches `max_shard_bytes` it is sealed and, with compression="zstd",
+    compressed. An index of the latest line per key is built on open from the
+    line prefixes, without decoding the documents. iter_records() yields
+    records in the order they were last written.
+
+    Safe to share between threads; use one writing process at a time.
+    """
+
+    name = "jsonl"
+    SHARD_PATTERN = re.compile(r"shard-(\d{6})\.jsonl(\.zst)?$")
+    KEY_PATTERN = re.compile(rb'\{"key":\s*(\d+)')
+
+    def __init__(self, root: str, suffix: str = "e.json", writer=None, codec: Optional[JsonCodec] = None,
+                 max_shard_bytes: int = 64 * 2**20, compression: Optional[str] = None):
+        """
+        Args:
+            root, suffix, writer, codec: See DatasetStore
+            max_shard_bytes: Uncompressed size at which a shard is sealed (default: 64 MiB)
+            compression: None or "zstd" (compresses sealed shards; needs the zstandard package)
+
+        Raises:
+            ValueError: If the compression is unknown or its library is not installed
+        """
+        if compression not in (None, "zstd"):
+            raise ValueError(f"Unsupported compression: {compression}. Use None or 'zstd'.")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("compression='zstd' requires the zstandard package")
+        super().__init__(root, suffix=suffix, writer=writer, codec=codec)
+        self.max_shard_bytes = max_shard_bytes
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._file = None
+        # key -> (shard, line number, byte offset) of the record's latest line
+        self._index: Dict[int, Tuple[int, int, int]] = {}
+        self._sizes: Dict[int, int] = {}
+        self._active: Optional[int] = None
+        self._lines = 0  # lines in the active shard
+
+        shards = sorted(
+            (int(match.group(1)), bool(match.group(2)))
+            for match in map(self.SHARD_PATTERN.match, os.listdir(root)) if match
+        )
+        for shard, compressed in shards:
+            self._index_shard(shard)
+            if not compressed:
+                self._active = shard
+        if self._active is not None and os.path.getsize(self._shard_path(self._active)) > self._sizes[self._active]:
+            logger.warning(f"Dropping a partially written line at the end of {self._shard_path(self._active)}")
+            with open(self._shard_path(self._active), "r+b") as f:
+                f.truncate(self._sizes[self._active])
+        self._next_shard = shards[-1][0] + 1 if shards else 0
+
+    def _shard_path(self, shard: int, compressed: bool = False) -> str:
+        return os.path.join(self.root, f"shard-{shard:06d}.jsonl" + (".zst" if compressed else ""))
+
+    def _open_shard(self, shard: int) -> Tuple[Any, bool]:
+        """
+        Open a shard for reading, compressed or not (it may be sealed while a reader runs).
+
+        Returns:
+            tuple: (binary file object, whether it supports seeking to a line offset)
+        """
+        try:
+            return open(self._shard_path(shard), "rb"), True
+        except FileNotFoundError:
+            raw = open(self._shard_path(shard, compressed=True), "rb")
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw)), False
+
+    def _index_shard(self, shard: int) -> None:
+        offset = 0
+        f, _ = self._open_shard(shard)
+        with f:
+            for line_number, line in enumerate(f):
+                if not line.endswith(b"\n"):
+                    break  # torn last line of an interrupted append
+                match = self.KEY_PATTERN.match(line)
+                if match:
+                    self._index[int(match.group(1))] = (shard, line_number, offset)
+                offset += len(line)
+        self._sizes[shard] = offset
+
+    def _seal(self) -> None:
+        """Close the active shard and compress it if configured (caller holds the lock)."""
+        self._file.close()
+        self._file = None
+        if self.compression == "zstd":
+            plain, compressed = self._shard_path(self._active), self._shard_path(self._active, compressed=True)
+            with open(plain, "rb") as src, open(compressed + ".tmp", "wb") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+            os.replace(compressed + ".tmp", compressed)
+            os.remove(plain)
+        self._active = None
+
+    def location(self, key: int) -> str:
+        return f"{self.root}#{key}"
+
+    def keys(self) -> List[int]:
+        with self._lock:
+            return sorted(self._index)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def next_key(self) -> int:
+        with self._lock:
+            return max(self._index, default=0) + 1
+
+    def get(self, key: int) -> Optional[Any]:
+        with self._lock:
+            if key not in self._index:
+                return None
+            shard, line_number, offset = self._index[key]
+            if self._file is not None:
+                self._file.flush()
+        f, seekable = self._open_shard(shard)
+        with f:
+            if seekable:
+                f.seek(offset)
+            else:
+                # Compressed shards cannot seek; skip lines instead
+                for _ in range(line_number):
+                    f.readline()
+            return self.codec.loads(f.readline())["data"]
+
+    def put_many(self, records: Iterable[Record]) -> None:
+        records = list(records)
+        lines = [self.codec.dumps({"key": key, "data": doc}, indent=False) + b"\n" for key, doc, _ in records]
+        with self._lock:
+            for (key, _, _), line in zip(records, lines):
+                if self._active is None:
+                    self._active, self._next_shard = self._next_shard, self._next_shard + 1
+                    self._sizes[self._active] = 0
+                if self._file is None:
+                    path = self._shard_path(self._active)
+                    self._lines = self._count_lines(path) if os.path.exists(path) else 0
+                    self._file = open(path, "ab")
+                self._file.write(line)
+                self._index[key] = (self._active, self._lines, self._sizes[self._active])
+                self._lines += 1
+                self._sizes[self._active] += len(line)
+                if self._sizes[self._active] >= self.max_shard_bytes:
+                    self._seal()
+            if self._file is not None:
+                self._file.flush()
+        for key, _, callback in records:
+            if callback is not None:
+                callback(self.location(key), None)
+
+    @staticmethod
+    def _count_lines(path: str) -> int:
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+
+    def iter_records(self, predicate=None, fields=None, stats=None, workers=None, keys=None):
+        if stats is not None:
+            for name in ("loaded", "filtered", "failed"):
+                stats.setdefault(name, 0)
+        keep = tuple(fields) if fields is not None else None
+        wanted = set(keys) if keys is not None else None
+        # Records written while iterating are not yielded, so a stage can update what it reads
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            index = dict(self._index)
+            sizes = dict(self._sizes)
+
+        for shard in sorted(sizes):
+            f, _ = self._open_shard(shard)
+            with f:
+                offset = 0
+                for line_number, line in enumerate(f):
+                    if offset >= sizes[shard]:
+                        break
+                    offset += len(line)
+                    match = self.KEY_PATTERN.match(line)
+                    if not match:
+                        continue
+                    key = int(match.group(1))
+                    if index.get(key, (None, None))[:2] != (shard, line_number):
+                        continue  # superseded by a later version
+                    if wanted is not None and key not in wanted:
+                        continue
+                    try:
+                        status, data = _select(self.codec.loads(line)["data"], predicate, keep)
+                    except (ValueError, KeyError) as e:
+                        status, data = "failed", None
+                        logger.error(f"Error decoding {self.location(key)}: {e}")
+                    if stats is not None:
+                        stats[status] += 1
+                    if status == "loaded":
+                        yield {"key": key, "file_path": self.location(key), "data": data}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class SqliteStore(DatasetStore):
+    """
+    Records as rows of one SQLite table (`<root>/records.sqlite`).
+
+    Safe to share between threads (one connection per thread) and between
+    processes (WAL journal, busy timeout, IMMEDIATE write transactions).
+    """
+
+    name = "sqlite"
+    FILE_NAME = "records.sqlite"
+
+    def __init__(self, root: str, suffix: str = "e.json", writer=None, codec: Optional[JsonCodec] = None,
+                 busy_timeout: float = 30.0):
+        """
+        Args:
+            root, suffix, writer, codec: See DatasetStore
+            busy_timeout: Seconds to wait for a lock held by another connection
+        """
+        super().__init__(root, suffix=suffix, writer=writer, codec=codec)
+        self.path = os.path.join(root, self.FILE_NAME)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS records (key INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def location(self, key: int) -> str:
+        return f"{self.path}#{key}"
+
+    def keys(self) -> List[int]:
+        return [key for (key,) in self._connection().execute("SELECT key FROM records ORDER BY key")]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def next_key(self) -> int:
+        return self._connection().execute("SELECT COALESCE(MAX(key), 0) + 1 FROM records").fetchone()[0]
+
+    def get(self, key: int) -> Optional[Any]:
+        row = self._connection().execute("SELECT data FROM records WHERE key = ?", (key,)).fetchone()
+        return self.codec.loads(row[0]) if row is not None else None
+
+    def put_many(self, records: Iterable[Record]) -> None:
+        records = list(records)
+        rows = [(key, self.codec.dumps(doc, indent=False)) for key, doc, _ in records]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for key, _, callback in records:
+            if callback is not None:
+                callback(self.location(key), None)
+
+    def _rows(self, keys) -> Iterator[Tuple[int, bytes]]:
+        conn = self._connection()
+        if keys is None:
+            yield from conn.execute("SELECT key, data FROM records ORDER BY key")
+            return
+        for chunk in iter_batches(keys, 500):
+            placeholders = ", ".join("?" * len(chunk))
+            rows = dict(conn.execute(f"SELECT key, data FROM records WHERE key IN ({placeholders})", chunk))
+            yield from ((key, rows[key]) for key in chunk if key in rows)
+
+    def iter_records(self, predicate=None, fields=None, stats=None, workers=None, keys=None):
+        if stats is not None:
+            for name in ("loaded", "filtered", "failed"):
+                stats.setdefault(name, 0)
+        keep = tuple(fields) if fields is not None else None
+        for key, blob in self._rows(keys):
+            try:
+                status, data = _select(self.codec.loads(blob), predicate, keep)
+            except ValueError as e:
+                status, data = "failed", None
+                logger.error(f"Error decoding {self.location(key)}: {e}")
+            if stats is not None:
+                stats[status] += 1
+            if status == "loaded":
+                yield {"key": key, "file_path": self.location(key), "data": data}
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+STORES: Dict[str, type] = {
+    store.name: store for store in (JsonDirStore, ShardedDirStore, JsonlStore, SqliteStore)
+}
+
+
+def open_store(kind: str, root: str, **options) -> DatasetStore:
+    """
+    Open (or create) a dataset store.
+
+    Args:
+        kind: 'json_dir', 'sharded_dir', 'jsonl' or 'sqlite'
+        root: Directory holding the store
+        **options: Backend options, e.g. writer, max_shard_bytes or compression
+
+    Returns:
+        DatasetStore: The store
+
+    Raises:
+        ValueError: If the kind is unknown
+    """
+    if kind not in STORES:
+        raise ValueError(f"Unsupported dataset store: {kind}. Available stores are {sorted(STORES)}.")
+    return STORES[kind](root, **options)
+
+
+def supports_writer(kind: str) -> bool:
+    """Return whether stores of `kind` take a WriteBehindWriter (False for unknown kinds)."""
+    return kind in STORES and STORES[kind].uses_writer
+
+
+def migrate(source: DatasetStore, target: DatasetStore, batch_size: int = MIGRATE_BATCH_SIZE,
+            stats: Optional[Dict[str, int]] = None) -> int:
+    """
+    Copy every record of `source` into `target`, keeping record numbers.
+
+    Args:
+        source: Store to read
+        target: Store to write (records with the same numbers are replaced)
+        batch_size: Records per put_many() call
+        stats (dict, optional): Updated with source read counts, see iter_data()
+
+    Returns:
+        int: Number of records copied
+    """
+    copied = 0
+    for batch in iter_batches(source.iter_records(stats=stats), batch_size):
+        target.put_many([(item["key"], item["data"], None) for item in batch])
+        copied += len(batch)
+    target.flush()
+    return copied
+
+
+if __name__ == "__main__":
+    import time
+
+    import config
+
+    target_dir = MIGRATE_TARGET_DIR or f"{config.OUTPUT_DIR}_{MIGRATE_TARGET}"
+    started = time.perf_counter()
+    with open_store(config.DATASET_STORE, config.OUTPUT_DIR, **config.DATASET_STORE_OPTIONS) as source, \
+            open_store(MIGRATE_TARGET, target_dir, **MIGRATE_TARGET_OPTIONS) as target:
+        read_stats = {}
+        copied = migrate(source, target, stats=read_stats)
+    logger.info(
+        f"Copied {copied} records from {config.DATASET_STORE} store {config.OUTPUT_DIR} to {MIGRATE_TARGET} "
+        f"store {target_dir} in {time.perf_counter() - started:.1f}s ({read_stats.get('failed', 0)} unreadable)"
+    )
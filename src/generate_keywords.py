@@ -1,4 +1,5 @@
-from dataset_operations import get_data, create_metadata_file
+from dataset_operations import iter_data, create_metadata_file
+from jsonl_index import IndexedJsonlReader, is_stale, write_jsonl
 from llms.llm_factory import get_llm_client
 from utils import convert_response_to_json
 from logger import setup_logger
@@ -13,6 +14,9 @@ logger = setup_logger(__name__)
 
 DATA_DIR = "UNS dataset/json_english_v2"
 FILE_PATTERN = "*e.json"
+# JSONL copy of DATA_DIR, re-exported whenever DATA_DIR changed since; examples are sampled through
+# its offset index, decoding only the sampled records
+EXAMPLES_PATH = DATA_DIR + ".jsonl"
 NUMBER_OF_SAMPLES = 5
 RANDOM_SEED = 42
 
@@ -22,6 +26,11 @@ client = get_llm_client(
     client_type=config.CLIENT_TYPE,
     model=config.KEYWORD_GENERATOR_LLM_MODEL,
     timeout=600,
+    stream=config.OLLAMA_STREAM,
+    fallback_model=config.ROUTER_FALLBACK_MODEL,
+    simulation=config.SIMULATION,
+    cache_policy=config.KEYWORD_CACHE_POLICY,
+    cache_path=config.RESPONSE_CACHE_PATH,
 )
 
 
@@ -50,12 +59,13 @@ def save_keywords():
 
 
 if __name__ == "__main__":
-    example_data = get_data(DATA_DIR, FILE_PATTERN)
-    sampled_data = random.sample(
-        example_data, min(NUMBER_OF_SAMPLES, len(example_data))
-    )
+    if is_stale(EXAMPLES_PATH, DATA_DIR, FILE_PATTERN):
+        count = write_jsonl(EXAMPLES_PATH, (item["data"] for item in iter_data(DATA_DIR, FILE_PATTERN)))
+        logger.info(f"Exported {count} example records to {EXAMPLES_PATH}")
+    with IndexedJsonlReader(EXAMPLES_PATH) as examples:
+        sampled_data = examples.sample(NUMBER_OF_SAMPLES)
     keyword_examples = [
-        sample["data"]["summary"]["key_words"][0] for sample in sampled_data
+        sample["summary"]["key_words"][0] for sample in sampled_data
     ]
 
     reply = client.conv(
@@ -1,4 +1,5 @@
-from dataset_operations import get_data, create_metadata_file
+from dataset_operations import iter_data, create_metadata_file
+from jsonl_index import IndexedJsonlReader, is_stale, write_jsonl
 from utils import convert_response_to_json
 from logger import setup_logger
 import config
@@ -15,18 +16,30 @@ logger = setup_logger(__name__)
 
 DATA_DIR = "UNS dataset/json_english_v2"
 FILE_PATTERN = "*e.json"
+# JSONL copy of DATA_DIR, re-exported whenever DATA_DIR changed since; examples are sampled through
+# its offset index, decoding only the sampled records
+EXAMPLES_PATH = DATA_DIR + ".jsonl"
 NUMBER_OF_SAMPLES = 5
 RANDOM_SEED = 42
 
 load_dotenv()
 # random.seed(RANDOM_SEED)
 
-model = ChatOpenAI(
-    model_name=config.KEYWORD_GENERATOR_LLM_MODEL,
-    temperature=config.KEYWORD_GENERATOR_TEMPERATURE,
-    max_tokens=config.KEYWORD_GENERATOR_MAX_TOKENS,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+if config.CLIENT_TYPE == "simulated":
+    # Offline load testing: same calls, simulated replies
+    from llms.simulated_client import SimulatedChatModel, SimulatedLLM
+
+    model = SimulatedChatModel(
+        SimulatedLLM(model=config.KEYWORD_GENERATOR_LLM_MODEL, **config.SIMULATION),
+        max_tokens=config.KEYWORD_GENERATOR_MAX_TOKENS,
+    )
+else:
+    model = ChatOpenAI(
+        model_name=config.KEYWORD_GENERATOR_LLM_MODEL,
+        temperature=config.KEYWORD_GENERATOR_TEMPERATURE,
+        max_tokens=config.KEYWORD_GENERATOR_MAX_TOKENS,
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
 
 
 def save_keywords():
@@ -54,12 +67,13 @@ def save_keywords():
 
 
 if __name__ == "__main__":
-    example_data = get_data(DATA_DIR, FILE_PATTERN)
-    sampled_data = random.sample(
-        example_data, min(NUMBER_OF_SAMPLES, len(example_data))
-    )
+    if is_stale(EXAMPLES_PATH, DATA_DIR, FILE_PATTERN):
+        count = write_jsonl(EXAMPLES_PATH, (item["data"] for item in iter_data(DATA_DIR, FILE_PATTERN)))
+        logger.info(f"Exported {count} example records to {EXAMPLES_PATH}")
+    with IndexedJsonlReader(EXAMPLES_PATH) as examples:
+        sampled_data = examples.sample(NUMBER_OF_SAMPLES)
     keyword_examples = [
-        sample["data"]["summary"]["key_words"][0] for sample in sampled_data
+        sample["summary"]["key_words"][0] for sample in sampled_data
     ]
 
     conversation = [
@@ -1,10 +1,17 @@
-from dataset_operations import create_metadata_file, save_summaries
-from llms.llm_factory import get_llm_client
+from batch_planner import BatchPlanner
+from dataset_operations import create_metadata_file, next_record_number, save_summaries
+from dataset_store import open_store, supports_writer
+from manifest import Manifest
+from llms.llm_factory import get_client_stats, get_llm_client
+from llms.openai_batch import OpenAIBatchRunner
+from llms.telemetry import StageMetrics
 from utils import convert_response_to_json
+from write_behind import WriteBehindWriter
 from logger import setup_logger
 import config
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import json
 import os
 
@@ -12,7 +19,139 @@ logger = setup_logger(__name__)
 
 BATCH_SIZE = 10
 NUMBER_OF_SUMMARIES_PER_KEYWORD = 2
-MAX_WORKERS = 5
+# Set TOKEN_BUDGET_BATCHING to pack keywords by estimated reply size instead of fixed
+# BATCH_SIZE chunks: each batch is filled to TARGET_FILL of SUMMARY_GENERATOR_MAX_TOKENS,
+# assuming ESTIMATED_TOKENS_PER_SUMMARY completion tokens per summary (the fill report
+# written next to metadata.json shows the observed value to calibrate it). Off by default:
+# the estimate is a guess until calibrated, and without tiktoken prompts are only
+# estimated at four characters per token
+TOKEN_BUDGET_BATCHING = False
+TARGET_FILL = 0.8
+ESTIMATED_TOKENS_PER_SUMMARY = 200
+MAX_KEYWORDS_PER_BATCH = None
+# Worker threads. Only OpenAI sends x-ratelimit-* headers, so only there (with
+# config.RATE_LIMIT) is a higher bound safe: the limiter then adapts the requests actually
+# in flight to the provider's limits. Ollama and local HuggingFace keep the baseline
+MAX_WORKERS = 32 if config.RATE_LIMIT and config.CLIENT_TYPE == "openai" else 5
+# Set ASYNC_MODE to drive the LLM with asyncio instead of threads;
+# MAX_CONCURRENCY then bounds the number of in-flight requests
+ASYNC_MODE = False
+MAX_CONCURRENCY = 200
+# With CLIENT_TYPE == "huggingface", this many prompts are generated per forward pass
+HF_BATCH_SIZE = 8
+# Number of system prompts whose prefilled KV cache the HuggingFace backend keeps
+HF_PREFIX_CACHE_SIZE = 2
+# Set BATCH_API_MODE to submit all prompts through the OpenAI Batch API (half price,
+# results within 24h); the run resumes from BATCH_STATE_PATH if interrupted while polling
+BATCH_API_MODE = False
+BATCH_STATE_PATH = os.path.join(config.OUTPUT_DIR, "batch_api_summary_state.json")
+
+# Per-call latency/token telemetry, written next to metadata.json at the end of the run
+metrics = StageMetrics("summary")
+# Set by make_batches() when TOKEN_BUDGET_BATCHING is on; records actual batch fill
+planner = None
+
+def get_client(pool_size=MAX_WORKERS):
+    """
+    Return the shared LLM client for this stage from the process-wide registry.
+
+    Args:
+        pool_size (int): Connection pool size for HTTP backends and upper bound on
+            requests in flight when rate limiting
+
+    Returns:
+        LLMInterface: Pooled client configured for summary generation
+    """
+    return get_llm_client(
+        client_type=config.CLIENT_TYPE,
+        model=config.SUMMARY_GENERATOR_LLM_MODEL,
+        prompt_cache_key=config.SUMMARY_PROMPT_CACHE_KEY,
+        timeout=600,
+        pool_size=pool_size,
+        stream=config.OLLAMA_STREAM,
+        prefix_cache_size=HF_PREFIX_CACHE_SIZE,
+        quantization=config.HF_QUANTIZATION,
+        generation_mode=config.HF_GENERATION_MODE,
+        pooled=True,
+        fallback_model=config.ROUTER_FALLBACK_MODEL,
+        simulation=config.SIMULATION,
+        cache_policy=config.SUMMARY_CACHE_POLICY,
+        cache_path=config.RESPONSE_CACHE_PATH,
+        retry_attempts=config.RETRY_MAX_ATTEMPTS,
+        breaker_max_pause=config.CIRCUIT_BREAKER_MAX_PAUSE,
+        response_validator=convert_response_to_json,
+        rate_limit=config.RATE_LIMIT,
+        requests_per_minute=config.RATE_LIMIT_RPM,
+        tokens_per_minute=config.RATE_LIMIT_TPM,
+        max_concurrency=pool_size,
+    )
+
+def get_batch_runner():
+    """
+    Build the Batch API runner for this stage.
+
+    Returns:
+        OpenAIBatchRunner: Runner whose state lives in BATCH_STATE_PATH
+
+    Raises:
+        ValueError: If CLIENT_TYPE is not "openai"
+    """
+    if config.CLIENT_TYPE != "openai":
+        raise ValueError(f"BATCH_API_MODE requires CLIENT_TYPE 'openai', got {config.CLIENT_TYPE!r}")
+    client = get_llm_client(client_type="openai", model=config.SUMMARY_GENERATOR_LLM_MODEL)
+    return OpenAIBatchRunner(
+        client.client, client.model, state_path=BATCH_STATE_PATH, prompt_cache_key=config.SUMMARY_PROMPT_CACHE_KEY
+    )
+
+def log_client_stats(pool_size=MAX_WORKERS):
+    """
+    Log client registry, response cache, rate limiter, retry, router and simulation counters and, for HuggingFace, prefix cache savings.
+
+    Args:
+        pool_size (int, optional): The pool_size the run's client was built with; it is part
+            of the registry key, so any other value would build (and report on) a fresh client.
+            None if no pooled client was used (Batch API mode): only registry stats are logged
+    """
+    logger.info(f"LLM client stats: {get_client_stats()}")
+    if pool_size is None:
+        return
+    client = get_client(pool_size)
+    if config.SUMMARY_CACHE_POLICY != "off":
+        logger.info(f"Response cache: {client.cache_stats()}")
+    if config.RATE_LIMIT:
+        logger.info(f"Rate limiter: {client.rate_limit_stats()}")
+    if config.RETRY_MAX_ATTEMPTS > 1:
+        logger.info(f"Retries: {client.retry_stats()}")
+    if config.CLIENT_TYPE == "router":
+        logger.info(f"Router: {client.router_stats()}")
+    if config.CLIENT_TYPE == "simulated":
+        logger.info(f"Simulation: {client.simulation_stats()}")
+    if config.CLIENT_TYPE == "huggingface":
+        prefix = client.aggregate_stats("prefix_cache_stats")
+        logger.info(
+            f"Prefix cache: {prefix.get('hits', 0)} hits, {prefix.get('misses', 0)} misses, "
+            f"{prefix.get('prefill_seconds_saved', 0.0):.2f}s of prefill saved"
+        )
+
+def describe_failures():
+    """
+    Say how failed batches were attempted, for the end-of-run warning.
+
+    Returns:
+        str: Attempts made (or that retries were off) and the errors recorded this run
+    """
+    if BATCH_API_MODE:
+        how = "in the Batch API run"
+    elif config.RETRY_MAX_ATTEMPTS > 1:
+        how = f"after up to {config.RETRY_MAX_ATTEMPTS} attempts"
+    else:
+        how = "(retries disabled)"
+    errors = metrics.report()["errors_by_type"]
+    rejected = errors.get("CircuitOpenError", 0)
+    if rejected:
+        how += (f", {rejected} rejected after waiting {config.CIRCUIT_BREAKER_MAX_PAUSE}s "
+                f"on the open circuit breaker")
+    return f"{how}; errors by type: {errors}"
 
 def build_prompt(keywords_chunk):
     """
@@ -31,11 +170,46 @@ def build_prompt(keywords_chunk):
         + json.dumps(keywords_chunk, indent=4)
     )
 
+def make_batches(all_keywords):
+    """
+    Split keywords into batches, packed by token budget if TOKEN_BUDGET_BATCHING is set.
+
+    Args:
+        all_keywords (list[str]): Every keyword to summarize
+
+    Returns:
+        list[list[str]]: Keyword batches in input order
+    """
+    global planner
+    if not TOKEN_BUDGET_BATCHING:
+        return [
+            all_keywords[i : i + BATCH_SIZE]
+            for i in range(0, len(all_keywords), BATCH_SIZE)
+        ]
+
+    planner = BatchPlanner(
+        build_prompt,
+        system_prompt=config.SUMMARY_GENERATOR_SYSTEM_PROMPT,
+        max_completion_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
+        summaries_per_keyword=NUMBER_OF_SUMMARIES_PER_KEYWORD,
+        tokens_per_summary=ESTIMATED_TOKENS_PER_SUMMARY,
+        target_fill=TARGET_FILL,
+        max_batch_size=MAX_KEYWORDS_PER_BATCH,
+        model=config.SUMMARY_GENERATOR_LLM_MODEL,
+    )
+    batches = planner.plan(all_keywords)
+    report = planner.fill_report()
+    logger.info(
+        f"Packed {len(all_keywords)} keywords into {len(batches)} batches "
+        f"(mean predicted fill {report['mean_predicted_fill']:.0%} of {config.SUMMARY_GENERATOR_MAX_TOKENS} tokens)"
+    )
+    return batches
+
 def process_batch(batch_idx, keywords_chunk):
     """
     Process a batch of keywords to generate summaries using the LLM.
 
-    Creates an LLM client, sends keywords to generate summaries, and
+    Fetches the shared LLM client, sends keywords to generate summaries, and
     returns the results. Designed for concurrent execution in threads.
 
     Args:
@@ -52,11 +226,7 @@ def process_batch(batch_idx, keywords_chunk):
         - Makes API calls to the configured LLM
     """
     try:
-        client = get_llm_client(
-            client_type=config.CLIENT_TYPE,
-            model=config.SUMMARY_GENERATOR_LLM_MODEL,
-            timeout=600,
-        )
+        client = get_client()
 
         reply = client.conv(
             user_message=build_prompt(keywords_chunk),
@@ -65,20 +235,202 @@ def process_batch(batch_idx, keywords_chunk):
             max_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
             response_format={"type": "json_object"},
         )
+        usage = client.last_usage
+        metrics.record_call(usage)
+        return parse_batch_reply(batch_idx, reply, usage.completion_tokens if usage else None)
 
-        json_response = convert_response_to_json(reply)
-        if not json_response:
-            logger.error(f"Failed to generate summaries for batch {batch_idx + 1}")
-            return batch_idx, []
+    except Exception as e:
+        metrics.record_error(e)
+        logger.error(f"Exception in batch {batch_idx + 1}: {e}")
+        return batch_idx, []
+
+def process_batch_group(group):
+    """
+    Generate summaries for several keyword batches in one batched LLM call.
 
-        batch_summaries = json_response.get("summaries", [])
-        logger.info(f"Generated summaries for batch {batch_idx + 1}")
-        return batch_idx, batch_summaries
+    Used with the HuggingFace backend, where conv_batch() runs all prompts
+    through a single padded forward pass instead of one pass per thread.
+
+    Args:
+        group (list[tuple[int, list[str]]]): (batch_idx, keywords_chunk) pairs
+
+    Returns:
+        list[tuple[int, list[dict]]]: One process_batch()-style result per pair
+    """
+    try:
+        client = get_client()
+
+        replies = client.conv_batch(
+            [build_prompt(chunk) for _, chunk in group],
+            system_message=config.SUMMARY_GENERATOR_SYSTEM_PROMPT,
+            temperature=config.SUMMARY_GENERATOR_TEMPERATURE,
+            max_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
+            response_format={"type": "json_object"},
+        )
+        metrics.record_call(client.last_usage)
+        return [
+            parse_batch_reply(batch_idx, reply)
+            for (batch_idx, _), reply in zip(group, replies)
+        ]
 
     except Exception as e:
-        logger.error(f"Exception in batch {batch_idx + 1}: {e}")
+        metrics.record_error(e)
+        first, last = group[0][0] + 1, group[-1][0] + 1
+        logger.error(f"Exception in batches {first}-{last}: {e}")
+        return [(batch_idx, []) for batch_idx, _ in group]
+
+def parse_batch_reply(batch_idx, reply, completion_tokens=None):
+    """
+    Extract the list of summaries from a raw LLM reply.
+
+    Args:
+        batch_idx (int): Index of the batch the reply belongs to (for logging)
+        reply (str): Raw model response
+        completion_tokens (int, optional): Completion tokens reported by the backend;
+            the reply is counted with the tokenizer if missing
+
+    Returns:
+        tuple[int, list[dict]]: The batch index and its summaries, or [] on failure
+    """
+    json_response = convert_response_to_json(reply)
+    batch_summaries = json_response.get("summaries", []) if isinstance(json_response, dict) else []
+    if planner is not None:
+        planner.record_actual(batch_idx, reply, completion_tokens, summaries=len(batch_summaries))
+
+    if not json_response:
+        metrics.record_error("InvalidJSON")
+        logger.error(f"Failed to generate summaries for batch {batch_idx + 1}")
         return batch_idx, []
 
+    logger.info(f"Generated summaries for batch {batch_idx + 1}")
+    return batch_idx, batch_summaries
+
+async def aprocess_batch(batch_idx, keywords_chunk, client, semaphore):
+    """
+    Async counterpart of process_batch() for the asyncio run mode.
+
+    Args:
+        batch_idx (int): Index of the current batch (for logging)
+        keywords_chunk (list[str]): Keywords to generate summaries for
+        client (LLMInterface): Shared client whose aconv() is awaited
+        semaphore (asyncio.Semaphore): Bounds the number of in-flight requests
+
+    Returns:
+        tuple[int, list[dict]]: Same as process_batch()
+    """
+    async with semaphore:
+        try:
+            reply = await client.aconv(
+                user_message=build_prompt(keywords_chunk),
+                system_message=config.SUMMARY_GENERATOR_SYSTEM_PROMPT,
+                temperature=config.SUMMARY_GENERATOR_TEMPERATURE,
+                max_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
+                response_format={"type": "json_object"},
+            )
+            usage = client.last_usage
+            metrics.record_call(usage)
+        except Exception as e:
+            metrics.record_error(e)
+            logger.error(f"Exception in batch {batch_idx + 1}: {e}")
+            return batch_idx, []
+
+    return parse_batch_reply(batch_idx, reply, usage.completion_tokens if usage else None)
+
+async def run_async(batches, max_concurrency):
+    """
+    Generate summaries for all batches on a single event loop.
+
+    Args:
+        batches (list[list[str]]): Keyword chunks to process
+        max_concurrency (int): Maximum number of concurrent LLM requests
+
+    Returns:
+        dict[int, list[dict]]: Summaries keyed by batch index
+    """
+    client = get_client(pool_size=max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        aprocess_batch(idx, chunk, client, semaphore)
+        for idx, chunk in enumerate(batches)
+    ]
+
+    results_by_idx = {}
+    for coro in asyncio.as_completed(tasks):
+        batch_idx, batch_summaries = await coro
+        results_by_idx[batch_idx] = batch_summaries
+        logger.info(f"Batch {batch_idx + 1}/{len(batches)} completed")
+    return results_by_idx
+
+def run_batch_api(batches, runner):
+    """
+    Generate summaries for all batches with a single Batch API run.
+
+    Args:
+        batches (list[list[str]]): Keyword chunks to process
+        runner (OpenAIBatchRunner): Runner used to submit (or resume) the run
+
+    Returns:
+        dict[int, list[dict]]: Summaries keyed by batch index
+    """
+    requests = [
+        runner.build_request(
+            custom_id=f"batch-{idx}",
+            user_message=build_prompt(chunk),
+            system_message=config.SUMMARY_GENERATOR_SYSTEM_PROMPT,
+            max_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
+            response_format={"type": "json_object"},
+        )
+        for idx, chunk in enumerate(batches)
+    ]
+    replies, errors = runner.run(requests)
+
+    results_by_idx = {}
+    for idx in range(len(batches)):
+        custom_id = f"batch-{idx}"
+        if custom_id in errors:
+            metrics.record_error("BatchAPIError")
+            logger.error(f"Batch {idx + 1} failed in the Batch API: {errors[custom_id]}")
+            results_by_idx[idx] = []
+        else:
+            results_by_idx[idx] = parse_batch_reply(idx, replies[custom_id])[1]
+    return results_by_idx
+
+def save_ready_batches(results_by_idx, next_batch, next_number, manifest=None, writer=None, store=None):
+    """
+    Save completed batches in batch order, starting at `next_batch`.
+
+    Lets files be written while later batches are still generating, with the
+    same numbering as saving everything at the end. Stops at the first batch
+    that has not completed yet.
+
+    Args:
+        results_by_idx (dict[int, list]): Summaries of the completed batches
+        next_batch (int): First batch not saved yet
+        next_number (int): Record number of its first file
+        manifest (Manifest, optional): Output directory index
+        writer (WriteBehindWriter, optional): Background writer for the files
+        store (DatasetStore, optional): Store to save the records in (see save_summaries())
+
+    Returns:
+        tuple[int, int, int]: The new next_batch and next_number, and the number of summaries saved
+    """
+    saved = 0
+    while next_batch in results_by_idx:
+        batch_summaries = results_by_idx[next_batch]
+        if batch_summaries:
+            next_number = save_summaries(
+                summaries=batch_summaries,
+                output_dir=config.OUTPUT_DIR,
+                suffix="e.json",
+                manifest=manifest,
+                writer=writer,
+                start_index=next_number,
+                store=store,
+            )
+            saved += len(batch_summaries)
+        next_batch += 1
+    return next_batch, next_number, saved
+
 if __name__ == "__main__":
     if os.path.exists(config.KEYWORDS_PATH):
         with open(config.KEYWORDS_PATH, "r", encoding="utf-8") as f:
@@ -89,39 +441,111 @@ if __name__ == "__main__":
         logger.error(f"File not found: {config.KEYWORDS_PATH}")
         exit(1)
 
-    batches = [
-        all_keywords[i : i + BATCH_SIZE]
-        for i in range(0, len(all_keywords), BATCH_SIZE)
-    ]
+    batches = make_batches(all_keywords)
     total_batches = len(batches)
     if total_batches == 0:
         logger.warning("No keywords to process")
         exit(0)
 
-    logger.info(f"Created {total_batches} batches (batch size = {BATCH_SIZE})")
+    if planner is None:
+        logger.info(f"Created {total_batches} batches (batch size = {BATCH_SIZE})")
 
-    # Limit workers to number of batches to avoid spinning idle threads
-    workers = min(MAX_WORKERS, total_batches)
-    logger.info(f"Running up to {workers} threads in parallel")
-
-    summaries = []
-    # To preserve deterministic ordering (optional), collect results in a dict and then flatten by index
+    # Batches are saved in their original order as soon as every earlier batch has finished
     results_by_idx = {}
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    use_manifest = config.USE_MANIFEST and config.DATASET_STORE == "json_dir"
+    manifest = Manifest(config.OUTPUT_DIR) if use_manifest else None
+    writer = None
+    if config.WRITE_BEHIND and supports_writer(config.DATASET_STORE):
+        writer = WriteBehindWriter(max_queue=config.WRITER_QUEUE_SIZE, batch_size=config.WRITER_BATCH_SIZE)
+    store = open_store(config.DATASET_STORE, config.OUTPUT_DIR, writer=writer, **config.DATASET_STORE_OPTIONS)
+    next_batch = 0
+    next_number = next_record_number(config.OUTPUT_DIR, "e.json", manifest) if manifest else store.next_key()
+    saved = 0
 
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = {
-            executor.submit(process_batch, idx, chunk): idx
-            for idx, chunk in enumerate(batches)
-        }
-        for future in as_completed(futures):
-            idx = futures[future]
-            batch_idx, batch_summaries = future.result()
-            results_by_idx[batch_idx] = batch_summaries
-            logger.info(f"Batch {batch_idx + 1}/{total_batches} completed")
-
-    # Merge in original batch order
-    for idx in range(total_batches):
-        summaries.extend(results_by_idx.get(idx, []))
-
-    save_summaries(summaries=summaries, output_dir=config.OUTPUT_DIR, suffix="e.json")
-    create_metadata_file(config, filepath=config.METADATA_PATH)    
+    def save_ready():
+        global next_batch, next_number, saved
+        next_batch, next_number, count = save_ready_batches(
+            results_by_idx, next_batch, next_number, manifest=manifest, store=store
+        )
+        saved += count
+
+    batch_runner = None
+    # pool_size of the client the run uses, so its stats are logged from that same client
+    pool_size = MAX_WORKERS
+    if BATCH_API_MODE:
+        batch_runner = get_batch_runner()
+        pool_size = None
+        logger.info(f"Submitting {total_batches} prompts through the OpenAI Batch API")
+        results_by_idx = run_batch_api(batches, batch_runner)
+    elif ASYNC_MODE:
+        concurrency = pool_size = min(MAX_CONCURRENCY, total_batches)
+        logger.info(f"Running up to {concurrency} concurrent requests on asyncio")
+        results_by_idx = asyncio.run(run_async(batches, concurrency))
+    elif config.CLIENT_TYPE == "huggingface":
+        indexed = list(enumerate(batches))
+        groups = [
+            indexed[i : i + HF_BATCH_SIZE]
+            for i in range(0, len(indexed), HF_BATCH_SIZE)
+        ]
+        workers = min(MAX_WORKERS, len(groups))
+        logger.info(f"Running {len(groups)} batched generations (up to {HF_BATCH_SIZE} prompts each)")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_batch_group, group) for group in groups]
+            for future in as_completed(futures):
+                for batch_idx, batch_summaries in future.result():
+                    results_by_idx[batch_idx] = batch_summaries
+                    logger.info(f"Batch {batch_idx + 1}/{total_batches} completed")
+                save_ready()
+    else:
+        # Limit workers to number of batches to avoid spinning idle threads
+        workers = min(MAX_WORKERS, total_batches)
+        logger.info(f"Running up to {workers} threads in parallel")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(process_batch, idx, chunk): idx
+                for idx, chunk in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                batch_idx, batch_summaries = future.result()
+                results_by_idx[batch_idx] = batch_summaries
+                logger.info(f"Batch {batch_idx + 1}/{total_batches} completed")
+                save_ready()
+
+    failed = [idx + 1 for idx in range(total_batches) if not results_by_idx.get(idx)]
+    if failed:
+        logger.warning(f"{len(failed)}/{total_batches} batches produced no summaries {describe_failures()}: {failed}")
+
+    # Anything not saved yet (Batch API and async runs return all batches at once)
+    save_ready()
+    log_client_stats(pool_size)
+    if writer is not None:
+        # Every file is on disk once the writer has drained
+        writer.close()
+        metrics.record_writer(writer.stats())
+        logger.info(f"Writer: {writer.stats()}")
+        saved -= writer.stats()["errors"]
+    store.close()
+    if manifest is not None:
+        manifest.close()
+    metrics.record_accepted(saved)
+    if batch_runner is not None:
+        # Only forget the submitted batches once their summaries are on disk
+        batch_runner.clear_state()
+    create_metadata_file(config, filepath=config.METADATA_PATH)
+    json_report, _ = metrics.write(os.path.dirname(config.METADATA_PATH))
+    logger.info(f"Wrote stage metrics to {json_report}")
+    prompt_cache = metrics.report()["prompt_cache"]
+    if prompt_cache["calls"]:
+        logger.info(f"Prompt cache: {prompt_cache['hit_rate']:.1%} of calls, {prompt_cache['token_hit_rate'] or 0:.1%} of prompt tokens")
+    if planner is not None:
+        fill = planner.fill_report()
+        fill_path = planner.write_report(os.path.dirname(config.METADATA_PATH))
+        logger.info(
+            f"Batch fill: predicted {fill['mean_predicted_fill']:.0%}, actual "
+            f"{fill['mean_actual_fill'] or 0:.0%}, {len(fill['truncation_risk'])} batches at max_tokens, "
+            f"observed {fill['observed_tokens_per_summary'] or 0:.0f} tokens/summary; report in {fill_path}"
+        )
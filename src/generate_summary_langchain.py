@@ -1,4 +1,6 @@
 from dataset_operations import create_metadata_file, save_summaries
+from dataset_store import open_store
+from manifest import Manifest
 from utils import convert_response_to_json
 from logger import setup_logger
 import config
@@ -17,12 +19,21 @@ MAX_WORKERS = 4
 
 load_dotenv()
 
-model = ChatOpenAI(
-    model_name=config.SUMMARY_GENERATOR_LLM_MODEL,
-    temperature=config.SUMMARY_GENERATOR_TEMPERATURE,
-    max_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+if config.CLIENT_TYPE == "simulated":
+    # Offline load testing: same calls, simulated replies
+    from llms.simulated_client import SimulatedChatModel, SimulatedLLM
+
+    model = SimulatedChatModel(
+        SimulatedLLM(model=config.SUMMARY_GENERATOR_LLM_MODEL, **config.SIMULATION),
+        max_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
+    )
+else:
+    model = ChatOpenAI(
+        model_name=config.SUMMARY_GENERATOR_LLM_MODEL,
+        temperature=config.SUMMARY_GENERATOR_TEMPERATURE,
+        max_tokens=config.SUMMARY_GENERATOR_MAX_TOKENS,
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
 
 
 if __name__ == "__main__":
@@ -76,6 +87,12 @@ if __name__ == "__main__":
         summaries.extend(batch_summaries)        
     
 
-    save_summaries(summaries=summaries, output_dir=config.OUTPUT_DIR, suffix="e.json")
+    use_manifest = config.USE_MANIFEST and config.DATASET_STORE == "json_dir"
+    manifest = Manifest(config.OUTPUT_DIR) if use_manifest else None
+    with open_store(config.DATASET_STORE, config.OUTPUT_DIR, **config.DATASET_STORE_OPTIONS) as store:
+        save_summaries(summaries=summaries, output_dir=config.OUTPUT_DIR, suffix="e.json", manifest=manifest,
+                       store=store)
+    if manifest is not None:
+        manifest.close()
     create_metadata_file(config, filepath=config.METADATA_PATH)
     logger.info(f"Successfully generated {len(summaries)} summaries")    
\ No newline at end of file
@@ -1,19 +1,60 @@
-from dataset_operations import get_data, create_metadata_file
-from llms.llm_factory import get_llm_client
+from dataset_operations import create_metadata_file, iter_batches, map_bounded
+from dataset_store import open_store, supports_writer
+from json_codec import write_json
+from llms.llm_factory import get_client_stats, get_llm_client
+from llms.openai_batch import OpenAIBatchRunner
+from llms.telemetry import StageMetrics
+from manifest import Manifest, record_number
 from utils import convert_response_to_json
+from write_behind import WriteBehindWriter
 from logger import setup_logger
 import config
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import json
+import asyncio
 import os
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional
 
 logger = setup_logger(__name__)
 
-FILE_PATTERN = "*e.json"
-# Tune this if you hit rate limits or want more/less parallelism
-MAX_WORKERS = 10
+# Only these top-level keys of each record are kept in memory (all save_transcription() writes back)
+RECORD_FIELDS = ("call_id", "summary")
+# Processes decoding record files ahead of the workers (1 decodes on the main thread)
+LOAD_WORKERS = min(4, os.cpu_count() or 1)
+# Worker threads. Only OpenAI sends x-ratelimit-* headers, so only there (with
+# config.RATE_LIMIT) is a higher bound safe: the limiter then adapts the requests actually
+# in flight to the provider's limits. Ollama and local HuggingFace keep the baseline
+MAX_WORKERS = 32 if config.RATE_LIMIT and config.CLIENT_TYPE == "openai" else 10
+# Set ASYNC_MODE to drive the LLM with asyncio instead of threads;
+# MAX_CONCURRENCY then bounds the number of in-flight requests
+ASYNC_MODE = False
+MAX_CONCURRENCY = 200
+# With CLIENT_TYPE == "huggingface", this many prompts are generated per forward pass
+HF_BATCH_SIZE = 8
+# Number of system prompts whose prefilled KV cache the HuggingFace backend keeps
+HF_PREFIX_CACHE_SIZE = 2
+# Set BATCH_API_MODE to submit all prompts through the OpenAI Batch API (half price,
+# results within 24h); the run resumes from BATCH_STATE_PATH if interrupted while polling
+BATCH_API_MODE = False
+BATCH_STATE_PATH = os.path.join(config.OUTPUT_DIR, "batch_api_transcription_state.json")
+# Set HEDGE_REQUESTS to send a duplicate of any call still running after the HEDGE_QUANTILE
+# latency of recent calls (to another backend with CLIENT_TYPE "router") and keep the first
+# reply; HEDGE_BUDGET caps the duplicates at that fraction of all calls
+HEDGE_REQUESTS = False
+HEDGE_QUANTILE = 0.95
+HEDGE_BUDGET = 0.05
+
+# Per-call latency/token telemetry, written next to metadata.json at the end of the run
+metrics = StageMetrics("transcription")
+# Index of OUTPUT_DIR (opened in __main__ when config.USE_MANIFEST); finished records are marked in it
+manifest = None
+# Background writer for finished records (created in __main__ when config.WRITE_BEHIND and the store takes one)
+writer = None
+# Where records are read from and written back to (opened in __main__, see config.DATASET_STORE)
+store = None
+
+def needs_transcription(data: Dict[str, Any]) -> bool:
+    """Predicate for iter_data(): True for records without a transcription yet."""
+    return "transcription" not in data
 
 def safe_get_summary_text(item: Dict[str, Any]) -> str:
     """
@@ -37,6 +78,92 @@ def safe_get_summary_text(item: Dict[str, Any]) -> str:
         return summary
     return ""
 
+def get_client(pool_size=MAX_WORKERS):
+    """
+    Return the shared LLM client for this stage from the process-wide registry.
+
+    Args:
+        pool_size (int): Connection pool size for HTTP backends and upper bound on
+            requests in flight when rate limiting
+
+    Returns:
+        LLMInterface: Pooled client configured for transcription generation
+    """
+    return get_llm_client(
+        client_type=config.CLIENT_TYPE,
+        model=config.TRANSCRIPTION_GENERATOR_LLM_MODEL,
+        prompt_cache_key=config.TRANSCRIPTION_PROMPT_CACHE_KEY,
+        timeout=600,
+        pool_size=pool_size,
+        stream=config.OLLAMA_STREAM,
+        prefix_cache_size=HF_PREFIX_CACHE_SIZE,
+        quantization=config.HF_QUANTIZATION,
+        generation_mode=config.HF_GENERATION_MODE,
+        pooled=True,
+        fallback_model=config.ROUTER_FALLBACK_MODEL,
+        simulation=config.SIMULATION,
+        hedge_quantile=HEDGE_QUANTILE if HEDGE_REQUESTS else None,
+        hedge_budget=HEDGE_BUDGET,
+        cache_policy=config.TRANSCRIPTION_CACHE_POLICY,
+        cache_path=config.RESPONSE_CACHE_PATH,
+        retry_attempts=config.RETRY_MAX_ATTEMPTS,
+        breaker_max_pause=config.CIRCUIT_BREAKER_MAX_PAUSE,
+        response_validator=convert_response_to_json,
+        rate_limit=config.RATE_LIMIT,
+        requests_per_minute=config.RATE_LIMIT_RPM,
+        tokens_per_minute=config.RATE_LIMIT_TPM,
+        max_concurrency=pool_size,
+    )
+
+def get_batch_runner():
+    """
+    Build the Batch API runner for this stage.
+
+    Returns:
+        OpenAIBatchRunner: Runner whose state lives in BATCH_STATE_PATH
+
+    Raises:
+        ValueError: If CLIENT_TYPE is not "openai"
+    """
+    if config.CLIENT_TYPE != "openai":
+        raise ValueError(f"BATCH_API_MODE requires CLIENT_TYPE 'openai', got {config.CLIENT_TYPE!r}")
+    client = get_llm_client(client_type="openai", model=config.TRANSCRIPTION_GENERATOR_LLM_MODEL)
+    return OpenAIBatchRunner(
+        client.client, client.model, state_path=BATCH_STATE_PATH, prompt_cache_key=config.TRANSCRIPTION_PROMPT_CACHE_KEY
+    )
+
+def log_client_stats(pool_size=MAX_WORKERS):
+    """
+    Log client registry, response cache, rate limiter, retry, router, hedging and simulation counters and, for HuggingFace, prefix cache savings.
+
+    Args:
+        pool_size (int, optional): The pool_size the run's client was built with; it is part
+            of the registry key, so any other value would build (and report on) a fresh client.
+            None if no pooled client was used (Batch API mode): only registry stats are logged
+    """
+    logger.info(f"LLM client stats: {get_client_stats()}")
+    if pool_size is None:
+        return
+    client = get_client(pool_size)
+    if config.TRANSCRIPTION_CACHE_POLICY != "off":
+        logger.info(f"Response cache: {client.cache_stats()}")
+    if config.RATE_LIMIT:
+        logger.info(f"Rate limiter: {client.rate_limit_stats()}")
+    if config.RETRY_MAX_ATTEMPTS > 1:
+        logger.info(f"Retries: {client.retry_stats()}")
+    if config.CLIENT_TYPE == "router":
+        logger.info(f"Router: {client.router_stats()}")
+    if config.CLIENT_TYPE == "simulated":
+        logger.info(f"Simulation: {client.simulation_stats()}")
+    if HEDGE_REQUESTS:
+        logger.info(f"Hedging: {client.hedge_stats()}")
+    if config.CLIENT_TYPE == "huggingface":
+        prefix = client.aggregate_stats("prefix_cache_stats")
+        logger.info(
+            f"Prefix cache: {prefix.get('hits', 0)} hits, {prefix.get('misses', 0)} misses, "
+            f"{prefix.get('prefill_seconds_saved', 0.0):.2f}s of prefill saved"
+        )
+
 def build_prompt(summary_text: str) -> str:
     """
     Build a user prompt for generating transcriptions from summary text.
@@ -53,7 +180,7 @@ def process_one(item: Dict[str, Any]) -> Tuple[str, bool, Optional[str]]:
     """
     Process a single data item to generate and save a transcription.
 
-    Skips items that already have transcriptions. Creates an LLM client,
+    Skips items that already have transcriptions. Fetches the shared LLM client,
     generates a conversation transcript from the summary, extracts participants,
     and writes the complete document back to the original file.
 
@@ -84,12 +211,8 @@ def process_one(item: Dict[str, Any]) -> Tuple[str, bool, Optional[str]]:
     logger.info(f"Creating transcription for file: {file_path}")
 
     try:
-        # Per-thread client to avoid shared-state/thread-safety issues
-        client = get_llm_client(
-            client_type=config.CLIENT_TYPE,
-            model=config.TRANSCRIPTION_GENERATOR_LLM_MODEL,
-            timeout=600,
-        )
+        # Shared client from the process-wide registry (non thread-safe models are pooled)
+        client = get_client()
 
         summary_text = safe_get_summary_text(item)
 
@@ -100,62 +223,335 @@ def process_one(item: Dict[str, Any]) -> Tuple[str, bool, Optional[str]]:
             max_tokens=config.TRANSCRIPTION_GENERATOR_MAX_TOKENS,
             response_format={"type": "json_object"},
         )
+        metrics.record_call(client.last_usage)
 
-        json_response = convert_response_to_json(reply)
-        if not json_response:
-            msg = "Failed to decode JSON from model response"
-            logger.error(f"{msg}. Skipping file: {file_path}")
-            return file_path, False, msg
+        return save_transcription(item, reply)
+
+    except Exception as e:
+        metrics.record_error(e)
+        msg = f"Exception: {e}"
+        logger.error(f"{msg} | File: {file_path}")
+        return file_path, False, msg
+
+def process_group(items: List[Dict[str, Any]]) -> List[Tuple[str, bool, Optional[str]]]:
+    """
+    Generate transcriptions for several items in one batched LLM call.
+
+    Used with the HuggingFace backend, where conv_batch() runs all prompts
+    through a single padded forward pass instead of one pass per thread.
+    Items that already have a transcription are skipped.
+
+    Args:
+        items: Items as yielded by iter_data()
+
+    Returns:
+        list[tuple[str, bool, Optional[str]]]: One process_one()-style result per item
+    """
+    results = []
+    pending = []
+    for item in items:
+        file_path = item.get("file_path", "<unknown>")
+        if "transcription" in item.get("data", {}):
+            logger.info(f"Transcription already exists. Skipping file: {file_path}")
+            results.append((file_path, True, None))
+        else:
+            pending.append(item)
+
+    if not pending:
+        return results
+
+    logger.info(f"Creating transcriptions for {len(pending)} files in one batch")
+    try:
+        client = get_client()
+
+        replies = client.conv_batch(
+            [build_prompt(safe_get_summary_text(item)) for item in pending],
+            system_message=config.TRANSCRIPTION_GENERATOR_SYSTEM_PROMPT,
+            temperature=config.TRANSCRIPTION_GENERATOR_TEMPERATURE,
+            max_tokens=config.TRANSCRIPTION_GENERATOR_MAX_TOKENS,
+            response_format={"type": "json_object"},
+        )
+        metrics.record_call(client.last_usage)
+    except Exception as e:
+        metrics.record_error(e)
+        msg = f"Exception: {e}"
+        logger.error(f"{msg} | Batch of {len(pending)} files")
+        return results + [(item.get("file_path", "<unknown>"), False, msg) for item in pending]
+
+    for item, reply in zip(pending, replies):
+        try:
+            results.append(save_transcription(item, reply))
+        except Exception as e:
+            msg = f"Exception: {e}"
+            logger.error(f"{msg} | File: {item.get('file_path', '<unknown>')}")
+            results.append((item.get("file_path", "<unknown>"), False, msg))
+    return results
+
+def save_transcription(item: Dict[str, Any], reply: str) -> Tuple[str, bool, Optional[str]]:
+    """
+    Parse a model reply and write the final transcription document back to disk.
+
+    Args:
+        item: Dictionary with 'file_path' and 'data' (see process_one)
+        reply: Raw model response
+
+    Returns:
+        tuple[str, bool, Optional[str]]: Same as process_one()
+    """
+    file_path = item.get("file_path", "<unknown>")
+    data = item.get("data", {})
 
-        # Extract participants from response (order preserved by first appearance)
-        participants = []
-        for entry in json_response.get("transcription", []):
-            sp = entry.get("speaker")
-            if sp and sp not in participants:
-                participants.append(sp)
-
-        final_doc = {
-            "call_id": data.get("call_id"),
-            "participants": participants,
-            "transcription": json_response.get("transcription", []),
-            "summary": data.get("summary", {}),
-        }
-
-        # Write back to the same file (each file is unique => no lock needed)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(final_doc, f, indent=2, ensure_ascii=False)
-
-        logger.info(f"Transcription generated and saved for file: {file_path}")
+    json_response = convert_response_to_json(reply)
+    if not json_response:
+        metrics.record_error("InvalidJSON")
+        msg = "Failed to decode JSON from model response"
+        logger.error(f"{msg}. Skipping file: {file_path}")
+        return file_path, False, msg
+
+    # Extract participants from response (order preserved by first appearance)
+    participants = []
+    for entry in json_response.get("transcription", []):
+        sp = entry.get("speaker")
+        if sp and sp not in participants:
+            participants.append(sp)
+
+    final_doc = {
+        "call_id": data.get("call_id"),
+        "participants": participants,
+        "transcription": json_response.get("transcription", []),
+        "summary": data.get("summary", {}),
+    }
+
+    # Write back to the same record (each record is unique => no lock needed)
+    if store is not None:
+        store.put(item["key"], final_doc, callback=on_written)
+    else:
+        write_json(file_path, final_doc)
+        on_written(file_path, None)
+    logger.info(f"Transcription generated for file: {file_path}")
+    return file_path, True, None
+
+def on_written(file_path: str, error: Optional[BaseException]) -> None:
+    """
+    Account for a transcription document once it has been written.
+
+    Runs on the writer thread with config.WRITE_BEHIND, so a record only
+    counts as accepted (and complete in the manifest) once it is on disk.
+    """
+    if error is not None:
+        metrics.record_error("WriteError")
+        return
+    if manifest is not None:
+        manifest.mark_complete(file_path, "transcription")
+    metrics.record_accepted()
+
+async def aprocess_one(item: Dict[str, Any], client, semaphore: asyncio.Semaphore) -> Tuple[str, bool, Optional[str]]:
+    """
+    Async counterpart of process_one() for the asyncio run mode.
+
+    Args:
+        item: Dictionary with 'file_path' and 'data' (see process_one)
+        client: Shared LLMInterface whose aconv() is awaited
+        semaphore: Bounds the number of in-flight requests
+
+    Returns:
+        tuple[str, bool, Optional[str]]: Same as process_one()
+    """
+    file_path = item.get("file_path", "<unknown>")
+
+    if "transcription" in item.get("data", {}):
+        logger.info(f"Transcription already exists. Skipping file: {file_path}")
         return file_path, True, None
 
+    async with semaphore:
+        logger.info(f"Creating transcription for file: {file_path}")
+        try:
+            reply = await client.aconv(
+                user_message=build_prompt(safe_get_summary_text(item)),
+                system_message=config.TRANSCRIPTION_GENERATOR_SYSTEM_PROMPT,
+                temperature=config.TRANSCRIPTION_GENERATOR_TEMPERATURE,
+                max_tokens=config.TRANSCRIPTION_GENERATOR_MAX_TOKENS,
+                response_format={"type": "json_object"},
+            )
+            metrics.record_call(client.last_usage)
+        except Exception as e:
+            metrics.record_error(e)
+            msg = f"Exception: {e}"
+            logger.error(f"{msg} | File: {file_path}")
+            return file_path, False, msg
+
+    try:
+        return save_transcription(item, reply)
     except Exception as e:
         msg = f"Exception: {e}"
         logger.error(f"{msg} | File: {file_path}")
         return file_path, False, msg
 
-if __name__ == "__main__":
-    data = get_data(data_dir=config.OUTPUT_DIR, file_pattern=FILE_PATTERN)
+async def run_async(items, max_concurrency: int):
+    """
+    Generate transcriptions for all items on a single event loop.
+
+    `max_concurrency` workers pull items from the (possibly lazy) iterable,
+    so only the records in flight are held in memory.
+
+    Args:
+        items (iterable[dict]): Items as yielded by iter_data()
+        max_concurrency: Maximum number of concurrent LLM requests
+
+    Returns:
+        list[tuple[str, bool, Optional[str]]]: One process_one()-style result per item
+    """
+    client = get_client(pool_size=max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    items = iter(items)
+    results = []
+
+    async def worker():
+        for item in items:
+            results.append(await aprocess_one(item, client, semaphore))
+
+    await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+    return results
+
+def run_batch_api(items, runner) -> List[Tuple[str, bool, Optional[str]]]:
+    """
+    Generate transcriptions for all items with a single Batch API run.
+
+    Requests are keyed by file name, so a resumed run maps results back to
+    the right files even if the directory listing changed order.
 
-    if not data:
-        logger.warning("No matching files found")
-        create_metadata_file(config, filepath=config.METADATA_PATH)
-        raise SystemExit(0)
+    Args:
+        items (iterable[dict]): Items as yielded by iter_data()
+        runner (OpenAIBatchRunner): Runner used to submit (or resume) the run
+
+    Returns:
+        list[tuple[str, bool, Optional[str]]]: One process_one()-style result per item
+    """
+    results = []
+    pending = {}
+    for item in items:
+        file_path = item.get("file_path", "<unknown>")
+        if "transcription" in item.get("data", {}):
+            logger.info(f"Transcription already exists. Skipping file: {file_path}")
+            results.append((file_path, True, None))
+        else:
+            pending[os.path.basename(file_path)] = item
+
+    if not pending:
+        return results
+
+    requests = [
+        runner.build_request(
+            custom_id=custom_id,
+            user_message=build_prompt(safe_get_summary_text(item)),
+            system_message=config.TRANSCRIPTION_GENERATOR_SYSTEM_PROMPT,
+            max_tokens=config.TRANSCRIPTION_GENERATOR_MAX_TOKENS,
+            response_format={"type": "json_object"},
+        )
+        for custom_id, item in pending.items()
+    ]
+    replies, errors = runner.run(requests)
+
+    for custom_id, item in pending.items():
+        file_path = item.get("file_path", "<unknown>")
+        if custom_id in errors:
+            metrics.record_error("BatchAPIError")
+            msg = f"Batch API error: {errors[custom_id]}"
+            logger.error(f"{msg} | File: {file_path}")
+            results.append((file_path, False, msg))
+            continue
+        try:
+            results.append(save_transcription(item, replies[custom_id]))
+        except Exception as e:
+            msg = f"Exception: {e}"
+            logger.error(f"{msg} | File: {file_path}")
+            results.append((file_path, False, msg))
+    return results
 
-    logger.info(f"Found {len(data)} files to evaluate (pattern: {FILE_PATTERN})")
-    workers = min(MAX_WORKERS, max(1, len(data)))
-    logger.info(f"Running up to {workers} threads in parallel")
+if __name__ == "__main__":
+    if config.WRITE_BEHIND and supports_writer(config.DATASET_STORE):
+        writer = WriteBehindWriter(max_queue=config.WRITER_QUEUE_SIZE, batch_size=config.WRITER_BATCH_SIZE)
+    store = open_store(config.DATASET_STORE, config.OUTPUT_DIR, writer=writer, **config.DATASET_STORE_OPTIONS)
+
+    # Records are streamed from the store; finished ones are filtered out before they are kept
+    scan_stats = {}
+    pending_keys = None
+    if config.USE_MANIFEST and config.DATASET_STORE == "json_dir":
+        # Only pending records are opened; the predicate still guards against a stale manifest
+        manifest = Manifest(config.OUTPUT_DIR)
+        logger.info(f"Manifest: {manifest.stats()}")
+        pending_keys = [record_number(os.path.basename(path)) for path in manifest.pending("transcription")]
+    data = store.iter_records(
+        predicate=needs_transcription,
+        fields=RECORD_FIELDS,
+        stats=scan_stats,
+        workers=LOAD_WORKERS,
+        keys=pending_keys,
+    )
 
     successes = 0
     failures = 0
-
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_map = {executor.submit(process_one, item): item for item in data}
-        for fut in as_completed(future_map):
-            _, ok, _ = fut.result()
+    batch_runner = None
+    # pool_size of the client the run uses, so its stats are logged from that same client
+    pool_size = MAX_WORKERS
+
+    if BATCH_API_MODE:
+        batch_runner = get_batch_runner()
+        pool_size = None
+        logger.info("Submitting pending files through the OpenAI Batch API")
+        for _, ok, _ in run_batch_api(data, batch_runner):
+            if ok:
+                successes += 1
+            else:
+                failures += 1
+    elif ASYNC_MODE:
+        pool_size = MAX_CONCURRENCY
+        logger.info(f"Running up to {MAX_CONCURRENCY} concurrent requests on asyncio")
+        for _, ok, _ in asyncio.run(run_async(data, MAX_CONCURRENCY)):
+            if ok:
+                successes += 1
+            else:
+                failures += 1
+    elif config.CLIENT_TYPE == "huggingface":
+        logger.info(f"Running batched generations (up to {HF_BATCH_SIZE} prompts each) on {MAX_WORKERS} threads")
+        for results in map_bounded(process_group, iter_batches(data, HF_BATCH_SIZE), MAX_WORKERS):
+            for _, ok, _ in results:
+                if ok:
+                    successes += 1
+                else:
+                    failures += 1
+    else:
+        logger.info(f"Running up to {MAX_WORKERS} threads in parallel")
+        for _, ok, _ in map_bounded(process_one, data, MAX_WORKERS):
             if ok:
                 successes += 1
             else:
                 failures += 1
 
-    logger.info(f"Done. Success: {successes}, Failures: {failures}, Total: {len(data)}")
+    if writer is not None:
+        # Successes above were handed to the writer; drain it and count files it failed to write
+        writer.close()
+        writer_stats = writer.stats()
+        metrics.record_writer(writer_stats)
+        logger.info(f"Writer: {writer_stats}")
+        successes -= writer_stats["errors"]
+        failures += writer_stats["errors"]
+    store.close()
+    if manifest is not None:
+        manifest.close()
+    if batch_runner is not None:
+        # Every reply is on disk by now, so the submitted batches can be forgotten
+        batch_runner.clear_state()
+
+    if not scan_stats.get("loaded") and not scan_stats.get("filtered"):
+        logger.warning(f"No pending records found in {config.DATASET_STORE} store {config.OUTPUT_DIR}")
+    else:
+        logger.info(f"Skipped {scan_stats.get('filtered', 0)} files that already have a transcription")
+    log_client_stats(pool_size)
+    logger.info(f"Done. Success: {successes}, Failures: {failures}, Total: {scan_stats.get('loaded', 0)}")
     create_metadata_file(config, filepath=config.METADATA_PATH)
+    json_report, _ = metrics.write(os.path.dirname(config.METADATA_PATH))
+    logger.info(f"Wrote stage metrics to {json_report}")
+    prompt_cache = metrics.report()["prompt_cache"]
+    if prompt_cache["calls"]:
+        logger.info(f"Prompt cache: {prompt_cache['hit_rate']:.1%} of calls, {prompt_cache['token_hit_rate'] or 0:.1%} of prompt tokens")
@@ -1,9 +1,10 @@
-from dataset_operations import get_data, create_metadata_file
+from dataset_operations import create_metadata_file, iter_batches
+from dataset_store import open_store
+from manifest import Manifest, record_number
 from utils import convert_response_to_json
 from logger import setup_logger
 import config
 
-import json
 import os
 from typing import Dict, Any
 from dotenv import load_dotenv
@@ -12,19 +13,29 @@ from langchain_core.messages import HumanMessage, SystemMessage
 
 logger = setup_logger(__name__)
 
-FILE_PATTERN = "*e.json"
 # Tune this if you hit rate limits or want more/less parallelism
 MAX_WORKERS = 10
+# Records read from disk and sent to model.batch() at a time, bounding memory use
+CHUNK_SIZE = 200
 
 load_dotenv()
 
 # Initialize LangChain model
-model = ChatOpenAI(
-    model_name=config.TRANSCRIPTION_GENERATOR_LLM_MODEL,
-    temperature=config.TRANSCRIPTION_GENERATOR_TEMPERATURE,
-    max_tokens=config.TRANSCRIPTION_GENERATOR_MAX_TOKENS,
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+if config.CLIENT_TYPE == "simulated":
+    # Offline load testing: same calls, simulated replies
+    from llms.simulated_client import SimulatedChatModel, SimulatedLLM
+
+    model = SimulatedChatModel(
+        SimulatedLLM(model=config.TRANSCRIPTION_GENERATOR_LLM_MODEL, **config.SIMULATION),
+        max_tokens=config.TRANSCRIPTION_GENERATOR_MAX_TOKENS,
+    )
+else:
+    model = ChatOpenAI(
+        model_name=config.TRANSCRIPTION_GENERATOR_LLM_MODEL,
+        temperature=config.TRANSCRIPTION_GENERATOR_TEMPERATURE,
+        max_tokens=config.TRANSCRIPTION_GENERATOR_MAX_TOKENS,
+        api_key=os.getenv("OPENAI_API_KEY")
+    )
 
 def safe_get_summary_text(item: Dict[str, Any]) -> str:
     """
@@ -61,85 +72,87 @@ def build_prompt(summary_text: str) -> str:
     return f"Generate a transcription for the following text:{summary_text}"
 
 if __name__ == "__main__":
-    data = get_data(data_dir=config.OUTPUT_DIR, file_pattern=FILE_PATTERN)
-
-    if not data:
-        logger.warning("No matching files found")
-        create_metadata_file(config, filepath=config.METADATA_PATH)
-        raise SystemExit(0)
-
-    logger.info(f"Found {len(data)} files to evaluate (pattern: {FILE_PATTERN})")
-
-    # Filter out items that already have transcriptions
-    items_to_process = []
-    for item in data:
-        if "transcription" in item.get("data", {}):
-            logger.info(f"Transcription already exists. Skipping file: {item.get('file_path')}")
-        else:
-            items_to_process.append(item)
-
-    if not items_to_process:
-        logger.info("All files already have transcriptions. Nothing to process.")
-        create_metadata_file(config, filepath=config.METADATA_PATH)
-        raise SystemExit(0)
-
-    logger.info(f"Processing {len(items_to_process)} files")
-    workers = min(MAX_WORKERS, max(1, len(items_to_process)))
-    logger.info(f"Running with max concurrency of {workers}")
-
-    # Build all conversations upfront
-    conversations = []
-    for item in items_to_process:
-        summary_text = safe_get_summary_text(item)
-        conversation = [
-            SystemMessage(content=config.TRANSCRIPTION_GENERATOR_SYSTEM_PROMPT),
-            HumanMessage(content=build_prompt(summary_text)),
-        ]
-        conversations.append(conversation)
-
-    # Process all conversations in batch
+    # Records are streamed in chunks; files that already have a transcription are skipped while reading
+    scan_stats = {}
+    store = open_store(config.DATASET_STORE, config.OUTPUT_DIR, **config.DATASET_STORE_OPTIONS)
+    use_manifest = config.USE_MANIFEST and config.DATASET_STORE == "json_dir"
+    manifest = Manifest(config.OUTPUT_DIR) if use_manifest else None
+    pending_keys = None
+    if manifest is not None:
+        pending_keys = [record_number(os.path.basename(path)) for path in manifest.pending("transcription")]
+    data = store.iter_records(
+        predicate=lambda doc: "transcription" not in doc,
+        fields=("call_id", "summary"),
+        stats=scan_stats,
+        keys=pending_keys,
+    )
+    logger.info(f"Running with max concurrency of {MAX_WORKERS}")
     model_with_structure = model.with_structured_output(method="json_mode")
-    responses = model_with_structure.batch(conversations, config={"max_concurrency": workers})
 
     successes = 0
     failures = 0
 
-    # Process responses and save to files
-    for item, response in zip(items_to_process, responses):
-        file_path = item.get("file_path", "<unknown>")
-        data_dict = item.get("data", {})
-
-        try:
-            json_response = convert_response_to_json(response)
-            if not json_response:
-                logger.error(f"Failed to decode JSON from model response. Skipping file: {file_path}")
+    for items_to_process in iter_batches(data, CHUNK_SIZE):
+        logger.info(f"Processing {len(items_to_process)} files")
+
+        conversations = []
+        for item in items_to_process:
+            summary_text = safe_get_summary_text(item)
+            conversation = [
+                SystemMessage(content=config.TRANSCRIPTION_GENERATOR_SYSTEM_PROMPT),
+                HumanMessage(content=build_prompt(summary_text)),
+            ]
+            conversations.append(conversation)
+
+        # Process the chunk's conversations in batch
+        responses = model_with_structure.batch(conversations, config={"max_concurrency": MAX_WORKERS})
+
+        # Process responses and save to files
+        for item, response in zip(items_to_process, responses):
+            file_path = item.get("file_path", "<unknown>")
+            data_dict = item.get("data", {})
+
+            try:
+                json_response = convert_response_to_json(response)
+                if not json_response:
+                    logger.error(f"Failed to decode JSON from model response. Skipping file: {file_path}")
+                    failures += 1
+                    continue
+
+                # Extract participants from response (order preserved by first appearance)
+                participants = []
+                for entry in json_response.get("transcription", []):
+                    sp = entry.get("speaker")
+                    if sp and sp not in participants:
+                        participants.append(sp)
+
+                final_doc = {
+                    "call_id": data_dict.get("call_id"),
+                    "participants": participants,
+                    "transcription": json_response.get("transcription", []),
+                    "summary": data_dict.get("summary", {}),
+                }
+
+                # Write back to the same record (each record is unique => no lock needed)
+                store.put(item["key"], final_doc)
+                if manifest is not None:
+                    manifest.mark_complete(file_path, "transcription")
+
+                logger.info(f"Transcription generated and saved for file: {file_path}")
+                successes += 1
+
+            except Exception as e:
+                logger.error(f"Exception: {e} | File: {file_path}")
                 failures += 1
-                continue
-
-            # Extract participants from response (order preserved by first appearance)
-            participants = []
-            for entry in json_response.get("transcription", []):
-                sp = entry.get("speaker")
-                if sp and sp not in participants:
-                    participants.append(sp)
-
-            final_doc = {
-                "call_id": data_dict.get("call_id"),
-                "participants": participants,
-                "transcription": json_response.get("transcription", []),
-                "summary": data_dict.get("summary", {}),
-            }
-
-            # Write back to the same file (each file is unique => no lock needed)
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(final_doc, f, indent=2, ensure_ascii=False)
-
-            logger.info(f"Transcription generated and saved for file: {file_path}")
-            successes += 1
-
-        except Exception as e:
-            logger.error(f"Exception: {e} | File: {file_path}")
-            failures += 1
-
-    logger.info(f"Done. Success: {successes}, Failures: {failures}, Total: {len(items_to_process)}")
+
+    if not scan_stats.get("loaded") and not scan_stats.get("filtered"):
+        logger.warning("No pending files found")
+    elif not scan_stats.get("loaded"):
+        logger.info("All files already have transcriptions. Nothing to process.")
+    else:
+        logger.info(f"Skipped {scan_stats.get('filtered', 0)} files that already have a transcription")
+    logger.info(f"Done. Success: {successes}, Failures: {failures}, Total: {scan_stats.get('loaded', 0)}")
+    store.close()
+    if manifest is not None:
+        manifest.close()
     create_metadata_file(config, filepath=config.METADATA_PATH)
@@ -0,0 +1,220 @@
+import fnmatch
+import json
+import mmap
+import os
+import random
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+from json_codec import JsonCodec, get_codec
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+
+def write_jsonl(path: str, records: Iterable[Any], codec: Optional[JsonCodec] = None) -> int:
+    """
+    Write records to a JSONL file, one document per line.
+
+    The file is written next to `path` and renamed over it, so readers never
+    see a partial corpus.
+
+    Args:
+        path: File to (over)write
+        records: JSON-serializable documents, consumed lazily
+        codec: Codec to use (default: get_codec())
+
+    Returns:
+        int: Number of records written
+    """
+    codec = codec or get_codec()
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    count = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for record in records:
+                f.write(codec.dumps(record, indent=False) + b"\n")
+                count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def is_stale(path: str, source_dir: str, file_pattern: str = "*") -> bool:
+    """
+    Return whether the JSONL export at `path` is missing or older than its source.
+
+    The export is stale if any file in `source_dir` matching `file_pattern` was
+    modified after it, or if the directory itself was (files added or removed).
+
+    Args:
+        path: JSONL export
+        source_dir: Directory the export was built from
+        file_pattern: Glob pattern of the source files (default: "*")
+    """
+    try:
+        exported = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return True
+    if os.stat(source_dir).st_mtime_ns > exported:
+        return True
+    with os.scandir(source_dir) as entries:
+        return any(
+            fnmatch.fnmatch(entry.name, file_pattern) and entry.stat().st_mtime_ns > exported
+            for entry in entries
+        )
+
+
+class IndexedJsonlReader:
+    """
+    Random access to the records of a JSONL file through a byte-offset index.
+
+    The index (line offsets plus each record's id) is built in one pass the
+    first time a file is opened and saved next to it as `<path>.idx`; it is
+    rebuilt whenever the file's size or mtime changes. Records are read from
+    a memory map and only decoded when accessed, so once indexed, sampling
+    and lookups cost the same on a hundred records as on a million.
+
+    Safe to share between threads for reading.
+    """
+
+    def __init__(self, path: str, id_field: str = "call_id", codec: Optional[JsonCodec] = None):
+        """
+        Args:
+            path: JSONL file, one JSON document per line (blank lines are skipped)
+            id_field: Top-level field lookup() matches (default: "call_id")
+            codec: JSON codec (default: get_codec())
+
+        Raises:
+            FileNotFoundError: If path does not exist
+        """
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.id_field = id_field
+        self.codec = codec or get_codec()
+        self.parsed = 0  # records decoded so far
+        self.built = False  # whether opening had to (re)build the index
+        self._ids: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+        self._file = open(path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self._signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "id_field": id_field}
+        if not self._load_index():
+            self._build_index()
+        # mmap cannot map an empty file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+
+    def _load_index(self) -> bool:
+        """Load the saved index if it matches the file; return whether it did."""
+        try:
+            with open(self.index_path, "rb") as f:
+                header = json.loads(f.readline())
+                if header.get("version") != INDEX_VERSION or any(
+                    header.get(key) != value for key, value in self._signature.items()
+                ):
+                    return False
+                offsets = array("Q")
+                offsets.frombytes(f.read(offsets.itemsize * header["count"]))
+                id_list = self.codec.loads(f.read())
+        except (OSError, ValueError, KeyError):
+            return False
+        if len(offsets) != header["count"] or len(id_list) != header["count"]:
+            return False
+        self._offsets, self._id_list = offsets, id_list
+        return True
+
+    def _build_index(self) -> None:
+        """Index every line of the file and save the index (best effort)."""
+        offsets, id_list = array("Q"), []
+        offset = 0
+        for line in self._file:
+            if line.strip():
+                try:
+                    record = self.codec.loads(line)
+                except ValueError as e:
+                    logger.error(f"Skipping undecodable line at byte {offset} of {self.path}: {e}")
+                else:
+                    value = record.get(self.id_field) if isinstance(record, dict) else None
+                    offsets.append(offset)
+                    id_list.append(None if value is None else str(value))
+            offset += len(line)
+        self._file.seek(0)
+        self._offsets, self._id_list = offsets, id_list
+        self.built = True
+
+        header = {"version": INDEX_VERSION, "count": len(id_list), **self._signature}
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                f.write(offsets.tobytes())
+                f.write(self.codec.dumps(id_list, indent=False))
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            # A read-only corpus still works; the index is just rebuilt next time
+            logger.warning(f"Could not save JSONL index {self.index_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info(f"Indexed {len(id_list)} records of {self.path}")
+
+    def __len__(self) -> int:
+        return len(self._id_list)
+
+    def __getitem__(self, position: int) -> Any:
+        """
+        Decode the record at `position` (negative positions count from the end).
+
+        Raises:
+            IndexError: If position is out of range
+        """
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(f"Record {position} out of range for {len(self)} records")
+        start = self._offsets[position]
+        end = self._map.find(b"\n", start)
+        data = self._map[start:end if end != -1 else len(self._map)]
+        with self._lock:
+            self.parsed += 1
+        return self.codec.loads(data)
+
+    def lookup(self, record_id: str) -> Optional[Any]:
+        """Return the record whose id_field equals `record_id`, or None."""
+        with self._lock:
+            if self._ids is None:
+                # Last occurrence wins, as when a corpus is appended to
+                self._ids = {value: position for position, value in enumerate(self._id_list) if value is not None}
+            position = self._ids.get(str(record_id))
+        return self[position] if position is not None else None
+
+    def sample(self, k: int, rng: Optional[random.Random] = None) -> List[Any]:
+        """
+        Decode `k` distinct records chosen uniformly at random (all of them if k >= len).
+
+        Args:
+            k: Number of records
+            rng: Random generator (default: the `random` module)
+        """
+        positions = (rng or random).sample(range(len(self)), min(k, len(self)))
+        return [self[position] for position in positions]
+
+    def close(self) -> None:
+        """Release the memory map and file."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "IndexedJsonlReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
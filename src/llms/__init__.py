@@ -1,7 +1,31 @@
 # LLM clients package
-# Import client modules to make them accessible for testing
-from . import openai_api
-from . import huggingface_client
-from . import ollama_client
-from . import llm_factory
-from . import llm_interface
+# Client modules are imported lazily on first attribute access (e.g. llms.huggingface_client),
+# so OpenAI-only runs never pay for importing torch/transformers.
+import importlib
+
+_SUBMODULES = {
+    "openai_api",
+    "huggingface_client",
+    "ollama_client",
+    "llm_factory",
+    "llm_interface",
+    "client_registry",
+    "openai_batch",
+    "response_cache",
+    "rate_limiter",
+    "retry",
+    "telemetry",
+    "router_client",
+    "hedging",
+    "simulated_client",
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
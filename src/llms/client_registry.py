@@ -0,0 +1,218 @@
+import queue
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List
+
+from .llm_interface import CallUsage, LLMInterface
+
+
+class PooledLLMClient(LLMInterface):
+    """
+    Thread-safe front for clients that must not be shared between threads.
+
+    Each call checks out an idle instance, runs on it and returns it to the pool.
+    Instances are built lazily by `factory`, up to `size` of them; once the pool
+    is full, callers block until an instance is released.
+    """
+
+    def __init__(self, factory: Callable[[], LLMInterface], size: int = 1, on_create: Callable[[], None] = None):
+        """
+        Args:
+            factory: Zero-argument callable building a new client instance
+            size: Maximum number of instances kept alive (default: 1)
+            on_create: Optional callback invoked after each instance is built
+        """
+        super().__init__(api_key=None, model=None)
+        self._factory = factory
+        self._size = max(1, int(size))
+        self._on_create = on_create
+        self._idle: "queue.LifoQueue[LLMInterface]" = queue.LifoQueue()
+        self._instances: List[LLMInterface] = []
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """Number of instances built so far."""
+        return self._created
+
+    def _checkout(self) -> LLMInterface:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            build = self._created < self._size
+            if build:
+                self._created += 1
+
+        if not build:
+            return self._idle.get()
+
+        try:
+            instance = self._factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._instances.append(instance)
+        if self.model is None:
+            self.api_key, self.model = instance.api_key, instance.model
+        if self._on_create:
+            self._on_create()
+        return instance
+
+    def _checkin(self, instance: LLMInterface) -> None:
+        self._idle.put(instance)
+
+    def aggregate_stats(self, method_name: str) -> Dict[str, Any]:
+        """
+        Sum a dict-returning stats method across every pooled instance.
+
+        Args:
+            method_name: Name of the instance method to call (e.g. "prefix_cache_stats")
+
+        Returns:
+            dict: Numeric values summed per key; empty if no instance provides the method
+        """
+        with self._lock:
+            instances = list(self._instances)
+        totals: Dict[str, Any] = {}
+        for instance in instances:
+            method = getattr(instance, method_name, None)
+            if not callable(method):
+                continue
+            for key, value in method().items():
+                if isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Run conv() on a pooled instance. Arguments match LLMInterface.conv()."""
+        instance = self._checkout()
+        try:
+            reply = instance.conv(
+                user_message,
+                system_message=system_message,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs,
+            )
+            usage = getattr(instance, "last_usage", None)
+            self._record_usage(usage if isinstance(usage, CallUsage) else None)
+            return reply
+        finally:
+            self._checkin(instance)
+
+    def conv_batch(
+        self,
+        user_messages: List[str],
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> List[str]:
+        """Run conv_batch() on a pooled instance. Arguments match LLMInterface.conv_batch()."""
+        instance = self._checkout()
+        try:
+            reply = instance.conv_batch(
+                user_messages,
+                system_message=system_message,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs,
+            )
+            usage = getattr(instance, "last_usage", None)
+            self._record_usage(usage if isinstance(usage, CallUsage) else None)
+            return reply
+        finally:
+            self._checkin(instance)
+
+
+class ClientRegistry:
+    """
+    Process-wide cache of LLM clients.
+
+    Thread-safe clients are constructed once per key and shared. Clients that are
+    not thread-safe are wrapped in a PooledLLMClient so concurrent callers never
+    touch the same instance. Construction counters make reuse observable.
+    """
+
+    def __init__(self):
+        # Re-entrant: construction counters are bumped while get() holds the lock
+        self._lock = threading.RLock()
+        self._clients: Dict[Hashable, LLMInterface] = {}
+        self._counters: Counter = Counter()
+
+    def get(
+        self,
+        key: Hashable,
+        factory: Callable[[], LLMInterface],
+        thread_safe: bool = True,
+        pool_size: int = 1,
+        counter_name: str = "constructions",
+    ) -> LLMInterface:
+        """
+        Return the client registered under `key`, building it on first use.
+
+        Args:
+            key: Hashable registry key
+            factory: Zero-argument callable building a new client instance
+            thread_safe: Share a single instance if True, otherwise serve from a pool
+            pool_size: Maximum pool size for non thread-safe clients
+            counter_name: Extra counter bumped per constructed instance (e.g. "model_loads")
+
+        Returns:
+            LLMInterface: Shared client or pool front
+        """
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._counters["hits"] += 1
+                return client
+            self._counters["misses"] += 1
+
+            if thread_safe:
+                client = factory()
+                self._count_construction(counter_name)
+            else:
+                client = PooledLLMClient(
+                    factory,
+                    size=pool_size,
+                    on_create=lambda: self._count_construction(counter_name),
+                )
+            self._clients[key] = client
+            return client
+
+    def _count_construction(self, counter_name: str) -> None:
+        with self._lock:
+            self._counters["constructions"] += 1
+            if counter_name != "constructions":
+                self._counters[counter_name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of registry counters and the number of cached clients."""
+        with self._lock:
+            snapshot = dict(self._counters)
+            snapshot["clients"] = len(self._clients)
+            return snapshot
+
+    def keys(self) -> List[Hashable]:
+        """Return the keys of all registered clients."""
+        with self._lock:
+            return list(self._clients)
+
+    def clear(self) -> None:
+        """Drop all cached clients and reset counters."""
+        with self._lock:
+            self._clients.clear()
+            self._counters.clear()
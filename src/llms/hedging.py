@@ -0,0 +1,295 @@
+import asyncio
+import contextvars
+import dataclasses
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .llm_interface import CallUsage, LLMClientWrapper, LLMInterface
+from .telemetry import percentile
+
+_hedge_attempt = contextvars.ContextVar("hedge_attempt", default=False)
+
+_policies: Dict[Hashable, "HedgePolicy"] = {}
+_policies_lock = threading.Lock()
+
+
+def is_hedge_attempt() -> bool:
+    """
+    Return True inside the duplicate request of a hedged call.
+
+    Routers use this to send the duplicate to a different backend than the
+    primary (see RouterClient).
+    """
+    return _hedge_attempt.get()
+
+
+class HedgePolicy:
+    """
+    Decides when a slow call gets a duplicate request.
+
+    A call that has not finished after the `quantile` latency of the last
+    `window` calls is hedged, as long as the budget allows it: every call earns
+    `budget` hedge credits (at most `max_credits`) and every hedge spends one,
+    so hedges add at most `budget` extra load. Shared by every client drawing
+    on the same backend (see get_hedge_policy()).
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        budget: float = 0.05,
+        window: int = 200,
+        min_samples: int = 20,
+        max_credits: float = 10.0,
+        max_workers: int = 64,
+    ):
+        """
+        Args:
+            quantile: Latency percentile after which a call is hedged (default: 0.95)
+            budget: Hedges allowed per call, i.e. the extra load cap (default: 0.05)
+            window: Number of recent latencies the percentile is computed over (default: 200)
+            min_samples: Latencies observed before hedging starts (default: 20)
+            max_credits: Upper bound on saved-up hedges, limiting bursts (default: 10)
+            max_workers: Threads running hedged calls for conv() (default: 64)
+
+        Raises:
+            ValueError: If quantile is not in (0, 1) or budget is negative
+        """
+        if not 0 < quantile < 1:
+            raise ValueError(f"quantile must be in (0, 1), got {quantile}")
+        if budget < 0:
+            raise ValueError(f"budget must not be negative, got {budget}")
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.max_credits = max_credits
+        self.max_workers = max_workers
+        self._latencies = deque(maxlen=window)
+        self._credits = 0.0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "budget_denied": 0}
+
+    def observe(self, latency: float) -> None:
+        """Add the latency of a completed (or, as a lower bound, cancelled) request to the rolling window."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def delay(self) -> Optional[float]:
+        """
+        Start a call and return how long to wait before hedging it.
+
+        Returns:
+            Optional[float]: Seconds, or None while fewer than min_samples latencies are known
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            self._credits = min(self.max_credits, self._credits + self.budget)
+            if len(self._latencies) < self.min_samples:
+                return None
+            return percentile(list(self._latencies), self.quantile)
+
+    def try_hedge(self) -> bool:
+        """Spend one hedge credit. Returns False if the budget is exhausted."""
+        with self._lock:
+            # Tolerance for credits accumulated from fractional budgets (10 * 0.1 < 1.0)
+            if self._credits < 1.0 - 1e-9:
+                self._stats["budget_denied"] += 1
+                return False
+            self._credits -= 1.0
+            self._stats["hedges"] += 1
+            return True
+
+    def record_win(self) -> None:
+        """Count a hedge that answered before the primary request."""
+        with self._lock:
+            self._stats["hedge_wins"] += 1
+
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the thread pool running hedged conv() calls, creating it on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hedging counters.
+
+        Returns:
+            dict: 'calls', 'hedges', 'hedge_wins', 'budget_denied', 'hedge_rate',
+            'win_rate' and the current 'threshold' in seconds
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            samples = list(self._latencies)
+        stats["hedge_rate"] = stats["hedges"] / stats["calls"] if stats["calls"] else 0.0
+        stats["win_rate"] = stats["hedge_wins"] / stats["hedges"] if stats["hedges"] else None
+        stats["threshold"] = percentile(samples, self.quantile) if len(samples) >= self.min_samples else None
+        return stats
+
+
+def get_hedge_policy(key: Hashable, **kwargs) -> HedgePolicy:
+    """
+    Return the process-wide HedgePolicy for `key`, creating it on first use.
+
+    Args:
+        key: Identifies the backend, e.g. (client_type, model, base_url)
+        **kwargs: HedgePolicy arguments, applied only when the policy is created
+
+    Returns:
+        HedgePolicy: Shared policy instance
+    """
+    with _policies_lock:
+        policy = _policies.get(key)
+        if policy is None:
+            policy = _policies[key] = HedgePolicy(**kwargs)
+        return policy
+
+
+def clear_hedge_policies() -> None:
+    """Drop all shared hedge policies (mainly for tests)."""
+    with _policies_lock:
+        policies = list(_policies.values())
+        _policies.clear()
+    for policy in policies:
+        if policy._executor is not None:
+            policy._executor.shutdown(wait=False)
+
+
+class HedgedLLMClient(LLMClientWrapper):
+    """
+    Sends a duplicate of slow calls and returns whichever reply arrives first.
+
+    With aconv() the losing request is cancelled. With conv() both requests run
+    on the policy's thread pool; the loser cannot be interrupted, so it runs to
+    completion in the background and its reply is dropped. conv_batch() is
+    not hedged.
+    """
+
+    def __init__(self, client: LLMInterface, policy: HedgePolicy, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            client: Client whose calls are hedged
+            policy: Shared hedging policy for this backend
+            clock: Monotonic clock used to measure latency
+        """
+        super().__init__(client)
+        self.policy = policy
+        self._clock = clock
+
+    def _attempt(self, hedge: bool, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[str, Optional[CallUsage]]:
+        _hedge_attempt.set(hedge)
+        started = self._clock()
+        reply = self.client.conv(*args, **kwargs)
+        self.policy.observe(self._clock() - started)
+        usage = self.client.last_usage
+        return reply, usage if isinstance(usage, CallUsage) else None
+
+    def _finish(self, usage: Optional[CallUsage], hedged: bool, hedge_won: bool) -> None:
+        if hedge_won:
+            self.policy.record_win()
+        if usage is not None and hedged:
+            usage = dataclasses.replace(usage, hedged=True, hedge_won=hedge_won)
+        self._record_usage(usage)
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Call the wrapped client, hedging if it is slower than the policy's threshold. Arguments match LLMInterface.conv()."""
+        args = (user_message,)
+        call_kwargs = dict(system_message=system_message, temperature=temperature, max_tokens=max_tokens, **kwargs)
+        delay = self.policy.delay()
+        if delay is None:
+            reply, usage = self._attempt(False, args, call_kwargs)
+            self._finish(usage, hedged=False, hedge_won=False)
+            return reply
+
+        executor = self.policy.executor()
+        primary = executor.submit(contextvars.copy_context().run, self._attempt, False, args, call_kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.policy.try_hedge():
+            reply, usage = primary.result()
+            self._finish(usage, hedged=False, hedge_won=False)
+            return reply
+
+        hedge = executor.submit(contextvars.copy_context().run, self._attempt, True, args, call_kwargs)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded or not pending:
+                # Only fail once both requests have failed
+                future = succeeded[0] if succeeded else primary
+                reply, usage = future.result()
+                for loser in pending:
+                    loser.cancel()
+                self._finish(usage, hedged=True, hedge_won=future is hedge)
+                return reply
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Async variant of conv(); the slower of the two requests is cancelled."""
+        call_kwargs = dict(system_message=system_message, temperature=temperature, max_tokens=max_tokens, **kwargs)
+
+        async def attempt(hedge: bool) -> Tuple[str, Optional[CallUsage]]:
+            _hedge_attempt.set(hedge)
+            started = self._clock()
+            try:
+                reply = await self.client.aconv(user_message, **call_kwargs)
+            except asyncio.CancelledError:
+                # A cancelled loser took at least this long; dropping it would pull the
+                # percentile down and make hedges ever more frequent
+                self.policy.observe(self._clock() - started)
+                raise
+            usage = self.client.last_usage
+            self.policy.observe(self._clock() - started)
+            return reply, usage if isinstance(usage, CallUsage) else None
+
+        delay = self.policy.delay()
+        if delay is None:
+            reply, usage = await attempt(False)
+            self._finish(usage, hedged=False, hedge_won=False)
+            return reply
+
+        primary = asyncio.ensure_future(attempt(False))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done or not self.policy.try_hedge():
+            reply, usage = await primary
+            self._finish(usage, hedged=False, hedge_won=False)
+            return reply
+
+        hedge = asyncio.ensure_future(attempt(True))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded or not pending:
+                    task = succeeded[0] if succeeded else primary
+                    reply, usage = task.result()
+                    self._finish(usage, hedged=True, hedge_won=task is hedge)
+                    return reply
+        finally:
+            for task in pending:
+                task.cancel()
+            # Let the losers unwind (release router slots, breaker probes) before returning
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def hedge_stats(self) -> Dict[str, Any]:
+        """Return the shared HedgePolicy.stats()."""
+        return self.policy.stats()
@@ -1,7 +1,31 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import AutoModelForCausalLM, AutoTokenizer, CompileConfig, StaticCache
 import torch
+import copy
+import io
 import os
-from .llm_interface import LLMInterface
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+from .llm_interface import CallUsage, LLMInterface
+
+SUPPORTED_QUANTIZATIONS = ["int8"]
+GENERATION_MODES = ["eager", "compiled"]
+# Static caches are sized in multiples of this many positions so that prompts of
+# similar length share one compiled decode graph
+STATIC_CACHE_BUCKET = 256
+DEFAULT_QUANTIZED_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "baby_calls", "quantized")
+
+
+@dataclass
+class PrefixCacheEntry:
+    """Prefilled key/value cache for one system prompt."""
+
+    input_ids: torch.Tensor
+    past_key_values: Any
+    prefill_seconds: float
 
 
 class HuggingFaceLLM(LLMInterface):
@@ -9,21 +33,77 @@ class HuggingFaceLLM(LLMInterface):
     Implementation of LLMInterface for Hugging Face transformer models.
     """
 
-    def __init__(self, model_id: str, api_key: str = None, device: str = None):
+    def __init__(
+        self,
+        model_id: str,
+        api_key: str = None,
+        device: str = None,
+        prefix_cache_size: int = 0,
+        quantization: Optional[str] = None,
+        quantized_cache_dir: Optional[str] = None,
+        generation_mode: str = "eager",
+    ):
         """
         Args:
             model_id: Hugging Face model name or local path
             api_key: Hugging Face token 
             device: 'cuda' or 'cpu' (auto-detected if None)
+            prefix_cache_size: Number of distinct system prompts whose prefilled
+                KV cache is kept for reuse (0 disables prefix caching)
+            quantization: 'int8' for dynamic int8 quantization of linear layers
+                (CPU only), or None for full precision
+            quantized_cache_dir: Where quantized checkpoints are cached
+                (default: ~/.cache/baby_calls/quantized)
+            generation_mode: 'eager' (dynamic KV cache) or 'compiled' (preallocated
+                static KV cache with a torch.compile'd decode step). Prefix caching
+                is only used in eager mode.
+
+        Raises:
+            ValueError: If the quantization or generation mode is unsupported,
+                or quantization is requested off CPU
         """
         
         super().__init__(api_key=api_key, model=model_id)
 
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.quantization = quantization
+
+        if generation_mode not in GENERATION_MODES:
+            raise ValueError(
+                f"Unsupported generation_mode: {generation_mode}. Supported modes are {GENERATION_MODES}."
+            )
+        self.generation_mode = generation_mode
+        self._static_caches: Dict[tuple, StaticCache] = {}
+        self._compile_config = None
+        if generation_mode == "compiled":
+            # CUDA graphs ("reduce-overhead") only help on GPU
+            self._compile_config = CompileConfig(
+                fullgraph=True,
+                dynamic=False,
+                mode="reduce-overhead" if self.device.startswith("cuda") else "default",
+            )
+            self._compile_config._compile_all_devices = True
 
         # Pass the token for private repo access
         self.tokenizer = AutoTokenizer.from_pretrained(model_id, token=api_key)
-        self.model = AutoModelForCausalLM.from_pretrained(model_id, token=api_key).to(self.device)
+        if quantization is None:
+            self.model = AutoModelForCausalLM.from_pretrained(model_id, token=api_key).to(self.device)
+        else:
+            self.model = self._load_quantized(
+                model_id, api_key, quantization, quantized_cache_dir or DEFAULT_QUANTIZED_CACHE_DIR
+            )
+
+        # LRU of system prompt -> PrefixCacheEntry
+        self.prefix_cache_size = prefix_cache_size
+        self._prefix_cache: "OrderedDict[str, PrefixCacheEntry]" = OrderedDict()
+        self._prefix_lock = threading.Lock()
+        self._prefix_stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "prefill_seconds": 0.0,
+            "prefill_seconds_saved": 0.0,
+        }
 
     def conv(
         self,
@@ -49,16 +129,301 @@ class HuggingFaceLLM(LLMInterface):
         Returns:
             str: Generated text, with input prompt removed and special tokens stripped
         """
+        if self.prefix_cache_size and self.generation_mode == "eager" and system_message and user_message:
+            return self._generate_with_prefix(system_message, [user_message], temperature, max_tokens)[0]
+
         prompt = f"{system_message}\n{user_message}" if system_message else user_message
 
+        started = time.perf_counter()
         inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
         outputs = self.model.generate(
             **inputs,
             max_new_tokens=max_tokens,
             do_sample=True,
             temperature=temperature,
+            **self._decode_kwargs(inputs["input_ids"].shape, max_tokens),
             # **kwargs,
         )
         input_len = inputs["input_ids"].shape[1]
         generated_ids = outputs[0][input_len:]
+        self._record_generation(inputs["input_ids"].numel(), outputs[:, input_len:], started)
         return self.tokenizer.decode(generated_ids, skip_special_tokens=True).strip()
+
+    def conv_batch(
+        self,
+        user_messages: List[str],
+        system_message: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 200,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Generate replies for several prompts in a single batched forward pass.
+
+        Prompts are left-padded into one tensor batch so every sequence ends at the
+        same position and new tokens line up. Sequences that hit EOS early are
+        padded by generate() while the rest keep decoding.
+
+        Args:
+            user_messages: User inputs, one per sequence in the batch
+            system_message: Optional system prompt prepended to every user message
+            temperature: Sampling temperature for generation (0.0-1.0)
+            max_tokens: Maximum new tokens to generate per sequence
+            **kwargs: Additional generation parameters (currently not used)
+
+        Returns:
+            list[str]: Generated text per prompt, in input order
+        """
+        if not user_messages:
+            return []
+
+        if self.prefix_cache_size and self.generation_mode == "eager" and system_message and all(user_messages):
+            return self._generate_with_prefix(system_message, user_messages, temperature, max_tokens)
+
+        prompts = [
+            f"{system_message}\n{user_message}" if system_message else user_message
+            for user_message in user_messages
+        ]
+
+        # Decoder-only models must be padded on the left for batched generation
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+
+        started = time.perf_counter()
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+        outputs = self.model.generate(
+            **inputs,
+            max_new_tokens=max_tokens,
+            do_sample=True,
+            temperature=temperature,
+            pad_token_id=self.tokenizer.pad_token_id,
+            **self._decode_kwargs(inputs["input_ids"].shape, max_tokens),
+        )
+        input_len = inputs["input_ids"].shape[1]
+        if "attention_mask" in inputs.keys():
+            prompt_tokens = inputs["attention_mask"].sum()
+        else:
+            prompt_tokens = inputs["input_ids"].numel()
+        self._record_generation(prompt_tokens, outputs[:, input_len:], started)
+        return [
+            self.tokenizer.decode(sequence[input_len:], skip_special_tokens=True).strip()
+            for sequence in outputs
+        ]
+
+    def _record_generation(self, prompt_tokens, new_tokens: torch.Tensor, started: float) -> None:
+        """
+        Record last_usage for a generate() call.
+
+        Args:
+            prompt_tokens: Number of non-padding prompt tokens across the batch
+            new_tokens: Generated ids, one row per sequence
+            started: perf_counter() value taken before tokenization
+        """
+        pad_id = self.tokenizer.pad_token_id
+        if new_tokens.shape[0] > 1 and isinstance(pad_id, int):
+            # Rows that stopped early are padded out to the longest row
+            completion_tokens = int((new_tokens != pad_id).sum())
+        else:
+            completion_tokens = int(new_tokens.numel())
+        self._record_usage(CallUsage(
+            prompt_tokens=int(prompt_tokens),
+            completion_tokens=completion_tokens,
+            latency=time.perf_counter() - started,
+            requests=int(new_tokens.shape[0]),
+        ))
+
+    def _decode_kwargs(self, input_shape, max_tokens: int) -> Dict[str, Any]:
+        """
+        Extra generate() arguments for the configured generation mode.
+
+        In compiled mode a static KV cache is preallocated for the (batch size,
+        cache length bucket) shape and reused, and generate() compiles the decode
+        step once per shape. Eager mode adds nothing.
+        """
+        if self.generation_mode != "compiled":
+            return {}
+
+        batch_size, prompt_len = input_shape[0], input_shape[1]
+        needed = prompt_len + max_tokens
+        cache_len = -(-needed // STATIC_CACHE_BUCKET) * STATIC_CACHE_BUCKET
+        key = (batch_size, cache_len)
+
+        cache = self._static_caches.get(key)
+        if cache is None:
+            cache = StaticCache(config=self.model.config, max_cache_len=cache_len)
+            self._static_caches[key] = cache
+        else:
+            cache.reset()
+        return {"past_key_values": cache, "compile_config": self._compile_config}
+
+    def compiled_shapes(self) -> List[tuple]:
+        """Return the (batch size, cache length) buckets compiled so far."""
+        return sorted(self._static_caches)
+
+    def warmup(self, prompt_lengths: Sequence[int] = (128,), max_tokens: int = 200, batch_sizes: Sequence[int] = (1,)) -> None:
+        """
+        Trigger compilation ahead of real traffic.
+
+        Runs a short dummy generation for every (batch size, prompt length)
+        combination so the matching static cache buckets are allocated and their
+        decode step is compiled before the first request. No-op in eager mode.
+
+        Args:
+            prompt_lengths: Expected prompt lengths in tokens
+            max_tokens: Expected max new tokens per request
+            batch_sizes: Expected batch sizes (see conv_batch)
+        """
+        if self.generation_mode != "compiled":
+            return
+
+        token_id = self.tokenizer.eos_token_id or 0
+        for batch_size in batch_sizes:
+            for prompt_len in prompt_lengths:
+                input_ids = torch.full((batch_size, prompt_len), token_id, dtype=torch.long, device=self.device)
+                self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    max_new_tokens=2,
+                    do_sample=False,
+                    pad_token_id=token_id,
+                    **self._decode_kwargs(input_ids.shape, max_tokens),
+                )
+
+    def _load_quantized(self, model_id: str, api_key: str, quantization: str, cache_dir: str):
+        """
+        Load a dynamically quantized model, reusing the on-disk checkpoint if present.
+
+        The first load quantizes the full-precision weights and saves the whole
+        converted module, so later starts skip both the fp32 load and the conversion.
+        """
+        if quantization not in SUPPORTED_QUANTIZATIONS:
+            raise ValueError(
+                f"Unsupported quantization: {quantization}. Supported modes are {SUPPORTED_QUANTIZATIONS}."
+            )
+        if self.device != "cpu":
+            raise ValueError(f"Dynamic {quantization} quantization is only supported on CPU, got device={self.device}")
+
+        safe_id = re.sub(r"[^A-Za-z0-9._-]+", "--", model_id)
+        self.quantized_path = os.path.join(cache_dir, f"{safe_id}-{quantization}.pt")
+
+        if os.path.exists(self.quantized_path):
+            model = torch.load(self.quantized_path, map_location="cpu", weights_only=False)
+            model.eval()
+            return model
+
+        model = AutoModelForCausalLM.from_pretrained(model_id, token=api_key)
+        model.eval()
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        # Write to a temp file first so an interrupted save never leaves a corrupt cache
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{self.quantized_path}.tmp"
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, self.quantized_path)
+        return model
+
+    def memory_footprint(self) -> int:
+        """
+        Return the serialized size of the model weights in bytes.
+
+        Measured from the state dict so packed int8 weights of quantized layers
+        are counted at their real size.
+        """
+        buffer = io.BytesIO()
+        torch.save(self.model.state_dict(), buffer)
+        return buffer.getbuffer().nbytes
+
+    def _get_prefix_entry(self, system_message: str) -> PrefixCacheEntry:
+        """Return the prefilled cache for a system prompt, computing it on a miss."""
+        with self._prefix_lock:
+            entry = self._prefix_cache.get(system_message)
+            if entry is not None:
+                self._prefix_cache.move_to_end(system_message)
+                self._prefix_stats["hits"] += 1
+                self._prefix_stats["prefill_seconds_saved"] += entry.prefill_seconds
+                return entry
+
+        prefix_ids = self.tokenizer(f"{system_message}\n", return_tensors="pt")["input_ids"].to(self.device)
+        start = time.perf_counter()
+        with torch.no_grad():
+            past_key_values = self.model(input_ids=prefix_ids, use_cache=True).past_key_values
+        entry = PrefixCacheEntry(prefix_ids, past_key_values, time.perf_counter() - start)
+
+        with self._prefix_lock:
+            self._prefix_stats["misses"] += 1
+            self._prefix_stats["prefill_seconds"] += entry.prefill_seconds
+            self._prefix_cache[system_message] = entry
+            while len(self._prefix_cache) > self.prefix_cache_size:
+                self._prefix_cache.popitem(last=False)
+                self._prefix_stats["evictions"] += 1
+        return entry
+
+    def _generate_with_prefix(
+        self,
+        system_message: str,
+        user_messages: List[str],
+        temperature: float,
+        max_tokens: int,
+    ) -> List[str]:
+        """
+        Generate from a cached system-prompt prefix plus per-request suffixes.
+
+        Sequences are laid out as [prefix][padding][user tokens] so the cached
+        prefix positions stay valid for every row; padding is masked out and the
+        new tokens still line up at the end of the batch.
+        """
+        entry = self._get_prefix_entry(system_message)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        pad_id = self.tokenizer.pad_token_id
+
+        suffixes = [
+            self.tokenizer(user_message, add_special_tokens=False)["input_ids"]
+            for user_message in user_messages
+        ]
+        longest = max(len(suffix) for suffix in suffixes)
+        prefix = entry.input_ids[0].tolist()
+
+        rows, masks = [], []
+        for suffix in suffixes:
+            padding = longest - len(suffix)
+            rows.append(prefix + [pad_id] * padding + list(suffix))
+            masks.append([1] * len(prefix) + [0] * padding + [1] * len(suffix))
+        input_ids = torch.tensor(rows, device=self.device)
+        attention_mask = torch.tensor(masks, device=self.device)
+
+        # generate() mutates the cache, so every call works on its own copy
+        past_key_values = copy.deepcopy(entry.past_key_values)
+        if len(rows) > 1:
+            past_key_values.batch_repeat_interleave(len(rows))
+
+        started = time.perf_counter()
+        outputs = self.model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=past_key_values,
+            max_new_tokens=max_tokens,
+            do_sample=True,
+            temperature=temperature,
+            pad_token_id=pad_id,
+        )
+        input_len = input_ids.shape[1]
+        self._record_generation(attention_mask.sum(), outputs[:, input_len:], started)
+        return [
+            self.tokenizer.decode(sequence[input_len:], skip_special_tokens=True).strip()
+            for sequence in outputs
+        ]
+
+    def prefix_cache_stats(self) -> Dict[str, Any]:
+        """
+        Report prefix cache effectiveness.
+
+        Returns:
+            dict: 'hits', 'misses', 'evictions', 'entries', total 'prefill_seconds'
+            spent building prefixes and 'prefill_seconds_saved' by reusing them
+        """
+        with self._prefix_lock:
+            stats = dict(self._prefix_stats)
+            stats["entries"] = len(self._prefix_cache)
+            return stats
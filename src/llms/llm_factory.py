@@ -1,9 +1,17 @@
 import os
+from typing import Any, Dict
+from .client_registry import ClientRegistry
 from .llm_interface import LLMInterface
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
+# Backends whose client objects can safely be shared between threads;
+# everything else is served from a bounded per-key pool when pooled=True
+THREAD_SAFE_CLIENT_TYPES = {"openai", "ollama", "router", "simulated"}
+
+_registry = ClientRegistry()
+
 
 def get_llm_client(client_type: str, **kwargs) -> LLMInterface:
     """
@@ -13,55 +21,272 @@ def get_llm_client(client_type: str, **kwargs) -> LLMInterface:
     loads API keys from environment variables if not provided.
 
     Args:
-        client_type: Provider name - 'openai', 'huggingface', or 'ollama'
+        client_type: Provider name - 'openai', 'huggingface', 'ollama', 'router'
+            (spreads calls over several Ollama servers, see RouterClient) or
+            'simulated' (offline fake backend for load tests, see SimulatedLLM)
         **kwargs: Provider-specific parameters:
             - api_key (str, optional): API key (falls back to env vars)
             - model (str): Model identifier or name
+            - prompt_cache_key (str, optional): For OpenAI (and the router's fallback) -
+              stable key routing calls that share a prompt prefix to the same prompt cache
             - device (str, optional): For HuggingFace - 'cuda' or 'cpu'
             - base_url (str, optional): For Ollama - API endpoint URL
             - timeout (int, optional): Request timeout in seconds
+            - prefix_cache_size (int, optional): For HuggingFace - number of system
+              prompts whose prefilled KV cache is reused across requests
+            - quantization (str, optional): For HuggingFace - 'int8' for dynamic int8
+              quantization on CPU (quantized checkpoint cached on disk)
+            - quantized_cache_dir (str, optional): For HuggingFace - quantized checkpoint cache
+            - generation_mode (str, optional): For HuggingFace - 'eager' or 'compiled'
+              (static KV cache with a compiled decode step)
+            - pool_size (int, optional): For Ollama - keep-alive connection pool size
+            - stream (bool, optional): For Ollama - stream completions (TTFT metrics)
+            - stop_on_json_close (bool, optional): For Ollama streaming - stop once
+              the top-level JSON value of a JSON-format call is complete
+            - base_urls (list[str], optional): For router - Ollama server URLs
+              (falls back to the comma-separated OLLAMA_BASE_URLS env var, then base_url)
+            - fallback_model (str, optional): For router - OpenAI model used when no
+              Ollama server can serve a call
+            - sticky, failure_threshold, ejection_seconds (optional): For router -
+              routing and ejection settings passed to RouterClient
+            - simulation (dict, optional): For simulated - SimulatedLLM arguments
+              (latency distribution, error/429/truncation rates, seed, ...)
+            - pooled (bool, optional): Reuse a process-wide client keyed by
+              (client_type, model, base_url, device, quantization, generation_mode,
+              prompt_cache_key)
+              instead of building a new one
+            - max_instances (int, optional): With pooled=True, upper bound on model
+              instances for backends that are not thread-safe (default: 1)
+            - cache_policy (str, optional): 'off', 'read_through' or 'replay_only' to
+              serve replies from the on-disk response cache (default: no cache)
+            - cache_path (str, optional): Response cache SQLite file; with response_validator,
+              only replies it accepts are cached
+            - hedge_quantile (float, optional): Send a duplicate of calls still running
+              after this latency percentile (e.g. 0.95) and keep the first reply
+            - hedge_budget (float, optional): With hedge_quantile, hedges allowed per
+              call (default: 0.05, i.e. at most 5% extra load)
+            - retry_attempts (int, optional): Retry transient failures (429, 5xx, timeouts,
+              invalid replies) with jittered exponential backoff, up to this many attempts
+              in total; backend outages pause all callers through a shared circuit breaker, and
+              retry_stats() counts the calls of every client built for the same backend
+            - breaker_max_pause (float, optional): With retry_attempts, seconds a call waits
+              on an open circuit breaker before failing with CircuitOpenError (default: no limit)
+            - response_validator (callable, optional): With retry_attempts, replies for
+              which it returns a falsy value are retried (e.g. convert_response_to_json)
+            - rate_limit (bool, optional): Send every call through the process-wide
+              adaptive rate limiter shared by (client_type, model, base_url)
+            - requests_per_minute / tokens_per_minute (float, optional): Initial limits
+              for rate_limit=True (otherwise learned from x-ratelimit-* headers)
+            - max_concurrency (int, optional): Upper bound on in-flight requests for
+              rate_limit=True (default: pool_size or 10)
 
     Returns:
         LLMInterface: Configured client instance implementing LLMInterface
 
     Raises:
-        ValueError: If client_type is not supported
+        ValueError: If client_type or cache_policy is not supported
 
     Examples:
         >>> client = get_llm_client('openai', model='gpt-4')
         >>> response = client.conv("Hello", "You are helpful")
         >>>
         >>> client = get_llm_client('ollama', model='llama2', base_url='http://localhost:11434')
+        >>>
+        >>> shared = get_llm_client('huggingface', model='gpt2', pooled=True, max_instances=2)
+        >>>
+        >>> cached = get_llm_client('openai', model='gpt-4', cache_policy='read_through')
+        >>>
+        >>> router = get_llm_client('router', model='llama3', base_urls=['http://gpu1:11434', 'http://gpu2:11434'])
     """
-    client_types = ["openai", "huggingface", "ollama"]
+    client_types = ["openai", "huggingface", "ollama", "router", "simulated"]
+
+    cache_policy = kwargs.pop("cache_policy", None)
+    cache_path = kwargs.pop("cache_path", None)
+    if cache_policy is not None and cache_policy != "off":
+        from .response_cache import CACHE_POLICIES, DEFAULT_CACHE_PATH, CachedLLMClient, open_response_cache
+
+        if cache_policy not in CACHE_POLICIES:
+            raise ValueError(
+                f"Unsupported cache_policy: {cache_policy}. Supported policies are {CACHE_POLICIES}."
+            )
+        return CachedLLMClient(
+            get_llm_client(client_type, **kwargs),
+            client_type,
+            open_response_cache(cache_path or DEFAULT_CACHE_PATH),
+            policy=cache_policy,
+            model=kwargs.get("model"),
+            response_validator=kwargs.get("response_validator"),
+        )
+
+    # Hedges sit outside the retries, so each duplicate retries (and is rate limited) on its own
+    hedge_quantile = kwargs.pop("hedge_quantile", None)
+    hedge_budget = kwargs.pop("hedge_budget", None)
+    if hedge_quantile is not None:
+        from .hedging import HedgedLLMClient, get_hedge_policy
+
+        policy_kwargs = {"quantile": hedge_quantile}
+        if hedge_budget is not None:
+            policy_kwargs["budget"] = hedge_budget
+        return HedgedLLMClient(
+            get_llm_client(client_type, **kwargs),
+            get_hedge_policy((client_type, kwargs.get("model"), kwargs.get("base_url")), **policy_kwargs),
+        )
+
+    retry_attempts = kwargs.pop("retry_attempts", None)
+    response_validator = kwargs.pop("response_validator", None)
+    breaker_max_pause = kwargs.pop("breaker_max_pause", None)
+    if retry_attempts is not None and retry_attempts > 1:
+        from .retry import RetryingLLMClient, RetryPolicy, get_circuit_breaker, get_retry_counters
+
+        backend_key = (client_type, kwargs.get("model"), kwargs.get("base_url"))
+        return RetryingLLMClient(
+            get_llm_client(client_type, **kwargs),
+            policy=RetryPolicy(max_attempts=retry_attempts),
+            breaker=get_circuit_breaker(backend_key),
+            response_validator=response_validator,
+            counters=get_retry_counters(backend_key),
+            max_pause=breaker_max_pause,
+        )
+
+    # Applied inside the cache and retries so cache hits never consume rate-limit
+    # budget and every retried attempt does
+    if kwargs.pop("rate_limit", False):
+        from .rate_limiter import RateLimitedLLMClient, get_rate_limiter
+
+        limiter = get_rate_limiter(
+            (client_type, kwargs.get("model"), kwargs.get("base_url")),
+            requests_per_minute=kwargs.pop("requests_per_minute", None),
+            tokens_per_minute=kwargs.pop("tokens_per_minute", None),
+            max_concurrency=kwargs.pop("max_concurrency", None) or kwargs.get("pool_size") or 10,
+        )
+        return RateLimitedLLMClient(get_llm_client(client_type, **kwargs), limiter)
+
+    if kwargs.pop("pooled", False):
+        if client_type not in client_types:
+            raise ValueError(
+                f"Unsupported client_type: {client_type}. Supported types are {client_types}."
+            )
+        return _get_pooled_client(client_type, **kwargs)
 
     if client_type == "openai":
         from .openai_api import ChatGPTClient
 
+        openai_kwargs = {key: kwargs[key] for key in ("prompt_cache_key",) if kwargs.get(key) is not None}
+
         return ChatGPTClient(
             api_key=kwargs.get("api_key") or os.getenv("OPENAI_API_KEY"),
             model=kwargs.get("model"),
+            **openai_kwargs,
         )
 
     elif client_type == "huggingface":
         from .huggingface_client import HuggingFaceLLM
 
+        hf_kwargs = {
+            key: kwargs[key]
+            for key in ("prefix_cache_size", "quantization", "quantized_cache_dir", "generation_mode")
+            if kwargs.get(key) is not None
+        }
+
         return HuggingFaceLLM(
             model_id=kwargs.get("model"),
             api_key=kwargs.get("api_key") or os.getenv("HUGGINGFACE_API_KEY"),
             device=kwargs.get("device"),
+            **hf_kwargs,
         )
     elif client_type == "ollama":
         from .ollama_client import OllamaClient
 
+        ollama_kwargs = {
+            key: kwargs[key]
+            for key in ("pool_size", "stream", "stop_on_json_close")
+            if kwargs.get(key) is not None
+        }
+
         return OllamaClient(
             model=kwargs.get("model"),
             api_key=kwargs.get("api_key"),
             base_url=kwargs.get("base_url") or os.getenv("OLLAMA_BASE_URL"),
             timeout=kwargs.get("timeout", 120),
+            **ollama_kwargs,
         )
 
+    elif client_type == "router":
+        from .router_client import RouterClient
+
+        base_urls = kwargs.get("base_urls") or [
+            url.strip() for url in os.getenv("OLLAMA_BASE_URLS", "").split(",") if url.strip()
+        ]
+        if not base_urls:
+            base_urls = [kwargs.get("base_url") or os.getenv("OLLAMA_BASE_URL") or "http://localhost:11434"]
+        node_kwargs = {
+            key: kwargs[key]
+            for key in ("api_key", "timeout", "pool_size", "stream", "stop_on_json_close")
+            if kwargs.get(key) is not None
+        }
+        backends = [
+            (url, get_llm_client("ollama", model=kwargs.get("model"), base_url=url, **node_kwargs))
+            for url in base_urls
+        ]
+        fallback = None
+        if kwargs.get("fallback_model"):
+            fallback = get_llm_client(
+                "openai", model=kwargs["fallback_model"], prompt_cache_key=kwargs.get("prompt_cache_key")
+            )
+        router_kwargs = {
+            key: kwargs[key]
+            for key in ("sticky", "failure_threshold", "ejection_seconds")
+            if kwargs.get(key) is not None
+        }
+
+        return RouterClient(kwargs.get("model"), backends, fallback=fallback, **router_kwargs)
+
+    elif client_type == "simulated":
+        from .simulated_client import SimulatedLLM
+
+        return SimulatedLLM(model=kwargs.get("model") or "simulated", **(kwargs.get("simulation") or {}))
+
     else:
         raise ValueError(
             f"Unsupported client_type: {client_type}. Supported types are {client_types}."
         )
+
+
+def _freeze(value: Any) -> Any:
+    """Turn dicts and lists (e.g. simulation, base_urls) into hashable tuples."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _get_pooled_client(client_type: str, **kwargs) -> LLMInterface:
+    """Fetch (or build once) the registry entry for this client configuration."""
+    # Every argument that shapes the client is part of the key, so two callers
+    # asking for different settings (stream, timeout, pool_size, ...) never share one
+    key = (client_type, _freeze({k: v for k, v in kwargs.items() if v is not None}))
+    return _registry.get(
+        key,
+        factory=lambda: get_llm_client(client_type, **kwargs),
+        thread_safe=client_type in THREAD_SAFE_CLIENT_TYPES,
+        pool_size=kwargs.get("max_instances", 1),
+        counter_name="model_loads" if client_type == "huggingface" else "constructions",
+    )
+
+
+def get_client_stats() -> Dict[str, Any]:
+    """
+    Return counters for the pooled client registry.
+
+    Returns:
+        dict: 'constructions' (all client instances built), 'model_loads'
+        (HuggingFace weight loads), 'hits'/'misses' (registry lookups) and
+        'clients' (distinct registered configurations)
+    """
+    return _registry.stats()
+
+
+def clear_client_registry() -> None:
+    """Drop all pooled clients and reset registry counters."""
+    _registry.clear()
@@ -1,15 +1,97 @@
+import asyncio
+import dataclasses
+import threading
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class CallUsage:
+    """
+    Metadata about the most recent conv()/aconv()/conv_batch() call.
+
+    Token counts are None when the backend did not report them.
+    """
+
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    reasoning_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None  # prompt tokens served from the provider's prompt cache
+    latency: Optional[float] = None  # wall-clock seconds spent in the backend call
+    generation_seconds: Optional[float] = None  # decode time reported by the backend (Ollama eval_duration)
+    queue_wait: float = 0.0  # seconds spent waiting for a rate-limit slot
+    requests: int = 1  # prompts covered by this call (conv_batch)
+    attempts: int = 1
+    from_cache: bool = False
+    hedged: bool = False  # a duplicate request was sent to cut tail latency
+    hedge_won: bool = False  # ...and the duplicate answered first
+
+    @property
+    def total_tokens(self) -> Optional[int]:
+        """Prompt plus completion tokens, or None if neither is known."""
+        if self.prompt_tokens is None and self.completion_tokens is None:
+            return None
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+
+
+def merge_usage(usages: List[Optional[CallUsage]]) -> Optional[CallUsage]:
+    """Sum several CallUsage records into one covering all of their requests."""
+    usages = [u for u in usages if u is not None]
+    if not usages:
+        return None
+
+    def total(name):
+        values = [getattr(u, name) for u in usages if getattr(u, name) is not None]
+        return sum(values) if values else None
+
+    return CallUsage(
+        prompt_tokens=total("prompt_tokens"),
+        completion_tokens=total("completion_tokens"),
+        reasoning_tokens=total("reasoning_tokens"),
+        cached_tokens=total("cached_tokens"),
+        latency=total("latency"),
+        generation_seconds=total("generation_seconds"),
+        queue_wait=sum(u.queue_wait for u in usages),
+        requests=sum(u.requests for u in usages),
+        attempts=max(u.attempts for u in usages),
+        from_cache=all(u.from_cache for u in usages),
+        hedged=any(u.hedged for u in usages),
+        hedge_won=any(u.hedge_won for u in usages),
+    )
+
+
+def usage_count(value) -> Optional[int]:
+    """Return `value` if it is a real token count (ints only; guards against mocks and missing fields)."""
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
 
 
 class LLMInterface(ABC):
     """
     Abstract base class for any Large Language Model client.
     Defines a consistent interface across multiple providers (OpenAI, Anthropic, Azure, etc.).
+
+    After each call, `last_usage` holds a CallUsage for the calling thread, so
+    conv() can keep returning a plain string.
     """
 
     def __init__(self, api_key: str, model: str):
         self.api_key = api_key
         self.model = model
+        self._usage_local = threading.local()
+
+    @property
+    def last_usage(self) -> Optional[CallUsage]:
+        """
+        Usage of the last call made from the current thread.
+
+        With aconv(), read it right after the await returns (before awaiting
+        anything else), since coroutines on one loop share a thread.
+        """
+        return getattr(self._usage_local, "usage", None)
+
+    def _record_usage(self, usage: Optional[CallUsage]) -> None:
+        self._usage_local.usage = usage
 
     @abstractmethod
     def conv(
@@ -25,3 +107,149 @@ class LLMInterface(ABC):
         Must be implemented by subclasses.
         """
         pass
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """
+        Async variant of conv().
+
+        The default implementation runs the blocking conv() in a worker thread so
+        every backend can be awaited. Clients with a native async transport
+        (OpenAI, Ollama) override this to avoid holding a thread per request.
+        """
+        def call():
+            reply = self.conv(
+                user_message,
+                system_message=system_message,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs,
+            )
+            # last_usage is per thread, so carry it back to the event loop thread
+            return reply, self.last_usage
+
+        reply, usage = await asyncio.to_thread(call)
+        self._record_usage(usage)
+        return reply
+
+    def conv_batch(
+        self,
+        user_messages: List[str],
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Send several prompts sharing one system message and return one reply each.
+
+        The default implementation calls conv() sequentially. Backends that can
+        generate a whole batch at once (HuggingFace) override this.
+        """
+        replies, usages = [], []
+        for user_message in user_messages:
+            replies.append(
+                self.conv(
+                    user_message,
+                    system_message=system_message,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs,
+                )
+            )
+            usages.append(self.last_usage)
+        self._record_usage(merge_usage(usages))
+        return replies
+
+
+class LLMClientWrapper(LLMInterface):
+    """
+    Base class for clients that add behaviour around another LLMInterface.
+
+    Every call is forwarded to the wrapped client unchanged; subclasses override
+    the methods they need. Attributes not defined on the wrapper (e.g.
+    aggregate_stats, prefix_cache_stats) are looked up on the wrapped client.
+    """
+
+    def __init__(self, client: LLMInterface):
+        super().__init__(client.api_key, client.model)
+        self.client = client
+
+    def __getattr__(self, name):
+        # Only reached for attributes missing on the wrapper itself
+        if name in ("client", "_usage_local"):
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def _inner_usage(self, **changes) -> Optional[CallUsage]:
+        """Copy the wrapped client's last_usage into this wrapper, applying `changes`."""
+        usage = getattr(self.client, "last_usage", None)
+        if not isinstance(usage, CallUsage):
+            usage = None
+        if usage is not None and changes:
+            usage = dataclasses.replace(usage, **changes)
+        self._record_usage(usage)
+        return usage
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Forward to the wrapped client's conv()."""
+        reply = self.client.conv(
+            user_message,
+            system_message=system_message,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs,
+        )
+        self._inner_usage()
+        return reply
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Forward to the wrapped client's aconv()."""
+        reply = await self.client.aconv(
+            user_message,
+            system_message=system_message,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs,
+        )
+        self._inner_usage()
+        return reply
+
+    def conv_batch(
+        self,
+        user_messages: List[str],
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> List[str]:
+        """Forward to the wrapped client's conv_batch()."""
+        replies = self.client.conv_batch(
+            user_messages,
+            system_message=system_message,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs,
+        )
+        self._inner_usage()
+        return replies
@@ -1,6 +1,139 @@
+import asyncio
+import json
+import threading
+import time
+import httpx
 import requests
-from typing import Any, Dict, Optional
-from .llm_interface import LLMInterface
+from dataclasses import asdict, dataclass
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, List, Optional
+from .llm_interface import CallUsage, LLMInterface, usage_count
+
+
+class OllamaHTTPError(RuntimeError):
+    """Non-2xx reply from the Ollama server; `status_code` carries the HTTP status."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Ollama HTTP error {status_code}: {text}")
+        self.status_code = status_code
+
+
+class JsonCompletionTracker:
+    """
+    Incrementally scans streamed text and detects when the first top-level JSON
+    object or array is closed, honouring strings and escape sequences.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.consumed = 0
+
+    def feed(self, text: str) -> int:
+        """
+        Scan the next piece of text.
+
+        Args:
+            text: Newly received characters
+
+        Returns:
+            int: Offset into `text` just past the closing bracket, or -1 if the
+            top-level value is still open
+        """
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                if self.started:
+                    self.in_string = True
+            elif ch in "{[":
+                self.started = True
+                self.depth += 1
+            elif ch in "}]" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.consumed += i + 1
+                    return i + 1
+        self.consumed += len(text)
+        return -1
+
+
+def _wants_json(response_format: Any) -> bool:
+    """Return whether `response_format` asks for a JSON reply."""
+    if isinstance(response_format, dict):
+        return response_format.get("type") in ("json_object", "json_schema")
+    return response_format == "json"
+
+
+@dataclass
+class StreamStats:
+    """Latency figures for a single streamed Ollama completion."""
+
+    time_to_first_token: Optional[float] = None
+    total_time: float = 0.0
+    chunks: int = 0
+    eval_count: Optional[int] = None
+    prompt_eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+    tokens_per_sec: Optional[float] = None
+    terminated_early: bool = False
+
+
+class _StreamAccumulator:
+    """Collects NDJSON chunks from /api/chat and decides when to stop reading."""
+
+    def __init__(self, stop_on_json_close: bool):
+        self.started_at = time.perf_counter()
+        self.parts: List[str] = []
+        self.stats = StreamStats()
+        self.tracker = JsonCompletionTracker() if stop_on_json_close else None
+
+    def feed(self, line) -> bool:
+        """Consume one NDJSON line. Returns True once reading should stop."""
+        if not line:
+            return False
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+
+        piece = (chunk.get("message") or {}).get("content") or chunk.get("response") or ""
+        if piece:
+            if self.stats.time_to_first_token is None:
+                self.stats.time_to_first_token = time.perf_counter() - self.started_at
+            self.stats.chunks += 1
+            if self.tracker is not None:
+                end = self.tracker.feed(piece)
+                if end >= 0:
+                    self.parts.append(piece[:end])
+                    self.stats.terminated_early = not chunk.get("done", False)
+                    return True
+            self.parts.append(piece)
+
+        if chunk.get("done"):
+            self.stats.eval_count = chunk.get("eval_count")
+            self.stats.prompt_eval_count = chunk.get("prompt_eval_count")
+            self.stats.eval_duration = eval_duration = chunk.get("eval_duration")
+            if self.stats.eval_count and eval_duration:
+                self.stats.tokens_per_sec = self.stats.eval_count / (eval_duration / 1e9)
+            return True
+        return False
+
+    def finish(self) -> str:
+        """Finalize timing figures and return the accumulated text."""
+        self.stats.total_time = time.perf_counter() - self.started_at
+        if self.stats.tokens_per_sec is None and self.stats.time_to_first_token is not None:
+            decode_time = self.stats.total_time - self.stats.time_to_first_token
+            if decode_time > 0:
+                # Ollama emits roughly one token per chunk
+                self.stats.tokens_per_sec = self.stats.chunks / decode_time
+        return "".join(self.parts)
 
 
 class OllamaClient(LLMInterface):
@@ -10,10 +143,15 @@ class OllamaClient(LLMInterface):
     Notes:
     - Ollama runs locally; an API key is not required (kept for interface parity).
     - Set OLLAMA_BASE_URL to override the default base URL.
+    - Requests go through a pooled keep-alive session; size the pool to the
+      number of threads sharing the client (e.g. the stage's MAX_WORKERS).
     - Maps:
         temperature -> options.temperature
         max_tokens  -> options.num_predict
       Pass extra generation options via **kwargs (e.g., top_p, seed, repeat_penalty, format="json").
+    - With stream=True, completions are read chunk by chunk to measure
+      time-to-first-token and tokens/sec, and (by default) the stream is cut as
+      soon as the top-level JSON value is closed. conv() returns the same string.
     """
 
     def __init__(
@@ -22,6 +160,9 @@ class OllamaClient(LLMInterface):
         api_key: Optional[str] = None,
         base_url: Optional[str] = None,
         timeout: int = 120,
+        pool_size: int = 10,
+        stream: bool = False,
+        stop_on_json_close: bool = True,
     ):
         """
         Initialize Ollama client for local LLM inference.
@@ -31,10 +172,90 @@ class OllamaClient(LLMInterface):
             api_key: Not used for Ollama, kept for interface compatibility
             base_url: Ollama server URL (default: "http://localhost:11434")
             timeout: Request timeout in seconds (default: 120)
+            pool_size: Maximum number of kept-alive connections, and of connections
+                aconv() opens at once (default: 10)
+            stream: Read completions incrementally via NDJSON streaming (default: False)
+            stop_on_json_close: In stream mode, stop generation once the top-level
+                JSON value is closed, for calls whose response_format asks for
+                JSON (default: True)
         """
         super().__init__(api_key or "", model)
         self.base_url = (base_url or "http://localhost:11434").rstrip("/")
         self.timeout = timeout
+        self.pool_size = pool_size
+
+        # One keep-alive session shared by all threads using this client
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        self._requests_sent = 0
+        self._stats_lock = threading.Lock()
+
+        self.stream = stream
+        self.stop_on_json_close = stop_on_json_close
+        self._local = threading.local()
+        self._stream_totals = {"calls": 0, "early": 0, "ttft": [0.0, 0], "rate": [0.0, 0]}
+        self._last_stream_stats: Optional[StreamStats] = None
+
+        # httpx.AsyncClient is bound to the event loop it was first used on
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _build_payload(
+        self,
+        user_message: str,
+        system_message: str,
+        temperature: float,
+        max_tokens: int,
+    ) -> Dict[str, Any]:
+        """Build the /api/chat request body shared by conv() and aconv()."""
+        # Build Ollama options from known params + passthrough kwargs
+        options: Dict[str, Any] = {
+            "temperature": float(temperature),
+            "num_predict": int(max_tokens) if max_tokens is not None else -1,
+        }
+
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message},
+            ],
+            "options": options,
+            "stream": self.stream,
+        }
+
+    @staticmethod
+    def _extract_content(data: Any) -> str:
+        """Pull the assistant text out of an Ollama response body."""
+        # Typical shape: {"message": {"role": "...","content": "..."}, "done": true, ...}
+        if isinstance(data, dict):
+            if "message" in data and isinstance(data["message"], dict):
+                return data["message"].get("content", "")
+
+            # Fallbacks for other shapes
+            if "response" in data and isinstance(data["response"], str):
+                return data["response"]
+
+            if "messages" in data and isinstance(data["messages"], list):
+                return "".join(m.get("content", "") for m in data["messages"])
+
+        # Last resort: stringify
+        return str(data)
+
+    @staticmethod
+    def _usage_from(data: Any, latency: float) -> CallUsage:
+        """Read prompt_eval_count / eval_count / eval_duration from a final response body."""
+        data = data if isinstance(data, dict) else {}
+        eval_duration = usage_count(data.get("eval_duration"))
+        return CallUsage(
+            prompt_tokens=usage_count(data.get("prompt_eval_count")),
+            completion_tokens=usage_count(data.get("eval_count")),
+            latency=latency,
+            generation_seconds=eval_duration / 1e9 if eval_duration else None,
+        )
 
     def conv(
         self,
@@ -63,44 +284,212 @@ class OllamaClient(LLMInterface):
         Raises:
             RuntimeError: If HTTP request fails or Ollama returns an error
         """
-        # Build Ollama options from known params + passthrough kwargs
-        options: Dict[str, Any] = {
-            "temperature": float(temperature),
-            "num_predict": int(max_tokens) if max_tokens is not None else -1,
-        }
-
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message},
-            ],
-            "options": options,
-            "stream": False,
-        }
+        payload = self._build_payload(user_message, system_message, temperature, max_tokens)
 
         url = f"{self.base_url}/api/chat"
         try:
-            resp = requests.post(url, json=payload, timeout=self.timeout)
+            with self._stats_lock:
+                self._requests_sent += 1
+            if self.stream:
+                return self._conv_stream(url, payload, kwargs.get("response_format"))
+            started = time.perf_counter()
+            resp = self.session.post(url, json=payload, timeout=self.timeout)
             resp.raise_for_status()
             data = resp.json()
+            self._record_usage(self._usage_from(data, time.perf_counter() - started))
+            return self._extract_content(data)
 
-            # Typical shape: {"message": {"role": "...","content": "..."}, "done": true, ...}
-            if isinstance(data, dict):
-                if "message" in data and isinstance(data["message"], dict):
-                    return data["message"].get("content", "")
+        except requests.HTTPError as e:
+            raise OllamaHTTPError(e.response.status_code, e.response.text) from e
+        except requests.RequestException as e:
+            raise RuntimeError(f"Ollama request failed: {e}") from e
 
-                # Fallbacks for other shapes
-                if "response" in data and isinstance(data["response"], str):
-                    return data["response"]
+    def _conv_stream(self, url: str, payload: Dict[str, Any], response_format: Any = None) -> str:
+        """
+        Read a streamed completion; leaving the block early closes the connection.
 
-                if "messages" in data and isinstance(data["messages"], list):
-                    return "".join(m.get("content", "") for m in data["messages"])
+        Only replies requested as JSON are cut off at the closing bracket: in
+        free text a balanced bracket does not mean the reply is finished.
+        """
+        acc = _StreamAccumulator(self.stop_on_json_close and _wants_json(response_format))
+        with self.session.post(url, json=payload, timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if acc.feed(line):
+                    break
+        text = acc.finish()
+        self._record_stream(acc.stats)
+        return text
 
-            # Last resort: stringify
-            return str(data)
+    async def _aconv_stream(self, url: str, payload: Dict[str, Any], response_format: Any = None) -> str:
+        """Async counterpart of _conv_stream()."""
+        acc = _StreamAccumulator(self.stop_on_json_close and _wants_json(response_format))
+        async with (await self._get_async_client()).stream("POST", url, json=payload) as resp:
+            if resp.is_error:
+                await resp.aread()
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if acc.feed(line):
+                    break
+        text = acc.finish()
+        self._record_stream(acc.stats)
+        return text
 
-        except requests.HTTPError as e:
-            raise RuntimeError(f"Ollama HTTP error {e.response.status_code}: {e.response.text}") from e
-        except requests.RequestException as e:
+    def _record_stream(self, stats: StreamStats) -> None:
+        self._local.last_stream_stats = stats
+        eval_duration = usage_count(stats.eval_duration)
+        self._record_usage(CallUsage(
+            prompt_tokens=usage_count(stats.prompt_eval_count),
+            # Streams cut short at the closing brace never see the final counts;
+            # Ollama emits roughly one token per chunk
+            completion_tokens=usage_count(stats.eval_count) if stats.eval_count is not None else stats.chunks,
+            latency=stats.total_time,
+            generation_seconds=eval_duration / 1e9 if eval_duration else None,
+        ))
+        with self._stats_lock:
+            totals = self._stream_totals
+            totals["calls"] += 1
+            totals["early"] += int(stats.terminated_early)
+            if stats.time_to_first_token is not None:
+                totals["ttft"][0] += stats.time_to_first_token
+                totals["ttft"][1] += 1
+            if stats.tokens_per_sec is not None:
+                totals["rate"][0] += stats.tokens_per_sec
+                totals["rate"][1] += 1
+            self._last_stream_stats = stats
+
+    @property
+    def last_stream_stats(self) -> Optional[StreamStats]:
+        """Stats of the most recent streamed call made from the current thread."""
+        return getattr(self._local, "last_stream_stats", None)
+
+    def stream_stats(self) -> Dict[str, Any]:
+        """
+        Aggregate figures over all streamed calls made by this client.
+
+        Returns:
+            dict: 'calls', 'early_terminations', mean 'time_to_first_token',
+            mean 'tokens_per_sec' and the 'last' call's stats
+        """
+        with self._stats_lock:
+            totals = self._stream_totals
+            ttft_sum, ttft_n = totals["ttft"]
+            rate_sum, rate_n = totals["rate"]
+            last = self._last_stream_stats
+            return {
+                "calls": totals["calls"],
+                "early_terminations": totals["early"],
+                "time_to_first_token": ttft_sum / ttft_n if ttft_n else None,
+                "tokens_per_sec": rate_sum / rate_n if rate_n else None,
+                "last": asdict(last) if last else None,
+            }
+
+    async def _get_async_client(self) -> httpx.AsyncClient:
+        """Return an AsyncClient bound to the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            stale, self._async_client = self._async_client, httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+            self._async_loop = loop
+            if stale is not None:
+                # Left over from an earlier loop (e.g. a previous asyncio.run());
+                # close it so its connections are not leaked
+                try:
+                    await stale.aclose()
+                except RuntimeError:
+                    # Its loop is closed: the sockets are released, but the
+                    # transports cannot schedule their connection_lost callbacks
+                    pass
+        return self._async_client
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs: Any,
+    ) -> str:
+        """
+        Async variant of conv() using a shared httpx.AsyncClient.
+
+        Takes the same arguments as conv() and returns the same string. The
+        underlying connection pool is reused across calls on the same event loop.
+
+        Raises:
+            RuntimeError: If HTTP request fails or Ollama returns an error
+        """
+        payload = self._build_payload(user_message, system_message, temperature, max_tokens)
+
+        url = f"{self.base_url}/api/chat"
+        try:
+            if self.stream:
+                return await self._aconv_stream(url, payload, kwargs.get("response_format"))
+            started = time.perf_counter()
+            resp = await (await self._get_async_client()).post(url, json=payload)
+            resp.raise_for_status()
+            data = resp.json()
+            self._record_usage(self._usage_from(data, time.perf_counter() - started))
+            return self._extract_content(data)
+
+        except httpx.HTTPStatusError as e:
+            raise OllamaHTTPError(e.response.status_code, e.response.text) from e
+        except httpx.HTTPError as e:
             raise RuntimeError(f"Ollama request failed: {e}") from e
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client, if one was created."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+
+    def health_check(self, timeout: float = 2.0) -> bool:
+        """
+        Probe the server with GET /api/tags.
+
+        Args:
+            timeout: Probe timeout in seconds (default: 2)
+
+        Returns:
+            bool: True if the server answers and has this client's model pulled
+        """
+        try:
+            resp = self.session.get(f"{self.base_url}/api/tags", timeout=timeout)
+            resp.raise_for_status()
+            models = resp.json().get("models")
+        except (requests.RequestException, ValueError):
+            return False
+        if not isinstance(models, list):
+            return True
+        names = {m.get("name") for m in models if isinstance(m, dict)}
+        return self.model in names or f"{self.model}:latest" in names
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Report keep-alive effectiveness for the synchronous session.
+
+        Returns:
+            dict: 'requests' sent through conv(), 'connections_opened' (new TCP
+            connections made by the pool) and 'connections_reused'
+        """
+        opened = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+
+        with self._stats_lock:
+            sent = self._requests_sent
+        return {
+            "requests": sent,
+            "connections_opened": opened,
+            "connections_reused": max(0, sent - opened),
+        }
+
+    def close(self) -> None:
+        """Close the pooled session and release its connections."""
+        self.session.close()
@@ -1,5 +1,7 @@
-from openai import OpenAI
-from .llm_interface import LLMInterface
+import time
+from openai import AsyncOpenAI, OpenAI
+from typing import Any, Callable, Mapping, Optional
+from .llm_interface import CallUsage, LLMInterface, usage_count
 
 
 class ChatGPTClient(LLMInterface):
@@ -7,16 +9,30 @@ class ChatGPTClient(LLMInterface):
     Implementation of LLMInterface for OpenAI's ChatGPT models.
     """
 
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(self, api_key: str, model: str = "gpt-4o", prompt_cache_key: Optional[str] = None):
         """
         Initialize OpenAI ChatGPT client.
 
         Args:
             api_key: OpenAI API key
             model: Model identifier (default: "gpt-4o")
+            prompt_cache_key: Sent as `prompt_cache_key` with every request so calls sharing
+                a system prompt are routed to the same prompt cache (default: not sent)
         """
         super().__init__(api_key, model)
+        self.prompt_cache_key = prompt_cache_key
         self.client = OpenAI(api_key=self.api_key)
+        # Created on first aconv() call so sync-only runs don't pay for it
+        self._async_client = None
+        # Called with the HTTP response headers (x-ratelimit-*) of every completion when set
+        self.on_response_headers: Optional[Callable[[Mapping[str, str]], None]] = None
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Lazily constructed AsyncOpenAI client used by aconv()."""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key)
+        return self._async_client
 
     def conv(
         self,
@@ -39,7 +55,50 @@ class ChatGPTClient(LLMInterface):
         Returns:
             str: Model's response text, stripped of whitespace
         """
-        response = self.client.chat.completions.create(
+        request = self._build_request(user_message, system_message, max_tokens, kwargs)
+        started = time.perf_counter()
+        if self.on_response_headers is None:
+            response = self.client.chat.completions.create(**request)
+        else:
+            raw = self.client.chat.completions.with_raw_response.create(**request)
+            self.on_response_headers(raw.headers)
+            response = raw.parse()
+        self._record_usage(self._usage_from(response, time.perf_counter() - started))
+        return response.choices[0].message.content.strip()
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """
+        Async variant of conv() backed by AsyncOpenAI.
+
+        Takes the same arguments as conv() and returns the same stripped string,
+        without tying up a thread while the request is in flight.
+        """
+        request = self._build_request(user_message, system_message, max_tokens, kwargs)
+        started = time.perf_counter()
+        if self.on_response_headers is None:
+            response = await self.async_client.chat.completions.create(**request)
+        else:
+            raw = await self.async_client.chat.completions.with_raw_response.create(**request)
+            self.on_response_headers(raw.headers)
+            response = await raw.parse()
+        self._record_usage(self._usage_from(response, time.perf_counter() - started))
+        return response.choices[0].message.content.strip()
+
+    def _build_request(self, user_message: str, system_message: str, max_tokens: int, kwargs: dict) -> dict:
+        """
+        Build the chat completion arguments.
+
+        The static system prompt comes first and the per-call content last, so
+        the shared prefix can be served from OpenAI's prompt cache.
+        """
+        request = dict(
             model=self.model,
             messages=[
                 {"role": "system", "content": system_message},
@@ -49,4 +108,20 @@ class ChatGPTClient(LLMInterface):
             max_completion_tokens=max_tokens,
             **kwargs,
         )
-        return response.choices[0].message.content.strip()
+        if self.prompt_cache_key is not None:
+            request.setdefault("prompt_cache_key", self.prompt_cache_key)
+        return request
+
+    @staticmethod
+    def _usage_from(response: Any, latency: float) -> CallUsage:
+        """Read token counts from a chat completion's `usage` block."""
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "completion_tokens_details", None)
+        prompt_details = getattr(usage, "prompt_tokens_details", None)
+        return CallUsage(
+            prompt_tokens=usage_count(getattr(usage, "prompt_tokens", None)),
+            completion_tokens=usage_count(getattr(usage, "completion_tokens", None)),
+            reasoning_tokens=usage_count(getattr(details, "reasoning_tokens", None)),
+            cached_tokens=usage_count(getattr(prompt_details, "cached_tokens", None)),
+            latency=latency,
+        )
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Hard limit of the Batch API on requests per input file
+MAX_REQUESTS_PER_BATCH = 50000
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class OpenAIBatchRunner:
+    """
+    Runs a stage's chat completions through the OpenAI Batch API.
+
+    Requests are written to JSONL input files, uploaded with purpose="batch"
+    and submitted as one or more batches. Submitted batch ids are recorded in
+    a state file, so a process that dies while polling picks the same batches
+    up again instead of paying for them twice. Results are mapped back to the
+    caller by custom_id.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        state_path: str,
+        poll_interval: float = 30.0,
+        completion_window: str = "24h",
+        max_requests_per_batch: int = MAX_REQUESTS_PER_BATCH,
+        prompt_cache_key: Optional[str] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            client: OpenAI client (anything exposing .files and .batches)
+            model: Model identifier used for every request
+            state_path: JSON file recording submitted batches; input JSONL files
+                are written next to it
+            poll_interval: Seconds between status checks (default: 30)
+            completion_window: Batch completion window (default: "24h")
+            max_requests_per_batch: Requests per input file (default: 50000)
+            prompt_cache_key: Added to every request body, as ChatGPTClient does
+            sleep: Called between polls (injectable for tests)
+        """
+        self.client = client
+        self.model = model
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_requests_per_batch = max(1, int(max_requests_per_batch))
+        self.prompt_cache_key = prompt_cache_key
+        self._sleep = sleep
+
+    def build_request(
+        self,
+        custom_id: str,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """
+        Build one JSONL line with the same body ChatGPTClient.conv() would send.
+
+        Args:
+            custom_id: Caller-chosen id used to map the result back
+            user_message: The user's input message
+            system_message: System prompt
+            max_tokens: Maximum tokens in response
+            **kwargs: Additional chat completion parameters (e.g., response_format)
+
+        Returns:
+            dict: Batch API request line
+        """
+        body = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message},
+            ],
+            "max_completion_tokens": max_tokens,
+            **kwargs,
+        }
+        if self.prompt_cache_key is not None:
+            body.setdefault("prompt_cache_key", self.prompt_cache_key)
+        return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+    def run(self, requests: List[Dict[str, Any]]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Submit (or resume) the batches for `requests` and wait for their results.
+
+        Batches recorded in the state file are resumed rather than resubmitted;
+        only custom_ids none of them cover (e.g. after a crash part-way through
+        submission) are uploaded as new batches. A recorded batch whose request
+        bodies differ from the current ones for the same custom_id (changed
+        model, prompts or inputs) is stale: it is dropped and those requests
+        are submitted again. A batch that fails as a whole
+        is dropped from the state and its requests are reported as errors, so
+        the next run submits them again. Call clear_state() once the results
+        have been persisted.
+
+        Args:
+            requests: Lines built with build_request()
+
+        Returns:
+            tuple[dict, dict]: Replies keyed by custom_id (stripped message content)
+            and error messages keyed by custom_id for requests that failed
+
+        Raises:
+            ValueError: If custom_ids are not unique
+        """
+        custom_ids = [r["custom_id"] for r in requests]
+        if len(set(custom_ids)) != len(custom_ids):
+            raise ValueError("custom_id values must be unique within a batch run")
+        if not requests:
+            return {}, {}
+
+        state = self._load_state()
+        if state is None:
+            state = self._submit(requests)
+        else:
+            self._drop_stale(state, requests)
+            submitted = {cid for entry in state["batches"] for cid in entry["custom_ids"]}
+            missing = [r for r in requests if r["custom_id"] not in submitted]
+            logger.info(f"Resuming {len(state['batches'])} submitted batches from {self.state_path}")
+            if missing:
+                logger.info(f"Submitting {len(missing)} requests not covered by {self.state_path}")
+                state = self._submit(missing, state)
+
+        batches = self._wait(state)
+
+        replies, errors = {}, {}
+        failed = []
+        for entry, batch in zip(state["batches"], batches):
+            if batch.status == "failed":
+                message = f"Batch {batch.id} failed: {getattr(batch, 'errors', None)}"
+                logger.error(f"{message}; its {len(entry['custom_ids'])} requests are resubmitted on the next run")
+                errors.update(dict.fromkeys(entry["custom_ids"], message))
+                failed.append(entry)
+                continue
+            self._collect(batch, replies, errors)
+        if failed:
+            self._drop_batches(state, failed)
+
+        wanted = set(custom_ids)
+        for cid in wanted - replies.keys() - errors.keys():
+            errors[cid] = "No result returned by the batch"
+        replies = {cid: text for cid, text in replies.items() if cid in wanted}
+        errors = {cid: msg for cid, msg in errors.items() if cid in wanted}
+        logger.info(f"Batch run finished: {len(replies)} replies, {len(errors)} errors")
+        return replies, errors
+
+    def clear_state(self) -> None:
+        """Forget the submitted batches and remove their input files."""
+        state = self._load_state()
+        if state is None:
+            return
+        for entry in state["batches"]:
+            if os.path.exists(entry["input_path"]):
+                os.remove(entry["input_path"])
+        os.remove(self.state_path)
+
+    def _drop_stale(self, state: Dict[str, Any], requests: List[Dict[str, Any]]) -> None:
+        """Drop recorded batches that sent a different body for any of the current custom_ids."""
+        current = {r["custom_id"]: _fingerprint(r) for r in requests}
+        stale = []
+        for entry in state["batches"]:
+            # States written before fingerprints were recorded cannot be checked
+            recorded = entry.get("fingerprints") or [None] * len(entry["custom_ids"])
+            if any(cid in current and current[cid] != fp for cid, fp in zip(entry["custom_ids"], recorded)):
+                stale.append(entry)
+        if stale:
+            logger.warning(
+                f"{len(stale)} batches in {self.state_path} were submitted for different requests "
+                f"(model, prompts or inputs changed); resubmitting their requests"
+            )
+            self._drop_batches(state, stale)
+
+    def _drop_batches(self, state: Dict[str, Any], entries: List[Dict[str, Any]]) -> None:
+        """Forget `entries` (and their input files) so their requests count as not submitted."""
+        for entry in entries:
+            state["batches"].remove(entry)
+            if os.path.exists(entry["input_path"]):
+                os.remove(entry["input_path"])
+        self._save_state(state)
+
+    def _submit(self, requests: List[Dict[str, Any]], state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        base, _ = os.path.splitext(self.state_path)
+        state = state or {"model": self.model, "batches": []}
+
+        for start in range(0, len(requests), self.max_requests_per_batch):
+            chunk = requests[start : start + self.max_requests_per_batch]
+            # Numbered past every file ever written for this state, even for batches since dropped
+            part = state.get("next_part", len(state["batches"]))
+            state["next_part"] = part + 1
+            input_path = f"{base}-{part}.jsonl"
+            with open(input_path, "w", encoding="utf-8") as f:
+                for line in chunk:
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+            with open(input_path, "rb") as f:
+                input_file = self.client.files.create(file=f, purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=self.completion_window,
+            )
+            logger.info(f"Submitted batch {batch.id} with {len(chunk)} requests")
+
+            state["batches"].append({
+                "batch_id": batch.id,
+                "input_file_id": input_file.id,
+                "input_path": input_path,
+                "custom_ids": [line["custom_id"] for line in chunk],
+                "fingerprints": [_fingerprint(line) for line in chunk],
+            })
+            # Persist after every submission so a crash never orphans a paid batch
+            self._save_state(state)
+
+        return state
+
+    def _wait(self, state: Dict[str, Any]) -> List[Any]:
+        pending = [entry["batch_id"] for entry in state["batches"]]
+        done = {}
+        while True:
+            for batch_id in pending:
+                batch = self.client.batches.retrieve(batch_id)
+                counts = getattr(batch, "request_counts", None)
+                if counts is not None:
+                    logger.info(
+                        f"Batch {batch_id}: {batch.status} "
+                        f"({counts.completed}/{counts.total} completed, {counts.failed} failed)"
+                    )
+                if batch.status in TERMINAL_STATUSES:
+                    done[batch_id] = batch
+            pending = [batch_id for batch_id in pending if batch_id not in done]
+            if not pending:
+                return [done[entry["batch_id"]] for entry in state["batches"]]
+            self._sleep(self.poll_interval)
+
+    def _collect(self, batch, replies: Dict[str, str], errors: Dict[str, str]) -> None:
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                cid = record.get("custom_id")
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    errors[cid] = str(record.get("error") or response.get("body"))
+                    continue
+                try:
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    replies[cid] = (content or "").strip()
+                except (KeyError, IndexError, TypeError) as e:
+                    errors[cid] = f"Malformed batch response: {e}"
+
+        if batch.status in ("expired", "cancelled"):
+            logger.warning(f"Batch {batch.id} ended as {batch.status}; unfinished requests are reported as errors")
+
+    def _load_state(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self, state: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+def _fingerprint(request: Dict[str, Any]) -> str:
+    """Hash of a request line's body, used to tell whether a recorded batch sent the same request."""
+    body = json.dumps(request["body"], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
@@ -0,0 +1,398 @@
+import asyncio
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Mapping, Optional
+
+from .llm_interface import LLMClientWrapper, LLMInterface
+
+# Rough characters-per-token ratio used to charge the TPM bucket before a request is sent
+CHARS_PER_TOKEN = 4
+# Headroom kept below the server's limits so the limiter settles just under them
+SAFETY_MARGIN = 0.95
+# How often aacquire() rechecks for a free slot; released slots cannot wake a coroutine directly
+SLOT_POLL_SECONDS = 0.01
+
+_limiters: Dict[Hashable, "AdaptiveRateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Return True for HTTP 429 errors (openai.RateLimitError, OllamaHTTPError, ...)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+class TokenBucket:
+    """
+    Continuously refilled bucket holding up to one minute of capacity.
+
+    A bucket without a rate is unlimited until set_rate() is called.
+    """
+
+    def __init__(self, per_minute: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.per_minute = None
+        self.tokens = 0.0
+        self._updated = clock()
+        if per_minute:
+            self.set_rate(per_minute)
+
+    def set_rate(self, per_minute: float) -> None:
+        """Change the refill rate; a newly limited bucket starts full."""
+        with self._lock:
+            self._refill()
+            if self.per_minute is None:
+                self.tokens = float(per_minute)
+            self.per_minute = float(per_minute)
+            self.tokens = min(self.tokens, self.per_minute)
+
+    def sync(self, remaining: float) -> None:
+        """Lower the local balance to what the server reports as remaining."""
+        with self._lock:
+            if self.per_minute is None:
+                return
+            self._refill()
+            self.tokens = min(self.tokens, float(remaining))
+
+    def _refill(self) -> None:
+        now = self._clock()
+        if self.per_minute is not None:
+            self.tokens = min(self.per_minute, self.tokens + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` from the bucket, allowing the balance to go negative.
+
+        A negative amount returns capacity (e.g. when a request used fewer
+        tokens than estimated).
+
+        Returns:
+            float: Seconds the caller must wait before its share is actually available
+        """
+        with self._lock:
+            if self.per_minute is None:
+                return 0.0
+            self._refill()
+            # A single request larger than the bucket is charged a full bucket
+            self.tokens = min(self.per_minute, self.tokens - min(float(amount), self.per_minute))
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens * 60.0 / self.per_minute
+
+
+class AdaptiveRateLimiter:
+    """
+    Process-wide limiter for requests/min, tokens/min and concurrent requests.
+
+    Both buckets start unlimited unless rates are given and are seeded from the
+    x-ratelimit-* headers of the first responses. Concurrency follows AIMD: it
+    grows by one slot per `limit` successful requests and halves on every 429.
+    When a request rate is known it is also capped near rate x latency (Little's
+    law), so workers are not left queuing on the request bucket.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_concurrency: int = 10,
+        min_concurrency: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        asleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        """
+        Args:
+            requests_per_minute: Initial RPM limit (None: learn from headers)
+            tokens_per_minute: Initial TPM limit (None: learn from headers)
+            max_concurrency: Upper bound on requests in flight
+            min_concurrency: Lower bound the AIMD decrease never goes below
+            clock: Monotonic clock (injectable for tests)
+            sleep: Used to wait for bucket capacity (injectable for tests)
+            asleep: Async counterpart of sleep, used by aacquire()
+        """
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        self._clock = clock
+        self._sleep = sleep
+        self._asleep = asleep
+        self._cond = threading.Condition()
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._latency: Optional[float] = None
+        self._stats = {"requests": 0, "throttled": 0, "waited_seconds": 0.0, "peak_in_flight": 0}
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Number of requests currently allowed in flight."""
+        with self._cond:
+            return self._effective_limit()
+
+    def _effective_limit(self) -> int:
+        limit = self._limit
+        if self.requests.per_minute and self._latency:
+            # Little's law: in-flight requests needed to sustain the request rate
+            limit = min(limit, math.ceil(self.requests.per_minute / 60.0 * self._latency * 1.2))
+        return max(self.min_concurrency, min(self.max_concurrency, int(limit)))
+
+    def acquire(self, estimated_tokens: int = 0) -> float:
+        """
+        Block until a request may be sent and take a concurrency slot.
+
+        Every acquire() must be paired with a release().
+
+        Args:
+            estimated_tokens: Prompt plus completion tokens charged to the TPM bucket
+
+        Returns:
+            float: Seconds spent waiting for bucket capacity
+        """
+        with self._cond:
+            while self._in_flight >= self._effective_limit():
+                self._cond.wait()
+            self._in_flight += 1
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+
+        try:
+            wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+            if wait > 0:
+                self._sleep(wait)
+        except BaseException:
+            self.release()
+            raise
+        return wait
+
+    async def aacquire(self, estimated_tokens: int = 0) -> float:
+        """
+        Async variant of acquire() that waits with asyncio.sleep instead of blocking a thread.
+
+        Every aacquire() must be paired with a release().
+
+        Args:
+            estimated_tokens: Prompt plus completion tokens charged to the TPM bucket
+
+        Returns:
+            float: Seconds spent waiting for bucket capacity
+        """
+        while True:
+            with self._cond:
+                if self._in_flight < self._effective_limit():
+                    self._in_flight += 1
+                    self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+                    break
+            await self._asleep(SLOT_POLL_SECONDS)
+
+        try:
+            wait = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+            if wait > 0:
+                await self._asleep(wait)
+        except BaseException:
+            self.release()
+            raise
+        return wait
+
+    def release(self, latency: Optional[float] = None, waited: float = 0.0, error: Optional[BaseException] = None) -> None:
+        """
+        Give a slot back and feed the outcome into the AIMD controller.
+
+        Args:
+            latency: Request duration in seconds; None if the request did not complete
+            waited: Value returned by acquire()
+            error: Exception raised by the request, if any (429s shrink the limit)
+        """
+        with self._cond:
+            self._in_flight -= 1
+            if error is None and latency is not None:
+                self._stats["requests"] += 1
+                self._stats["waited_seconds"] += waited
+                self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+                if self._limit < self.max_concurrency:
+                    self._limit = min(self.max_concurrency, self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+        if error is not None and is_rate_limit_error(error):
+            self.record_throttle()
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0) -> Iterator[None]:
+        """Context manager running its body between acquire() and release()."""
+        waited = self.acquire(estimated_tokens)
+        started = self._clock()
+        try:
+            yield
+        except BaseException as e:
+            self.release(waited=waited, error=e)
+            raise
+        self.release(self._clock() - started, waited)
+
+    def record_throttle(self) -> None:
+        """Halve the concurrency limit after a 429."""
+        with self._cond:
+            self._stats["throttled"] += 1
+            self._limit = max(float(self.min_concurrency), self._limit / 2.0)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Seed and resynchronise both buckets from x-ratelimit-* response headers.
+
+        Args:
+            headers: Response headers (case-insensitive mapping or plain dict)
+        """
+        lowered = {str(k).lower(): v for k, v in dict(headers).items()}
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = _to_float(lowered.get(f"x-ratelimit-limit-{kind}"))
+            if limit:
+                bucket.set_rate(limit * SAFETY_MARGIN)
+            remaining = _to_float(lowered.get(f"x-ratelimit-remaining-{kind}"))
+            if remaining is not None:
+                bucket.sync(remaining - (limit or 0) * (1 - SAFETY_MARGIN))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return limiter counters and current limits.
+
+        Returns:
+            dict: 'requests', 'throttled', 'waited_seconds', 'peak_in_flight',
+            'concurrency_limit', 'requests_per_minute' and 'tokens_per_minute'
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["concurrency_limit"] = self._effective_limit()
+        stats["requests_per_minute"] = self.requests.per_minute
+        stats["tokens_per_minute"] = self.tokens.per_minute
+        return stats
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_rate_limiter(key: Hashable, **kwargs) -> AdaptiveRateLimiter:
+    """
+    Return the process-wide limiter for `key`, creating it on first use.
+
+    Args:
+        key: Identifies the quota being shared (e.g. (client_type, model, base_url))
+        **kwargs: AdaptiveRateLimiter arguments used when the limiter is created
+
+    Returns:
+        AdaptiveRateLimiter: Limiter shared by every client with the same key
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = AdaptiveRateLimiter(**kwargs)
+        return limiter
+
+
+def clear_rate_limiters() -> None:
+    """Forget all process-wide limiters."""
+    with _limiters_lock:
+        _limiters.clear()
+
+
+def estimate_tokens(texts: List[str], max_tokens: int) -> int:
+    """Estimate prompt + completion tokens for TPM accounting."""
+    return sum(len(text or "") for text in texts) // CHARS_PER_TOKEN + int(max_tokens or 0)
+
+
+class RateLimitedLLMClient(LLMClientWrapper):
+    """
+    Sends every call of the wrapped client through an AdaptiveRateLimiter.
+
+    If the wrapped client exposes an `on_response_headers` hook (ChatGPTClient),
+    it is pointed at the limiter so the buckets follow the server's limits.
+    """
+
+    def __init__(self, client: LLMInterface, limiter: AdaptiveRateLimiter):
+        """
+        Args:
+            client: Client whose calls are rate limited
+            limiter: Limiter shared by every client drawing on the same quota
+        """
+        super().__init__(client)
+        self.limiter = limiter
+        if hasattr(client, "on_response_headers"):
+            client.on_response_headers = limiter.update_from_headers
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Wait for the limiter, then call the wrapped client. Arguments match LLMInterface.conv()."""
+        estimated = estimate_tokens([system_message, user_message], max_tokens)
+        queued = time.monotonic()
+        waited = self.limiter.acquire(estimated)
+        started = time.monotonic()
+        try:
+            reply = super().conv(user_message, system_message, temperature, max_tokens, **kwargs)
+        except BaseException as e:
+            self.limiter.release(waited=waited, error=e)
+            raise
+        self.limiter.release(time.monotonic() - started, waited)
+        self._settle(estimated, started - queued)
+        return reply
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Async variant of conv(); waits for the limiter without blocking the event loop."""
+        estimated = estimate_tokens([system_message, user_message], max_tokens)
+        queued = time.monotonic()
+        waited = await self.limiter.aacquire(estimated)
+        started = time.monotonic()
+        try:
+            reply = await super().aconv(user_message, system_message, temperature, max_tokens, **kwargs)
+        except BaseException as e:
+            self.limiter.release(waited=waited, error=e)
+            raise
+        self.limiter.release(time.monotonic() - started, waited)
+        self._settle(estimated, started - queued)
+        return reply
+
+    def conv_batch(
+        self,
+        user_messages: List[str],
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> List[str]:
+        """Charge a batch as one request carrying every prompt's tokens."""
+        estimated = estimate_tokens([system_message] * len(user_messages) + list(user_messages),
+                                    max_tokens * len(user_messages))
+        queued = time.monotonic()
+        with self.limiter.slot(estimated):
+            started = time.monotonic()
+            replies = super().conv_batch(user_messages, system_message, temperature, max_tokens, **kwargs)
+        self._settle(estimated, started - queued)
+        return replies
+
+    def _settle(self, estimated: int, queue_wait: float) -> None:
+        """Record queue wait in last_usage and correct the TPM bucket with the reported token count."""
+        usage = self._inner_usage(queue_wait=queue_wait)
+        if usage is not None and usage.total_tokens is not None and not usage.from_cache:
+            self.limiter.tokens.reserve(usage.total_tokens - estimated)
+
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        """Return the shared limiter's stats()."""
+        return self.limiter.stats()
@@ -0,0 +1,369 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .llm_interface import CallUsage, LLMClientWrapper, LLMInterface
+
+CACHE_POLICIES = ["off", "read_through", "replay_only"]
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "baby_calls", "responses.sqlite")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+_caches: Dict[str, "ResponseCache"] = {}
+_caches_lock = threading.Lock()
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay_only mode when a request has no cached response."""
+
+
+class ResponseCache:
+    """
+    Content-addressed store of LLM replies in a single SQLite file.
+
+    Safe to share between threads (one connection per thread) and between
+    processes (WAL journal, busy timeout, IMMEDIATE write transactions). Once
+    the stored replies exceed `max_bytes`, the least recently read entries are
+    evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, busy_timeout: float = 30.0):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            max_bytes: Upper bound on the total size of stored replies (default: 1 GiB)
+            busy_timeout: Seconds to wait for a lock held by another connection
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        # Running total of the stored sizes, kept by triggers so put() never scans the table
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_meta ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " total_size INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_insert AFTER INSERT ON responses BEGIN"
+                " UPDATE cache_meta SET total_size = total_size + new.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_delete AFTER DELETE ON responses BEGIN"
+                " UPDATE cache_meta SET total_size = total_size - old.size WHERE id = 0; END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS responses_size_update AFTER UPDATE OF size ON responses BEGIN"
+                " UPDATE cache_meta SET total_size = total_size - old.size + new.size WHERE id = 0; END"
+            )
+            # Seeded once, for new files and ones written before the total was kept
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_meta (id, total_size)"
+                " SELECT 0, COALESCE(SUM(size), 0) FROM responses"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def make_key(
+        client_type: str,
+        model: str,
+        system_message: str,
+        user_message: str,
+        temperature: float,
+        max_tokens: int,
+        response_format: Any = None,
+        seed: Optional[int] = None,
+    ) -> str:
+        """
+        Hash every request field that can change the reply.
+
+        Returns:
+            str: Hex SHA-256 digest used as the cache key
+        """
+        payload = json.dumps(
+            [client_type, model, system_message, user_message, temperature, max_tokens, response_format, seed],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached reply for `key` and mark it as recently used.
+
+        Args:
+            key: Key built with make_key()
+
+        Returns:
+            Optional[str]: The reply, or None on a miss
+        """
+        conn = self._connection()
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._count("hits")
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """
+        Store a reply and evict least recently used entries beyond max_bytes.
+
+        Args:
+            key: Key built with make_key()
+            response: Reply text to store
+        """
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # An upsert, not INSERT OR REPLACE, whose implicit delete would skip the size trigger
+            conn.execute(
+                "INSERT INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET response = excluded.response, size = excluded.size,"
+                " created = excluded.created, last_access = excluded.last_access",
+                (key, response, size, now, now),
+            )
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("writes")
+        if evicted:
+            self._count("evictions", evicted)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        total = conn.execute("SELECT total_size FROM cache_meta WHERE id = 0").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return 0
+
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        return len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return this process's hit/miss counters plus the current cache size.
+
+        Returns:
+            dict: 'hits', 'misses', 'writes', 'evictions', 'entries' and 'bytes'
+        """
+        conn = self._connection()
+        entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        size = conn.execute("SELECT total_size FROM cache_meta WHERE id = 0").fetchone()[0]
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(entries=entries, bytes=size)
+        return stats
+
+    def close(self) -> None:
+        """Close every per-thread connection."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+def open_response_cache(path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES) -> ResponseCache:
+    """
+    Return the process-wide ResponseCache for `path`, opening it on first use.
+
+    Args:
+        path: SQLite database file ("~" is expanded)
+        max_bytes: Size bound applied when the cache is first opened
+
+    Returns:
+        ResponseCache: Shared cache instance (counters are shared by all its users)
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = ResponseCache(path, max_bytes=max_bytes)
+        return cache
+
+
+class CachedLLMClient(LLMClientWrapper):
+    """
+    Serves replies from a ResponseCache before calling the wrapped client.
+
+    Policies:
+        - "read_through": return cached replies, call the client on a miss and store the reply
+        - "replay_only": return cached replies, raise CacheMissError on a miss
+        - "off": always call the client, never touch the cache
+    """
+
+    def __init__(
+        self,
+        client: LLMInterface,
+        client_type: str,
+        cache: ResponseCache,
+        policy: str = "read_through",
+        model: Optional[str] = None,
+        response_validator: Optional[Callable[[str], Any]] = None,
+    ):
+        """
+        Args:
+            client: Client called on cache misses
+            client_type: Backend name, part of the cache key
+            cache: Cache to read and write
+            policy: One of CACHE_POLICIES (default: "read_through")
+            model: Configured model, part of the cache key (default: the wrapped
+                client's model; pooled clients report None until first checked out)
+            response_validator: Only replies for which it returns a truthy value
+                are stored, so a bad reply is not replayed on every rerun
+
+        Raises:
+            ValueError: If policy is not supported
+        """
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unsupported cache policy: {policy}. Supported policies are {CACHE_POLICIES}.")
+        super().__init__(client)
+        self.client_type = client_type
+        self.cache = cache
+        self.policy = policy
+        self.model = model
+        self.response_validator = response_validator
+
+    def _key(self, user_message, system_message, temperature, max_tokens, kwargs) -> str:
+        return ResponseCache.make_key(
+            self.client_type,
+            self.model if self.model is not None else self.client.model,
+            system_message,
+            user_message,
+            temperature,
+            max_tokens,
+            kwargs.get("response_format"),
+            kwargs.get("seed"),
+        )
+
+    def _store(self, key: str, reply: str) -> None:
+        if self.response_validator is None or self.response_validator(reply):
+            self.cache.put(key, reply)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        reply = self.cache.get(key)
+        if reply is None and self.policy == "replay_only":
+            raise CacheMissError(f"No cached response for request {key[:12]} (replay_only)")
+        if reply is not None:
+            self._record_usage(CallUsage(latency=0.0, from_cache=True))
+        return reply
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Return the cached reply or call the wrapped client. Arguments match LLMInterface.conv()."""
+        if self.policy == "off":
+            return super().conv(user_message, system_message, temperature, max_tokens, **kwargs)
+
+        key = self._key(user_message, system_message, temperature, max_tokens, kwargs)
+        reply = self._lookup(key)
+        if reply is None:
+            reply = super().conv(user_message, system_message, temperature, max_tokens, **kwargs)
+            self._store(key, reply)
+        return reply
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Async variant of conv(); cache lookups are local and stay on the event loop."""
+        if self.policy == "off":
+            return await super().aconv(user_message, system_message, temperature, max_tokens, **kwargs)
+
+        key = self._key(user_message, system_message, temperature, max_tokens, kwargs)
+        reply = self._lookup(key)
+        if reply is None:
+            reply = await super().aconv(user_message, system_message, temperature, max_tokens, **kwargs)
+            self._store(key, reply)
+        return reply
+
+    def conv_batch(
+        self,
+        user_messages: List[str],
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> List[str]:
+        """Serve cached prompts from the cache and send only the misses to the wrapped client as one batch."""
+        if self.policy == "off":
+            return super().conv_batch(user_messages, system_message, temperature, max_tokens, **kwargs)
+
+        keys = [self._key(m, system_message, temperature, max_tokens, kwargs) for m in user_messages]
+        replies = [self._lookup(key) for key in keys]
+        missing = [i for i, reply in enumerate(replies) if reply is None]
+        if missing:
+            generated = super().conv_batch(
+                [user_messages[i] for i in missing], system_message, temperature, max_tokens, **kwargs
+            )
+            for i, reply in zip(missing, generated):
+                self._store(keys[i], reply)
+                replies[i] = reply
+        else:
+            self._record_usage(CallUsage(latency=0.0, requests=len(replies), from_cache=True))
+        return replies
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Return the underlying ResponseCache.stats()."""
+        return self.cache.stats()
@@ -0,0 +1,568 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from logger import setup_logger
+
+from .llm_interface import LLMClientWrapper, LLMInterface
+
+logger = setup_logger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, throttling and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+# How often abefore_call() rechecks an open breaker
+BREAKER_POLL_SECONDS = 0.05
+
+_breakers: Dict[Hashable, "CircuitBreaker"] = {}
+_breakers_lock = threading.Lock()
+_counters: Dict[Hashable, "RetryCounters"] = {}
+_transient_types: Optional[Tuple[type, ...]] = None
+
+
+class InvalidResponseError(ValueError):
+    """Raised when a reply fails the response validator (e.g. not valid JSON)."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the circuit breaker stays open longer than a caller is willing to wait."""
+
+
+def _get_transient_types() -> Tuple[type, ...]:
+    """Connection and timeout errors of the HTTP stacks used by the backends."""
+    global _transient_types
+    if _transient_types is None:
+        types: List[type] = [TimeoutError, ConnectionError]
+        try:
+            import openai
+
+            types += [openai.APIConnectionError, openai.APITimeoutError]
+        except ImportError:
+            pass
+        try:
+            import requests
+
+            types += [requests.Timeout, requests.ConnectionError]
+        except ImportError:
+            pass
+        try:
+            import httpx
+
+            types += [httpx.TransportError]
+        except ImportError:
+            pass
+        _transient_types = tuple(types)
+    return _transient_types
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _causes(error: BaseException):
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """
+    Return True if `error` suggests the backend itself is unhealthy.
+
+    Server errors (5xx), timeouts and connection failures count; throttling
+    and bad replies do not. Wrapped errors are classified by their cause, so
+    Ollama's RuntimeError("Ollama request failed") around a requests timeout
+    counts too.
+    """
+    for cause in _causes(error):
+        status = _status_code(cause)
+        if status is not None:
+            return status >= 500 or status == 408
+        if isinstance(cause, _get_transient_types()):
+            return True
+    return False
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Classify an error raised by an LLM call.
+
+    Retryable: HTTP 408/409/429/5xx (openai.APIStatusError, OllamaHTTPError),
+    connection errors and timeouts, undecodable replies (json.JSONDecodeError,
+    InvalidResponseError). Everything else (auth, bad request, programming
+    errors) fails immediately.
+    """
+    for cause in _causes(error):
+        status = _status_code(cause)
+        if status is not None:
+            return status in RETRYABLE_STATUS_CODES or status >= 500
+        if isinstance(cause, (InvalidResponseError, json.JSONDecodeError)):
+            return True
+        if isinstance(cause, _get_transient_types()):
+            return True
+    return False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Return the server's Retry-After hint in seconds, if the error carries one."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Attempt n (0-based) waits a uniform random time in [0, min(max_delay,
+    base_delay * 2**n)], or the server's Retry-After hint when it is longer.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        Args:
+            max_attempts: Total attempts including the first call (default: 5)
+            base_delay: Backoff ceiling of the first retry in seconds (default: 1)
+            max_delay: Upper bound on a single backoff in seconds (default: 60)
+            rng: Random source for jitter (injectable for tests)
+        """
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """
+        Seconds to wait before retrying after failed attempt `attempt`.
+
+        Args:
+            attempt: 0-based index of the attempt that just failed
+            error: The failure, used for Retry-After hints
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = self._rng.uniform(0, ceiling)
+        hint = retry_after(error) if error is not None else None
+        if hint is not None:
+            delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Pauses every caller of a backend that keeps failing.
+
+    After `failure_threshold` consecutive backend failures the breaker opens:
+    callers block in before_call() until `reset_timeout` has passed. Then a
+    single probe call is let through (half-open); its success closes the
+    breaker and releases everyone, its failure reopens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker (default: 5)
+            reset_timeout: Seconds the breaker stays open before a probe (default: 30)
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._cond = threading.Condition()
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"opened": 0, "paused_seconds": 0.0}
+
+    def _admit(self, started: float, max_wait: Optional[float]) -> Tuple[bool, Optional[float]]:
+        """
+        Check, under the lock, whether a call may proceed now.
+
+        Returns:
+            tuple[bool, float | None]: (True, None) if it may, else (False, seconds
+            until the state can next change, or None if only another call can change it)
+        """
+        if self.state == self.CLOSED:
+            return True, None
+        now = self._clock()
+        if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True, None
+        if max_wait is not None and now - started >= max_wait:
+            raise CircuitOpenError("Backend circuit breaker is open")
+        timeout = self.reset_timeout - (now - self._opened_at) if self.state == self.OPEN else None
+        if max_wait is not None:
+            remaining = max_wait - (now - started)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return False, timeout
+
+    def before_call(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Block while the breaker is open; return once a call may proceed.
+
+        Args:
+            max_wait: Give up after this many seconds (default: wait indefinitely)
+
+        Returns:
+            bool: True if the call is the half-open probe; its outcome must then be
+            recorded, or abort_probe() called if it never completes
+
+        Raises:
+            CircuitOpenError: If max_wait elapses while the breaker is still open
+        """
+        started = self._clock()
+        with self._cond:
+            while True:
+                admitted, timeout = self._admit(started, max_wait)
+                if admitted:
+                    break
+                self._cond.wait(timeout=max(timeout, 0.01) if timeout is not None else None)
+            self._stats["paused_seconds"] += self._clock() - started
+            return self.state == self.HALF_OPEN
+
+    async def abefore_call(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Async variant of before_call() that waits with asyncio.sleep instead of blocking a thread.
+
+        Returns:
+            bool: True if the call is the half-open probe, as for before_call()
+
+        Raises:
+            CircuitOpenError: If max_wait elapses while the breaker is still open
+        """
+        started = self._clock()
+        while True:
+            with self._cond:
+                admitted, timeout = self._admit(started, max_wait)
+                if admitted:
+                    self._stats["paused_seconds"] += self._clock() - started
+                    return self.state == self.HALF_OPEN
+            # Other callers' outcomes cannot wake a coroutine, so recheck periodically
+            await asyncio.sleep(min(timeout, BREAKER_POLL_SECONDS) if timeout is not None else BREAKER_POLL_SECONDS)
+
+    def abort_probe(self) -> None:
+        """Give up the probe of a call that was cancelled or interrupted, so another caller can probe."""
+        with self._cond:
+            self._probing = False
+            self._cond.notify_all()
+
+    def record_success(self) -> None:
+        """Close the breaker and wake paused callers."""
+        with self._cond:
+            self._failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                logger.info("Backend recovered; circuit breaker closed")
+            self.state = self.CLOSED
+            self._cond.notify_all()
+
+    def record_failure(self, backend_failure: bool = True) -> None:
+        """
+        Count a failed call.
+
+        Args:
+            backend_failure: False for failures that say nothing about backend
+                health (bad replies, throttling); they only end a probe
+        """
+        with self._cond:
+            was_probe = self._probing
+            self._probing = False
+            if not backend_failure:
+                if was_probe:
+                    # Backend answered, so it is up
+                    self._failures = 0
+                    self.state = self.CLOSED
+                self._cond.notify_all()
+                return
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self._stats["opened"] += 1
+                    logger.warning(
+                        f"Backend looks down after {self._failures} consecutive failures; "
+                        f"pausing all workers for {self.reset_timeout:.0f}s"
+                    )
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return 'state', 'consecutive_failures', 'opened' and 'paused_seconds'."""
+        with self._cond:
+            return {"state": self.state, "consecutive_failures": self._failures, **self._stats}
+
+
+def get_circuit_breaker(key: Hashable, **kwargs) -> CircuitBreaker:
+    """
+    Return the process-wide breaker for `key`, creating it on first use.
+
+    Args:
+        key: Identifies the backend (e.g. (client_type, model, base_url))
+        **kwargs: CircuitBreaker arguments used when the breaker is created
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(**kwargs)
+        return breaker
+
+
+class RetryCounters:
+    """Thread-safe retry counters, shared by every RetryingLLMClient of one backend."""
+
+    FIELDS = ("calls", "retries", "gave_up", "invalid_replies", "rejected")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a copy of the counters."""
+        with self._lock:
+            return dict(self._counts)
+
+
+def get_retry_counters(key: Hashable) -> RetryCounters:
+    """
+    Return the process-wide retry counters for `key`, creating them on first use.
+
+    Stages build a new wrapper chain per get_llm_client() call, so counters
+    kept on the wrapper would only ever cover that one wrapper's calls.
+
+    Args:
+        key: Identifies the backend (same key as get_circuit_breaker())
+    """
+    with _breakers_lock:
+        counters = _counters.get(key)
+        if counters is None:
+            counters = _counters[key] = RetryCounters()
+        return counters
+
+
+def clear_circuit_breakers() -> None:
+    """Forget all process-wide breakers and retry counters."""
+    with _breakers_lock:
+        _breakers.clear()
+        _counters.clear()
+
+
+class RetryingLLMClient(LLMClientWrapper):
+    """
+    Retries failed calls of the wrapped client.
+
+    Retryable errors (see is_retryable()) are retried with RetryPolicy backoff.
+    Replies rejected by `response_validator` are retried too. Backend failures
+    feed a CircuitBreaker shared by all workers.
+    """
+
+    def __init__(
+        self,
+        client: LLMInterface,
+        policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        response_validator: Optional[Callable[[str], Any]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        counters: Optional[RetryCounters] = None,
+        max_pause: Optional[float] = None,
+    ):
+        """
+        Args:
+            client: Client whose calls are retried
+            policy: Backoff policy (default: RetryPolicy())
+            breaker: Shared circuit breaker (default: a private one)
+            response_validator: Returns a truthy value for usable replies
+                (e.g. utils.convert_response_to_json); falsy replies are retried
+            sleep: Used for backoff (injectable for tests)
+            counters: Shared retry counters (default: private ones)
+            max_pause: Seconds a call may wait on an open breaker before it fails
+                with CircuitOpenError (default: wait until the backend recovers)
+        """
+        super().__init__(client)
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.response_validator = response_validator
+        self._sleep = sleep
+        self.counters = counters or RetryCounters()
+        self.max_pause = max_pause
+
+    def _count(self, name: str) -> None:
+        self.counters.add(name)
+
+    def _before_call(self) -> bool:
+        try:
+            return self.breaker.before_call(max_wait=self.max_pause)
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+
+    async def _abefore_call(self) -> bool:
+        try:
+            return await self.breaker.abefore_call(max_wait=self.max_pause)
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+
+    def _check(self, reply: str) -> str:
+        if self.response_validator is not None and not self.response_validator(reply):
+            self._count("invalid_replies")
+            raise InvalidResponseError("Reply rejected by response validator")
+        return reply
+
+    def _on_failure(self, attempt: int, error: Exception) -> float:
+        """Record a failed attempt; return the backoff, or re-raise if it should not be retried."""
+        self.breaker.record_failure(is_backend_failure(error))
+        if not is_retryable(error) or attempt + 1 >= self.policy.max_attempts:
+            self._count("gave_up")
+            raise error
+        self._count("retries")
+        delay = self.policy.delay(attempt, error)
+        logger.warning(
+            f"LLM call failed (attempt {attempt + 1}/{self.policy.max_attempts}): {error}; "
+            f"retrying in {delay:.1f}s"
+        )
+        return delay
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Call the wrapped client, retrying transient failures. Arguments match LLMInterface.conv()."""
+        self._count("calls")
+        attempt = 0
+        while True:
+            probe = self._before_call()
+            try:
+                reply = self._check(super().conv(user_message, system_message, temperature, max_tokens, **kwargs))
+            except Exception as e:
+                self._sleep(self._on_failure(attempt, e))
+                attempt += 1
+                continue
+            except BaseException:
+                # Interrupted: no outcome to record, but never leave the breaker waiting on this probe
+                if probe:
+                    self.breaker.abort_probe()
+                raise
+            self.breaker.record_success()
+            self._inner_usage(attempts=attempt + 1)
+            return reply
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Async variant of conv(); backoff uses asyncio.sleep."""
+        self._count("calls")
+        attempt = 0
+        while True:
+            probe = await self._abefore_call()
+            try:
+                reply = self._check(
+                    await super().aconv(user_message, system_message, temperature, max_tokens, **kwargs)
+                )
+            except Exception as e:
+                await asyncio.sleep(self._on_failure(attempt, e))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled (e.g. a losing hedge attempt): release the probe, as in conv()
+                if probe:
+                    self.breaker.abort_probe()
+                raise
+            self.breaker.record_success()
+            self._inner_usage(attempts=attempt + 1)
+            return reply
+
+    def conv_batch(
+        self,
+        user_messages: List[str],
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> List[str]:
+        """
+        Batched conv() with retries.
+
+        A failed call retries the whole batch; replies rejected by the validator
+        are regenerated on their own, keeping the valid ones. Prompts still
+        invalid after the last attempt keep their last reply so the caller can
+        report them.
+        """
+        self._count("calls")
+        replies: List[Optional[str]] = [None] * len(user_messages)
+        pending = list(range(len(user_messages)))
+        attempt = 0
+        while True:
+            probe = self._before_call()
+            try:
+                generated = super().conv_batch(
+                    [user_messages[i] for i in pending], system_message, temperature, max_tokens, **kwargs
+                )
+            except Exception as e:
+                self._sleep(self._on_failure(attempt, e))
+                attempt += 1
+                continue
+            except BaseException:
+                if probe:
+                    self.breaker.abort_probe()
+                raise
+            self.breaker.record_success()
+
+            invalid = []
+            for i, reply in zip(pending, generated):
+                replies[i] = reply
+                if self.response_validator is not None and not self.response_validator(reply):
+                    self._count("invalid_replies")
+                    invalid.append(i)
+            if not invalid or attempt + 1 >= self.policy.max_attempts:
+                # Usage of the final round only; earlier rounds are counted in retry_stats()
+                self._inner_usage(attempts=attempt + 1)
+                return replies
+            self._count("retries")
+            self._sleep(self.policy.delay(attempt))
+            pending = invalid
+            attempt += 1
+
+    def retry_stats(self) -> Dict[str, Any]:
+        """Return retry counters plus the breaker's stats() under 'breaker'."""
+        stats = self.counters.snapshot()
+        stats["breaker"] = self.breaker.stats()
+        return stats
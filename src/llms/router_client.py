@@ -0,0 +1,338 @@
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from logger import setup_logger
+
+from .hedging import is_hedge_attempt
+from .llm_interface import CallUsage, LLMInterface
+from .rate_limiter import is_rate_limit_error
+from .retry import is_backend_failure
+
+logger = setup_logger(__name__)
+
+
+class NoHealthyBackendError(RuntimeError):
+    """Raised when every backend failed or is ejected and no fallback is configured."""
+
+
+class _Backend:
+    """Routing state of one backend (guarded by the router's lock)."""
+
+    def __init__(self, name: str, client: LLMInterface):
+        self.name = name
+        self.client = client
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until: Optional[float] = None
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+
+
+class RouterClient(LLMInterface):
+    """
+    Spreads calls over several interchangeable backends (e.g. Ollama servers).
+
+    Routing:
+        - Sticky: calls sharing a system prompt go to the same backend (rendezvous
+          hashing), so its prompt/KV cache stays warm. The preferred backend is
+          skipped when it has `sticky_slack` more calls in flight than the least
+          loaded one.
+        - Least outstanding requests otherwise (and when sticky=False, and for
+          the duplicate request of a hedged call).
+
+    Failover: a call failing with a backend error (5xx, timeout, connection
+    error) or a 429 is retried once on each other healthy backend, then on the
+    optional fallback client. Backends with `failure_threshold` consecutive
+    backend errors are ejected for `ejection_seconds` (doubling on every
+    repeated ejection, up to `max_ejection_seconds`) and only readmitted once
+    their health_check() passes.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        backends: List[Tuple[str, LLMInterface]],
+        fallback: Optional[LLMInterface] = None,
+        sticky: bool = True,
+        sticky_slack: int = 2,
+        failure_threshold: int = 3,
+        ejection_seconds: float = 30.0,
+        max_ejection_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            model: Model name (backends are expected to serve the same model)
+            backends: (name, client) pairs, e.g. one OllamaClient per base URL
+            fallback: Client used only when no backend could serve a call (e.g. ChatGPTClient)
+            sticky: Route by system-prompt hash (default: True)
+            sticky_slack: Extra in-flight calls tolerated on the sticky backend before
+                falling back to least-outstanding selection (default: 2)
+            failure_threshold: Consecutive backend errors that eject a backend (default: 3)
+            ejection_seconds: First ejection period (default: 30)
+            max_ejection_seconds: Upper bound on the ejection period (default: 300)
+            clock: Monotonic clock (injectable for tests)
+
+        Raises:
+            ValueError: If no backends are given
+        """
+        if not backends:
+            raise ValueError("RouterClient needs at least one backend")
+        super().__init__(api_key="", model=model)
+        self.backends = [_Backend(name, client) for name, client in backends]
+        self.fallback = fallback
+        self.sticky = sticky
+        self.sticky_slack = sticky_slack
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.ejection_seconds = ejection_seconds
+        self.max_ejection_seconds = max_ejection_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rotation = 0
+        self._stats = {"failovers": 0, "fallback_requests": 0}
+
+    @staticmethod
+    def _affinity(prompt_hash: bytes, name: str) -> bytes:
+        return hashlib.sha256(prompt_hash + name.encode("utf-8")).digest()
+
+    def _due_for_probe(self) -> List[_Backend]:
+        now = self._clock()
+        with self._lock:
+            due = [
+                b for b in self.backends
+                if b.ejected_until is not None and b.ejected_until <= now and not b.probing
+            ]
+            for backend in due:
+                backend.probing = True
+        return due
+
+    def _finish_probe(self, backend: _Backend, healthy: bool) -> None:
+        with self._lock:
+            backend.probing = False
+            if healthy:
+                backend.ejected_until = None
+                backend.consecutive_failures = 0
+                logger.info(f"Backend {backend.name} passed its health check; readmitted")
+            else:
+                self._eject(backend)
+
+    @staticmethod
+    def _probe(backend: _Backend) -> bool:
+        health_check = getattr(backend.client, "health_check", None)
+        if health_check is None:
+            return True
+        try:
+            return bool(health_check())
+        except Exception:
+            return False
+
+    def _select(self, system_message: str, tried: Set[_Backend]) -> Optional[_Backend]:
+        """Pick a backend and count the call as outstanding on it."""
+        with self._lock:
+            untried = [b for b in self.backends if b not in tried]
+            candidates = [b for b in untried if b.ejected_until is None]
+            if not candidates:
+                if tried or self.fallback is not None or not untried:
+                    return None
+                # Every backend is ejected and there is nowhere else to go: use the one readmitted soonest
+                candidates = [min(untried, key=lambda b: b.ejected_until)]
+
+            least = min(b.outstanding for b in candidates)
+            chosen = None
+            # A hedge duplicates a slow call, so it should not join the primary on the sticky backend
+            if self.sticky and system_message and not is_hedge_attempt():
+                prompt_hash = hashlib.sha256(system_message.encode("utf-8")).digest()
+                preferred = max(candidates, key=lambda b: self._affinity(prompt_hash, b.name))
+                if preferred.outstanding <= least + self.sticky_slack:
+                    chosen = preferred
+            if chosen is None:
+                # Rotate the starting point so ties do not always land on the first backend
+                self._rotation += 1
+                offset = self._rotation % len(candidates)
+                rotated = candidates[offset:] + candidates[:offset]
+                chosen = min(rotated, key=lambda b: b.outstanding)
+
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def _eject(self, backend: _Backend) -> None:
+        backend.ejections += 1
+        period = min(self.ejection_seconds * 2 ** (backend.ejections - 1), self.max_ejection_seconds)
+        backend.ejected_until = self._clock() + period
+        logger.warning(f"Ejecting backend {backend.name} for {period:.0f}s")
+
+    def _copy_usage(self, client: LLMInterface) -> None:
+        usage = getattr(client, "last_usage", None)
+        self._record_usage(usage if isinstance(usage, CallUsage) else None)
+
+    def _on_success(self, backend: _Backend) -> None:
+        with self._lock:
+            backend.outstanding -= 1
+            backend.consecutive_failures = 0
+        self._copy_usage(backend.client)
+
+    def _on_abort(self, backend: _Backend) -> None:
+        """Release a call that was cancelled or interrupted; says nothing about backend health."""
+        with self._lock:
+            backend.outstanding -= 1
+
+    def _on_failure(self, backend: _Backend, error: BaseException) -> bool:
+        """Record a failed call. Returns True if the call should fail over."""
+        backend_failure = is_backend_failure(error)
+        throttled = is_rate_limit_error(error)
+        with self._lock:
+            backend.outstanding -= 1
+            if backend_failure:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                if backend.consecutive_failures >= self.failure_threshold and backend.ejected_until is None:
+                    self._eject(backend)
+            elif not throttled:
+                return False
+            self._stats["failovers"] += 1
+        logger.warning(f"Backend {backend.name} failed ({error}); failing over")
+        return True
+
+    def _no_backend(self, last_error: Optional[BaseException]) -> NoHealthyBackendError:
+        return NoHealthyBackendError(f"No healthy backend could serve the request (last error: {last_error})")
+
+    def _count_fallback(self) -> None:
+        with self._lock:
+            self._stats["fallback_requests"] += 1
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """
+        Route the call to a backend, failing over on backend errors. Arguments match LLMInterface.conv().
+
+        Raises:
+            NoHealthyBackendError: If every backend failed and there is no fallback
+        """
+        for backend in self._due_for_probe():
+            self._finish_probe(backend, self._probe(backend))
+
+        tried: Set[_Backend] = set()
+        last_error = None
+        while True:
+            backend = self._select(system_message, tried)
+            if backend is None:
+                break
+            tried.add(backend)
+            try:
+                reply = backend.client.conv(
+                    user_message,
+                    system_message=system_message,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs,
+                )
+            except Exception as e:
+                if not self._on_failure(backend, e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                # Cancelled (e.g. a losing hedge attempt) or interrupted
+                self._on_abort(backend)
+                raise
+            self._on_success(backend)
+            return reply
+
+        if self.fallback is None:
+            raise self._no_backend(last_error) from last_error
+        self._count_fallback()
+        reply = self.fallback.conv(
+            user_message, system_message=system_message, temperature=temperature, max_tokens=max_tokens, **kwargs
+        )
+        self._copy_usage(self.fallback)
+        return reply
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Async variant of conv(); health probes run in a worker thread."""
+        for backend in self._due_for_probe():
+            self._finish_probe(backend, await asyncio.to_thread(self._probe, backend))
+
+        tried: Set[_Backend] = set()
+        last_error = None
+        while True:
+            backend = self._select(system_message, tried)
+            if backend is None:
+                break
+            tried.add(backend)
+            try:
+                reply = await backend.client.aconv(
+                    user_message,
+                    system_message=system_message,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **kwargs,
+                )
+            except Exception as e:
+                if not self._on_failure(backend, e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                # Cancelled (e.g. a losing hedge attempt) or interrupted
+                self._on_abort(backend)
+                raise
+            self._on_success(backend)
+            return reply
+
+        if self.fallback is None:
+            raise self._no_backend(last_error) from last_error
+        self._count_fallback()
+        reply = await self.fallback.aconv(
+            user_message, system_message=system_message, temperature=temperature, max_tokens=max_tokens, **kwargs
+        )
+        self._copy_usage(self.fallback)
+        return reply
+
+    def router_stats(self) -> Dict[str, Any]:
+        """
+        Return per-backend routing counters.
+
+        Returns:
+            dict: 'backends' (name -> requests, failures, ejections, outstanding and
+            'ejected'), 'failovers' and 'fallback_requests'
+        """
+        with self._lock:
+            return {
+                "backends": {
+                    b.name: {
+                        "requests": b.requests,
+                        "failures": b.failures,
+                        "ejections": b.ejections,
+                        "outstanding": b.outstanding,
+                        "ejected": b.ejected_until is not None,
+                    }
+                    for b in self.backends
+                },
+                **self._stats,
+            }
+
+    def close(self) -> None:
+        """Close every backend (and the fallback) that supports it."""
+        for client in [b.client for b in self.backends] + [self.fallback]:
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
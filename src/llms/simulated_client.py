@@ -0,0 +1,383 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .llm_interface import CallUsage, LLMInterface
+
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "exponential", "lognormal"]
+SCHEMAS = ["auto", "keywords", "summaries", "transcription", "text"]
+CHARS_PER_TOKEN = 4
+
+_SYMPTOMS = [
+    "has had a temperature since yesterday", "is coughing mostly at night", "refuses solid food",
+    "has a runny nose", "wakes up several times a night", "has a mild rash on the chest",
+    "is more irritable than usual", "has had loose stools twice today", "is pulling at one ear",
+    "drinks less milk than usual",
+]
+_DETAILS = [
+    "Parents measured the temperature with a digital thermometer.",
+    "No medication has been given so far.",
+    "The baby is still feeding, although less than usual.",
+    "An older sibling had similar symptoms last week.",
+    "Parents used saline drops to clear the nose.",
+    "The child is playful between episodes.",
+    "Diapers are wet as often as usual.",
+    "Symptoms started after a day at daycare.",
+]
+_NURSE_LINES = [
+    "How long has this been going on?", "Has the child had a fever?", "Is the baby drinking enough?",
+    "Have you given any medication?", "Are the diapers as wet as usual?",
+    "Please call back if the symptoms get worse.", "I would recommend seeing a pediatrician tomorrow.",
+]
+
+
+class SimulatedRateLimitError(RuntimeError):
+    """Injected HTTP 429; classified like a real provider throttle."""
+
+    status_code = 429
+
+
+class SimulatedServerError(RuntimeError):
+    """Injected HTTP 503; classified like a real backend failure."""
+
+    status_code = 503
+
+
+class SimulatedLLM(LLMInterface):
+    """
+    Offline stand-in for an LLM backend, for load-testing the pipeline.
+
+    Replies are schema-valid JSON for the keyword, summary and transcription
+    stages (detected from the prompt, or forced with `schema`), generated
+    deterministically from the prompt and `seed`. Each call sleeps for a
+    latency drawn from the configured distribution plus the decode time of its
+    completion at `tokens_per_second`. Errors, 429s and truncated replies are
+    injected at the configured rates; replies longer than max_tokens are cut
+    off like real ones. Token counts are estimated at four characters per
+    token and reported through last_usage.
+
+    Thread-safe; aconv() sleeps on the event loop without a thread.
+    """
+
+    def __init__(
+        self,
+        model: str = "simulated",
+        schema: str = "auto",
+        latency_distribution: str = "lognormal",
+        latency_mean: float = 1.0,
+        latency_sigma: float = 0.5,
+        tokens_per_second: Optional[float] = None,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        truncation_rate: float = 0.0,
+        seed: Optional[int] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            model: Model name reported to callers (default: "simulated")
+            schema: One of SCHEMAS; "auto" picks the stage schema from the prompt
+            latency_distribution: One of LATENCY_DISTRIBUTIONS (default: "lognormal")
+            latency_mean: Mean per-call overhead in seconds (median for lognormal; default: 1)
+            latency_sigma: Spread: standard deviation of log-latency for lognormal,
+                relative half-width for uniform (default: 0.5)
+            tokens_per_second: Decode speed added on top of the overhead (default: none)
+            error_rate: Fraction of calls failing with SimulatedServerError (503)
+            rate_limit_rate: Fraction of calls failing with SimulatedRateLimitError (429)
+            truncation_rate: Fraction of replies cut off at a random point
+            seed: Seed for latency, error and content generation (default: random)
+            sleep: Called with each latency (injectable for tests)
+
+        Raises:
+            ValueError: If schema or latency_distribution is not supported
+        """
+        if schema not in SCHEMAS:
+            raise ValueError(f"Unsupported schema: {schema}. Supported schemas are {SCHEMAS}.")
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unsupported latency_distribution: {latency_distribution}. "
+                f"Supported distributions are {LATENCY_DISTRIBUTIONS}."
+            )
+        super().__init__(api_key="", model=model)
+        self.schema = schema
+        self.latency_distribution = latency_distribution
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.truncation_rate = truncation_rate
+        self.seed = seed
+        self._sleep = sleep
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0, "errors": 0, "rate_limited": 0, "truncated": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "simulated_seconds": 0.0,
+        }
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Estimate tokens at four characters per token."""
+        return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+    def _overhead(self) -> float:
+        mean, sigma = self.latency_mean, self.latency_sigma
+        if self.latency_distribution == "fixed":
+            return mean
+        if self.latency_distribution == "uniform":
+            return self._rng.uniform(max(0.0, mean * (1 - sigma)), mean * (1 + sigma))
+        if self.latency_distribution == "exponential":
+            return self._rng.expovariate(1 / mean) if mean > 0 else 0.0
+        return mean * math.exp(self._rng.gauss(0.0, sigma))
+
+    def _detect_schema(self, system_message: str, user_message: str) -> str:
+        if self.schema != "auto":
+            return self.schema
+        text = user_message.lower()
+        if "transcription" in text:
+            return "transcription"
+        if "summaries" in text:
+            return "summaries"
+        if "keyword" in text:
+            return "keywords"
+        if '"keywords"' in system_message:
+            return "keywords"
+        return "text"
+
+    def _content(self, system_message: str, user_message: str) -> str:
+        digest = hashlib.sha256(f"{self.seed}|{system_message}|{user_message}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+        schema = self._detect_schema(system_message, user_message)
+
+        if schema == "keywords":
+            match = re.search(r"Generate (\d+) keyword", user_message)
+            count = int(match.group(1)) if match else 5
+            return json.dumps({"keywords": [rng.choice(_SYMPTOMS).replace("has ", "", 1) for _ in range(count)]})
+
+        if schema == "summaries":
+            match = re.search(r"Generate (\d+) different summaries", user_message)
+            per_keyword = int(match.group(1)) if match else 1
+            bracket = user_message.find("[")
+            try:
+                keywords = json.loads(user_message[bracket:]) if bracket >= 0 else []
+            except ValueError:
+                keywords = []
+            summaries = []
+            for keyword in keywords or ["unspecified concern"]:
+                for _ in range(per_keyword):
+                    text = [f"Baby of {rng.randint(1, 36)} months: parents report {keyword}."]
+                    text += rng.sample(_DETAILS, rng.randint(4, 7))
+                    summaries.append({"summary": {"text": text, "key_words": [keyword]}})
+            return json.dumps({"summaries": summaries}, indent=4, ensure_ascii=False)
+
+        if schema == "transcription":
+            sentences = [s for s in re.split(r"(?<=[.!?])\s+|', '|\", \"", user_message.split(":", 1)[-1]) if s]
+            turns = []
+            for i in range(rng.randint(8, 16)):
+                if i % 2 == 0:
+                    source = rng.choice(sentences) if sentences else rng.choice(_DETAILS)
+                    turns.append({"speaker": "CALLER", "text": source.strip(" []'\"")})
+                else:
+                    turns.append({"speaker": "NURSE", "text": rng.choice(_NURSE_LINES)})
+            return json.dumps({"transcription": turns}, indent=2, ensure_ascii=False)
+
+        return json.dumps({"reply": " ".join(rng.sample(_DETAILS, 3))})
+
+    def _plan(self, user_message: str, system_message: str, max_tokens: int) -> Tuple[str, float, CallUsage]:
+        """Draw the outcome of one call: reply, latency and usage. Raises injected errors."""
+        content = self._content(system_message, user_message)
+        prompt_tokens = self.count_tokens(system_message) + self.count_tokens(user_message)
+
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            overhead = self._overhead()
+            roll = self._rng.random()
+            if roll < self.error_rate:
+                self._stats["errors"] += 1
+                failure = SimulatedServerError("Simulated backend error (503)")
+            elif roll < self.error_rate + self.rate_limit_rate:
+                self._stats["rate_limited"] += 1
+                failure = SimulatedRateLimitError("Simulated rate limit (429)")
+            else:
+                failure = None
+            truncate_at = None
+            if max_tokens is not None and max_tokens > 0 and self.count_tokens(content) > max_tokens:
+                truncate_at = max_tokens * CHARS_PER_TOKEN
+            elif self._rng.random() < self.truncation_rate:
+                truncate_at = self._rng.randint(1, max(1, len(content) - 1))
+            if truncate_at is not None and failure is None:
+                self._stats["truncated"] += 1
+
+        if failure is not None:
+            failure.latency = overhead
+            raise failure
+        if truncate_at is not None:
+            content = content[:truncate_at]
+
+        completion_tokens = self.count_tokens(content)
+        generation = completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+        latency = overhead + generation
+        with self._lock:
+            self._stats["completion_tokens"] += completion_tokens
+            self._stats["simulated_seconds"] += latency
+        usage = CallUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=latency,
+            generation_seconds=generation or None,
+        )
+        return content, latency, usage
+
+    def conv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """
+        Return a simulated reply after the simulated latency. Arguments match LLMInterface.conv().
+
+        Raises:
+            SimulatedServerError: Injected at error_rate
+            SimulatedRateLimitError: Injected at rate_limit_rate
+        """
+        try:
+            reply, latency, usage = self._plan(user_message, system_message, max_tokens)
+        except (SimulatedServerError, SimulatedRateLimitError) as e:
+            self._sleep(e.latency)
+            raise
+        self._sleep(latency)
+        self._record_usage(usage)
+        return reply
+
+    async def aconv(
+        self,
+        user_message: str,
+        system_message: str = "You are a helpful assistant.",
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        **kwargs,
+    ) -> str:
+        """Async variant of conv(); waits with asyncio.sleep."""
+        try:
+            reply, latency, usage = self._plan(user_message, system_message, max_tokens)
+        except (SimulatedServerError, SimulatedRateLimitError) as e:
+            await asyncio.sleep(e.latency)
+            raise
+        await asyncio.sleep(latency)
+        self._record_usage(usage)
+        return reply
+
+    def simulation_stats(self) -> Dict[str, Any]:
+        """
+        Return counters of the simulated traffic.
+
+        Returns:
+            dict: 'calls', 'errors', 'rate_limited', 'truncated', 'prompt_tokens',
+            'completion_tokens' and 'simulated_seconds' (sum of simulated latencies)
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+def _message_parts(messages) -> Tuple[str, str]:
+    """Split LangChain-style messages (or a plain string) into system and user text."""
+    if isinstance(messages, str):
+        return "", messages
+    system, user = [], []
+    for message in messages:
+        if isinstance(message, tuple):
+            role, content = message
+        else:
+            role, content = getattr(message, "type", "human"), getattr(message, "content", "")
+        (system if role == "system" else user).append(content)
+    return "\n".join(system), "\n".join(user)
+
+
+def _ai_message(content: str, usage: Optional[CallUsage]):
+    """Build a LangChain AIMessage, or a look-alike when langchain_core is not installed."""
+    usage_metadata = None
+    if usage is not None:
+        usage_metadata = {
+            "input_tokens": usage.prompt_tokens,
+            "output_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+        }
+    try:
+        from langchain_core.messages import AIMessage
+    except ImportError:
+        return SimpleNamespace(content=content, usage_metadata=usage_metadata, type="ai")
+    return AIMessage(content=content, usage_metadata=usage_metadata)
+
+
+class SimulatedChatModel:
+    """
+    Minimal LangChain chat-model look-alike backed by SimulatedLLM.
+
+    Supports the calls the *_langchain.py scripts make: invoke(), ainvoke(),
+    batch() with config={"max_concurrency": n}, and
+    with_structured_output(method="json_mode"), whose results are parsed dicts.
+    """
+
+    def __init__(self, llm: SimulatedLLM, max_tokens: Optional[int] = None, structured: bool = False):
+        """
+        Args:
+            llm: Simulated backend answering the calls
+            max_tokens: Completion limit applied to every call
+            structured: Parse replies as JSON (set by with_structured_output())
+        """
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.structured = structured
+
+    def with_structured_output(self, schema: Any = None, method: str = "json_mode", **kwargs) -> "SimulatedChatModel":
+        """Return a copy whose invoke() returns the parsed JSON reply."""
+        return SimulatedChatModel(self.llm, self.max_tokens, structured=True)
+
+    def _result(self, reply: str, usage: Optional[CallUsage]):
+        return json.loads(reply) if self.structured else _ai_message(reply, usage)
+
+    def invoke(self, messages, config: Optional[Dict[str, Any]] = None, **kwargs):
+        """Answer one conversation."""
+        system, user = _message_parts(messages)
+        reply = self.llm.conv(user, system_message=system, max_tokens=self.max_tokens)
+        return self._result(reply, self.llm.last_usage)
+
+    async def ainvoke(self, messages, config: Optional[Dict[str, Any]] = None, **kwargs):
+        """Async variant of invoke()."""
+        system, user = _message_parts(messages)
+        reply = await self.llm.aconv(user, system_message=system, max_tokens=self.max_tokens)
+        return self._result(reply, self.llm.last_usage)
+
+    def batch(
+        self,
+        inputs: List[Any],
+        config: Optional[Dict[str, Any]] = None,
+        return_exceptions: bool = False,
+        **kwargs,
+    ) -> List[Any]:
+        """Answer several conversations on up to config["max_concurrency"] threads."""
+        workers = max(1, int((config or {}).get("max_concurrency") or 8))
+
+        def run(messages):
+            try:
+                return self.invoke(messages)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        with ThreadPoolExecutor(max_workers=min(workers, max(1, len(inputs)))) as executor:
+            return list(executor.map(run, inputs))
@@ -0,0 +1,260 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .llm_interface import CallUsage
+
+METRIC_PREFIX = "baby_calls"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    Linear-interpolated percentile of `values`.
+
+    Args:
+        values: Observations (need not be sorted)
+        q: Quantile in [0, 1]
+
+    Returns:
+        Optional[float]: The percentile, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    low, high = math.floor(pos), math.ceil(pos)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def _summary(values: List[float]) -> Dict[str, Optional[float]]:
+    summary = {f"p{int(q * 100)}": percentile(values, q) for q in QUANTILES}
+    summary["mean"] = sum(values) / len(values) if values else None
+    summary["max"] = max(values) if values else None
+    return summary
+
+
+class StageMetrics:
+    """
+    Thread-safe aggregator of per-call LLM telemetry for one pipeline stage.
+
+    Workers call record_call() with the client's last_usage after every
+    successful call, record_error() on failures and record_accepted() for
+    every record written. write() exports a JSON report and a Prometheus
+    textfile (for node_exporter's textfile collector).
+    """
+
+    def __init__(self, stage: str):
+        """
+        Args:
+            stage: Stage name used in file names and as the `stage` label
+        """
+        self.stage = stage
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._latencies: List[float] = []
+        self._queue_waits: List[float] = []
+        self._tokens = Counter()
+        self._prompt_cache = Counter()
+        self._generation_seconds = 0.0
+        self._calls = 0
+        self._cached_calls = 0
+        self._requests = 0
+        self._retried_calls = 0
+        self._hedged_calls = 0
+        self._hedge_wins = 0
+        self._errors = Counter()
+        self._accepted = 0
+        self._writer: Optional[Dict[str, Any]] = None
+
+    def record_call(self, usage: Optional[CallUsage]) -> None:
+        """
+        Record one successful call.
+
+        Args:
+            usage: The client's last_usage (None if the backend reported nothing)
+        """
+        with self._lock:
+            self._calls += 1
+            if not isinstance(usage, CallUsage):
+                self._requests += 1
+                return
+            self._requests += usage.requests
+            self._queue_waits.append(usage.queue_wait)
+            if usage.attempts > 1:
+                self._retried_calls += 1
+            if usage.hedged:
+                self._hedged_calls += 1
+                self._hedge_wins += usage.hedge_won
+            if usage.from_cache:
+                self._cached_calls += 1
+                return
+            if usage.latency is not None:
+                self._latencies.append(usage.latency)
+            for kind in ("prompt_tokens", "completion_tokens", "reasoning_tokens", "cached_tokens"):
+                value = getattr(usage, kind)
+                if value is not None:
+                    self._tokens[kind] += value
+            # Hit rates only cover calls whose backend reports cached tokens
+            if usage.cached_tokens is not None:
+                self._prompt_cache["calls"] += 1
+                self._prompt_cache["hits"] += usage.cached_tokens > 0
+                self._prompt_cache["prompt_tokens"] += usage.prompt_tokens or 0
+            if usage.completion_tokens:
+                self._generation_seconds += usage.generation_seconds or usage.latency or 0.0
+
+    def record_error(self, error: Union[BaseException, str]) -> None:
+        """
+        Record a failed call or an unusable reply.
+
+        Args:
+            error: The exception, or a short error kind (e.g. "InvalidJSON")
+        """
+        kind = error if isinstance(error, str) else type(error).__name__
+        with self._lock:
+            self._errors[kind] += 1
+
+    def record_writer(self, stats: Dict[str, Any]) -> None:
+        """Attach the latest write-behind writer stats (WriteBehindWriter.stats()) to the report."""
+        with self._lock:
+            self._writer = dict(stats)
+
+    def record_accepted(self, count: int = 1) -> None:
+        """Record records that made it to disk."""
+        with self._lock:
+            self._accepted += count
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build the run-level report.
+
+        Returns:
+            dict: Call/error/hedge counts, latency and queue-wait percentiles, token totals,
+            prompt-cache hit rates (share of calls with cached tokens and share of
+            prompt tokens served from the cache), completion tokens/sec (per-call decode speed and overall throughput) and
+            tokens per accepted record
+        """
+        with self._lock:
+            wall = time.monotonic() - self.started_at
+            tokens = dict(self._tokens)
+            total_tokens = tokens.get("prompt_tokens", 0) + tokens.get("completion_tokens", 0)
+            completion = tokens.get("completion_tokens", 0)
+            cache = self._prompt_cache
+            return {
+                "stage": self.stage,
+                "wall_seconds": wall,
+                "calls": self._calls,
+                "cached_calls": self._cached_calls,
+                "retried_calls": self._retried_calls,
+                "hedged_calls": self._hedged_calls,
+                "hedge_wins": self._hedge_wins,
+                "hedge_win_rate": self._hedge_wins / self._hedged_calls if self._hedged_calls else None,
+                "requests": self._requests,
+                "errors": sum(self._errors.values()),
+                "errors_by_type": dict(self._errors),
+                "accepted_records": self._accepted,
+                "latency_seconds": _summary(self._latencies),
+                "queue_wait_seconds": _summary(self._queue_waits),
+                "tokens": {
+                    "prompt": tokens.get("prompt_tokens", 0),
+                    "completion": completion,
+                    "reasoning": tokens.get("reasoning_tokens", 0),
+                    "cached": tokens.get("cached_tokens", 0),
+                    "total": total_tokens,
+                },
+                "prompt_cache": {
+                    "calls": cache["calls"],
+                    "hit_rate": cache["hits"] / cache["calls"] if cache["calls"] else None,
+                    "token_hit_rate": (
+                        tokens.get("cached_tokens", 0) / cache["prompt_tokens"] if cache["prompt_tokens"] else None
+                    ),
+                },
+                "tokens_per_sec": completion / self._generation_seconds if self._generation_seconds else None,
+                "throughput_tokens_per_sec": completion / wall if wall > 0 else None,
+                "tokens_per_accepted_record": total_tokens / self._accepted if self._accepted else None,
+                "writer": dict(self._writer) if self._writer is not None else None,
+            }
+
+    def prometheus_text(self, report: Optional[Dict[str, Any]] = None) -> str:
+        """Render a report in the Prometheus text exposition format."""
+        report = report or self.report()
+        stage = f'stage="{self.stage}"'
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, Any]]) -> None:
+            samples = [(labels, value) for labels, value in samples if value is not None]
+            if not samples:
+                return
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{METRIC_PREFIX}_{name}{{{labels}}} {value}")
+
+        metric("llm_calls_total", "counter", "Successful LLM calls.", [(stage, report["calls"])])
+        metric("llm_cached_calls_total", "counter", "LLM calls served from the response cache.",
+               [(stage, report["cached_calls"])])
+        metric("llm_hedged_calls_total", "counter", "LLM calls that sent a duplicate request.",
+               [(stage, report["hedged_calls"])])
+        metric("llm_hedge_wins_total", "counter", "Hedged calls answered by the duplicate request.",
+               [(stage, report["hedge_wins"])])
+        metric("llm_errors_total", "counter", "Failed LLM calls and unusable replies by type.",
+               [(f'{stage},type="{kind}"', count) for kind, count in sorted(report["errors_by_type"].items())])
+        metric("accepted_records_total", "counter", "Records written by the stage.",
+               [(stage, report["accepted_records"])])
+        for name, key, help_text in (
+            ("llm_latency_seconds", "latency_seconds", "LLM call latency."),
+            ("llm_queue_wait_seconds", "queue_wait_seconds", "Time spent waiting for a rate-limit slot."),
+        ):
+            metric(name, "gauge", help_text, [
+                (f'{stage},quantile="{q}"', report[key][f"p{int(q * 100)}"]) for q in QUANTILES
+            ])
+        metric("llm_tokens_total", "counter", "Tokens reported by the backend.",
+               [(f'{stage},kind="{kind}"', count) for kind, count in report["tokens"].items() if kind != "total"])
+        metric("llm_prompt_cache_hit_ratio", "gauge", "Share of calls with prompt tokens served from the prompt cache.",
+               [(stage, report["prompt_cache"]["hit_rate"])])
+        metric("llm_prompt_cache_token_ratio", "gauge", "Share of prompt tokens served from the prompt cache.",
+               [(stage, report["prompt_cache"]["token_hit_rate"])])
+        metric("llm_tokens_per_second", "gauge", "Completion tokens per second of generation time.",
+               [(stage, report["tokens_per_sec"])])
+        metric("llm_tokens_per_accepted_record", "gauge", "Prompt plus completion tokens per accepted record.",
+               [(stage, report["tokens_per_accepted_record"])])
+        writer = report.get("writer")
+        if writer:
+            metric("writer_queue_depth_max", "gauge", "Deepest write-behind queue seen.",
+                   [(stage, writer["max_queue_depth"])])
+            metric("writer_files_total", "counter", "Files written by the write-behind writer.",
+                   [(stage, writer["written"])])
+            metric("writer_errors_total", "counter", "Failed write-behind writes.", [(stage, writer["errors"])])
+            metric("writer_fsyncs_total", "counter", "fsync calls made by the write-behind writer.",
+                   [(stage, writer["fsyncs"])])
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_dir: str) -> Tuple[str, str]:
+        """
+        Write `<stage>_metrics.json` and `<stage>_metrics.prom` to output_dir.
+
+        Both files are replaced atomically so scrapers never see partial output.
+
+        Args:
+            output_dir: Directory holding metadata.json
+
+        Returns:
+            tuple[str, str]: Paths of the JSON report and the Prometheus textfile
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        report = self.report()
+        json_path = os.path.join(output_dir, f"{self.stage}_metrics.json")
+        prom_path = os.path.join(output_dir, f"{self.stage}_metrics.prom")
+        for path, content in (
+            (json_path, json.dumps(report, indent=2)),
+            (prom_path, self.prometheus_text(report)),
+        ):
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return json_path, prom_path
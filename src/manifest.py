@@ -0,0 +1,320 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dataset_operations import iter_data
+from json_codec import read_json
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MANIFEST_NAME = "manifest.sqlite"
+# Output-directory mtime as of the last close(); opening compares it to skip reconcile()
+STAMP_NAME = "manifest.stamp"
+STAMP_WIDTH = 32
+STAGES = ("summary", "transcription")
+
+
+def record_number(file_name: str, suffix: str = "e.json") -> Optional[int]:
+    """Return the record number of a file named like '12e.json', or None for other files."""
+    stem = file_name[: -len(suffix)] if file_name.endswith(suffix) else ""
+    return int(stem) if stem.isdigit() else None
+
+
+class Manifest:
+    """
+    SQLite index of the numbered record files in an output directory.
+
+    Maps record number and call_id to the file path, its mtime and which
+    stages have completed, so save_summaries() can number new files and the
+    transcription stage can list pending records without listing or parsing
+    the whole corpus. Built from the files on first use. Later opens only
+    compare the directory's mtime with the one recorded at the last close();
+    if files were added, replaced or deleted in between, the manifest is
+    reconciled with a directory listing. Changes made while a manifest is open,
+    and files edited in place, are not detected: pass reconcile=True, or run
+    this module (`python src/manifest.py`) to rebuild it from scratch.
+
+    Safe to share between threads (one connection per thread) and between
+    processes (WAL journal, busy timeout, IMMEDIATE write transactions).
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        suffix: str = "e.json",
+        busy_timeout: float = 30.0,
+        build: bool = True,
+        reconcile: Optional[bool] = None,
+    ):
+        """
+        Args:
+            output_dir: Directory holding the record files; the manifest lives inside it
+            suffix: Record file suffix (default: "e.json")
+            busy_timeout: Seconds to wait for a lock held by another connection
+            build: Index the existing files if the manifest has never been built (default: True)
+            reconcile: Run reconcile() on an existing manifest: True always, False never,
+                None (default) only if the directory changed since the last close()
+        """
+        self.output_dir = output_dir
+        self.suffix = suffix
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.stamp_path = os.path.join(output_dir, STAMP_NAME)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        os.makedirs(output_dir, exist_ok=True)
+        # Checked before connecting: opening the database creates its WAL files in the directory
+        changed = self._directory_changed()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " number INTEGER PRIMARY KEY,"
+            " call_id TEXT,"
+            " file_path TEXT NOT NULL UNIQUE,"
+            " mtime REAL,"
+            " summary INTEGER NOT NULL DEFAULT 0,"
+            " transcription INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS records_call_id ON records (call_id)")
+        for stage in STAGES:
+            # Partial indexes keep pending() proportional to the pending records
+            conn.execute(f"CREATE INDEX IF NOT EXISTS records_{stage}_pending ON records (number) WHERE {stage} = 0")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        built = conn.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone() is not None
+        if build and not built:
+            self.rebuild()
+        elif built and (reconcile or (reconcile is None and changed)):
+            self.reconcile()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _directory_changed(self) -> bool:
+        try:
+            with open(self.stamp_path, "rb") as f:
+                return int(f.read()) != os.stat(self.output_dir).st_mtime_ns
+        except (OSError, ValueError):
+            return True
+
+    def _write_stamp(self) -> None:
+        # Created empty first and then overwritten in place, so writing the stamp
+        # does not itself change the directory's mtime
+        if not os.path.exists(self.stamp_path):
+            open(self.stamp_path, "wb").close()
+        stamp = str(os.stat(self.output_dir).st_mtime_ns).encode().ljust(STAMP_WIDTH)
+        with open(self.stamp_path, "r+b") as f:
+            f.write(stamp)
+
+    def _write(self, statements: Iterable[Tuple[str, Tuple]]) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _mtime(file_path: str) -> Optional[float]:
+        try:
+            return os.stat(file_path).st_mtime
+        except OSError:
+            return None
+
+    def rebuild(self) -> int:
+        """
+        Reconstruct the manifest from the record files on disk.
+
+        Returns:
+            int: Number of records indexed
+        """
+        started = time.perf_counter()
+        rows = []
+        for item in iter_data(self.output_dir, f"*{self.suffix}"):
+            file_name = os.path.basename(item["file_path"])
+            number = record_number(file_name, self.suffix)
+            data = item["data"]
+            if number is None or not isinstance(data, dict):
+                continue
+            # Same path spelling as save_summaries() uses
+            file_path = os.path.join(self.output_dir, file_name)
+            rows.append((
+                number,
+                data.get("call_id"),
+                file_path,
+                self._mtime(file_path),
+                int("summary" in data),
+                int("transcription" in data),
+            ))
+
+        statements = [("DELETE FROM records", ())]
+        statements += [("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)", row) for row in rows]
+        statements.append(("INSERT OR REPLACE INTO meta VALUES ('built_at', ?)", (str(time.time()),)))
+        self._write(statements)
+        logger.info(f"Rebuilt manifest {self.path}: {len(rows)} records in {time.perf_counter() - started:.1f}s")
+        return len(rows)
+
+    def reconcile(self) -> Dict[str, int]:
+        """
+        Update the manifest for record files changed outside the pipeline.
+
+        The directory is listed, but only files that are new or whose mtime
+        differs from the indexed one are parsed; rows whose file is gone are
+        dropped.
+
+        Returns:
+            dict: 'added', 'updated' and 'removed' record counts
+        """
+        indexed = dict(self._connection().execute("SELECT file_path, mtime FROM records"))
+        on_disk = {}
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                number = record_number(entry.name, self.suffix)
+                if number is not None and entry.is_file():
+                    # Same path spelling as save_summaries() uses
+                    on_disk[os.path.join(self.output_dir, entry.name)] = (number, entry.stat().st_mtime)
+
+        statements, counts = [], {"added": 0, "updated": 0, "removed": 0}
+        for file_path, (number, mtime) in on_disk.items():
+            if file_path in indexed and indexed[file_path] == mtime:
+                continue
+            try:
+                data = read_json(file_path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable record {file_path}: {e}")
+                continue
+            if not isinstance(data, dict):
+                continue
+            statements.append((
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                (number, data.get("call_id"), file_path, mtime,
+                 int("summary" in data), int("transcription" in data)),
+            ))
+            counts["updated" if file_path in indexed else "added"] += 1
+        for file_path in indexed.keys() - on_disk.keys():
+            statements.append(("DELETE FROM records WHERE file_path = ?", (file_path,)))
+            counts["removed"] += 1
+
+        if statements:
+            self._write(statements)
+            logger.info(f"Reconciled manifest {self.path} with {self.output_dir}: {counts}")
+        return counts
+
+    def next_number(self) -> int:
+        """Return the number after the highest indexed record (1 for an empty directory)."""
+        return self._connection().execute("SELECT COALESCE(MAX(number), 0) + 1 FROM records").fetchone()[0]
+
+    def add(self, number: int, file_path: str, call_id: Optional[str] = None, stages: Iterable[str] = ()) -> None:
+        """
+        Index (or re-index) one record file.
+
+        Args:
+            number: Record number (the numeric prefix of the file name)
+            file_path: Path of the written file
+            call_id: The record's call_id
+            stages: Stages already complete for this record (e.g. ["summary"])
+        """
+        self.add_many([(number, file_path, call_id, stages)])
+
+    def add_many(self, records: Iterable[Tuple[int, str, Optional[str], Iterable[str]]]) -> None:
+        """Index several (number, file_path, call_id, stages) records in one transaction."""
+        statements = []
+        for number, file_path, call_id, stages in records:
+            stages = set(stages)
+            flags = [int(stage in stages) for stage in STAGES]
+            statements.append((
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)",
+                (number, call_id, file_path, self._mtime(file_path), *flags),
+            ))
+        self._write(statements)
+
+    def mark_complete(self, file_path: str, stage: str) -> None:
+        """
+        Record that `stage` finished for the record stored in `file_path`.
+
+        Raises:
+            ValueError: If stage is unknown
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}. Stages are {STAGES}.")
+        self._write([(f"UPDATE records SET {stage} = 1, mtime = ? WHERE file_path = ?",
+                      (self._mtime(file_path), file_path))])
+
+    def pending(self, stage: str) -> List[str]:
+        """
+        List the files of records `stage` has not completed, in record order.
+
+        Raises:
+            ValueError: If stage is unknown
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}. Stages are {STAGES}.")
+        rows = self._connection().execute(f"SELECT file_path FROM records WHERE {stage} = 0 ORDER BY number")
+        return [file_path for (file_path,) in rows]
+
+    def lookup(self, call_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a record by call_id.
+
+        Returns:
+            Optional[dict]: 'number', 'call_id', 'file_path', 'mtime' and one flag per stage, or None
+        """
+        row = self._connection().execute(
+            "SELECT number, call_id, file_path, mtime, summary, transcription FROM records WHERE call_id = ?",
+            (call_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("number", "call_id", "file_path", "mtime") + STAGES, row))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return record counts.
+
+        Returns:
+            dict: 'records' plus '<stage>_complete' for every stage
+        """
+        row = self._connection().execute(
+            "SELECT COUNT(*), " + ", ".join(f"COALESCE(SUM({stage}), 0)" for stage in STAGES) + " FROM records"
+        ).fetchone()
+        return dict(zip(("records",) + tuple(f"{stage}_complete" for stage in STAGES), row))
+
+    def close(self) -> None:
+        """Close every per-thread connection and record the directory's mtime for the next open."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        if connections:
+            try:
+                self._write_stamp()
+            except OSError as e:
+                # The next open just reconciles
+                logger.warning(f"Could not write {self.stamp_path}: {e}")
+
+
+if __name__ == "__main__":
+    import config
+
+    manifest = Manifest(config.OUTPUT_DIR, build=False, reconcile=False)
+    manifest.rebuild()
+    logger.info(f"Manifest stats: {manifest.stats()}")
+    manifest.close()
@@ -0,0 +1,228 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from json_codec import JsonCodec, get_codec
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Called with (path, error) once a document is durable on disk (error is None) or failed
+WriteCallback = Callable[[str, Optional[BaseException]], None]
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    Writes JSON documents on a dedicated thread so producers never wait for the disk.
+
+    Documents are queued by submit() (which only blocks when `max_queue`
+    writes are already waiting) and written in batches of up to `batch_size`:
+    every document goes to a temporary file in its target directory, the
+    batch's files are fsynced together, then each is renamed over its target
+    and the touched directories are fsynced once. A crash therefore leaves
+    either the old or the new version of a file, never a truncated one.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 1000,
+        batch_size: int = 64,
+        fsync: bool = True,
+        codec: Optional[JsonCodec] = None,
+        name: str = "write-behind",
+    ):
+        """
+        Args:
+            max_queue: Writes waiting before submit() blocks (default: 1000)
+            batch_size: Documents written (and fsynced) per batch (default: 64)
+            fsync: Make every batch durable before renaming (default: True)
+            codec: JSON codec (default: get_codec())
+            name: Writer thread name
+        """
+        self.batch_size = max(1, int(batch_size))
+        self.fsync = fsync
+        self.codec = codec or get_codec()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "written": 0,
+            "errors": 0,
+            "batches": 0,
+            "fsyncs": 0,
+            "max_queue_depth": 0,
+            "blocked_submits": 0,
+            "write_seconds": 0.0,
+        }
+        self._closed = False
+        self._tmp_ids = itertools.count()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, obj: Any, callback: Optional[WriteCallback] = None) -> None:
+        """
+        Queue `obj` to be written to `path`.
+
+        Args:
+            path: Target file (replaced atomically)
+            obj: JSON-serializable document; must not be modified after submitting
+            callback: Called on the writer thread with (path, None) once the file
+                is on disk, or (path, error) if writing failed
+
+        Raises:
+            RuntimeError: If the writer was closed
+        """
+        if self._closed:
+            raise RuntimeError("WriteBehindWriter is closed")
+        item = (path, obj, callback)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self._stats["blocked_submits"] += 1
+            self._queue.put(item)
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, Any, Optional[WriteCallback]]], bool]:
+        """Block for one item, then take whatever else is queued, up to batch_size."""
+        batch, stop = [], False
+        item = self._queue.get()
+        while True:
+            if item is _STOP:
+                stop = True
+                self._queue.task_done()
+                break
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch, stop
+
+    def _run(self) -> None:
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                try:
+                    self._write_batch(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[Tuple[str, Any, Optional[WriteCallback]]]) -> None:
+        started = time.perf_counter()
+        staged: List[Tuple[str, str, Optional[WriteCallback]]] = []
+        failed: List[Tuple[str, BaseException, Optional[WriteCallback]]] = []
+        fsyncs = 0
+
+        for path, obj, callback in batch:
+            tmp_path = f"{path}.{os.getpid()}.{next(self._tmp_ids)}.tmp"
+            try:
+                data = self.codec.dumps(obj)
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        fsyncs += 1
+                staged.append((path, tmp_path, callback))
+            except Exception as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                failed.append((path, e, callback))
+
+        directories = set()
+        done: List[Tuple[str, Optional[WriteCallback]]] = []
+        for path, tmp_path, callback in staged:
+            try:
+                os.replace(tmp_path, path)
+            except Exception as e:
+                failed.append((path, e, callback))
+                continue
+            directories.add(os.path.dirname(os.path.abspath(path)))
+            done.append((path, callback))
+
+        if self.fsync:
+            # One directory fsync per batch makes all of its renames durable
+            for directory in directories:
+                try:
+                    fd = os.open(directory, os.O_RDONLY)
+                except OSError:
+                    continue
+                try:
+                    os.fsync(fd)
+                    fsyncs += 1
+                except OSError:
+                    pass
+                finally:
+                    os.close(fd)
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["written"] += len(done)
+            self._stats["errors"] += len(failed)
+            self._stats["fsyncs"] += fsyncs
+            self._stats["write_seconds"] += time.perf_counter() - started
+
+        for path, error, callback in failed:
+            logger.error(f"Failed to write {path}: {error}")
+            self._notify(callback, path, error)
+        for path, callback in done:
+            self._notify(callback, path, None)
+
+    @staticmethod
+    def _notify(callback: Optional[WriteCallback], path: str, error: Optional[BaseException]) -> None:
+        if callback is None:
+            return
+        try:
+            callback(path, error)
+        except Exception as e:
+            logger.error(f"Write callback for {path} failed: {e}")
+
+    def queue_depth(self) -> int:
+        """Number of writes waiting for the writer thread."""
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Block until every document submitted so far is written (or failed)."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write everything still queued and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return writer counters.
+
+        Returns:
+            dict: 'submitted', 'written', 'errors', 'batches', 'fsyncs',
+            'queue_depth', 'max_queue_depth', 'blocked_submits' (submits that
+            waited for a full queue) and 'write_seconds'
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+    def __enter__(self) -> "WriteBehindWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,127 @@
+"""Minimal local stand-in for the Ollama HTTP API used by the client tests."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class OllamaStubServer:
+    """
+    Threaded HTTP/1.1 server answering POST /api/chat and GET /api/tags.
+
+    Records the client port of every request so tests can count how many
+    distinct TCP connections were used. Streaming requests are answered with one
+    NDJSON line per entry of `chunks`; `chunks_sent` and `aborted` show whether
+    the client hung up before the stream finished. Set `status` to answer chat
+requests with an HTTP error, and `models` to the model names /api/tags
+lists. Use as a context manager.
+    """
+
+    def __init__(self, content="stub reply", delay=0.0, chunks=None, chunk_delay=0.0, status=200, models=None):
+        self.content = content
+        self.status = status
+        self.models = models if models is not None else ["llama2:latest"]
+        self.delay = delay
+        self.chunks = chunks if chunks is not None else [content]
+        self.chunk_delay = chunk_delay
+        self.requests = []
+        self.connections = set()
+        self.chunks_sent = 0
+        self.aborted = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, data):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path != "/api/tags":
+                    self._send_json(404, {"error": "not found"})
+                    return
+                self._send_json(200, {"models": [{"name": name} for name in stub.models]})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests.append(payload)
+                    stub.connections.add(self.client_address[1])
+                if stub.delay:
+                    threading.Event().wait(stub.delay)
+                if stub.status != 200:
+                    self._send_json(stub.status, {"error": "stub failure"})
+                    return
+                if payload.get("stream"):
+                    self._stream_reply()
+                    return
+
+                self._send_json(200, {
+                    "message": {"role": "assistant", "content": stub.content},
+                    "done": True,
+                    "prompt_eval_count": 12,
+                    "eval_count": 3,
+                    "eval_duration": 250_000_000,
+                })
+
+            def _write_chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream_reply(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                lines = [
+                    {"message": {"role": "assistant", "content": piece}, "done": False}
+                    for piece in stub.chunks
+                ]
+                lines.append({
+                    "message": {"role": "assistant", "content": ""},
+                    "done": True,
+                    "prompt_eval_count": 12,
+                    "eval_count": len(stub.chunks),
+                    "eval_duration": 500_000_000,
+                })
+                try:
+                    for line in lines:
+                        self._write_chunk(json.dumps(line).encode("utf-8") + b"\n")
+                        with stub._lock:
+                            stub.chunks_sent += 1
+                        if stub.chunk_delay:
+                            threading.Event().wait(stub.chunk_delay)
+                    self._write_chunk(b"")
+                except (BrokenPipeError, ConnectionResetError):
+                    with stub._lock:
+                        stub.aborted += 1
+                    self.close_connection = True
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,71 @@
+"""In-process stand-in for the OpenAI Files and Batches endpoints used by the batch runner tests."""
+import json
+from types import SimpleNamespace
+
+
+class FakeBatchAPI:
+    """
+    Mimics `client.files` and `client.batches` of the OpenAI SDK.
+
+    Uploaded JSONL files are stored in memory. A batch reports "in_progress"
+    for `polls_until_done` retrievals, then completes with one output line per
+    request whose content is `responder(request_body)`. Requests whose
+    custom_id is in `failing_ids` land in the error file instead.
+    """
+
+    def __init__(self, responder=None, polls_until_done=1, failing_ids=(), status="completed"):
+        self.responder = responder or (lambda body: body["messages"][1]["content"].upper())
+        self.polls_until_done = polls_until_done
+        self.failing_ids = set(failing_ids)
+        self.final_status = status
+        self.uploads = {}
+        self.created = []
+        self.retrievals = 0
+        self._batches = {}
+        self._contents = {}
+        self.files = SimpleNamespace(create=self._files_create, content=self._files_content)
+        self.batches = SimpleNamespace(create=self._batches_create, retrieve=self._batches_retrieve)
+
+    def _files_create(self, file, purpose):
+        assert purpose == "batch"
+        file_id = f"file-{len(self.uploads)}"
+        self.uploads[file_id] = [json.loads(line) for line in file.read().decode("utf-8").splitlines()]
+        return SimpleNamespace(id=file_id)
+
+    def _files_content(self, file_id):
+        return SimpleNamespace(text=self._contents[file_id])
+
+    def _batches_create(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-{len(self._batches)}"
+        self._batches[batch_id] = {"input_file_id": input_file_id, "polls": 0}
+        self.created.append({"input_file_id": input_file_id, "endpoint": endpoint,
+                             "completion_window": completion_window})
+        return SimpleNamespace(id=batch_id, status="validating")
+
+    def _batches_retrieve(self, batch_id):
+        self.retrievals += 1
+        entry = self._batches[batch_id]
+        entry["polls"] += 1
+        lines = self.uploads[entry["input_file_id"]]
+        counts = SimpleNamespace(total=len(lines), completed=0, failed=0)
+        if entry["polls"] <= self.polls_until_done:
+            return SimpleNamespace(id=batch_id, status="in_progress", request_counts=counts,
+                                   output_file_id=None, error_file_id=None, errors=None)
+
+        output, errors = [], []
+        for line in lines:
+            cid = line["custom_id"]
+            if cid in self.failing_ids:
+                errors.append({"custom_id": cid, "response": {"status_code": 400, "body": {"error": "bad"}},
+                               "error": None})
+            else:
+                body = {"choices": [{"message": {"content": f" {self.responder(line['body'])} "}}]}
+                output.append({"custom_id": cid, "response": {"status_code": 200, "body": body}, "error": None})
+        output_id, error_id = f"{batch_id}-out", f"{batch_id}-err"
+        self._contents[output_id] = "\n".join(json.dumps(o) for o in output)
+        self._contents[error_id] = "\n".join(json.dumps(e) for e in errors)
+        counts.completed, counts.failed = len(output), len(errors)
+        return SimpleNamespace(id=batch_id, status=self.final_status, request_counts=counts,
+                               output_file_id=output_id if output else None,
+                               error_file_id=error_id if errors else None,
+                               errors={"data": ["boom"]} if self.final_status == "failed" else None)
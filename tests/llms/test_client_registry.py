@@ -0,0 +1,200 @@
+import pytest
+import threading
+import time
+from unittest.mock import Mock
+
+
+def make_client(reply="ok", delay=0.0):
+    """Helper building a mock LLM client whose conv() optionally sleeps."""
+    client = Mock()
+    client.api_key = 'key'
+    client.model = 'model'
+
+    def conv(*args, **kwargs):
+        time.sleep(delay)
+        return reply
+
+    client.conv.side_effect = conv
+    return client
+
+
+class TestPooledLLMClient:
+    """Test suite for PooledLLMClient."""
+
+    def test_instances_built_lazily(self):
+        """Test that no instance is built until the first call."""
+        from src.llms.client_registry import PooledLLMClient
+
+        factory = Mock(side_effect=lambda: make_client())
+        pool = PooledLLMClient(factory, size=3)
+
+        factory.assert_not_called()
+        assert pool.conv("Hello") == "ok"
+        assert pool.conv("Again") == "ok"
+
+        # Sequential calls reuse the single idle instance
+        assert factory.call_count == 1
+        assert pool.size == 1
+        assert pool.model == 'model'
+
+    def test_pool_size_is_bounded_under_concurrency(self):
+        """Test that concurrent callers never build more than `size` instances."""
+        from src.llms.client_registry import PooledLLMClient
+
+        factory = Mock(side_effect=lambda: make_client(delay=0.05))
+        pool = PooledLLMClient(factory, size=2)
+
+        threads = [threading.Thread(target=pool.conv, args=("Hi",)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert factory.call_count == 2
+        assert pool.size == 2
+
+    def test_conv_forwards_arguments(self):
+        """Test that conv() arguments reach the pooled instance."""
+        from src.llms.client_registry import PooledLLMClient
+
+        instance = make_client()
+        pool = PooledLLMClient(lambda: instance)
+
+        pool.conv("Hello", system_message="sys", temperature=0.1, max_tokens=10, seed=1)
+
+        instance.conv.assert_called_once_with(
+            "Hello", system_message="sys", temperature=0.1, max_tokens=10, seed=1
+        )
+
+    def test_failed_construction_frees_slot(self):
+        """Test that a factory error does not permanently consume pool capacity."""
+        from src.llms.client_registry import PooledLLMClient
+
+        factory = Mock(side_effect=[RuntimeError("load failed"), make_client()])
+        pool = PooledLLMClient(factory, size=1)
+
+        with pytest.raises(RuntimeError, match="load failed"):
+            pool.conv("Hello")
+        assert pool.conv("Hello") == "ok"
+
+
+class TestClientRegistry:
+    """Test suite for ClientRegistry."""
+
+    def test_thread_safe_clients_are_shared(self):
+        """Test that a thread-safe client is constructed once per key."""
+        from src.llms.client_registry import ClientRegistry
+
+        registry = ClientRegistry()
+        factory = Mock(side_effect=lambda: make_client())
+
+        first = registry.get(('openai', 'gpt-4'), factory)
+        second = registry.get(('openai', 'gpt-4'), factory)
+        other = registry.get(('openai', 'gpt-5'), factory)
+
+        assert first is second
+        assert other is not first
+        assert factory.call_count == 2
+        stats = registry.stats()
+        assert stats['constructions'] == 2
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+        assert stats['clients'] == 2
+
+    def test_non_thread_safe_clients_are_pooled(self):
+        """Test that non thread-safe clients are served from a pool and counted on load."""
+        from src.llms.client_registry import ClientRegistry, PooledLLMClient
+
+        registry = ClientRegistry()
+        factory = Mock(side_effect=lambda: make_client())
+
+        client = registry.get(('huggingface', 'gpt2'), factory, thread_safe=False,
+                              pool_size=2, counter_name='model_loads')
+
+        assert isinstance(client, PooledLLMClient)
+        assert registry.stats().get('model_loads', 0) == 0
+
+        client.conv("Hello")
+        stats = registry.stats()
+        assert stats['model_loads'] == 1
+        assert stats['constructions'] == 1
+
+    def test_clear_resets_clients_and_counters(self):
+        """Test that clear() drops clients and counters."""
+        from src.llms.client_registry import ClientRegistry
+
+        registry = ClientRegistry()
+        registry.get('key', make_client)
+        registry.clear()
+
+        assert registry.keys() == []
+        assert registry.stats() == {'clients': 0}
+
+
+class TestConvBatch:
+    """Test suite for conv_batch fallbacks."""
+
+    def test_default_conv_batch_calls_conv_per_prompt(self):
+        """Test that LLMInterface.conv_batch falls back to sequential conv()."""
+        from src.llms.llm_interface import LLMInterface
+
+        class EchoClient(LLMInterface):
+            def conv(self, user_message, system_message="", temperature=0.7, max_tokens=500, **kwargs):
+                return f"{system_message}:{user_message}:{max_tokens}"
+
+        client = EchoClient(api_key=None, model='echo')
+
+        assert client.conv_batch(["a", "b"], system_message="s", max_tokens=5) == ["s:a:5", "s:b:5"]
+
+    def test_pooled_conv_batch_forwards_to_instance(self):
+        """Test that PooledLLMClient forwards conv_batch to a pooled instance."""
+        from src.llms.client_registry import PooledLLMClient
+
+        instance = make_client()
+        instance.conv_batch.return_value = ["x", "y"]
+        pool = PooledLLMClient(lambda: instance)
+
+        assert pool.conv_batch(["a", "b"], system_message="s") == ["x", "y"]
+        instance.conv_batch.assert_called_once_with(
+            ["a", "b"], system_message="s", temperature=0.7, max_tokens=500
+        )
+
+
+class TestAggregateStats:
+    """Test suite for PooledLLMClient.aggregate_stats."""
+
+    def test_sums_numeric_stats_across_instances(self):
+        """Test that numeric stats from every pooled instance are summed."""
+        from src.llms.client_registry import PooledLLMClient
+
+        stats = iter([{"hits": 2, "saved": 0.5, "label": "a"}, {"hits": 3, "saved": 1.0}])
+
+        def factory():
+            client = make_client(delay=0.05)
+            client.prefix_cache_stats.return_value = next(stats)
+            return client
+
+        pool = PooledLLMClient(factory, size=2)
+        threads = [threading.Thread(target=pool.conv, args=("Hi",)) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert pool.aggregate_stats("prefix_cache_stats") == {"hits": 5, "saved": 1.5}
+
+    def test_missing_method_returns_empty(self):
+        """Test that instances without the stats method are skipped."""
+        from src.llms.client_registry import PooledLLMClient
+
+        class BareClient:
+            api_key = None
+            model = 'bare'
+
+            def conv(self, *args, **kwargs):
+                return "ok"
+
+        pool = PooledLLMClient(BareClient)
+        pool.conv("Hi")
+
+        assert pool.aggregate_stats("prefix_cache_stats") == {}
@@ -0,0 +1,279 @@
+import pytest
+import asyncio
+import threading
+import time
+
+
+def make_client(delays, errors=None):
+    """
+    Helper building a client whose n-th call sleeps delays[n] seconds.
+
+    Calls past the end of `delays` return immediately. `errors` maps call
+    numbers to exceptions raised after the delay.
+    """
+    from src.llms.hedging import is_hedge_attempt
+    from src.llms.llm_interface import CallUsage, LLMInterface
+
+    errors = errors or {}
+
+    class SlowClient(LLMInterface):
+        def __init__(self):
+            super().__init__(api_key=None, model="m")
+            self.calls = 0
+            self.hedge_flags = []
+            self.cancelled = 0
+            self._lock = threading.Lock()
+
+        def _next(self):
+            with self._lock:
+                n = self.calls
+                self.calls += 1
+                self.hedge_flags.append(is_hedge_attempt())
+            return n
+
+        def conv(self, user_message, system_message="", temperature=0.7, max_tokens=500, **kwargs):
+            n = self._next()
+            time.sleep(delays[n] if n < len(delays) else 0)
+            if n in errors:
+                raise errors[n]
+            self._record_usage(CallUsage(completion_tokens=n))
+            return f"reply {n}"
+
+        async def aconv(self, user_message, system_message="", temperature=0.7, max_tokens=500, **kwargs):
+            n = self._next()
+            try:
+                await asyncio.sleep(delays[n] if n < len(delays) else 0)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            if n in errors:
+                raise errors[n]
+            self._record_usage(CallUsage(completion_tokens=n))
+            return f"reply {n}"
+
+    return SlowClient()
+
+
+def make_policy(latency=0.05, samples=20, **kwargs):
+    """Helper building a policy already warmed up with `samples` latencies."""
+    from src.llms.hedging import HedgePolicy
+
+    options = dict(quantile=0.9, budget=1.0, min_samples=samples)
+    options.update(kwargs)
+    policy = HedgePolicy(**options)
+    for _ in range(samples):
+        policy.observe(latency)
+    return policy
+
+
+class TestHedgePolicy:
+    """Test suite for HedgePolicy."""
+
+    def test_no_hedging_until_warmed_up(self):
+        """Test that the delay is unknown before min_samples latencies."""
+        from src.llms.hedging import HedgePolicy
+
+        policy = HedgePolicy(min_samples=3)
+        assert policy.delay() is None
+        for latency in (1.0, 2.0, 3.0):
+            policy.observe(latency)
+        assert policy.delay() == pytest.approx(2.9)
+
+    def test_budget_caps_hedges(self):
+        """Test that hedges are limited to `budget` per call."""
+        from src.llms.hedging import HedgePolicy
+
+        policy = HedgePolicy(budget=0.1, min_samples=0)
+        allowed = 0
+        for _ in range(100):
+            policy.delay()
+            allowed += policy.try_hedge()
+
+        assert allowed == 10
+        stats = policy.stats()
+        assert stats["hedges"] == 10
+        assert stats["budget_denied"] == 90
+        assert stats["hedge_rate"] == pytest.approx(0.1)
+
+    def test_invalid_arguments(self):
+        """Test argument validation."""
+        from src.llms.hedging import HedgePolicy
+
+        with pytest.raises(ValueError):
+            HedgePolicy(quantile=1.0)
+        with pytest.raises(ValueError):
+            HedgePolicy(budget=-0.1)
+
+    def test_shared_policy_registry(self):
+        """Test that get_hedge_policy returns one policy per key."""
+        from src.llms.hedging import clear_hedge_policies, get_hedge_policy
+
+        clear_hedge_policies()
+        try:
+            assert get_hedge_policy(("ollama", "m", None)) is get_hedge_policy(("ollama", "m", None), budget=0.5)
+            assert get_hedge_policy(("ollama", "m", None)).budget == 0.05
+        finally:
+            clear_hedge_policies()
+
+
+class TestHedgedLLMClient:
+    """Test suite for HedgedLLMClient."""
+
+    def test_fast_call_is_not_hedged(self):
+        """Test that calls finishing before the threshold send no duplicate."""
+        from src.llms.hedging import HedgedLLMClient
+
+        backend = make_client([0.0])
+        client = HedgedLLMClient(backend, make_policy(latency=0.5))
+
+        assert client.conv("hi") == "reply 0"
+        assert backend.calls == 1
+        assert client.last_usage.hedged is False
+
+    def test_slow_call_is_hedged_and_hedge_wins(self):
+        """Test that the duplicate's reply is returned when it arrives first."""
+        from src.llms.hedging import HedgedLLMClient
+
+        backend = make_client([1.0, 0.0])
+        policy = make_policy(latency=0.05)
+        client = HedgedLLMClient(backend, policy)
+
+        started = time.monotonic()
+        assert client.conv("hi") == "reply 1"
+        assert time.monotonic() - started < 0.8
+        assert backend.hedge_flags == [False, True]
+        usage = client.last_usage
+        assert usage.hedged is True
+        assert usage.hedge_won is True
+        assert usage.completion_tokens == 1
+        assert client.hedge_stats()["win_rate"] == 1.0
+
+    def test_primary_can_still_win(self):
+        """Test that the primary's reply is used when it finishes before the hedge."""
+        from src.llms.hedging import HedgedLLMClient
+
+        backend = make_client([0.15, 1.0])
+        client = HedgedLLMClient(backend, make_policy(latency=0.05))
+
+        assert client.conv("hi") == "reply 0"
+        assert client.last_usage.hedged is True
+        assert client.last_usage.hedge_won is False
+        assert client.hedge_stats()["hedge_wins"] == 0
+
+    def test_failed_request_waits_for_the_other(self):
+        """Test that one failure does not fail the call while the other request runs."""
+        from src.llms.hedging import HedgedLLMClient
+
+        backend = make_client([0.15, 0.3], errors={0: RuntimeError("boom")})
+        client = HedgedLLMClient(backend, make_policy(latency=0.05))
+
+        assert client.conv("hi") == "reply 1"
+
+    def test_both_failing_raises(self):
+        """Test that the primary's error is raised when both requests fail."""
+        from src.llms.hedging import HedgedLLMClient
+
+        backend = make_client([0.15, 0.0], errors={0: RuntimeError("primary"), 1: RuntimeError("hedge")})
+        client = HedgedLLMClient(backend, make_policy(latency=0.05))
+
+        with pytest.raises(RuntimeError, match="primary"):
+            client.conv("hi")
+
+    def test_budget_exhausted_waits_for_primary(self):
+        """Test that no duplicate is sent without budget."""
+        from src.llms.hedging import HedgedLLMClient
+
+        backend = make_client([0.2])
+        client = HedgedLLMClient(backend, make_policy(latency=0.05, budget=0.0))
+
+        assert client.conv("hi") == "reply 0"
+        assert backend.calls == 1
+        assert client.hedge_stats()["budget_denied"] == 1
+
+    def test_aconv_cancels_the_loser(self):
+        """Test that the async path cancels the slower request."""
+        from src.llms.hedging import HedgedLLMClient
+
+        backend = make_client([1.0, 0.0])
+        client = HedgedLLMClient(backend, make_policy(latency=0.05))
+
+        async def main():
+            reply = await client.aconv("hi")
+            return reply, client.last_usage
+
+        reply, usage = asyncio.run(main())
+        assert reply == "reply 1"
+        assert usage.hedge_won is True
+        assert backend.cancelled == 1
+
+    def test_aconv_loser_is_released_and_observed(self):
+        """Test that the cancelled loser frees its router slot and still counts in the latency window."""
+        from src.llms.hedging import HedgedLLMClient
+        from src.llms.router_client import RouterClient
+
+        slow, fast = make_client([1.0]), make_client([])
+        router = RouterClient("m", [("slow", slow), ("fast", fast)], sticky_slack=10)
+
+        def sticky_backend(prompt):
+            backend = router._select(prompt, set())
+            backend.outstanding -= 1
+            return backend.name
+
+        prompt = next(p for p in (f"prompt {i}" for i in range(100)) if sticky_backend(p) == "slow")
+        policy = make_policy(latency=0.05)
+        client = HedgedLLMClient(router, policy)
+
+        async def main():
+            reply = await client.aconv("hi", system_message=prompt)
+            # Checked before the event loop shuts down and cancels leftovers itself
+            return reply, slow.cancelled, router.router_stats()["backends"]
+
+        reply, cancelled, backends = asyncio.run(main())
+
+        assert reply == "reply 0"
+        assert cancelled == 1
+        assert all(b["outstanding"] == 0 for b in backends.values())
+        # 20 warm-up samples, the fast winner and the cancelled primary (at least the hedge delay)
+        latencies = list(policy._latencies)
+        assert len(latencies) == 22
+        assert max(latencies) >= 0.05
+
+    def test_router_sends_hedge_to_another_backend(self):
+        """Test that a hedge skips the sticky backend of the primary."""
+        from src.llms.hedging import HedgedLLMClient
+        from src.llms.router_client import RouterClient
+
+        slow, fast = make_client([1.0]), make_client([])
+        router = RouterClient("m", [("slow", slow), ("fast", fast)], sticky_slack=10)
+
+        def sticky_backend(prompt):
+            backend = router._select(prompt, set())
+            backend.outstanding -= 1
+            return backend.name
+
+        prompt = next(p for p in (f"prompt {i}" for i in range(100)) if sticky_backend(p) == "slow")
+        client = HedgedLLMClient(router, make_policy(latency=0.05))
+
+        assert client.conv("hi", system_message=prompt) == "reply 0"
+        assert slow.hedge_flags == [False]
+        assert fast.hedge_flags == [True]
+
+
+class TestStageMetricsHedging:
+    """Test suite for hedge counters in StageMetrics."""
+
+    def test_win_rate_reported(self):
+        """Test hedged call and win counts in the report and textfile."""
+        from src.llms.llm_interface import CallUsage
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("transcription")
+        metrics.record_call(CallUsage(latency=1.0, hedged=True, hedge_won=True))
+        metrics.record_call(CallUsage(latency=1.0, hedged=True))
+        metrics.record_call(CallUsage(latency=1.0))
+
+        report = metrics.report()
+        assert report["hedged_calls"] == 2
+        assert report["hedge_wins"] == 1
+        assert report["hedge_win_rate"] == 0.5
+        assert 'baby_calls_llm_hedge_wins_total{stage="transcription"} 1' in metrics.prometheus_text()
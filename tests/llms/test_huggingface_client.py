@@ -31,6 +31,32 @@ def create_mock_tokenizer_output(input_ids_tensor):
     return MockTokenizerOutput(mock_output)
 
 
+def build_tiny_llama():
+    """Helper building a tiny randomly initialised Llama model and word-level tokenizer offline."""
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    words = "you are a helpful assistant be brief hello world how is the baby".split()
+    vocab = {"<pad>": 0, "<s>": 1, "</s>": 2, "<unk>": 3}
+    for word in words:
+        vocab[word] = len(vocab)
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", eos_token="</s>",
+        unk_token="<unk>", pad_token="<pad>"
+    )
+
+    torch.manual_seed(0)
+    model = LlamaForCausalLM(LlamaConfig(
+        vocab_size=len(vocab), hidden_size=32, intermediate_size=64,
+        num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=4,
+        max_position_embeddings=128, pad_token_id=0, bos_token_id=1, eos_token_id=2,
+    ))
+    model.eval()
+    return tokenizer, model
+
+
 class TestHuggingFaceLLM:
     """Test suite for HuggingFaceLLM."""
 
@@ -415,3 +441,256 @@ class TestHuggingFaceLLM:
         )
         # Note: self.model becomes the actual model instance after __init__
         assert client.model == mock_model_instance
+
+    @patch('src.llms.huggingface_client.AutoModelForCausalLM')
+    @patch('src.llms.huggingface_client.AutoTokenizer')
+    @patch('src.llms.huggingface_client.torch.cuda.is_available')
+    def test_conv_batch_left_pads_and_generates_once(self, mock_cuda_available, mock_tokenizer_class, mock_model_class):
+        """Test that conv_batch runs all prompts through one padded generate call."""
+        from src.llms.huggingface_client import HuggingFaceLLM
+
+        mock_cuda_available.return_value = False
+
+        mock_tokenizer_instance = Mock()
+        mock_tokenizer_instance.pad_token = None
+        mock_tokenizer_instance.eos_token = '</s>'
+        mock_tokenizer_instance.pad_token_id = 0
+        input_tensor = torch.tensor([[0, 0, 5, 6], [7, 8, 9, 10]])
+        mock_tokenizer_instance.return_value = create_mock_tokenizer_output(input_tensor)
+        mock_tokenizer_instance.decode.side_effect = [" first ", "second"]
+        mock_tokenizer_class.from_pretrained.return_value = mock_tokenizer_instance
+
+        mock_model_instance = Mock()
+        mock_model_instance.generate.return_value = torch.tensor([
+            [0, 0, 5, 6, 11, 12, 0],
+            [7, 8, 9, 10, 13, 14, 15],
+        ])
+        mock_model_instance.to.return_value = mock_model_instance
+        mock_model_class.from_pretrained.return_value = mock_model_instance
+
+        client = HuggingFaceLLM(model_id='gpt2')
+        result = client.conv_batch(["Hi", "Hello there"], system_message="sys", max_tokens=3)
+
+        assert result == ["first", "second"]
+        # Prompts are tokenized together with left padding
+        mock_tokenizer_instance.assert_called_once_with(
+            ["sys\nHi", "sys\nHello there"], return_tensors="pt", padding=True
+        )
+        assert mock_tokenizer_instance.padding_side == "left"
+        assert mock_tokenizer_instance.pad_token == '</s>'
+        # One generate call for the whole batch
+        mock_model_instance.generate.assert_called_once()
+        gen_args = mock_model_instance.generate.call_args[1]
+        assert gen_args['max_new_tokens'] == 3
+        assert gen_args['pad_token_id'] == 0
+        # Only the newly generated tokens are decoded for each sequence
+        decoded = [c[0][0].tolist() for c in mock_tokenizer_instance.decode.call_args_list]
+        assert decoded == [[11, 12, 0], [13, 14, 15]]
+
+    @patch('src.llms.huggingface_client.AutoModelForCausalLM')
+    @patch('src.llms.huggingface_client.AutoTokenizer')
+    @patch('src.llms.huggingface_client.torch.cuda.is_available')
+    def test_conv_batch_empty(self, mock_cuda_available, mock_tokenizer_class, mock_model_class):
+        """Test that an empty batch returns without calling the model."""
+        from src.llms.huggingface_client import HuggingFaceLLM
+
+        mock_cuda_available.return_value = False
+        mock_model_instance = Mock()
+        mock_model_instance.to.return_value = mock_model_instance
+        mock_model_class.from_pretrained.return_value = mock_model_instance
+
+        client = HuggingFaceLLM(model_id='gpt2')
+
+        assert client.conv_batch([]) == []
+        mock_model_instance.generate.assert_not_called()
+
+
+class TestPrefixCache:
+    """Prefix KV-cache reuse, exercised on a tiny offline model."""
+
+    def make_client(self, prefix_cache_size):
+        from src.llms.huggingface_client import HuggingFaceLLM
+
+        tokenizer, model = build_tiny_llama()
+        with patch('src.llms.huggingface_client.AutoTokenizer') as mock_tokenizer_class, \
+                patch('src.llms.huggingface_client.AutoModelForCausalLM') as mock_model_class:
+            mock_tokenizer_class.from_pretrained.return_value = tokenizer
+            mock_model_class.from_pretrained.return_value = model
+            return HuggingFaceLLM(model_id='tiny', device='cpu', prefix_cache_size=prefix_cache_size)
+
+    def test_disabled_by_default(self):
+        """Test that prefix caching is off unless a cache size is given."""
+        client = self.make_client(prefix_cache_size=0)
+
+        client.conv("hello world", system_message="you are a helpful assistant", max_tokens=3)
+
+        assert client.prefix_cache_stats()['misses'] == 0
+        assert client.prefix_cache_stats()['entries'] == 0
+
+    def test_cached_prefix_matches_uncached_generation(self):
+        """Test that reusing the prefilled prefix yields the same tokens as a full prefill."""
+        plain = self.make_client(prefix_cache_size=0)
+        cached = self.make_client(prefix_cache_size=2)
+        system = "you are a helpful assistant be brief"
+
+        torch.manual_seed(123)
+        expected = plain.conv("how is the baby", system_message=system, max_tokens=6)
+        results = []
+        for _ in range(2):
+            torch.manual_seed(123)
+            results.append(cached.conv("how is the baby", system_message=system, max_tokens=6))
+
+        assert results == [expected, expected]
+        stats = cached.prefix_cache_stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+        assert stats['entries'] == 1
+        assert stats['prefill_seconds_saved'] > 0
+
+    def test_conv_batch_reuses_prefix(self):
+        """Test that batched generation shares one cached prefix across rows."""
+        client = self.make_client(prefix_cache_size=1)
+
+        replies = client.conv_batch(
+            ["hello world", "how is the baby", "hello"],
+            system_message="you are a helpful assistant",
+            max_tokens=4,
+        )
+
+        assert len(replies) == 3
+        assert client.prefix_cache_stats()['misses'] == 1
+
+    def test_lru_eviction(self):
+        """Test that the least recently used prefix is evicted when the cache is full."""
+        client = self.make_client(prefix_cache_size=2)
+
+        for system in ["you are a helpful assistant", "be brief", "you are a helpful assistant", "hello"]:
+            client.conv("how is the baby", system_message=system, max_tokens=2)
+
+        stats = client.prefix_cache_stats()
+        assert stats['entries'] == 2
+        assert stats['evictions'] == 1
+        assert stats['hits'] == 1
+        assert list(client._prefix_cache) == ["you are a helpful assistant", "hello"]
+
+
+class TestQuantization:
+    """INT8 dynamic quantization, exercised on a tiny offline model."""
+
+    def load(self, tmp_path, **kwargs):
+        from src.llms.huggingface_client import HuggingFaceLLM
+
+        tokenizer, model = build_tiny_llama()
+        with patch('src.llms.huggingface_client.AutoTokenizer') as mock_tokenizer_class, \
+                patch('src.llms.huggingface_client.AutoModelForCausalLM') as mock_model_class:
+            mock_tokenizer_class.from_pretrained.return_value = tokenizer
+            mock_model_class.from_pretrained.return_value = model
+            client = HuggingFaceLLM(model_id='org/tiny', device='cpu',
+                                    quantized_cache_dir=str(tmp_path), **kwargs)
+            return client, mock_model_class
+
+    def test_int8_quantizes_linear_layers_and_caches_checkpoint(self, tmp_path):
+        """Test that int8 mode quantizes Linear layers and writes the checkpoint cache."""
+        client, mock_model_class = self.load(tmp_path, quantization='int8')
+
+        linear_types = {type(m) for m in client.model.modules() if 'Linear' in type(m).__name__}
+        assert torch.nn.Linear not in linear_types
+        assert client.quantized_path == str(tmp_path / 'org--tiny-int8.pt')
+        assert (tmp_path / 'org--tiny-int8.pt').exists()
+        mock_model_class.from_pretrained.assert_called_once()
+        assert client.conv("hello world", system_message="be brief", max_tokens=3) is not None
+
+    def test_cached_checkpoint_skips_conversion(self, tmp_path):
+        """Test that a second start loads the quantized checkpoint without touching fp32 weights."""
+        self.load(tmp_path, quantization='int8')
+
+        client, mock_model_class = self.load(tmp_path, quantization='int8')
+
+        mock_model_class.from_pretrained.assert_not_called()
+        assert client.conv("hello world", max_tokens=3) is not None
+
+    def test_int8_reduces_memory_footprint(self, tmp_path):
+        """Test that the quantized model is smaller than the fp32 baseline."""
+        fp32, _ = self.load(tmp_path)
+        int8, _ = self.load(tmp_path, quantization='int8')
+
+        assert int8.memory_footprint() < fp32.memory_footprint()
+
+    def test_unsupported_quantization(self, tmp_path):
+        """Test that unknown quantization modes are rejected."""
+        with pytest.raises(ValueError, match='Unsupported quantization'):
+            self.load(tmp_path, quantization='int4')
+
+    @patch('src.llms.huggingface_client.AutoModelForCausalLM')
+    @patch('src.llms.huggingface_client.AutoTokenizer')
+    def test_quantization_requires_cpu(self, mock_tokenizer_class, mock_model_class, tmp_path):
+        """Test that dynamic quantization is refused on non-CPU devices."""
+        from src.llms.huggingface_client import HuggingFaceLLM
+
+        with pytest.raises(ValueError, match='only supported on CPU'):
+            HuggingFaceLLM(model_id='gpt2', device='cuda', quantization='int8',
+                           quantized_cache_dir=str(tmp_path))
+        mock_model_class.from_pretrained.assert_not_called()
+
+
+class TestCompiledGeneration:
+    """Static-KV-cache compiled decode path."""
+
+    def make_client(self, **kwargs):
+        from src.llms.huggingface_client import HuggingFaceLLM
+
+        tokenizer, model = build_tiny_llama()
+        with patch('src.llms.huggingface_client.AutoTokenizer') as mock_tokenizer_class, \
+                patch('src.llms.huggingface_client.AutoModelForCausalLM') as mock_model_class:
+            mock_tokenizer_class.from_pretrained.return_value = tokenizer
+            mock_model_class.from_pretrained.return_value = model
+            return HuggingFaceLLM(model_id='tiny', device='cpu', **kwargs)
+
+    def test_eager_mode_adds_no_generate_arguments(self):
+        """Test that the default eager mode leaves generate() arguments untouched."""
+        client = self.make_client()
+
+        assert client.generation_mode == 'eager'
+        assert client._decode_kwargs((1, 10), 50) == {}
+        client.warmup()
+        assert client.compiled_shapes() == []
+
+    def test_invalid_generation_mode(self):
+        """Test that unknown generation modes are rejected."""
+        with pytest.raises(ValueError, match='Unsupported generation_mode'):
+            self.make_client(generation_mode='jit')
+
+    def test_static_cache_bucketed_and_reused(self):
+        """Test that static caches are bucketed by length and reused per shape."""
+        from transformers import StaticCache
+        from src.llms.huggingface_client import STATIC_CACHE_BUCKET
+
+        client = self.make_client(generation_mode='compiled')
+
+        first = client._decode_kwargs((1, 10), 50)
+        second = client._decode_kwargs((1, 40), 100)
+        larger = client._decode_kwargs((1, 200), 100)
+        batched = client._decode_kwargs((4, 10), 50)
+
+        assert isinstance(first['past_key_values'], StaticCache)
+        assert first['compile_config'].fullgraph is True
+        assert second['past_key_values'] is first['past_key_values']
+        assert larger['past_key_values'] is not first['past_key_values']
+        assert client.compiled_shapes() == [
+            (1, STATIC_CACHE_BUCKET), (1, 2 * STATIC_CACHE_BUCKET), (4, STATIC_CACHE_BUCKET)
+        ]
+        assert batched['past_key_values'] is not first['past_key_values']
+
+    def test_compiled_conv_generates_after_warmup(self):
+        """Test that the compiled path generates text after warming up its bucket."""
+        client = self.make_client(generation_mode='compiled', prefix_cache_size=2)
+
+        client.warmup(prompt_lengths=[8], max_tokens=4)
+        first = client.conv("hello world", system_message="be brief", max_tokens=4)
+        second = client.conv("how is the baby", system_message="you are a helpful assistant", max_tokens=4)
+
+        assert isinstance(first, str) and isinstance(second, str)
+        # Both prompts fall into the bucket compiled during warm-up
+        assert len(client.compiled_shapes()) == 1
+        # Prefix caching is bypassed in compiled mode
+        assert client.prefix_cache_stats()['misses'] == 0
@@ -1,5 +1,8 @@
 import pytest
+import asyncio
+import json
 from unittest.mock import Mock, patch
+import httpx
 import requests
 
 
@@ -50,7 +53,7 @@ class TestOllamaClient:
 
         assert client.api_key == 'not-needed-but-accepted'
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_basic_call(self, mock_post):
         """Test basic conversation call with standard response format."""
         from src.llms.ollama_client import OllamaClient
@@ -87,7 +90,7 @@ class TestOllamaClient:
 
         assert result == "Hello! How can I help you?"
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_with_custom_system_message(self, mock_post):
         """Test conversation with custom system message."""
         from src.llms.ollama_client import OllamaClient
@@ -113,7 +116,7 @@ class TestOllamaClient:
         assert payload['messages'][0]['content'] == "You are an expert programmer."
         assert result == "I'm a coding expert."
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_with_temperature(self, mock_post):
         """Test conversation with custom temperature."""
         from src.llms.ollama_client import OllamaClient
@@ -132,7 +135,7 @@ class TestOllamaClient:
         payload = mock_post.call_args[1]['json']
         assert payload['options']['temperature'] == 0.2
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_with_max_tokens(self, mock_post):
         """Test conversation with custom max_tokens."""
         from src.llms.ollama_client import OllamaClient
@@ -151,7 +154,7 @@ class TestOllamaClient:
         payload = mock_post.call_args[1]['json']
         assert payload['options']['num_predict'] == 100
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_with_none_max_tokens(self, mock_post):
         """Test that None max_tokens becomes -1 (unlimited)."""
         from src.llms.ollama_client import OllamaClient
@@ -170,7 +173,7 @@ class TestOllamaClient:
         payload = mock_post.call_args[1]['json']
         assert payload['options']['num_predict'] == -1
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_response_format_fallback(self, mock_post):
         """Test fallback to 'response' field in response."""
         from src.llms.ollama_client import OllamaClient
@@ -189,7 +192,7 @@ class TestOllamaClient:
 
         assert result == "This is a response string"
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_messages_array_format(self, mock_post):
         """Test fallback to messages array in response."""
         from src.llms.ollama_client import OllamaClient
@@ -211,7 +214,7 @@ class TestOllamaClient:
         # Should concatenate message contents
         assert result == "Part 1 Part 2"
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_unknown_format_stringify(self, mock_post):
         """Test that unknown response format is stringified."""
         from src.llms.ollama_client import OllamaClient
@@ -231,7 +234,7 @@ class TestOllamaClient:
         assert "unknown_field" in result
         assert "unknown_value" in result
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_empty_content(self, mock_post):
         """Test handling of empty content in response."""
         from src.llms.ollama_client import OllamaClient
@@ -252,7 +255,7 @@ class TestOllamaClient:
 
         assert result == ""
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_missing_content_field(self, mock_post):
         """Test handling of missing content field."""
         from src.llms.ollama_client import OllamaClient
@@ -274,7 +277,7 @@ class TestOllamaClient:
         # Should return empty string
         assert result == ""
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_http_error(self, mock_post):
         """Test handling of HTTP errors."""
         from src.llms.ollama_client import OllamaClient
@@ -295,7 +298,7 @@ class TestOllamaClient:
         assert "500" in error_msg
         assert "Internal Server Error" in error_msg
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_connection_error(self, mock_post):
         """Test handling of connection errors."""
         from src.llms.ollama_client import OllamaClient
@@ -311,7 +314,7 @@ class TestOllamaClient:
         assert "Ollama request failed" in error_msg
         assert "Connection refused" in error_msg
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_timeout_error(self, mock_post):
         """Test handling of timeout errors."""
         from src.llms.ollama_client import OllamaClient
@@ -327,7 +330,7 @@ class TestOllamaClient:
         assert "Ollama request failed" in error_msg
         assert "timed out" in error_msg.lower()
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_custom_base_url_used(self, mock_post):
         """Test that custom base URL is used in requests."""
         from src.llms.ollama_client import OllamaClient
@@ -347,7 +350,7 @@ class TestOllamaClient:
         call_args = mock_post.call_args
         assert call_args[0][0] == 'http://custom-server:9999/api/chat'
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_custom_timeout_used(self, mock_post):
         """Test that custom timeout is passed to requests."""
         from src.llms.ollama_client import OllamaClient
@@ -367,7 +370,7 @@ class TestOllamaClient:
         call_args = mock_post.call_args
         assert call_args[1]['timeout'] == 30
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_with_multiline_response(self, mock_post):
         """Test conversation with multiline response."""
         from src.llms.ollama_client import OllamaClient
@@ -389,7 +392,7 @@ class TestOllamaClient:
         # Multiline should be preserved
         assert result == "Line 1\nLine 2\nLine 3"
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_with_unicode_response(self, mock_post):
         """Test conversation with unicode characters."""
         from src.llms.ollama_client import OllamaClient
@@ -411,7 +414,7 @@ class TestOllamaClient:
         # Unicode should be preserved
         assert result == "你好世界 🌍 Привет"
 
-    @patch('src.llms.ollama_client.requests.post')
+    @patch('src.llms.ollama_client.requests.Session.post')
     def test_conv_multiple_calls_same_client(self, mock_post):
         """Test multiple conversation calls with same client."""
         from src.llms.ollama_client import OllamaClient
@@ -439,3 +442,278 @@ class TestOllamaClient:
         assert result1 == "First"
         assert result2 == "Second"
         assert mock_post.call_count == 2
+
+    def test_aconv_basic_call(self):
+        """Test async conversation call sends the same payload as conv()."""
+        from src.llms.ollama_client import OllamaClient
+
+        seen = {}
+
+        def handler(request):
+            seen['url'] = str(request.url)
+            seen['payload'] = json.loads(request.content)
+            return httpx.Response(200, json={
+                "message": {"role": "assistant", "content": "Async reply"},
+                "done": True
+            })
+
+        client = OllamaClient(model='llama2')
+
+        async def run():
+            client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            client._async_loop = asyncio.get_running_loop()
+            try:
+                return await client.aconv("Hello", temperature=0.3, max_tokens=42)
+            finally:
+                await client.aclose()
+
+        result = asyncio.run(run())
+
+        assert result == "Async reply"
+        assert seen['url'] == 'http://localhost:11434/api/chat'
+        assert seen['payload']['stream'] is False
+        assert seen['payload']['options'] == {"temperature": 0.3, "num_predict": 42}
+        assert client._async_client is None
+
+    def test_aconv_http_error(self):
+        """Test async HTTP errors are wrapped in RuntimeError like conv()."""
+        from src.llms.ollama_client import OllamaClient
+
+        def handler(request):
+            return httpx.Response(500, text="model crashed")
+
+        client = OllamaClient(model='llama2')
+
+        async def run():
+            client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            client._async_loop = asyncio.get_running_loop()
+            return await client.aconv("Hello")
+
+        with pytest.raises(RuntimeError, match="Ollama HTTP error 500: model crashed"):
+            asyncio.run(run())
+
+    def test_async_client_recreated_per_event_loop(self):
+        """Test that a new AsyncClient is created, and the old one closed, when the event loop changes."""
+        from src.llms.ollama_client import OllamaClient
+
+        client = OllamaClient(model='llama2', timeout=30, pool_size=3)
+
+        async def grab():
+            return await client._get_async_client()
+
+        first = asyncio.run(grab())
+        second = asyncio.run(grab())
+
+        assert first is not second
+        assert first.is_closed
+        assert not second.is_closed
+        assert second._transport._pool._max_connections == 3
+        assert second.timeout.read == 30
+
+
+class TestOllamaConnectionPooling:
+    """Connection reuse against a local stub Ollama server."""
+
+    def test_default_pool_size(self):
+        """Test the default keep-alive pool configuration."""
+        from src.llms.ollama_client import OllamaClient
+
+        client = OllamaClient(model='llama2')
+
+        assert client.pool_size == 10
+        assert client.session.headers['Connection'] == 'keep-alive'
+
+    def test_sequential_calls_reuse_one_connection(self):
+        """Test that back-to-back calls share a single TCP connection."""
+        from src.llms.ollama_client import OllamaClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        with OllamaStubServer(content="pong") as server:
+            client = OllamaClient(model='llama2', base_url=server.base_url, pool_size=4)
+            results = [client.conv(f"ping {i}") for i in range(5)]
+            stats = client.connection_stats()
+            client.close()
+
+        assert results == ["pong"] * 5
+        assert len(server.requests) == 5
+        assert len(server.connections) == 1
+        assert stats == {
+            "requests": 5,
+            "connections_opened": 1,
+            "connections_reused": 4,
+        }
+
+    def test_concurrent_calls_bounded_by_pool_size(self):
+        """Test that concurrent threads never open more connections than pool_size."""
+        from concurrent.futures import ThreadPoolExecutor
+        from src.llms.ollama_client import OllamaClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        pool_size = 4
+        with OllamaStubServer(delay=0.01) as server:
+            client = OllamaClient(model='llama2', base_url=server.base_url, pool_size=pool_size)
+            with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                list(executor.map(lambda i: client.conv(f"msg {i}"), range(40)))
+            stats = client.connection_stats()
+            client.close()
+
+        assert len(server.requests) == 40
+        assert len(server.connections) <= pool_size
+        assert stats["requests"] == 40
+        assert stats["connections_opened"] <= pool_size
+        assert stats["connections_reused"] >= 40 - pool_size
+
+
+class TestJsonCompletionTracker:
+    """Test suite for JsonCompletionTracker."""
+
+    def test_detects_close_across_pieces(self):
+        """Test that the closing brace is found across several fed pieces."""
+        from src.llms.ollama_client import JsonCompletionTracker
+
+        tracker = JsonCompletionTracker()
+
+        assert tracker.feed('{"transcription": [') == -1
+        assert tracker.feed('{"speaker": "NURSE"}') == -1
+        assert tracker.feed(']}\n\ntrailing') == 2
+
+    def test_ignores_brackets_inside_strings(self):
+        """Test that braces and escaped quotes inside strings are not counted."""
+        from src.llms.ollama_client import JsonCompletionTracker
+
+        tracker = JsonCompletionTracker()
+        text = '{"text": "a } b \\" ] c"} extra'
+
+        end = tracker.feed(text)
+
+        assert text[:end] == '{"text": "a } b \\" ] c"}'
+
+    def test_ignores_leading_prose(self):
+        """Test that text before the first bracket is skipped."""
+        from src.llms.ollama_client import JsonCompletionTracker
+
+        tracker = JsonCompletionTracker()
+
+        assert tracker.feed('Sure "here": ') == -1
+        assert tracker.feed('{"a": 1}') == 8
+
+
+class TestOllamaStreaming:
+    """Streaming mode against a local stub Ollama server."""
+
+    def test_stream_returns_same_string(self):
+        """Test that streamed chunks are joined into the full reply."""
+        from src.llms.ollama_client import OllamaClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        with OllamaStubServer(chunks=["Hello", ", ", "world"]) as server:
+            client = OllamaClient(model='llama2', base_url=server.base_url,
+                                  stream=True, stop_on_json_close=False)
+            result = client.conv("Hi")
+            client.close()
+
+        assert result == "Hello, world"
+        assert server.requests[0]['stream'] is True
+        stats = client.last_stream_stats
+        assert stats.chunks == 3
+        assert stats.eval_count == 3
+        assert stats.tokens_per_sec == pytest.approx(6.0)
+        assert stats.time_to_first_token is not None
+        assert stats.terminated_early is False
+
+    def test_stream_records_usage(self):
+        """Test that the final chunk's counters are recorded as last_usage."""
+        from src.llms.ollama_client import OllamaClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        with OllamaStubServer(chunks=["a", "b", "c"]) as server:
+            client = OllamaClient(model='llama2', base_url=server.base_url,
+                                  stream=True, stop_on_json_close=False)
+            client.conv("Hi")
+            client.close()
+
+        usage = client.last_usage
+        assert usage.prompt_tokens == 12
+        assert usage.completion_tokens == 3
+        assert usage.generation_seconds == pytest.approx(0.5)
+
+    def test_non_stream_records_usage(self):
+        """Test that prompt_eval_count/eval_count of a plain reply are recorded."""
+        from src.llms.ollama_client import OllamaClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        with OllamaStubServer(chunks=["a"]) as server:
+            client = OllamaClient(model='llama2', base_url=server.base_url)
+            client.conv("Hi")
+            client.close()
+
+        usage = client.last_usage
+        assert usage.prompt_tokens == 12
+        assert usage.completion_tokens == 3
+        assert usage.generation_seconds == pytest.approx(0.25)
+
+    def test_stream_stops_when_json_closes(self):
+        """Test that reading stops as soon as the top-level JSON object closes."""
+        from src.llms.ollama_client import OllamaClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        chunks = ['{"transcription": ', '[{"speaker": "NURSE"}]', '}', '\n'] + ["junk"] * 50
+        with OllamaStubServer(chunks=chunks, chunk_delay=0.01) as server:
+            client = OllamaClient(model='llama2', base_url=server.base_url, stream=True)
+            result = client.conv("Hi", response_format={"type": "json_object"})
+            client.close()
+
+        assert json.loads(result) == {"transcription": [{"speaker": "NURSE"}]}
+        assert client.last_stream_stats.terminated_early is True
+        # The server was cut off well before emitting all trailing chunks
+        assert server.chunks_sent < len(chunks)
+        summary = client.stream_stats()
+        assert summary['calls'] == 1
+        assert summary['early_terminations'] == 1
+
+    def test_stream_reads_free_text_to_the_end(self):
+        """Test that a reply not requested as JSON is not cut off at a balanced bracket."""
+        from src.llms.ollama_client import OllamaClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        chunks = ["See [1]", " and [2]", " for details."]
+        with OllamaStubServer(chunks=chunks) as server:
+            client = OllamaClient(model='llama2', base_url=server.base_url, stream=True)
+            result = client.conv("Hi")
+            client.close()
+
+        assert result == "See [1] and [2] for details."
+        assert client.last_stream_stats.terminated_early is False
+
+    def test_stream_error_chunk_raises(self):
+        """Test that an error line in the stream surfaces as RuntimeError."""
+        from src.llms.ollama_client import _StreamAccumulator
+
+        acc = _StreamAccumulator(stop_on_json_close=True)
+
+        with pytest.raises(RuntimeError, match="model not found"):
+            acc.feed(json.dumps({"error": "model not found"}))
+
+    def test_astream_returns_same_string(self):
+        """Test that aconv() supports streaming with the same result."""
+        from src.llms.ollama_client import OllamaClient
+
+        lines = "\n".join(json.dumps(l) for l in [
+            {"message": {"content": '{"a": '}, "done": False},
+            {"message": {"content": '1} tail'}, "done": False},
+            {"message": {"content": ""}, "done": True},
+        ])
+
+        def handler(request):
+            assert json.loads(request.content)['stream'] is True
+            return httpx.Response(200, text=lines)
+
+        client = OllamaClient(model='llama2', stream=True)
+
+        async def run():
+            client._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            client._async_loop = asyncio.get_running_loop()
+            return await client.aconv("Hello", response_format={"type": "json_object"})
+
+        assert asyncio.run(run()) == '{"a": 1}'
+        assert client.last_stream_stats.terminated_early is True
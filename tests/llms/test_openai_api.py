@@ -1,5 +1,6 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+import asyncio
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 
 
 class TestChatGPTClient:
@@ -307,3 +308,154 @@ class TestChatGPTClient:
 
         mock_openai.assert_called_once_with(api_key=None)
         assert client.api_key is None
+
+    @patch('src.llms.openai_api.AsyncOpenAI')
+    @patch('src.llms.openai_api.OpenAI')
+    def test_async_client_created_lazily(self, mock_openai, mock_async_openai):
+        """Test that AsyncOpenAI is only constructed on first use."""
+        from src.llms.openai_api import ChatGPTClient
+
+        client = ChatGPTClient(api_key='test-key')
+        mock_async_openai.assert_not_called()
+
+        assert client.async_client is client.async_client
+        mock_async_openai.assert_called_once_with(api_key='test-key')
+
+    @patch('src.llms.openai_api.AsyncOpenAI')
+    @patch('src.llms.openai_api.OpenAI')
+    def test_aconv_basic_call(self, mock_openai, mock_async_openai):
+        """Test async conversation call mirrors the sync request."""
+        from src.llms.openai_api import ChatGPTClient
+
+        mock_message = Mock()
+        mock_message.content = "  Async hello  "
+        mock_choice = Mock()
+        mock_choice.message = mock_message
+        mock_response = Mock()
+        mock_response.choices = [mock_choice]
+
+        mock_async_instance = Mock()
+        mock_async_instance.chat.completions.create = AsyncMock(return_value=mock_response)
+        mock_async_openai.return_value = mock_async_instance
+
+        client = ChatGPTClient(api_key='test-key', model='gpt-4')
+        result = asyncio.run(client.aconv(
+            "Hello",
+            max_tokens=50,
+            response_format={"type": "json_object"}
+        ))
+
+        mock_async_instance.chat.completions.create.assert_awaited_once_with(
+            model='gpt-4',
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": "Hello"}
+            ],
+            max_completion_tokens=50,
+            response_format={"type": "json_object"}
+        )
+        # Sync client must not be used
+        mock_openai.return_value.chat.completions.create.assert_not_called()
+        assert result == "Async hello"
+
+
+class TestChatGPTResponseHeaders:
+    """Test suite for the on_response_headers hook."""
+
+    @patch('src.llms.openai_api.OpenAI')
+    def test_hook_receives_headers(self, mock_openai):
+        """Test that setting the hook switches conv() to with_raw_response."""
+        from src.llms.openai_api import ChatGPTClient
+
+        parsed = Mock()
+        parsed.choices = [Mock(message=Mock(content=" hi "))]
+        raw = Mock()
+        raw.headers = {"x-ratelimit-remaining-requests": "9"}
+        raw.parse.return_value = parsed
+        mock_openai.return_value.chat.completions.with_raw_response.create.return_value = raw
+
+        client = ChatGPTClient(api_key='test-key', model='gpt-4')
+        seen = []
+        client.on_response_headers = seen.append
+
+        assert client.conv("Hello", max_tokens=5) == "hi"
+        assert seen == [raw.headers]
+        mock_openai.return_value.chat.completions.create.assert_not_called()
+        call_kwargs = mock_openai.return_value.chat.completions.with_raw_response.create.call_args[1]
+        assert call_kwargs['max_completion_tokens'] == 5
+
+
+class TestChatGPTUsage:
+    """Test suite for per-call usage telemetry."""
+
+    @patch('src.llms.openai_api.OpenAI')
+    def test_last_usage_reads_response_usage(self, mock_openai):
+        """Test that token counts from response.usage end up in last_usage."""
+        from src.llms.openai_api import ChatGPTClient
+
+        response = Mock()
+        response.choices = [Mock(message=Mock(content="ok"))]
+        response.usage = Mock(prompt_tokens=40, completion_tokens=7)
+        response.usage.completion_tokens_details = Mock(reasoning_tokens=3)
+        mock_openai.return_value.chat.completions.create.return_value = response
+
+        client = ChatGPTClient(api_key='test-key', model='gpt-4')
+        client.conv("Hello")
+
+        usage = client.last_usage
+        assert usage.prompt_tokens == 40
+        assert usage.completion_tokens == 7
+        assert usage.reasoning_tokens == 3
+        assert usage.total_tokens == 47
+        assert usage.latency >= 0
+
+    @patch('src.llms.openai_api.OpenAI')
+    def test_missing_usage_leaves_counts_empty(self, mock_openai):
+        """Test that a response without integer usage fields records None counts."""
+        from src.llms.openai_api import ChatGPTClient
+
+        response = Mock()
+        response.choices = [Mock(message=Mock(content="ok"))]
+        response.usage = None
+        mock_openai.return_value.chat.completions.create.return_value = response
+
+        client = ChatGPTClient(api_key='test-key', model='gpt-4')
+        client.conv("Hello")
+
+        assert client.last_usage.prompt_tokens is None
+        assert client.last_usage.completion_tokens is None
+
+    @patch('src.llms.openai_api.OpenAI')
+    def test_cached_tokens_and_prompt_cache_key(self, mock_openai):
+        """Test that prompt_cache_key is sent and cached prompt tokens are recorded."""
+        from src.llms.openai_api import ChatGPTClient
+
+        response = Mock()
+        response.choices = [Mock(message=Mock(content="ok"))]
+        response.usage = Mock(prompt_tokens=1600, completion_tokens=7)
+        response.usage.prompt_tokens_details = Mock(cached_tokens=1536)
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value = response
+
+        client = ChatGPTClient(api_key='test-key', model='gpt-4', prompt_cache_key='stage-a')
+        client.conv("Hello", system_message="static prefix")
+        client.conv("Hello", prompt_cache_key='override')
+
+        assert create.call_args_list[0].kwargs['prompt_cache_key'] == 'stage-a'
+        assert create.call_args_list[0].kwargs['messages'][0] == {"role": "system", "content": "static prefix"}
+        assert create.call_args_list[1].kwargs['prompt_cache_key'] == 'override'
+        assert client.last_usage.cached_tokens == 1536
+
+    @patch('src.llms.openai_api.OpenAI')
+    def test_no_prompt_cache_key_by_default(self, mock_openai):
+        """Test that requests are unchanged without a prompt_cache_key."""
+        from src.llms.openai_api import ChatGPTClient
+
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value = Mock(choices=[Mock(message=Mock(content="ok"))], usage=None)
+
+        client = ChatGPTClient(api_key='test-key', model='gpt-4')
+        client.conv("Hello")
+
+        assert 'prompt_cache_key' not in create.call_args.kwargs
+        assert client.last_usage.cached_tokens is None
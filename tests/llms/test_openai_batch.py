@@ -0,0 +1,180 @@
+import pytest
+import json
+import os
+
+from tests.llms.openai_batch_stub import FakeBatchAPI
+
+
+def make_runner(api, tmp_path, **kwargs):
+    """Helper building a runner that never actually sleeps."""
+    from src.llms.openai_batch import OpenAIBatchRunner
+
+    return OpenAIBatchRunner(api, "gpt-test", state_path=str(tmp_path / "state.json"),
+                             poll_interval=0, sleep=lambda _: None, **kwargs)
+
+
+class TestOpenAIBatchRunner:
+    """Test suite for OpenAIBatchRunner."""
+
+    def test_build_request_mirrors_conv(self, tmp_path):
+        """Test that request lines carry the same body as ChatGPTClient.conv()."""
+        runner = make_runner(FakeBatchAPI(), tmp_path)
+
+        line = runner.build_request("a", "Hi", "Be brief", max_tokens=50,
+                                    response_format={"type": "json_object"})
+
+        assert line["custom_id"] == "a"
+        assert line["method"] == "POST"
+        assert line["url"] == "/v1/chat/completions"
+        assert line["body"] == {
+            "model": "gpt-test",
+            "messages": [
+                {"role": "system", "content": "Be brief"},
+                {"role": "user", "content": "Hi"},
+            ],
+            "max_completion_tokens": 50,
+            "response_format": {"type": "json_object"},
+        }
+
+    def test_build_request_adds_prompt_cache_key(self, tmp_path):
+        """Test that the runner's prompt_cache_key is added unless a request sets its own."""
+        runner = make_runner(FakeBatchAPI(), tmp_path, prompt_cache_key="stage")
+
+        assert runner.build_request("a", "Hi")["body"]["prompt_cache_key"] == "stage"
+        assert runner.build_request("b", "Hi", prompt_cache_key="own")["body"]["prompt_cache_key"] == "own"
+
+    def test_run_maps_results_by_custom_id(self, tmp_path):
+        """Test submit, poll and result mapping, including per-request errors."""
+        api = FakeBatchAPI(polls_until_done=2, failing_ids={"c"})
+        runner = make_runner(api, tmp_path)
+        requests = [runner.build_request(cid, f"msg {cid}") for cid in ("a", "b", "c")]
+
+        replies, errors = runner.run(requests)
+
+        assert replies == {"a": "MSG A", "b": "MSG B"}
+        assert list(errors) == ["c"]
+        assert len(api.created) == 1
+        assert api.created[0]["endpoint"] == "/v1/chat/completions"
+        assert api.retrievals == 3
+        # Uploaded file is the JSONL written next to the state file
+        with open(tmp_path / "state-0.jsonl", encoding="utf-8") as f:
+            assert [json.loads(line) for line in f] == requests
+
+    def test_requests_split_across_batches(self, tmp_path):
+        """Test that inputs larger than max_requests_per_batch become several batches."""
+        api = FakeBatchAPI(polls_until_done=0)
+        runner = make_runner(api, tmp_path, max_requests_per_batch=2)
+
+        replies, errors = runner.run([runner.build_request(str(i), f"m{i}") for i in range(5)])
+
+        assert len(api.created) == 3
+        assert sorted(replies) == ["0", "1", "2", "3", "4"]
+        assert errors == {}
+
+    def test_resume_after_crash_does_not_resubmit(self, tmp_path):
+        """Test that a second run picks up the batch recorded in the state file."""
+        api = FakeBatchAPI(polls_until_done=3)
+
+        def crash(_):
+            raise KeyboardInterrupt
+
+        from src.llms.openai_batch import OpenAIBatchRunner
+
+        crashing = OpenAIBatchRunner(api, "gpt-test", state_path=str(tmp_path / "state.json"), sleep=crash)
+        requests = [crashing.build_request(cid, cid) for cid in ("a", "b")]
+        with pytest.raises(KeyboardInterrupt):
+            crashing.run(requests)
+        assert os.path.exists(tmp_path / "state.json")
+
+        # Resumed with a subset (e.g. some results were already persisted)
+        replies, errors = make_runner(api, tmp_path).run(requests[:1])
+
+        assert len(api.created) == 1
+        assert replies == {"a": "A"}
+        assert errors == {}
+
+    def test_partial_submission_resumes_and_submits_rest(self, tmp_path):
+        """Test that a crash part-way through submission keeps the recorded batch and submits only the rest."""
+        api = FakeBatchAPI(polls_until_done=0)
+        create = api.batches.create
+
+        def create_once(**kwargs):
+            if api.created:
+                raise KeyboardInterrupt
+            return create(**kwargs)
+
+        api.batches.create = create_once
+        runner = make_runner(api, tmp_path, max_requests_per_batch=2)
+        requests = [runner.build_request(cid, cid) for cid in ("a", "b", "c", "d")]
+        with pytest.raises(KeyboardInterrupt):
+            runner.run(requests)
+
+        api.batches.create = create
+        replies, errors = make_runner(api, tmp_path, max_requests_per_batch=2).run(requests)
+
+        assert replies == {"a": "A", "b": "B", "c": "C", "d": "D"}
+        assert errors == {}
+        assert len(api.created) == 2
+        assert [line["custom_id"] for line in api.uploads[api.created[1]["input_file_id"]]] == ["c", "d"]
+        with open(tmp_path / "state.json", encoding="utf-8") as f:
+            assert [entry["input_path"] for entry in json.load(f)["batches"]] == [
+                str(tmp_path / "state-0.jsonl"), str(tmp_path / "state-1.jsonl")]
+
+    def test_stale_state_is_resubmitted(self, tmp_path):
+        """Test that batches recorded for different request bodies are not mapped onto the new requests."""
+        api = FakeBatchAPI(polls_until_done=3)
+
+        def crash(_):
+            raise KeyboardInterrupt
+
+        from src.llms.openai_batch import OpenAIBatchRunner
+
+        crashing = OpenAIBatchRunner(api, "gpt-test", state_path=str(tmp_path / "state.json"), sleep=crash)
+        with pytest.raises(KeyboardInterrupt):
+            crashing.run([crashing.build_request("batch-0", "old keywords")])
+
+        runner = make_runner(api, tmp_path)
+        replies, errors = runner.run([runner.build_request("batch-0", "new keywords")])
+
+        assert replies == {"batch-0": "NEW KEYWORDS"}
+        assert errors == {}
+        assert len(api.created) == 2
+        assert not os.path.exists(tmp_path / "state-0.jsonl")
+
+    def test_clear_state_removes_files(self, tmp_path):
+        """Test that clear_state() removes the state file and the input JSONL."""
+        runner = make_runner(FakeBatchAPI(polls_until_done=0), tmp_path)
+        runner.run([runner.build_request("a", "hi")])
+
+        runner.clear_state()
+
+        assert os.listdir(tmp_path) == []
+
+    def test_failed_batch_is_resubmitted_on_next_run(self, tmp_path):
+        """Test that a batch failing as a whole is reported as errors and resubmitted by the next run."""
+        api = FakeBatchAPI(polls_until_done=0, status="failed")
+        runner = make_runner(api, tmp_path, max_requests_per_batch=1)
+        requests = [runner.build_request(cid, cid) for cid in ("a", "b")]
+
+        replies, errors = runner.run(requests)
+
+        assert replies == {}
+        assert sorted(errors) == ["a", "b"]
+        assert all("failed" in message for message in errors.values())
+
+        api.final_status = "completed"
+        replies, errors = make_runner(api, tmp_path, max_requests_per_batch=1).run(requests)
+
+        assert replies == {"a": "A", "b": "B"}
+        assert errors == {}
+        assert len(api.created) == 4
+        assert sorted(os.listdir(tmp_path)) == ["state-2.jsonl", "state-3.jsonl", "state.json"]
+
+    def test_duplicate_custom_ids_rejected(self, tmp_path):
+        """Test that duplicate custom_ids raise ValueError before anything is uploaded."""
+        api = FakeBatchAPI()
+        runner = make_runner(api, tmp_path)
+
+        with pytest.raises(ValueError):
+            runner.run([runner.build_request("a", "x"), runner.build_request("a", "y")])
+        assert api.uploads == {}
@@ -0,0 +1,259 @@
+import pytest
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+
+class FakeClock:
+    """Manually advanced clock; sleep() advances it instead of blocking."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimitError(Exception):
+    """Stand-in for openai.RateLimitError."""
+    status_code = 429
+
+
+def make_limiter(clock=None, **kwargs):
+    """Helper building a limiter on a fake clock."""
+    from src.llms.rate_limiter import AdaptiveRateLimiter
+
+    clock = clock or FakeClock()
+    return AdaptiveRateLimiter(clock=clock, sleep=clock.sleep, **kwargs), clock
+
+
+class TestTokenBucket:
+    """Test suite for TokenBucket."""
+
+    def test_unlimited_until_rate_set(self):
+        """Test that a bucket without a rate never asks callers to wait."""
+        from src.llms.rate_limiter import TokenBucket
+
+        bucket = TokenBucket(clock=FakeClock())
+
+        assert all(bucket.reserve(1000) == 0 for _ in range(100))
+
+    def test_wait_matches_refill_rate(self):
+        """Test that the wait time reflects the per-minute refill rate."""
+        from src.llms.rate_limiter import TokenBucket
+
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock)
+
+        assert all(bucket.reserve(1) == 0 for _ in range(60))
+        assert bucket.reserve(1) == pytest.approx(1.0)
+        clock.now += 10
+        # 10 seconds refilled 10 requests, one of which was already promised
+        assert bucket.reserve(9) == 0
+
+    def test_sync_lowers_balance(self):
+        """Test that server-reported remaining capacity lowers the local balance."""
+        from src.llms.rate_limiter import TokenBucket
+
+        bucket = TokenBucket(600, FakeClock())
+        bucket.sync(0)
+
+        assert bucket.reserve(10) == pytest.approx(1.0)
+
+
+class TestAdaptiveRateLimiter:
+    """Test suite for AdaptiveRateLimiter."""
+
+    def test_headers_seed_limits(self):
+        """Test that x-ratelimit-* headers set both bucket rates."""
+        limiter, _ = make_limiter()
+
+        limiter.update_from_headers({
+            "X-RateLimit-Limit-Requests": "500",
+            "X-RateLimit-Limit-Tokens": "200000",
+            "X-RateLimit-Remaining-Requests": "499",
+            "X-RateLimit-Remaining-Tokens": "199000",
+            "X-RateLimit-Reset-Requests": "120ms",
+        })
+
+        stats = limiter.stats()
+        assert stats["requests_per_minute"] == pytest.approx(475)
+        assert stats["tokens_per_minute"] == pytest.approx(190000)
+
+    def test_requests_are_paced_by_rpm(self):
+        """Test that exceeding the RPM bucket makes callers wait."""
+        limiter, clock = make_limiter(requests_per_minute=120)
+
+        for _ in range(121):
+            with limiter.slot():
+                pass
+
+        assert clock.sleeps == [pytest.approx(0.5)]
+
+    def test_tokens_are_paced_by_tpm(self):
+        """Test that large requests are paced by the TPM bucket."""
+        limiter, clock = make_limiter(tokens_per_minute=6000)
+
+        with limiter.slot(estimated_tokens=6000):
+            pass
+        with limiter.slot(estimated_tokens=600):
+            pass
+
+        assert clock.sleeps == [pytest.approx(6.0)]
+
+    def test_throttle_halves_concurrency_and_recovers(self):
+        """Test AIMD: 429 halves the limit, successes grow it back."""
+        limiter, _ = make_limiter(max_concurrency=16)
+
+        with pytest.raises(RateLimitError):
+            with limiter.slot():
+                raise RateLimitError()
+        assert limiter.concurrency_limit == 8
+        assert limiter.stats()["throttled"] == 1
+
+        for _ in range(200):
+            with limiter.slot():
+                pass
+        assert limiter.concurrency_limit == 16
+
+    def test_other_errors_do_not_throttle(self):
+        """Test that non-429 errors release the slot without shrinking the limit."""
+        limiter, _ = make_limiter(max_concurrency=4)
+
+        with pytest.raises(ValueError):
+            with limiter.slot():
+                raise ValueError("bad json")
+
+        assert limiter.concurrency_limit == 4
+        assert limiter.stats()["throttled"] == 0
+
+    def test_concurrency_is_bounded(self):
+        """Test that no more than the limit of requests run at once."""
+        from src.llms.rate_limiter import AdaptiveRateLimiter
+
+        limiter = AdaptiveRateLimiter(max_concurrency=3)
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def worker():
+            with limiter.slot():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert peak[0] == 3
+        assert limiter.stats()["peak_in_flight"] == 3
+
+    def test_aacquire_bounds_coroutines_without_threads(self):
+        """Test that aacquire() limits concurrent coroutines and paces them on the event loop thread."""
+        from src.llms.rate_limiter import AdaptiveRateLimiter
+
+        clock = FakeClock()
+        bucket_waits = []
+
+        async def asleep(seconds):
+            if seconds > 0.01:
+                bucket_waits.append(seconds)
+            await asyncio.sleep(0)
+
+        limiter = AdaptiveRateLimiter(requests_per_minute=3, max_concurrency=2, clock=clock, asleep=asleep)
+        active, peak, threads = [0], [0], set()
+
+        async def worker():
+            waited = await limiter.aacquire()
+            threads.add(threading.get_ident())
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            limiter.release(0.01, waited)
+
+        async def run():
+            await asyncio.gather(*(worker() for _ in range(6)))
+
+        asyncio.run(run())
+
+        assert peak[0] == 2
+        assert threads == {threading.get_ident()}
+        assert len(bucket_waits) == 3
+        assert limiter.stats()["requests"] == 6
+
+    def test_littles_law_caps_concurrency(self):
+        """Test that a known RPM and latency cap the concurrency limit."""
+        limiter, clock = make_limiter(requests_per_minute=60, max_concurrency=50)
+
+        with limiter.slot():
+            clock.now += 2.0
+
+        # 1 request/s x 2s latency x 1.2 headroom
+        assert limiter.concurrency_limit == 3
+
+
+class TestRateLimitedLLMClient:
+    """Test suite for RateLimitedLLMClient."""
+
+    def test_installs_header_hook(self):
+        """Test that the wrapped client's header hook feeds the limiter."""
+        from src.llms.rate_limiter import RateLimitedLLMClient
+
+        backend = Mock()
+        backend.on_response_headers = None
+        limiter, _ = make_limiter()
+
+        RateLimitedLLMClient(backend, limiter)
+        backend.on_response_headers({"x-ratelimit-limit-requests": "100"})
+
+        assert limiter.stats()["requests_per_minute"] == pytest.approx(95)
+
+    def test_conv_goes_through_limiter(self):
+        """Test that conv() is forwarded and counted by the limiter."""
+        from src.llms.rate_limiter import RateLimitedLLMClient
+
+        backend = Mock()
+        backend.conv.return_value = "ok"
+        limiter, _ = make_limiter()
+        client = RateLimitedLLMClient(backend, limiter)
+
+        assert client.conv("Hi", system_message="sys", max_tokens=10) == "ok"
+        backend.conv.assert_called_once_with("Hi", system_message="sys", temperature=0.7, max_tokens=10)
+        assert client.rate_limit_stats()["requests"] == 1
+
+    def test_aconv_throttle_is_recorded(self):
+        """Test that a 429 from aconv() shrinks the shared limit."""
+        from src.llms.rate_limiter import RateLimitedLLMClient
+
+        backend = Mock()
+
+        async def aconv(*args, **kwargs):
+            raise RateLimitError()
+
+        backend.aconv.side_effect = aconv
+        limiter, _ = make_limiter(max_concurrency=8)
+        client = RateLimitedLLMClient(backend, limiter)
+
+        with pytest.raises(RateLimitError):
+            asyncio.run(client.aconv("Hi"))
+        assert limiter.concurrency_limit == 4
+
+    def test_ollama_429_is_rate_limit_error(self):
+        """Test that Ollama HTTP 429 errors are classified as throttling."""
+        from src.llms.ollama_client import OllamaHTTPError
+        from src.llms.rate_limiter import is_rate_limit_error
+
+        assert is_rate_limit_error(OllamaHTTPError(429, "slow down"))
+        assert not is_rate_limit_error(OllamaHTTPError(500, "boom"))
+        assert not is_rate_limit_error(RuntimeError("x"))
@@ -0,0 +1,276 @@
+import pytest
+import asyncio
+import multiprocessing
+import threading
+from unittest.mock import Mock
+
+
+def make_cache(tmp_path, **kwargs):
+    """Helper opening a fresh cache file under tmp_path."""
+    from src.llms.response_cache import ResponseCache
+
+    return ResponseCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def make_backend(model="gpt-test"):
+    """Helper building a mock backend that echoes its prompt."""
+    backend = Mock()
+    backend.api_key = "key"
+    backend.model = model
+    backend.conv.side_effect = lambda user_message, **kwargs: f"reply to {user_message}"
+    backend.conv_batch.side_effect = lambda user_messages, **kwargs: [f"reply to {m}" for m in user_messages]
+    return backend
+
+
+def _write_entries(path, prefix, count):
+    from src.llms.response_cache import ResponseCache
+
+    cache = ResponseCache(path)
+    for i in range(count):
+        cache.put(f"{prefix}-{i}", "x" * 100)
+    cache.close()
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache."""
+
+    def test_key_covers_every_request_field(self):
+        """Test that changing any keyed field changes the key."""
+        from src.llms.response_cache import ResponseCache
+
+        base = dict(client_type="openai", model="m", system_message="s", user_message="u",
+                    temperature=0.5, max_tokens=10, response_format={"type": "json_object"}, seed=1)
+        key = ResponseCache.make_key(**base)
+
+        assert ResponseCache.make_key(**base) == key
+        for field, value in [("client_type", "ollama"), ("model", "m2"), ("system_message", "s2"),
+                             ("user_message", "u2"), ("temperature", 0.6), ("max_tokens", 11),
+                             ("response_format", None), ("seed", 2)]:
+            assert ResponseCache.make_key(**{**base, field: value}) != key
+
+    def test_get_put_and_counters(self, tmp_path):
+        """Test round-trip storage and hit/miss counters."""
+        cache = make_cache(tmp_path)
+
+        assert cache.get("k") is None
+        cache.put("k", "héllo")
+        assert cache.get("k") == "héllo"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["writes"] == 1
+        assert stats["entries"] == 1
+        assert stats["bytes"] == len("héllo".encode("utf-8"))
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        """Test that least recently read entries are evicted once max_bytes is exceeded."""
+        cache = make_cache(tmp_path, max_bytes=300)
+        for key in ("a", "b", "c"):
+            cache.put(key, "x" * 100)
+        # Touch "a" so "b" becomes the least recently used entry
+        cache.get("a")
+
+        cache.put("d", "x" * 100)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] <= 300
+
+    def test_size_total_tracks_replacements_and_evictions(self, tmp_path):
+        """Test that the running size total matches the stored replies without rescanning them."""
+        import sqlite3
+
+        cache = make_cache(tmp_path, max_bytes=200)
+        cache.put("a", "x" * 100)
+        cache.put("a", "x" * 40)
+        cache.put("b", "x" * 100)
+        cache.put("c", "x" * 100)
+        cache.close()
+
+        conn = sqlite3.connect(str(tmp_path / "cache.sqlite"))
+        total = conn.execute("SELECT total_size FROM cache_meta").fetchone()[0]
+        assert total == conn.execute("SELECT SUM(size) FROM responses").fetchone()[0] == 200
+        # A file written before the total was kept is seeded from its rows on open
+        conn.execute("DROP TABLE cache_meta")
+        conn.commit()
+        conn.close()
+
+        assert make_cache(tmp_path).stats()["bytes"] == 200
+
+    def test_persists_across_instances(self, tmp_path):
+        """Test that entries survive reopening the file."""
+        cache = make_cache(tmp_path)
+        cache.put("k", "v")
+        cache.close()
+
+        assert make_cache(tmp_path).get("k") == "v"
+
+    def test_concurrent_threads(self, tmp_path):
+        """Test that many threads can read and write the same cache."""
+        cache = make_cache(tmp_path)
+
+        def worker(n):
+            for i in range(20):
+                cache.put(f"{n}-{i}", str(i))
+                assert cache.get(f"{n}-{i}") == str(i)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert cache.stats()["entries"] == 160
+
+    def test_concurrent_processes(self, tmp_path):
+        """Test that several processes can write to one cache file."""
+        path = str(tmp_path / "cache.sqlite")
+        make_cache(tmp_path).close()
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=_write_entries, args=(path, f"p{n}", 25)) for n in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(timeout=60)
+
+        assert [p.exitcode for p in procs] == [0, 0, 0]
+        stats = make_cache(tmp_path).stats()
+        assert stats["entries"] == 75
+        assert stats["bytes"] == 7500
+
+
+class TestCachedLLMClient:
+    """Test suite for CachedLLMClient."""
+
+    def test_read_through_calls_backend_once(self, tmp_path):
+        """Test that a repeated request is served from the cache."""
+        from src.llms.response_cache import CachedLLMClient
+
+        backend = make_backend()
+        client = CachedLLMClient(backend, "openai", make_cache(tmp_path))
+
+        first = client.conv("Hi", system_message="sys", max_tokens=5, response_format={"type": "json_object"})
+        second = client.conv("Hi", system_message="sys", max_tokens=5, response_format={"type": "json_object"})
+
+        assert first == second == "reply to Hi"
+        backend.conv.assert_called_once_with("Hi", system_message="sys", temperature=0.7, max_tokens=5,
+                                             response_format={"type": "json_object"})
+        assert client.cache_stats()["hits"] == 1
+
+    def test_changed_prompt_misses(self, tmp_path):
+        """Test that a different system prompt is not served a stale reply."""
+        from src.llms.response_cache import CachedLLMClient
+
+        backend = make_backend()
+        client = CachedLLMClient(backend, "openai", make_cache(tmp_path))
+
+        client.conv("Hi", system_message="v1")
+        client.conv("Hi", system_message="v2")
+
+        assert backend.conv.call_count == 2
+
+    def test_replay_only_never_calls_backend(self, tmp_path):
+        """Test that replay_only serves hits and raises CacheMissError on misses."""
+        from src.llms.response_cache import CacheMissError, CachedLLMClient
+
+        cache = make_cache(tmp_path)
+        CachedLLMClient(make_backend(), "openai", cache).conv("Hi")
+        backend = make_backend()
+        client = CachedLLMClient(backend, "openai", cache, policy="replay_only")
+
+        assert client.conv("Hi") == "reply to Hi"
+        with pytest.raises(CacheMissError):
+            client.conv("Unseen")
+        backend.conv.assert_not_called()
+
+    def test_off_bypasses_cache(self, tmp_path):
+        """Test that policy 'off' always calls the backend and stores nothing."""
+        from src.llms.response_cache import CachedLLMClient
+
+        backend = make_backend()
+        cache = make_cache(tmp_path)
+        client = CachedLLMClient(backend, "openai", cache, policy="off")
+
+        client.conv("Hi")
+        client.conv("Hi")
+
+        assert backend.conv.call_count == 2
+        assert cache.stats()["entries"] == 0
+
+    def test_conv_batch_sends_only_misses(self, tmp_path):
+        """Test that conv_batch() forwards only uncached prompts, preserving order."""
+        from src.llms.response_cache import CachedLLMClient
+
+        backend = make_backend()
+        client = CachedLLMClient(backend, "huggingface", make_cache(tmp_path))
+        client.conv("b")
+
+        replies = client.conv_batch(["a", "b", "c"])
+
+        assert replies == ["reply to a", "reply to b", "reply to c"]
+        assert backend.conv_batch.call_args[0][0] == ["a", "c"]
+
+    def test_configured_model_keys_pooled_clients(self, tmp_path):
+        """Test that the configured model keys entries while a pooled backend reports no model."""
+        from src.llms.response_cache import CachedLLMClient
+
+        cache = make_cache(tmp_path)
+        first = CachedLLMClient(make_backend(model=None), "huggingface", cache, model="model-a")
+        backend = make_backend(model=None)
+        second = CachedLLMClient(backend, "huggingface", cache, model="model-b")
+
+        first.conv("Hi")
+        second.conv("Hi")
+
+        backend.conv.assert_called_once()
+        assert cache.stats()["entries"] == 2
+
+    def test_invalid_replies_not_cached(self, tmp_path):
+        """Test that replies rejected by the validator are returned but not stored."""
+        from src.llms.response_cache import CachedLLMClient
+
+        backend = make_backend()
+        cache = make_cache(tmp_path)
+        client = CachedLLMClient(backend, "openai", cache, response_validator=lambda reply: reply != "reply to b")
+
+        assert client.conv_batch(["a", "b"]) == ["reply to a", "reply to b"]
+        assert client.conv("b") == "reply to b"
+
+        assert cache.stats()["entries"] == 1
+        assert backend.conv.call_count == 1
+
+    def test_aconv_uses_cache(self, tmp_path):
+        """Test that aconv() reads and writes the same cache entries as conv()."""
+        from src.llms.response_cache import CachedLLMClient
+
+        backend = make_backend()
+
+        async def aconv(user_message, **kwargs):
+            return f"async reply to {user_message}"
+
+        backend.aconv.side_effect = aconv
+        client = CachedLLMClient(backend, "openai", make_cache(tmp_path))
+
+        assert asyncio.run(client.aconv("Hi")) == "async reply to Hi"
+        assert client.conv("Hi") == "async reply to Hi"
+        backend.conv.assert_not_called()
+
+    def test_unknown_attributes_forwarded(self, tmp_path):
+        """Test that backend-specific helpers stay reachable through the wrapper."""
+        from src.llms.response_cache import CachedLLMClient
+
+        backend = make_backend()
+        backend.aggregate_stats.return_value = {"hits": 3}
+        client = CachedLLMClient(backend, "huggingface", make_cache(tmp_path))
+
+        assert client.aggregate_stats("prefix_cache_stats") == {"hits": 3}
+
+    def test_invalid_policy(self, tmp_path):
+        """Test that unknown policies raise ValueError."""
+        from src.llms.response_cache import CachedLLMClient
+
+        with pytest.raises(ValueError):
+            CachedLLMClient(make_backend(), "openai", make_cache(tmp_path), policy="sometimes")
@@ -0,0 +1,357 @@
+import pytest
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import Mock
+
+
+class StatusError(Exception):
+    """Stand-in for openai.APIStatusError."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = Mock(status_code=status_code, headers=headers or {})
+
+
+def make_backend(*outcomes):
+    """Helper building a mock backend whose conv() yields outcomes in order (exceptions are raised)."""
+    backend = Mock()
+    backend.api_key = "key"
+    backend.model = "model"
+    remaining = list(outcomes)
+
+    def conv(*args, **kwargs):
+        outcome = remaining.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    backend.conv.side_effect = conv
+    return backend
+
+
+def make_client(backend, **kwargs):
+    """Helper building a RetryingLLMClient that records instead of sleeping."""
+    from src.llms.retry import RetryingLLMClient, RetryPolicy
+
+    sleeps = []
+    kwargs.setdefault("policy", RetryPolicy(max_attempts=4, base_delay=1.0))
+    client = RetryingLLMClient(backend, sleep=sleeps.append, **kwargs)
+    return client, sleeps
+
+
+class TestClassification:
+    """Test suite for is_retryable() and is_backend_failure()."""
+
+    @pytest.mark.parametrize("status, retryable", [(429, True), (500, True), (503, True), (408, True),
+                                                   (400, False), (401, False), (404, False)])
+    def test_status_codes(self, status, retryable):
+        """Test retry classification of HTTP status errors."""
+        from src.llms.retry import is_retryable
+
+        assert is_retryable(StatusError(status)) is retryable
+
+    def test_ollama_errors(self):
+        """Test that Ollama HTTP errors and wrapped timeouts are classified."""
+        import requests
+        from src.llms.ollama_client import OllamaHTTPError
+        from src.llms.retry import is_backend_failure, is_retryable
+
+        assert is_retryable(OllamaHTTPError(502, "bad gateway"))
+        assert not is_retryable(OllamaHTTPError(400, "bad request"))
+        try:
+            try:
+                raise requests.Timeout("read timed out")
+            except requests.Timeout as e:
+                raise RuntimeError("Ollama request failed") from e
+        except RuntimeError as wrapped:
+            assert is_retryable(wrapped)
+            assert is_backend_failure(wrapped)
+
+    def test_decode_errors_retryable_but_not_outages(self):
+        """Test that bad replies are retried without counting against the backend."""
+        from src.llms.retry import InvalidResponseError, is_backend_failure, is_retryable
+
+        decode_error = json.JSONDecodeError("Expecting value", "", 0)
+        assert is_retryable(decode_error)
+        assert is_retryable(InvalidResponseError())
+        assert not is_backend_failure(InvalidResponseError())
+        assert not is_backend_failure(StatusError(429))
+        assert is_backend_failure(StatusError(503))
+
+    def test_programming_errors_not_retryable(self):
+        """Test that unrelated exceptions fail immediately."""
+        from src.llms.retry import is_retryable
+
+        assert not is_retryable(KeyError("x"))
+
+
+class TestRetryPolicy:
+    """Test suite for RetryPolicy."""
+
+    def test_full_jitter_bounds(self):
+        """Test that delays stay within the exponential ceiling."""
+        from src.llms.retry import RetryPolicy
+
+        policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+
+        for attempt, ceiling in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 10.0)]:
+            delays = [policy.delay(attempt) for _ in range(200)]
+            assert all(0 <= d <= ceiling for d in delays)
+            assert max(delays) > ceiling / 2
+
+    def test_retry_after_hint(self):
+        """Test that a Retry-After header raises the delay."""
+        from src.llms.retry import RetryPolicy
+
+        policy = RetryPolicy(base_delay=0.001, max_delay=30.0)
+
+        assert policy.delay(0, StatusError(429, {"retry-after": "7"})) == 7.0
+
+
+class TestRetryingLLMClient:
+    """Test suite for RetryingLLMClient."""
+
+    def test_retries_until_success(self):
+        """Test that transient failures are retried with backoff."""
+        backend = make_backend(StatusError(429), StatusError(503), "ok")
+        client, sleeps = make_client(backend)
+
+        assert client.conv("Hi") == "ok"
+        assert backend.conv.call_count == 3
+        assert len(sleeps) == 2
+        assert client.retry_stats()["retries"] == 2
+
+    def test_non_retryable_raises_immediately(self):
+        """Test that a 400 is not retried."""
+        backend = make_backend(StatusError(400))
+        client, sleeps = make_client(backend)
+
+        with pytest.raises(StatusError):
+            client.conv("Hi")
+        assert sleeps == []
+        assert client.retry_stats()["gave_up"] == 1
+
+    def test_gives_up_after_max_attempts(self):
+        """Test that the last error is raised once attempts are exhausted."""
+        backend = make_backend(*[StatusError(500)] * 4)
+        client, sleeps = make_client(backend)
+
+        with pytest.raises(StatusError):
+            client.conv("Hi")
+        assert backend.conv.call_count == 4
+        assert len(sleeps) == 3
+
+    def test_invalid_replies_are_retried(self):
+        """Test that replies rejected by the validator are regenerated."""
+        backend = make_backend("not json", '{"ok": true}')
+        client, _ = make_client(backend, response_validator=lambda r: r.startswith("{"))
+
+        assert client.conv("Hi") == '{"ok": true}'
+        assert client.retry_stats()["invalid_replies"] == 1
+
+    def test_conv_batch_regenerates_only_invalid(self):
+        """Test that conv_batch() retries only prompts with rejected replies."""
+        backend = Mock()
+        backend.conv_batch.side_effect = [["{a}", "bad", "{c}"], ["{b}"]]
+        client, _ = make_client(backend, response_validator=lambda r: r.startswith("{"))
+
+        assert client.conv_batch(["a", "b", "c"]) == ["{a}", "{b}", "{c}"]
+        assert backend.conv_batch.call_args_list[1][0][0] == ["b"]
+
+    def test_aconv_retries(self):
+        """Test that aconv() retries with asyncio backoff."""
+        from src.llms.retry import RetryPolicy
+
+        backend = Mock()
+        outcomes = [StatusError(502), "ok"]
+
+        async def aconv(*args, **kwargs):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        backend.aconv.side_effect = aconv
+        client, _ = make_client(backend, policy=RetryPolicy(max_attempts=3, base_delay=0.001))
+
+        assert asyncio.run(client.aconv("Hi")) == "ok"
+
+
+class TestCircuitBreaker:
+    """Test suite for CircuitBreaker."""
+
+    def test_opens_after_threshold_and_probes(self):
+        """Test closed -> open -> half-open -> closed transitions."""
+        from src.llms.retry import CircuitBreaker, CircuitOpenError
+
+        clock = [0.0]
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=lambda: clock[0])
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call(max_wait=0)
+
+        clock[0] = 10.0
+        breaker.before_call()
+        assert breaker.state == "half_open"
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.stats()["opened"] == 1
+
+    def test_failed_probe_reopens(self):
+        """Test that a failing probe reopens the breaker."""
+        from src.llms.retry import CircuitBreaker
+
+        clock = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=lambda: clock[0])
+        breaker.record_failure()
+        clock[0] = 5.0
+        breaker.before_call()
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+
+    def test_open_breaker_pauses_all_workers(self):
+        """Test that workers wait while open and resume after a successful probe."""
+        from src.llms.retry import CircuitBreaker
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+        breaker.record_failure()
+        started = time.monotonic()
+        finished = []
+
+        def worker():
+            breaker.before_call()
+            breaker.record_success()
+            finished.append(time.monotonic() - started)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert len(finished) == 4
+        assert min(finished) >= 0.19
+        assert breaker.state == "closed"
+
+    def test_open_breaker_pauses_coroutines_on_the_loop(self):
+        """Test that abefore_call() waits on the event loop and resumes after a successful probe."""
+        from src.llms.retry import CircuitBreaker, CircuitOpenError
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+        breaker.record_failure()
+        started = time.monotonic()
+        finished, threads = [], set()
+
+        async def worker():
+            await breaker.abefore_call()
+            threads.add(threading.get_ident())
+            breaker.record_success()
+            finished.append(time.monotonic() - started)
+
+        async def run():
+            with pytest.raises(CircuitOpenError):
+                await breaker.abefore_call(max_wait=0)
+            await asyncio.gather(*(worker() for _ in range(4)))
+
+        asyncio.run(run())
+
+        assert len(finished) == 4
+        assert min(finished) >= 0.19
+        assert threads == {threading.get_ident()}
+        assert breaker.state == "closed"
+
+    def test_interrupted_probe_is_released(self):
+        """Test that an interrupted half-open probe lets the next caller probe instead of hanging."""
+        from src.llms.retry import CircuitBreaker, CircuitOpenError
+
+        clock = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=lambda: clock[0])
+        breaker.record_failure()
+        clock[0] = 5.0
+        client, _ = make_client(make_backend(KeyboardInterrupt(), "ok"), breaker=breaker)
+
+        with pytest.raises(KeyboardInterrupt):
+            client.conv("Hi")
+
+        assert breaker.state == "half_open"
+        assert client.conv("Hi") == "ok"
+        assert breaker.state == "closed"
+        # A caller that was not the probe leaves a probe in progress alone
+        breaker.record_failure()
+        clock[0] = 10.0
+        assert breaker.before_call() is True
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call(max_wait=0)
+
+    def test_max_pause_rejects_calls(self):
+        """Test that max_pause fails calls with CircuitOpenError while the breaker stays open."""
+        from src.llms.retry import CircuitBreaker, CircuitOpenError
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        backend = make_backend("ok")
+        client, _ = make_client(backend, breaker=breaker, max_pause=0)
+
+        with pytest.raises(CircuitOpenError):
+            client.conv("Hi")
+        with pytest.raises(CircuitOpenError):
+            asyncio.run(client.aconv("Hi"))
+
+        backend.conv.assert_not_called()
+        assert client.retry_stats()["rejected"] == 2
+
+    def test_cancelled_async_probe_is_released(self):
+        """Test that cancelling the probing aconv() (e.g. a losing hedge attempt) releases the probe."""
+        from src.llms.retry import CircuitBreaker
+
+        clock = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=lambda: clock[0])
+        breaker.record_failure()
+        clock[0] = 5.0
+        backend = Mock()
+        calls = []
+
+        async def aconv(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                await asyncio.Event().wait()
+            return "ok"
+
+        backend.aconv.side_effect = aconv
+        client, _ = make_client(backend, breaker=breaker)
+
+        async def main():
+            probe = asyncio.create_task(client.aconv("Hi"))
+            await asyncio.sleep(0)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+            return await asyncio.wait_for(client.aconv("Hi"), timeout=1)
+
+        assert asyncio.run(main()) == "ok"
+        assert breaker.state == "closed"
+
+    def test_client_failures_feed_breaker(self):
+        """Test that outages open the shared breaker while 429s do not."""
+        from src.llms.retry import CircuitBreaker, RetryPolicy
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        throttled, _ = make_client(make_backend(StatusError(429), StatusError(429)), breaker=breaker,
+                                   policy=RetryPolicy(max_attempts=2))
+        with pytest.raises(StatusError):
+            throttled.conv("Hi")
+        assert breaker.state == "closed"
+
+        down, _ = make_client(make_backend(StatusError(503), StatusError(503)), breaker=breaker,
+                              policy=RetryPolicy(max_attempts=2))
+        with pytest.raises(StatusError):
+            down.conv("Hi")
+        assert breaker.state == "open"
@@ -0,0 +1,258 @@
+import pytest
+import asyncio
+import threading
+from unittest.mock import Mock
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ServerError(Exception):
+    """Stand-in for an HTTP 503 from a backend."""
+
+    status_code = 503
+
+
+class Throttled(Exception):
+    """Stand-in for an HTTP 429 from a backend."""
+
+    status_code = 429
+
+
+def make_backend(name, fail_with=None, healthy=True):
+    """Helper building a mock backend that replies with its own name."""
+    backend = Mock()
+    backend.last_usage = None
+    if fail_with is not None:
+        backend.conv.side_effect = fail_with
+    else:
+        backend.conv.side_effect = lambda user_message, **kwargs: name
+
+    async def aconv(user_message, **kwargs):
+        return backend.conv(user_message, **kwargs)
+
+    backend.aconv.side_effect = aconv
+    backend.health_check.return_value = healthy
+    return backend
+
+
+def make_router(backends, **kwargs):
+    """Helper building a router over named mock backends."""
+    from src.llms.router_client import RouterClient
+
+    return RouterClient("llama2", list(backends.items()), **kwargs)
+
+
+class TestRouterSelection:
+    """Test suite for backend selection."""
+
+    def test_sticky_routing_by_system_prompt(self):
+        """Test that a system prompt keeps landing on the same backend."""
+        router = make_router({name: make_backend(name) for name in ("a", "b", "c")})
+
+        first = {router.conv("hi", system_message=f"prompt {i}") for i in range(20)}
+        for i in range(20):
+            target = router.conv("hi", system_message="prompt 7")
+            assert target == router.conv("again", system_message="prompt 7")
+        # Different prompts spread over several backends
+        assert len(first) > 1
+
+    def test_least_outstanding_without_stickiness(self):
+        """Test that a busy backend is avoided."""
+        router = make_router({"a": make_backend("a"), "b": make_backend("b")}, sticky=False)
+        router.backends[0].outstanding = 5
+
+        assert {router.conv("hi") for _ in range(5)} == {"b"}
+
+    def test_sticky_backend_skipped_when_overloaded(self):
+        """Test the bounded-load escape from sticky routing."""
+        router = make_router({"a": make_backend("a"), "b": make_backend("b")}, sticky_slack=1)
+        preferred = router.conv("hi", system_message="s")
+        busy = next(b for b in router.backends if b.name == preferred)
+        busy.outstanding = 3
+
+        assert router.conv("hi", system_message="s") != preferred
+
+    def test_outstanding_tracked_during_concurrent_calls(self):
+        """Test that in-flight calls are counted and released."""
+        release = threading.Event()
+        started = threading.Barrier(3)
+
+        def slow(user_message, **kwargs):
+            started.wait()
+            release.wait()
+            return "ok"
+
+        router = make_router({"a": make_backend("a", fail_with=slow), "b": make_backend("b", fail_with=slow)},
+                             sticky=False)
+        threads = [threading.Thread(target=router.conv, args=("hi",)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        started.wait()
+
+        stats = router.router_stats()["backends"]
+        assert stats["a"]["outstanding"] == 1
+        assert stats["b"]["outstanding"] == 1
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert all(s["outstanding"] == 0 for s in router.router_stats()["backends"].values())
+
+    def test_cancelled_aconv_releases_outstanding(self):
+        """Test that cancelling an in-flight aconv() gives its slot back without counting a failure."""
+        backend = make_backend("a")
+
+        async def hang(user_message, **kwargs):
+            await asyncio.Event().wait()
+
+        backend.aconv.side_effect = hang
+        router = make_router({"a": backend})
+
+        async def main():
+            task = asyncio.create_task(router.aconv("hi"))
+            await asyncio.sleep(0)
+            assert router.router_stats()["backends"]["a"]["outstanding"] == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+
+        stats = router.router_stats()["backends"]["a"]
+        assert stats["outstanding"] == 0
+        assert stats["failures"] == 0
+
+    def test_interrupted_conv_releases_outstanding(self):
+        """Test that a KeyboardInterrupt during conv() gives its slot back."""
+        router = make_router({"a": make_backend("a", fail_with=KeyboardInterrupt())})
+
+        with pytest.raises(KeyboardInterrupt):
+            router.conv("hi")
+
+        assert router.router_stats()["backends"]["a"]["outstanding"] == 0
+
+
+class TestRouterFailover:
+    """Test suite for failover, ejection and fallback."""
+
+    def test_backend_error_fails_over(self):
+        """Test that a 5xx moves the call to another backend."""
+        router = make_router({"a": make_backend("a", fail_with=ServerError()), "b": make_backend("b")},
+                             sticky=False)
+
+        assert {router.conv("hi") for _ in range(4)} == {"b"}
+        assert router.router_stats()["failovers"] >= 1
+
+    def test_throttled_backend_fails_over_without_ejection(self):
+        """Test that a 429 fails over but does not count towards ejection."""
+        router = make_router({"a": make_backend("a", fail_with=Throttled()), "b": make_backend("b")},
+                             sticky=False, failure_threshold=1)
+
+        for _ in range(4):
+            assert router.conv("hi") == "b"
+        assert router.router_stats()["backends"]["a"]["ejections"] == 0
+
+    def test_client_errors_are_raised(self):
+        """Test that errors unrelated to backend health are not retried elsewhere."""
+        other = make_backend("b")
+        router = make_router({"a": make_backend("a", fail_with=ValueError("bad")), "b": other}, sticky=False)
+        router.backends[1].outstanding = 1
+
+        with pytest.raises(ValueError):
+            router.conv("hi")
+        other.conv.assert_not_called()
+
+    def test_ejection_and_health_checked_readmission(self):
+        """Test that failing backends are ejected and only return after a passing probe."""
+        clock = FakeClock()
+        failing = make_backend("a", fail_with=ServerError(), healthy=False)
+        router = make_router({"a": failing, "b": make_backend("b")}, sticky=False,
+                             failure_threshold=2, ejection_seconds=10, clock=clock)
+
+        for _ in range(6):
+            router.conv("hi")
+        stats = router.router_stats()["backends"]["a"]
+        assert stats["ejected"] is True
+        assert stats["failures"] == 2
+
+        # The probe fails: ejected again for twice as long
+        clock.now = 11
+        router.conv("hi")
+        assert router.router_stats()["backends"]["a"]["ejections"] == 2
+        assert router.backends[0].ejected_until == pytest.approx(31)
+
+        # The probe passes: readmitted
+        failing.health_check.return_value = True
+        failing.conv.side_effect = lambda user_message, **kwargs: "a"
+        clock.now = 40
+        assert {router.conv("hi") for _ in range(4)} == {"a", "b"}
+        assert router.router_stats()["backends"]["a"]["ejected"] is False
+
+    def test_fallback_used_when_all_backends_fail(self):
+        """Test the OpenAI-style fallback client."""
+        fallback = make_backend("fallback")
+        router = make_router({"a": make_backend("a", fail_with=ServerError()),
+                              "b": make_backend("b", fail_with=ServerError())}, fallback=fallback)
+
+        assert router.conv("hi") == "fallback"
+        assert router.router_stats()["fallback_requests"] == 1
+
+    def test_no_backend_error_without_fallback(self):
+        """Test the error raised when nothing could serve a call."""
+        from src.llms.router_client import NoHealthyBackendError
+
+        router = make_router({"a": make_backend("a", fail_with=ServerError())})
+
+        with pytest.raises(NoHealthyBackendError):
+            router.conv("hi")
+
+    def test_all_ejected_still_tries_a_backend(self):
+        """Test that without a fallback, an ejected backend is used rather than failing outright."""
+        clock = FakeClock()
+        backend = make_backend("a", fail_with=ServerError(), healthy=False)
+        router = make_router({"a": backend}, failure_threshold=1, clock=clock)
+        with pytest.raises(RuntimeError):
+            router.conv("hi")
+        backend.conv.side_effect = lambda user_message, **kwargs: "a"
+
+        assert router.conv("hi") == "a"
+
+    def test_aconv_fails_over(self):
+        """Test failover on the async path."""
+        router = make_router({"a": make_backend("a", fail_with=ServerError()), "b": make_backend("b")},
+                             sticky=False)
+
+        async def main():
+            return await asyncio.gather(*(router.aconv("hi") for _ in range(3)))
+
+        replies = asyncio.run(main())
+        assert set(replies) == {"b"}
+
+
+class TestRouterWithOllama:
+    """End-to-end routing over stub Ollama servers."""
+
+    def test_failover_and_health_check_against_stub_servers(self):
+        """Test that a server returning 503 is skipped and probed via /api/tags."""
+        from src.llms.ollama_client import OllamaClient
+        from src.llms.router_client import RouterClient
+        from tests.llms.ollama_stub import OllamaStubServer
+
+        with OllamaStubServer(content="down", status=503) as bad, OllamaStubServer(content="up") as good:
+            clients = [OllamaClient(model="llama2", base_url=s.base_url) for s in (bad, good)]
+            router = RouterClient("llama2", [(c.base_url, c) for c in clients], sticky=False, failure_threshold=1)
+
+            assert {router.conv("hi") for _ in range(3)} == {"up"}
+            assert router.last_usage.completion_tokens == 3
+            assert clients[0].health_check() is True
+            assert OllamaClient(model="missing", base_url=good.base_url).health_check() is False
+            router.close()
+
+        assert router.router_stats()["backends"][clients[0].base_url]["ejected"] is True
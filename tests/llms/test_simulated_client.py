@@ -0,0 +1,199 @@
+import pytest
+import asyncio
+import json
+
+
+def make_llm(**kwargs):
+    """Helper building a simulated backend that never sleeps."""
+    from src.llms.simulated_client import SimulatedLLM
+
+    options = dict(seed=1, sleep=lambda seconds: None)
+    options.update(kwargs)
+    return SimulatedLLM(**options)
+
+
+SUMMARY_PROMPT = (
+    "Generate 2 different summaries per keyword.\n"
+    "Change context for each summary while keeping it realistic.\n"
+    "Here are the keywords:\n" + json.dumps(["fever at night", "rash on arms", "won't eat"], indent=4)
+)
+
+
+class TestSimulatedReplies:
+    """Test suite for schema-valid simulated replies."""
+
+    def test_summary_schema(self):
+        """Test that summary prompts get per-keyword summaries in the stage schema."""
+        llm = make_llm()
+        reply = json.loads(llm.conv(SUMMARY_PROMPT, max_tokens=10000))
+
+        summaries = reply["summaries"]
+        assert len(summaries) == 6
+        assert all(5 <= len(s["summary"]["text"]) <= 8 for s in summaries)
+        assert [s["summary"]["key_words"][0] for s in summaries[:2]] == ["fever at night"] * 2
+
+    def test_transcription_schema(self):
+        """Test alternating CALLER/NURSE turns."""
+        llm = make_llm()
+        reply = json.loads(llm.conv(
+            "Generate a transcription for the following text:['Baby has a cough.', 'No fever.']",
+            max_tokens=10000,
+        ))
+
+        turns = reply["transcription"]
+        assert len(turns) >= 8
+        assert {t["speaker"] for t in turns} == {"CALLER", "NURSE"}
+        assert all(isinstance(t["text"], str) and t["text"] for t in turns)
+
+    def test_keyword_schema(self):
+        """Test that the requested number of keywords is returned."""
+        llm = make_llm()
+        reply = json.loads(llm.conv("Generate 7 keyword phrases based on the following examples:\n[]"))
+
+        assert len(reply["keywords"]) == 7
+
+    def test_replies_are_deterministic(self):
+        """Test that the same seed and prompt give the same reply."""
+        assert make_llm().conv(SUMMARY_PROMPT, max_tokens=10000) == make_llm().conv(SUMMARY_PROMPT, max_tokens=10000)
+
+    def test_invalid_arguments(self):
+        """Test schema and distribution validation."""
+        with pytest.raises(ValueError):
+            make_llm(schema="xml")
+        with pytest.raises(ValueError):
+            make_llm(latency_distribution="pareto")
+
+
+class TestSimulatedFaults:
+    """Test suite for latency, fault injection and token accounting."""
+
+    def test_latency_includes_decode_time(self):
+        """Test that the sleep covers overhead plus completion tokens / tokens_per_second."""
+        slept = []
+        llm = make_llm(latency_distribution="fixed", latency_mean=0.5, tokens_per_second=100, sleep=slept.append)
+        llm.conv(SUMMARY_PROMPT, max_tokens=10000)
+
+        usage = llm.last_usage
+        assert slept == [pytest.approx(0.5 + usage.completion_tokens / 100)]
+        assert usage.latency == slept[0]
+        assert usage.prompt_tokens == llm.count_tokens("You are a helpful assistant.") + llm.count_tokens(SUMMARY_PROMPT)
+
+    @pytest.mark.parametrize("distribution", ["uniform", "exponential", "lognormal"])
+    def test_latency_distributions_average_out(self, distribution):
+        """Test that sampled latencies center on latency_mean."""
+        slept = []
+        llm = make_llm(latency_distribution=distribution, latency_mean=1.0, latency_sigma=0.2, sleep=slept.append)
+        for _ in range(2000):
+            llm.conv("hi")
+
+        slept.sort()
+        assert slept[0] >= 0
+        assert slept[len(slept) // 2] == pytest.approx(1.0, rel=0.35)
+
+    def test_injected_errors_are_classified(self):
+        """Test that injected failures look like real 503s and 429s to the retry and rate-limit layers."""
+        from src.llms.rate_limiter import is_rate_limit_error
+        from src.llms.retry import is_backend_failure, is_retryable
+        from src.llms.simulated_client import SimulatedRateLimitError, SimulatedServerError
+
+        llm = make_llm(error_rate=0.3, rate_limit_rate=0.3)
+        errors = {SimulatedServerError: 0, SimulatedRateLimitError: 0}
+        for _ in range(500):
+            try:
+                llm.conv("hi")
+            except (SimulatedServerError, SimulatedRateLimitError) as e:
+                errors[type(e)] += 1
+                assert is_retryable(e)
+                assert is_backend_failure(e) == isinstance(e, SimulatedServerError)
+                assert is_rate_limit_error(e) == isinstance(e, SimulatedRateLimitError)
+
+        stats = llm.simulation_stats()
+        assert stats["errors"] == errors[SimulatedServerError] > 100
+        assert stats["rate_limited"] == errors[SimulatedRateLimitError] > 100
+        assert stats["calls"] == 500
+
+    def test_reply_truncated_at_max_tokens(self):
+        """Test that long replies are cut off like real ones and fail to parse."""
+        from src.utils import convert_response_to_json
+
+        llm = make_llm()
+        reply = llm.conv(SUMMARY_PROMPT, max_tokens=50)
+
+        assert len(reply) == 200
+        assert llm.last_usage.completion_tokens == 50
+        assert convert_response_to_json(reply) is None
+        assert llm.simulation_stats()["truncated"] == 1
+
+    def test_random_truncation(self):
+        """Test truncation_rate."""
+        llm = make_llm(truncation_rate=1.0)
+        reply = llm.conv(SUMMARY_PROMPT, max_tokens=10000)
+
+        with pytest.raises(ValueError):
+            json.loads(reply)
+
+    def test_aconv_does_not_block_the_loop(self):
+        """Test that concurrent aconv() calls overlap."""
+        import time
+        from src.llms.simulated_client import SimulatedLLM
+
+        llm = SimulatedLLM(latency_distribution="fixed", latency_mean=0.2, seed=1)
+
+        async def main():
+            return await asyncio.gather(*(llm.aconv("hi") for _ in range(50)))
+
+        started = time.monotonic()
+        replies = asyncio.run(main())
+        assert len(replies) == 50
+        assert time.monotonic() - started < 1.0
+
+
+class TestSimulatedChatModel:
+    """Test suite for the LangChain look-alike."""
+
+    def test_structured_batch_returns_dicts(self):
+        """Test with_structured_output(method="json_mode").batch(...)."""
+        from src.llms.simulated_client import SimulatedChatModel
+
+        model = SimulatedChatModel(make_llm(), max_tokens=10000)
+        conversations = [[("system", "sys"), ("human", SUMMARY_PROMPT)]] * 3
+
+        results = model.with_structured_output(method="json_mode").batch(conversations, config={"max_concurrency": 2})
+
+        assert len(results) == 3
+        assert all(len(r["summaries"]) == 6 for r in results)
+
+    def test_invoke_returns_message_with_usage(self):
+        """Test that invoke() returns an AI message with content and usage metadata."""
+        from src.llms.simulated_client import SimulatedChatModel
+
+        message = SimulatedChatModel(make_llm()).invoke("Generate 3 keyword phrases")
+
+        assert len(json.loads(message.content)["keywords"]) == 3
+        assert message.usage_metadata["output_tokens"] > 0
+
+    def test_batch_return_exceptions(self):
+        """Test that failures are returned in place with return_exceptions=True."""
+        from src.llms.simulated_client import SimulatedChatModel, SimulatedServerError
+
+        model = SimulatedChatModel(make_llm(error_rate=1.0))
+        results = model.batch(["a", "b"], return_exceptions=True)
+
+        assert all(isinstance(r, SimulatedServerError) for r in results)
+        with pytest.raises(SimulatedServerError):
+            model.batch(["a"])
+
+
+class TestSimulatedFactory:
+    """Test suite for get_llm_client('simulated')."""
+
+    def test_factory_passes_simulation_settings(self):
+        """Test that the simulation dict configures the backend."""
+        from src.llms.llm_factory import get_llm_client
+        from src.llms.simulated_client import SimulatedLLM
+
+        client = get_llm_client('simulated', model='gpt-test', simulation={'error_rate': 0.5, 'seed': 3})
+
+        assert isinstance(client, SimulatedLLM)
+        assert client.model == 'gpt-test'
+        assert client.error_rate == 0.5
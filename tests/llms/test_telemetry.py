@@ -0,0 +1,210 @@
+import pytest
+import asyncio
+import json
+
+
+def make_usage_client(usage):
+    """Helper building a concrete client that reports `usage` after every call."""
+    from src.llms.llm_interface import LLMInterface
+
+    class UsageClient(LLMInterface):
+        def conv(self, user_message, system_message="", temperature=0.7, max_tokens=500, **kwargs):
+            self._record_usage(usage)
+            return f"reply to {user_message}"
+
+    return UsageClient(api_key=None, model="m")
+
+
+class TestPercentile:
+    """Test suite for the percentile helper."""
+
+    def test_interpolates_between_values(self):
+        """Test linear interpolation on unsorted input."""
+        from src.llms.telemetry import percentile
+
+        values = [4.0, 1.0, 3.0, 2.0]
+        assert percentile(values, 0.0) == 1.0
+        assert percentile(values, 0.5) == pytest.approx(2.5)
+        assert percentile(values, 1.0) == 4.0
+
+    def test_empty_list(self):
+        """Test that an empty list has no percentile."""
+        from src.llms.telemetry import percentile
+
+        assert percentile([], 0.95) is None
+
+
+class TestCallUsage:
+    """Test suite for CallUsage propagation through the interface and wrappers."""
+
+    def test_default_conv_batch_merges_usage(self):
+        """Test that the sequential conv_batch sums per-call usage."""
+        from src.llms.llm_interface import CallUsage
+
+        client = make_usage_client(CallUsage(prompt_tokens=10, completion_tokens=2, latency=0.5))
+        client.conv_batch(["a", "b", "c"])
+
+        usage = client.last_usage
+        assert usage.prompt_tokens == 30
+        assert usage.completion_tokens == 6
+        assert usage.latency == pytest.approx(1.5)
+        assert usage.requests == 3
+
+    def test_default_aconv_carries_usage_back(self):
+        """Test that usage recorded in the worker thread is visible after the await."""
+        from src.llms.llm_interface import CallUsage
+
+        client = make_usage_client(CallUsage(prompt_tokens=5, completion_tokens=1))
+        asyncio.run(client.aconv("a"))
+
+        assert client.last_usage.prompt_tokens == 5
+
+    def test_last_usage_is_per_thread(self):
+        """Test that a call on another thread does not overwrite this thread's usage."""
+        import threading
+        from src.llms.llm_interface import CallUsage
+
+        client = make_usage_client(CallUsage(prompt_tokens=1))
+        thread = threading.Thread(target=client.conv, args=("a",))
+        thread.start()
+        thread.join()
+
+        assert client.last_usage is None
+
+    def test_wrappers_propagate_usage(self, tmp_path):
+        """Test that cache misses, hits and rate-limit waits show up in the outer last_usage."""
+        from src.llms.llm_interface import CallUsage
+        from src.llms.rate_limiter import AdaptiveRateLimiter, RateLimitedLLMClient
+        from src.llms.response_cache import CachedLLMClient, ResponseCache
+
+        backend = make_usage_client(CallUsage(prompt_tokens=8, completion_tokens=4, latency=0.2))
+        limited = RateLimitedLLMClient(backend, AdaptiveRateLimiter())
+        client = CachedLLMClient(limited, "openai", ResponseCache(str(tmp_path / "c.sqlite")))
+
+        client.conv("a")
+        miss = client.last_usage
+        assert miss.completion_tokens == 4
+        assert miss.from_cache is False
+        assert miss.queue_wait >= 0
+
+        client.conv("a")
+        hit = client.last_usage
+        assert hit.from_cache is True
+        assert hit.completion_tokens is None
+
+
+class TestStageMetrics:
+    """Test suite for StageMetrics."""
+
+    def test_report_aggregates_calls(self):
+        """Test counts, token totals and per-record ratios."""
+        from src.llms.llm_interface import CallUsage
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("summary")
+        metrics.record_call(CallUsage(prompt_tokens=100, completion_tokens=20, latency=1.0, queue_wait=0.5))
+        metrics.record_call(CallUsage(prompt_tokens=50, completion_tokens=10, latency=3.0, attempts=2))
+        metrics.record_call(CallUsage(latency=0.0, from_cache=True))
+        metrics.record_call(None)
+        metrics.record_error(ValueError("bad"))
+        metrics.record_error("InvalidJSON")
+        metrics.record_accepted(3)
+
+        report = metrics.report()
+        assert report["calls"] == 4
+        assert report["cached_calls"] == 1
+        assert report["retried_calls"] == 1
+        assert report["errors"] == 2
+        assert report["errors_by_type"] == {"ValueError": 1, "InvalidJSON": 1}
+        assert report["tokens"] == {"prompt": 150, "completion": 30, "reasoning": 0, "cached": 0, "total": 180}
+        assert report["tokens_per_accepted_record"] == pytest.approx(60.0)
+        # Cached replies do not drag the latency distribution down
+        assert report["latency_seconds"]["p50"] == pytest.approx(2.0)
+        assert report["latency_seconds"]["max"] == 3.0
+        assert report["tokens_per_sec"] == pytest.approx(30 / 4.0)
+
+    def test_generation_seconds_preferred_for_decode_speed(self):
+        """Test that backend-reported decode time is used over wall-clock latency."""
+        from src.llms.llm_interface import CallUsage
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("transcription")
+        metrics.record_call(CallUsage(completion_tokens=50, latency=2.0, generation_seconds=0.5))
+
+        assert metrics.report()["tokens_per_sec"] == pytest.approx(100.0)
+
+    def test_prompt_cache_hit_rates(self):
+        """Test call and token hit rates over calls that report cached tokens."""
+        from src.llms.llm_interface import CallUsage
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("transcription")
+        metrics.record_call(CallUsage(prompt_tokens=1600, cached_tokens=0))
+        metrics.record_call(CallUsage(prompt_tokens=1600, cached_tokens=1536))
+        metrics.record_call(CallUsage(prompt_tokens=1600, cached_tokens=1536))
+        metrics.record_call(CallUsage(prompt_tokens=1600))
+
+        report = metrics.report()
+        assert report["tokens"]["cached"] == 3072
+        assert report["prompt_cache"]["calls"] == 3
+        assert report["prompt_cache"]["hit_rate"] == pytest.approx(2 / 3)
+        assert report["prompt_cache"]["token_hit_rate"] == pytest.approx(3072 / 4800)
+        assert 'baby_calls_llm_prompt_cache_hit_ratio{stage="transcription"} 0.66' in metrics.prometheus_text()
+
+    def test_prompt_cache_unreported(self):
+        """Test that backends without cached-token counts leave the hit rates empty."""
+        from src.llms.llm_interface import CallUsage
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("summary")
+        metrics.record_call(CallUsage(prompt_tokens=10))
+
+        assert metrics.report()["prompt_cache"] == {"calls": 0, "hit_rate": None, "token_hit_rate": None}
+        assert "prompt_cache" not in metrics.prometheus_text()
+
+    def test_prometheus_text(self):
+        """Test the exposition format and that empty metrics are omitted."""
+        from src.llms.llm_interface import CallUsage
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("summary")
+        metrics.record_call(CallUsage(prompt_tokens=10, completion_tokens=5, latency=1.0))
+        metrics.record_error("InvalidJSON")
+
+        text = metrics.prometheus_text()
+        assert "# TYPE baby_calls_llm_calls_total counter" in text
+        assert 'baby_calls_llm_calls_total{stage="summary"} 1' in text
+        assert 'baby_calls_llm_errors_total{stage="summary",type="InvalidJSON"} 1' in text
+        assert 'baby_calls_llm_latency_seconds{stage="summary",quantile="0.95"} 1.0' in text
+        assert 'baby_calls_llm_tokens_total{stage="summary",kind="prompt"} 10' in text
+        # No accepted records yet, so the ratio is left out
+        assert "tokens_per_accepted_record" not in text
+
+    def test_writer_stats(self):
+        """Test that write-behind writer stats appear in the report and the textfile."""
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("summary")
+        assert metrics.report()["writer"] is None
+        assert "writer_" not in metrics.prometheus_text()
+
+        metrics.record_writer({"written": 5, "errors": 1, "fsyncs": 7, "max_queue_depth": 3})
+        assert metrics.report()["writer"]["written"] == 5
+        text = metrics.prometheus_text()
+        assert 'baby_calls_writer_files_total{stage="summary"} 5' in text
+        assert 'baby_calls_writer_errors_total{stage="summary"} 1' in text
+        assert 'baby_calls_writer_queue_depth_max{stage="summary"} 3' in text
+
+    def test_write_creates_both_files(self, tmp_path):
+        """Test that write() produces the JSON report and the textfile."""
+        from src.llms.telemetry import StageMetrics
+
+        metrics = StageMetrics("summary")
+        metrics.record_accepted()
+        json_path, prom_path = metrics.write(str(tmp_path / "out"))
+
+        with open(json_path) as f:
+            assert json.load(f)["accepted_records"] == 1
+        with open(prom_path) as f:
+            assert 'baby_calls_accepted_records_total{stage="summary"} 1' in f.read()
+        assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["summary_metrics.json", "summary_metrics.prom"]
@@ -0,0 +1,110 @@
+import pytest
+import json
+from unittest.mock import patch
+
+
+def make_planner(**kwargs):
+    """Helper building a planner with a trivial prompt builder."""
+    from src.batch_planner import BatchPlanner
+
+    options = dict(
+        build_prompt=lambda keywords: json.dumps(keywords),
+        system_prompt="system",
+        max_completion_tokens=1000,
+        summaries_per_keyword=2,
+        tokens_per_summary=100,
+        target_fill=0.8,
+    )
+    options.update(kwargs)
+    return BatchPlanner(**options)
+
+
+class TestCountTokens:
+    """Test suite for count_tokens."""
+
+    def test_fallback_without_tiktoken(self):
+        """Test the characters-per-token estimate when tiktoken is missing."""
+        from src import batch_planner
+
+        with patch.object(batch_planner, "tiktoken", None):
+            batch_planner._encoding.cache_clear()
+            try:
+                assert batch_planner.count_tokens("abcdefgh") == 2
+                assert batch_planner.count_tokens("abcdefghi") == 3
+                assert batch_planner.count_tokens("") == 0
+            finally:
+                batch_planner._encoding.cache_clear()
+
+
+class TestBatchPlanner:
+    """Test suite for BatchPlanner."""
+
+    def test_packs_to_target_fill(self):
+        """Test that batches stop growing before the completion budget is exceeded."""
+        planner = make_planner()
+        keywords = [f"k{i}" for i in range(10)]
+
+        batches = planner.plan(keywords)
+
+        # Each keyword needs ~2 * 100 tokens, so 3 fit into 0.8 * 1000
+        assert [len(b) for b in batches] == [3, 3, 3, 1]
+        assert sum(batches, []) == keywords
+        assert all(b.completion_tokens <= 800 for b in planner.batches)
+
+    def test_max_batch_size_caps_keywords(self):
+        """Test the optional keyword cap."""
+        planner = make_planner(max_batch_size=2)
+
+        assert [len(b) for b in planner.plan(["a", "b", "c"])] == [2, 1]
+
+    def test_oversized_keyword_gets_own_batch(self):
+        """Test that a keyword over budget is still scheduled alone."""
+        planner = make_planner(tokens_per_summary=1000)
+
+        assert planner.plan(["a", "b"]) == [["a"], ["b"]]
+
+    def test_prompt_budget(self):
+        """Test that max_prompt_tokens also bounds a batch."""
+        planner = make_planner(tokens_per_summary=1, max_prompt_tokens=20)
+        keywords = ["x" * 20] * 4
+
+        batches = planner.plan(keywords)
+
+        assert len(batches) > 1
+        assert all(b.prompt_tokens <= 20 for b in planner.batches)
+
+    def test_invalid_target_fill(self):
+        """Test that target_fill outside (0, 1] is rejected."""
+        with pytest.raises(ValueError):
+            make_planner(target_fill=1.5)
+
+    def test_fill_report_compares_predicted_and_actual(self, tmp_path):
+        """Test per-batch fill ratios, truncation risk and calibration."""
+        planner = make_planner()
+        planner.plan([f"k{i}" for i in range(6)])
+
+        planner.record_actual(0, "reply", completion_tokens=600, summaries=6)
+        planner.record_actual(1, "reply", completion_tokens=990, summaries=4)
+
+        report = planner.fill_report()
+        first, second = report["batches"]
+        assert first["actual_fill"] == pytest.approx(0.6)
+        assert second["actual_fill"] == pytest.approx(0.99)
+        assert first["predicted_fill"] == pytest.approx(first["predicted_completion_tokens"] / 1000, abs=1e-4)
+        assert report["truncation_risk"] == [1]
+        assert report["observed_tokens_per_summary"] == pytest.approx(159.0)
+
+        path = planner.write_report(str(tmp_path))
+        with open(path) as f:
+            assert len(json.load(f)["batches"]) == 2
+
+    def test_actual_counted_from_reply_when_unreported(self):
+        """Test that the reply text is tokenized if the backend reported no usage."""
+        from src.batch_planner import count_tokens
+
+        planner = make_planner()
+        planner.plan(["a"])
+        planner.record_actual(0, "some reply text")
+
+        row = planner.fill_report()["batches"][0]
+        assert row["actual_completion_tokens"] == count_tokens("some reply text")
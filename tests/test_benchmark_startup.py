@@ -0,0 +1,42 @@
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+
+class TestLazyBackendImports:
+    """Startup regression checks for the lazily imported llms package."""
+
+    @pytest.mark.parametrize("module", ["generate_summary", "generate_transcription"])
+    def test_openai_entry_points_skip_torch(self, module):
+        """Test that OpenAI-only entry points never import torch/transformers."""
+        from src.benchmark_startup import measure_startup
+
+        result = measure_startup(module)
+
+        assert "error" not in result, result.get("error")
+        assert result["heavy_modules"] == []
+        assert result["import_seconds"] >= 0
+        assert result["max_rss_mb"] > 0
+
+    def test_package_import_is_lazy(self):
+        """Test that importing llms does not import any backend module."""
+        code = (
+            "import sys, llms; "
+            "print(sorted(m for m in sys.modules if m.startswith('llms.') or m in ('torch', 'openai')))"
+        )
+        proc = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR,
+                              capture_output=True, text=True, check=True)
+
+        assert proc.stdout.strip() == "[]"
+
+    def test_submodules_resolve_on_access(self):
+        """Test that backend modules are still reachable as package attributes."""
+        import src.llms as llms
+
+        assert llms.llm_interface.LLMInterface.__name__ == "LLMInterface"
+        assert "ollama_client" in dir(llms)
+        with pytest.raises(AttributeError):
+            llms.not_a_backend
@@ -3,7 +3,7 @@ import json
 import os
 import tempfile
 from pathlib import Path
-from src.dataset_operations import get_data, save_summaries, create_metadata_file
+from src.dataset_operations import get_data, iter_data, iter_batches, map_bounded, save_summaries, create_metadata_file
 
 
 class TestGetData:
@@ -86,6 +86,106 @@ class TestGetData:
         assert result[2]["data"]["order"] == 3
 
 
+def lacks_transcription(data):
+    """Module-level (picklable) predicate for the process-pool loader."""
+    return "transcription" not in data
+
+
+class TestIterData:
+    """Test suite for the streaming iter_data function."""
+
+    def test_yields_lazily_in_sorted_order(self, tmp_path):
+        """Test that files are read one at a time, in sorted order."""
+        for i in (3, 1, 2):
+            (tmp_path / f"{i}e.json").write_text(json.dumps({"order": i}))
+
+        records = iter_data(str(tmp_path), "*e.json")
+        first = next(records)
+        # A file removed after the first read is reported and skipped
+        (tmp_path / "2e.json").unlink()
+
+        assert first["data"] == {"order": 1}
+        assert [r["data"]["order"] for r in records] == [3]
+
+    def test_predicate_and_projection(self, tmp_path):
+        """Test that filtered documents are dropped and only requested fields kept."""
+        (tmp_path / "1e.json").write_text(json.dumps({"call_id": "a", "summary": "s", "transcription": []}))
+        (tmp_path / "2e.json").write_text(json.dumps({"call_id": "b", "summary": "s", "extra": "x" * 100}))
+        (tmp_path / "3e.json").write_text("{ invalid json }")
+        stats = {}
+
+        result = list(iter_data(str(tmp_path), "*e.json", predicate=lambda d: "transcription" not in d,
+                                fields=("call_id", "summary"), stats=stats))
+
+        assert result == [{"file_path": str(tmp_path / "2e.json"), "data": {"call_id": "b", "summary": "s"}}]
+        assert stats == {"loaded": 1, "filtered": 1, "failed": 1}
+
+    def test_process_pool_matches_sequential(self, tmp_path):
+        """Test that parallel decoding yields the same records, in order, with the same stats."""
+        for i in range(1, 12):
+            doc = {"call_id": str(i), "summary": "s"}
+            if i % 4 == 0:
+                doc["transcription"] = []
+            (tmp_path / f"{i:02d}e.json").write_text(json.dumps(doc))
+        (tmp_path / "12e.json").write_text("{ invalid json }")
+
+        sequential_stats, parallel_stats = {}, {}
+        sequential = list(iter_data(str(tmp_path), "*e.json", predicate=lacks_transcription,
+                                    fields=("call_id",), stats=sequential_stats))
+        parallel = list(iter_data(str(tmp_path), "*e.json", predicate=lacks_transcription,
+                                  fields=("call_id",), stats=parallel_stats, workers=2, chunk_size=3))
+
+        assert parallel == sequential
+        assert [r["data"]["call_id"] for r in parallel] == ["1", "2", "3", "5", "6", "7", "9", "10", "11"]
+        assert parallel_stats == sequential_stats == {"loaded": 9, "filtered": 2, "failed": 1}
+
+    def test_nonexistent_directory(self):
+        """Test that the missing folder is reported on first use."""
+        with pytest.raises(FileNotFoundError, match="Folder not found"):
+            next(iter_data("/nonexistent/path", "*.json"))
+
+
+class TestBoundedProcessing:
+    """Test suite for iter_batches and map_bounded."""
+
+    def test_iter_batches(self):
+        """Test grouping of a lazy iterable."""
+        assert list(iter_batches(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(iter_batches([], 2)) == []
+
+    def test_map_bounded_limits_items_read_ahead(self):
+        """Test that the input is consumed only as tasks complete."""
+        import threading
+
+        lock = threading.Lock()
+        state = {"read": 0, "done": 0, "max_ahead": 0}
+
+        def items():
+            for i in range(50):
+                with lock:
+                    state["read"] += 1
+                    state["max_ahead"] = max(state["max_ahead"], state["read"] - state["done"])
+                yield i
+
+        def work(i):
+            with lock:
+                state["done"] += 1
+            return i * 2
+
+        results = list(map_bounded(work, items(), max_workers=2, max_pending=4))
+
+        assert sorted(results) == [i * 2 for i in range(50)]
+        assert state["max_ahead"] <= 4
+
+    def test_map_bounded_propagates_errors(self):
+        """Test that an exception in a task is raised to the consumer."""
+        def work(i):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            list(map_bounded(work, [1], max_workers=1))
+
+
 class TestSaveSummaries:
     """Test suite for save_summaries function."""
 
@@ -182,6 +282,34 @@ class TestSaveSummaries:
             assert "кириллицей" in data["summary"]["text"][0]
             assert "🎉" in data["summary"]["text"][0]
 
+    def test_save_summaries_with_writer(self, tmp_path):
+        """Test that queued files get consecutive numbers across calls and land on disk."""
+        from src.write_behind import WriteBehindWriter
+
+        with WriteBehindWriter() as writer:
+            next_number = save_summaries([{"a": 1}, {"a": 2}], str(tmp_path), "e.json", writer=writer)
+            assert next_number == 3
+            # The first files may still be queued, so the caller passes the number on
+            next_number = save_summaries([{"a": 3}], str(tmp_path), "e.json", writer=writer, start_index=next_number)
+            assert next_number == 4
+
+        assert sorted(os.listdir(tmp_path)) == ["1e.json", "2e.json", "3e.json"]
+        with open(tmp_path / "3e.json") as f:
+            assert json.load(f)["a"] == 3
+
+    def test_save_summaries_to_store(self, tmp_path):
+        """Test that records go to the given store, numbered after its last record."""
+        from src.dataset_store import open_store
+
+        with open_store("sqlite", str(tmp_path / "store")) as store:
+            store.put(4, {"call_id": "4-record-1_ms"})
+            next_number = save_summaries([{"a": 1}, {"a": 2}], str(tmp_path), "e.json", store=store)
+
+            assert next_number == 7
+            assert store.keys() == [4, 5, 6]
+            assert store.get(6)["a"] == 2
+            assert store.get(6)["call_id"].startswith("6-record-")
+
 
 class TestCreateMetadataFile:
     """Test suite for create_metadata_file function."""
@@ -0,0 +1,218 @@
+import pytest
+import json
+import os
+
+
+STORE_KINDS = ["json_dir", "sharded_dir", "jsonl", "sqlite"]
+
+
+def record(number, **extra):
+    """Helper building a pipeline-shaped record."""
+    return {"call_id": f"{number}-record-1700000000000_ms", "summary": {"text": [f"Call {number}"]}, **extra}
+
+
+@pytest.mark.parametrize("kind", STORE_KINDS)
+class TestDatasetStores:
+    """Behaviour every dataset store backend shares."""
+
+    def test_put_get_and_keys(self, tmp_path, kind):
+        """Test storing, reading back and numbering records."""
+        from src.dataset_store import open_store
+
+        with open_store(kind, str(tmp_path)) as store:
+            assert store.next_key() == 1
+            store.put_many([(i, record(i), None) for i in (1, 2, 5)])
+
+            assert store.keys() == [1, 2, 5]
+            assert store.count() == 3
+            assert store.next_key() == 6
+            assert store.get(2) == record(2)
+            assert store.get(3) is None
+
+    def test_replace_keeps_latest_version(self, tmp_path, kind):
+        """Test that putting an existing key replaces the record."""
+        from src.dataset_store import open_store
+
+        with open_store(kind, str(tmp_path)) as store:
+            store.put(1, record(1))
+            store.put(1, record(1, transcription=[{"speaker": "NURSE", "text": "Hi"}]))
+
+            assert store.count() == 1
+            assert "transcription" in store.get(1)
+            assert [item["data"] for item in store.iter_records()] == [store.get(1)]
+
+    def test_iter_records_filters_and_projects(self, tmp_path, kind):
+        """Test predicate, fields, stats and key selection."""
+        from src.dataset_store import open_store
+
+        with open_store(kind, str(tmp_path)) as store:
+            store.put_many([(i, record(i), None) for i in range(1, 5)])
+            store.put(3, record(3, transcription=[]))
+
+            stats = {}
+            items = list(store.iter_records(
+                predicate=lambda doc: "transcription" not in doc, fields=("call_id",), stats=stats,
+            ))
+            assert [item["key"] for item in items] == [1, 2, 4]
+            assert items[0]["data"] == {"call_id": "1-record-1700000000000_ms"}
+            assert items[0]["file_path"] == store.location(1)
+            assert stats == {"loaded": 3, "filtered": 1, "failed": 0}
+
+            assert sorted(item["key"] for item in store.iter_records(keys=[4, 2, 9])) == [2, 4]
+
+    def test_callbacks_get_location(self, tmp_path, kind):
+        """Test that put callbacks report where each record was written."""
+        from src.dataset_store import open_store
+
+        written = []
+        with open_store(kind, str(tmp_path)) as store:
+            store.put(7, record(7), callback=lambda location, error: written.append((location, error)))
+            assert written == [(store.location(7), None)]
+
+    def test_reopen_persists(self, tmp_path, kind):
+        """Test that records survive closing and reopening the store."""
+        from src.dataset_store import open_store
+
+        with open_store(kind, str(tmp_path)) as store:
+            store.put_many([(i, record(i), None) for i in range(1, 4)])
+            store.put(2, record(2, transcription=[]))
+
+        with open_store(kind, str(tmp_path)) as store:
+            assert store.keys() == [1, 2, 3]
+            assert "transcription" in store.get(2)
+            store.put(4, record(4))
+            assert store.next_key() == 5
+
+    def test_migrate_roundtrip(self, tmp_path, kind):
+        """Test migrating into every other backend and back keeps numbers and content."""
+        from src.dataset_store import migrate, open_store
+
+        with open_store(kind, str(tmp_path / "source")) as source:
+            source.put_many([(i, record(i), None) for i in (1, 2, 10)])
+            for other in STORE_KINDS:
+                with open_store(other, str(tmp_path / other)) as target:
+                    assert migrate(source, target, batch_size=2) == 3
+                    assert target.keys() == [1, 2, 10]
+                    assert target.get(10) == record(10)
+
+                    with open_store(kind, str(tmp_path / f"back_{other}")) as back:
+                        migrate(target, back)
+                        assert {item["key"]: item["data"] for item in back.iter_records()} == \
+                            {i: record(i) for i in (1, 2, 10)}
+
+
+class TestDirectoryStores:
+    """Test suite for the file-per-record backends."""
+
+    def test_json_dir_uses_original_layout(self, tmp_path):
+        """Test that json_dir reads and writes the numbered files the pipeline always wrote."""
+        from src.dataset_store import open_store
+
+        (tmp_path / "3e.json").write_text(json.dumps(record(3)))
+        (tmp_path / "keywords.json").write_text("{}")
+        with open_store("json_dir", str(tmp_path)) as store:
+            assert store.keys() == [3]
+            store.put(4, record(4))
+        assert json.loads((tmp_path / "4e.json").read_text()) == record(4)
+
+    def test_sharded_dir_spreads_files(self, tmp_path):
+        """Test that sharded_dir puts files in two-hex-digit subdirectories."""
+        from src.dataset_store import open_store
+
+        with open_store("sharded_dir", str(tmp_path)) as store:
+            store.put_many([(i, record(i), None) for i in range(1, 50)])
+            shards = {os.path.basename(os.path.dirname(store.location(i))) for i in range(1, 50)}
+
+        assert len(shards) > 10
+        assert all(len(shard) == 2 for shard in shards)
+        assert not [name for name in os.listdir(tmp_path) if name.endswith("e.json")]
+
+    def test_writes_through_background_writer(self, tmp_path):
+        """Test that a store with a writer hands files to it."""
+        from src.dataset_store import open_store
+        from src.write_behind import WriteBehindWriter
+
+        written = []
+        with WriteBehindWriter() as writer:
+            store = open_store("sharded_dir", str(tmp_path), writer=writer)
+            store.put(1, record(1), callback=lambda location, error: written.append(location))
+            store.flush()
+            assert written == [store.location(1)]
+            assert writer.stats()["written"] == 1
+            assert store.get(1) == record(1)
+
+    @pytest.mark.parametrize("kind", ["jsonl", "sqlite"])
+    def test_synchronous_stores_refuse_a_writer(self, tmp_path, kind):
+        """Test that backends which write synchronously reject a background writer."""
+        from src.dataset_store import open_store, supports_writer
+        from src.write_behind import WriteBehindWriter
+
+        assert not supports_writer(kind)
+        assert supports_writer("json_dir") and supports_writer("sharded_dir")
+        assert not supports_writer("unknown")
+        with WriteBehindWriter() as writer:
+            with pytest.raises(ValueError):
+                open_store(kind, str(tmp_path), writer=writer)
+
+
+class TestJsonlStore:
+    """Test suite for the JSONL shard backend."""
+
+    def test_rolls_shards_by_size(self, tmp_path):
+        """Test that a new shard starts once the active one reaches max_shard_bytes."""
+        from src.dataset_store import open_store
+
+        with open_store("jsonl", str(tmp_path), max_shard_bytes=500) as store:
+            store.put_many([(i, record(i), None) for i in range(1, 21)])
+            assert store.get(1) == record(1)
+            assert store.get(20) == record(20)
+            assert [item["key"] for item in store.iter_records()] == list(range(1, 21))
+
+        shards = sorted(os.listdir(tmp_path))
+        assert len(shards) > 1
+        assert all(os.path.getsize(tmp_path / name) < 500 + 200 for name in shards)
+
+    def test_torn_last_line_is_dropped(self, tmp_path):
+        """Test that a partially written line from an interrupted append is ignored and truncated."""
+        from src.dataset_store import open_store
+
+        with open_store("jsonl", str(tmp_path)) as store:
+            store.put_many([(i, record(i), None) for i in (1, 2)])
+        with open(tmp_path / "shard-000000.jsonl", "ab") as f:
+            f.write(b'{"key": 3, "data": {"call')
+
+        with open_store("jsonl", str(tmp_path)) as store:
+            assert store.keys() == [1, 2]
+            store.put(3, record(3))
+            assert [item["key"] for item in store.iter_records()] == [1, 2, 3]
+
+    def test_zstd_compresses_sealed_shards(self, tmp_path):
+        """Test that sealed shards are compressed and still readable."""
+        pytest.importorskip("zstandard")
+        from src.dataset_store import open_store
+
+        with open_store("jsonl", str(tmp_path), max_shard_bytes=500, compression="zstd") as store:
+            store.put_many([(i, record(i), None) for i in range(1, 21)])
+            assert store.get(2) == record(2)
+
+        assert any(name.endswith(".jsonl.zst") for name in os.listdir(tmp_path))
+        with open_store("jsonl", str(tmp_path), compression="zstd") as store:
+            assert [item["key"] for item in store.iter_records()] == list(range(1, 21))
+
+    def test_unknown_compression(self, tmp_path):
+        """Test that unsupported compression is rejected."""
+        from src.dataset_store import open_store
+
+        with pytest.raises(ValueError):
+            open_store("jsonl", str(tmp_path), compression="gzip")
+
+
+class TestOpenStore:
+    """Test suite for open_store."""
+
+    def test_unknown_store(self, tmp_path):
+        """Test that an unknown backend name raises ValueError."""
+        from src.dataset_store import open_store
+
+        with pytest.raises(ValueError, match="Unsupported dataset store"):
+            open_store("parquet", str(tmp_path))
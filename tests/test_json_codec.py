@@ -0,0 +1,79 @@
+import pytest
+import json
+
+
+RECORD = {
+    "call_id": "1-record-1700000000001_ms",
+    "participants": ["CALLER", "NURSE"],
+    "transcription": [{"speaker": "CALLER", "text": "She won’t eat, temp 38.5"}],
+    "summary": {"text": ["Fever."], "key_words": ["fever"]},
+}
+
+
+class TestJsonCodec:
+    """Test suite for the pluggable JSON codecs."""
+
+    def test_stdlib_output_matches_previous_layout(self):
+        """Test that the stdlib codec writes exactly what json.dump(indent=2, ensure_ascii=False) did."""
+        from src.json_codec import get_codec
+
+        expected = json.dumps(RECORD, indent=2, ensure_ascii=False).encode("utf-8")
+        assert get_codec("json").dumps(RECORD) == expected
+        assert get_codec("json").loads(expected) == RECORD
+
+    def test_orjson_matches_stdlib(self):
+        """Test that the fast path produces the same bytes for dataset records."""
+        pytest.importorskip("orjson")
+        from src.json_codec import get_codec
+
+        assert get_codec("orjson").dumps(RECORD) == get_codec("json").dumps(RECORD)
+        assert get_codec("orjson").dumps(RECORD, indent=False) == json.dumps(
+            RECORD, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def test_orjson_falls_back_for_unsupported_objects(self):
+        """Test that documents orjson rejects are still encoded."""
+        pytest.importorskip("orjson")
+        from src.json_codec import get_codec
+
+        assert json.loads(get_codec("orjson").dumps({1: 2**70})) == {"1": 2**70}
+
+    def test_decode_errors_are_json_decode_errors(self):
+        """Test that every codec raises json.JSONDecodeError on invalid input."""
+        from src.json_codec import CODECS, get_codec
+
+        for name in CODECS:
+            with pytest.raises(json.JSONDecodeError):
+                get_codec(name).loads(b"{ invalid json }")
+
+    def test_unknown_codec(self):
+        """Test that an unknown codec name is rejected."""
+        from src.json_codec import get_codec
+
+        with pytest.raises(ValueError, match="Unsupported JSON codec"):
+            get_codec("msgpack")
+
+    def test_read_write_round_trip(self, tmp_path):
+        """Test write_json()/read_json() with the default codec."""
+        from src.json_codec import read_json, write_json
+
+        path = str(tmp_path / "1e.json")
+        write_json(path, RECORD)
+
+        assert read_json(path) == RECORD
+        with open(path, encoding="utf-8") as f:
+            assert f.read().startswith('{\n  "call_id"')
+
+
+class TestBenchmarkDatasetIO:
+    """Smoke test for the dataset I/O benchmark."""
+
+    def test_benchmark_size_reports_throughput(self):
+        """Test one row per codec with positive throughputs."""
+        from src.benchmark_dataset_io import benchmark_size
+
+        rows = benchmark_size(20, codecs=["json"], workers=2)
+
+        assert [row["codec"] for row in rows] == ["json"]
+        assert rows[0]["files"] == 20
+        assert rows[0]["load_files_per_sec"] > 0
+        assert rows[0]["parallel_load_files_per_sec"] > 0
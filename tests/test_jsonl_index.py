@@ -0,0 +1,153 @@
+import pytest
+import json
+import os
+import random
+
+
+def write_corpus(path, count):
+    """Helper writing a JSONL corpus of pipeline-shaped records."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(1, count + 1):
+            f.write(json.dumps({"call_id": f"{i}-record", "summary": {"key_words": [f"fever {i}"]}}) + "\n")
+    return str(path)
+
+
+class TestWriteJsonl:
+    """Test suite for write_jsonl."""
+
+    def test_writes_one_record_per_line(self, tmp_path):
+        """Test that records are written as single lines and counted."""
+        from src.jsonl_index import write_jsonl
+
+        path = tmp_path / "corpus.jsonl"
+        count = write_jsonl(str(path), iter([{"a": 1}, {"b": "Тест"}]))
+
+        assert count == 2
+        assert [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()] == [{"a": 1}, {"b": "Тест"}]
+        assert os.listdir(tmp_path) == ["corpus.jsonl"]
+
+
+class TestIsStale:
+    """Test suite for is_stale."""
+
+    def test_tracks_source_changes(self, tmp_path):
+        """Test that the export is stale when missing, when a source file is newer, or when files are added."""
+        from src.jsonl_index import is_stale
+
+        source = tmp_path / "data"
+        source.mkdir()
+        (source / "1e.json").write_text("{}")
+        (source / "notes.txt").write_text("")
+        export = tmp_path / "data.jsonl"
+        assert is_stale(str(export), str(source), "*e.json")
+
+        export.write_text("{}\n")
+        os.utime(export, ns=(10**18, 10**18))
+        os.utime(source, ns=(1, 1))
+        os.utime(source / "1e.json", ns=(1, 1))
+        assert not is_stale(str(export), str(source), "*e.json")
+
+        os.utime(source / "notes.txt", ns=(2 * 10**18, 2 * 10**18))
+        assert not is_stale(str(export), str(source), "*e.json")
+
+        os.utime(source / "1e.json", ns=(2 * 10**18, 2 * 10**18))
+        assert is_stale(str(export), str(source), "*e.json")
+
+        os.utime(source / "1e.json", ns=(1, 1))
+        (source / "2e.json").write_text("{}")
+        assert is_stale(str(export), str(source), "*e.json")
+
+
+class TestIndexedJsonlReader:
+    """Test suite for the offset-indexed JSONL reader."""
+
+    def test_random_access(self, tmp_path):
+        """Test length, positional access and out-of-range positions."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        with IndexedJsonlReader(write_corpus(tmp_path / "corpus.jsonl", 100)) as reader:
+            assert len(reader) == 100
+            assert reader[0]["call_id"] == "1-record"
+            assert reader[-1]["call_id"] == "100-record"
+            with pytest.raises(IndexError):
+                reader[100]
+
+    def test_lookup_by_id(self, tmp_path):
+        """Test lookup by call_id decodes only the record found."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        path = write_corpus(tmp_path / "corpus.jsonl", 100)
+        with IndexedJsonlReader(path) as reader:
+            assert reader.lookup("42-record")["summary"]["key_words"] == ["fever 42"]
+            assert reader.lookup("missing") is None
+            assert reader.parsed == 1
+
+    def test_sample_parses_only_sampled_records(self, tmp_path):
+        """Test that sampling decodes exactly the records it returns."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        path = write_corpus(tmp_path / "corpus.jsonl", 1000)
+        IndexedJsonlReader(path).close()
+
+        with IndexedJsonlReader(path) as reader:
+            sampled = reader.sample(5, rng=random.Random(42))
+            assert reader.parsed == 5
+            assert len({record["call_id"] for record in sampled}) == 5
+            assert sampled == reader.sample(5, rng=random.Random(42))
+            assert len(reader.sample(5000)) == 1000
+
+    def test_index_is_saved_and_reused(self, tmp_path):
+        """Test that the index is written next to the file and loaded on the next open."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        path = write_corpus(tmp_path / "corpus.jsonl", 10)
+        with IndexedJsonlReader(path) as reader:
+            assert reader.built
+        assert os.path.exists(path + ".idx")
+
+        with IndexedJsonlReader(path) as reader:
+            assert not reader.built
+            assert reader.lookup("7-record")["call_id"] == "7-record"
+
+    def test_index_rebuilt_when_file_changes(self, tmp_path):
+        """Test that a stale index is detected and rebuilt."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        path = write_corpus(tmp_path / "corpus.jsonl", 10)
+        IndexedJsonlReader(path).close()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"call_id": "new"}) + "\n")
+
+        with IndexedJsonlReader(path) as reader:
+            assert reader.built
+            assert len(reader) == 11
+            assert reader.lookup("new") == {"call_id": "new"}
+
+    def test_skips_blank_and_invalid_lines(self, tmp_path):
+        """Test that blank and undecodable lines are left out of the index."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        path = tmp_path / "corpus.jsonl"
+        path.write_text('{"call_id": "a"}\n\nnot json\n{"call_id": "b"}')
+
+        with IndexedJsonlReader(str(path)) as reader:
+            assert len(reader) == 2
+            assert reader[0] == {"call_id": "a"}
+            assert reader[1] == {"call_id": "b"}
+
+    def test_empty_file(self, tmp_path):
+        """Test that an empty corpus opens and samples nothing."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        path = tmp_path / "corpus.jsonl"
+        path.write_text("")
+        with IndexedJsonlReader(str(path)) as reader:
+            assert len(reader) == 0
+            assert reader.sample(5) == []
+
+    def test_missing_file(self, tmp_path):
+        """Test that a missing corpus raises FileNotFoundError."""
+        from src.jsonl_index import IndexedJsonlReader
+
+        with pytest.raises(FileNotFoundError):
+            IndexedJsonlReader(str(tmp_path / "missing.jsonl"))
@@ -26,6 +26,15 @@ class TestGetLLMClient:
         # Verify correct client instance returned
         assert client == mock_client_instance
 
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_openai_with_prompt_cache_key(self, mock_chatgpt_client):
+        """Test that prompt_cache_key is passed through to ChatGPTClient."""
+        from src.llms.llm_factory import get_llm_client
+
+        get_llm_client('openai', api_key='test-api-key', model='gpt-4', prompt_cache_key='stage')
+
+        mock_chatgpt_client.assert_called_once_with(api_key='test-api-key', model='gpt-4', prompt_cache_key='stage')
+
     @patch('src.llms.openai_api.ChatGPTClient')
     @patch('src.llms.llm_factory.os.getenv')
     def test_openai_with_env_var(self, mock_getenv, mock_chatgpt_client):
@@ -320,3 +329,302 @@ class TestGetLLMClient:
             device=None
         )
 
+
+
+    @patch('src.llms.ollama_client.OllamaClient')
+    @patch('src.llms.llm_factory.os.getenv')
+    def test_ollama_with_pool_size(self, mock_getenv, mock_ollama_client):
+        """Test that pool_size is forwarded to the Ollama client when given."""
+        from src.llms.llm_factory import get_llm_client
+
+        mock_getenv.return_value = None
+
+        get_llm_client('ollama', model='llama2', pool_size=16)
+
+        mock_ollama_client.assert_called_once_with(
+            model='llama2',
+            api_key=None,
+            base_url=None,
+            timeout=120,
+            pool_size=16
+        )
+
+
+    @patch('src.llms.ollama_client.OllamaClient')
+    @patch('src.llms.llm_factory.os.getenv')
+    def test_ollama_with_streaming(self, mock_getenv, mock_ollama_client):
+        """Test that streaming options are forwarded to the Ollama client."""
+        from src.llms.llm_factory import get_llm_client
+
+        mock_getenv.return_value = None
+
+        get_llm_client('ollama', model='llama2', stream=True, stop_on_json_close=False)
+
+        mock_ollama_client.assert_called_once_with(
+            model='llama2',
+            api_key=None,
+            base_url=None,
+            timeout=120,
+            stream=True,
+            stop_on_json_close=False
+        )
+
+
+    @patch('src.llms.huggingface_client.HuggingFaceLLM')
+    @patch('src.llms.llm_factory.os.getenv')
+    def test_huggingface_with_quantization(self, mock_getenv, mock_hf_client):
+        """Test that quantization is forwarded to the HuggingFace client when given."""
+        from src.llms.llm_factory import get_llm_client
+
+        mock_getenv.return_value = None
+
+        get_llm_client('huggingface', model='gpt2', device='cpu', quantization='int8')
+
+        mock_hf_client.assert_called_once_with(
+            model_id='gpt2',
+            api_key=None,
+            device='cpu',
+            quantization='int8'
+        )
+
+
+class TestPooledLLMClient:
+    """Test suite for get_llm_client(pooled=True)."""
+
+    def setup_method(self):
+        from src.llms.llm_factory import clear_client_registry
+        clear_client_registry()
+
+    def teardown_method(self):
+        from src.llms.llm_factory import clear_client_registry
+        clear_client_registry()
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    @patch('src.llms.llm_factory.os.getenv')
+    def test_pooled_openai_client_is_reused(self, mock_getenv, mock_chatgpt_client):
+        """Test that pooled OpenAI clients are built once and shared."""
+        from src.llms.llm_factory import get_llm_client, get_client_stats
+
+        mock_getenv.return_value = 'env-key'
+        mock_chatgpt_client.side_effect = lambda **kwargs: Mock()
+
+        first = get_llm_client('openai', model='gpt-4', pooled=True)
+        second = get_llm_client('openai', model='gpt-4', pooled=True)
+        other = get_llm_client('openai', model='gpt-5', pooled=True)
+
+        assert first is second
+        assert other is not first
+        assert mock_chatgpt_client.call_count == 2
+        stats = get_client_stats()
+        assert stats['constructions'] == 2
+        assert stats['hits'] == 1
+
+    @patch('src.llms.ollama_client.OllamaClient')
+    def test_pooled_key_covers_every_setting(self, mock_ollama_client):
+        """Test that pooled clients built with different settings are not shared."""
+        from src.llms.llm_factory import get_llm_client
+
+        mock_ollama_client.side_effect = lambda **kwargs: Mock()
+
+        plain = get_llm_client('ollama', model='llama3', pooled=True)
+        assert get_llm_client('ollama', model='llama3', pooled=True) is plain
+        assert get_llm_client('ollama', model='llama3', stream=True, pooled=True) is not plain
+        assert get_llm_client('ollama', model='llama3', timeout=5, pooled=True) is not plain
+        assert get_llm_client('ollama', model='llama3', pool_size=4, pooled=True) is not plain
+        assert get_llm_client('router', model='llama3', base_urls=['http://a'], pooled=True) is not \
+            get_llm_client('router', model='llama3', base_urls=['http://b'], pooled=True)
+
+    @patch('src.llms.huggingface_client.HuggingFaceLLM')
+    @patch('src.llms.llm_factory.os.getenv')
+    def test_pooled_huggingface_loads_model_once(self, mock_getenv, mock_hf_client):
+        """Test that pooled HuggingFace clients load weights once for sequential calls."""
+        from src.llms.llm_factory import get_llm_client, get_client_stats
+
+        mock_getenv.return_value = None
+        instance = Mock()
+        instance.conv.return_value = "generated"
+        mock_hf_client.return_value = instance
+
+        for _ in range(5):
+            client = get_llm_client('huggingface', model='gpt2', device='cpu', pooled=True)
+            assert client.conv("Hello") == "generated"
+
+        mock_hf_client.assert_called_once_with(model_id='gpt2', api_key=None, device='cpu')
+        stats = get_client_stats()
+        assert stats['model_loads'] == 1
+        assert stats['clients'] == 1
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_unpooled_calls_still_construct_new_clients(self, mock_chatgpt_client):
+        """Test that the default path is unaffected by the registry."""
+        from src.llms.llm_factory import get_llm_client, get_client_stats
+
+        get_llm_client('openai', model='gpt-4')
+        get_llm_client('openai', model='gpt-4')
+
+        assert mock_chatgpt_client.call_count == 2
+        assert get_client_stats() == {'clients': 0}
+
+    def test_pooled_invalid_client_type(self):
+        """Test that pooled lookups still reject unsupported client types."""
+        from src.llms.llm_factory import get_llm_client
+
+        with pytest.raises(ValueError, match='Unsupported client_type'):
+            get_llm_client('invalid_provider', model='test', pooled=True)
+
+
+class TestResponseCacheWrapping:
+    """Test suite for get_llm_client(cache_policy=...)."""
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    @patch('src.llms.llm_factory.os.getenv')
+    def test_cache_policy_wraps_client(self, mock_getenv, mock_chatgpt_client, tmp_path):
+        """Test that a cache policy returns a CachedLLMClient around the backend."""
+        from src.llms.llm_factory import get_llm_client
+        from src.llms.response_cache import CachedLLMClient
+
+        mock_getenv.return_value = 'env-key'
+
+        client = get_llm_client('openai', model='gpt-4', cache_policy='read_through',
+                                cache_path=str(tmp_path / 'cache.sqlite'))
+
+        assert isinstance(client, CachedLLMClient)
+        assert client.client is mock_chatgpt_client.return_value
+        assert client.policy == 'read_through'
+        mock_chatgpt_client.assert_called_once_with(api_key='env-key', model='gpt-4')
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_cache_policy_off_returns_backend(self, mock_chatgpt_client):
+        """Test that cache_policy='off' leaves the client unwrapped."""
+        from src.llms.llm_factory import get_llm_client
+
+        client = get_llm_client('openai', model='gpt-4', cache_policy='off')
+
+        assert client is mock_chatgpt_client.return_value
+
+    def test_invalid_cache_policy(self):
+        """Test that unknown cache policies raise ValueError."""
+        from src.llms.llm_factory import get_llm_client
+
+        with pytest.raises(ValueError, match='Unsupported cache_policy'):
+            get_llm_client('openai', model='gpt-4', cache_policy='sometimes')
+
+
+class TestRetryWrapping:
+    """Test suite for get_llm_client(retry_attempts=...)."""
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_retry_wraps_outside_rate_limiter(self, mock_chatgpt_client):
+        """Test that retries wrap the rate limiter so every attempt is rate limited."""
+        from src.llms.llm_factory import get_llm_client
+        from src.llms.rate_limiter import RateLimitedLLMClient
+        from src.llms.retry import RetryingLLMClient
+
+        client = get_llm_client('openai', model='gpt-4', retry_attempts=3, rate_limit=True)
+
+        assert isinstance(client, RetryingLLMClient)
+        assert isinstance(client.client, RateLimitedLLMClient)
+        assert client.client.client is mock_chatgpt_client.return_value
+        assert client.policy.max_attempts == 3
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_breaker_max_pause_passed_to_retries(self, mock_chatgpt_client):
+        """Test that breaker_max_pause reaches the retrying wrapper and not the backend."""
+        from src.llms.llm_factory import get_llm_client
+
+        client = get_llm_client('openai', model='gpt-4', retry_attempts=3, breaker_max_pause=30)
+
+        assert client.max_pause == 30
+        mock_chatgpt_client.assert_called_once()
+        assert 'breaker_max_pause' not in mock_chatgpt_client.call_args.kwargs
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_single_attempt_disables_retry(self, mock_chatgpt_client):
+        """Test that retry_attempts=1 leaves the client unwrapped."""
+        from src.llms.llm_factory import get_llm_client
+
+        assert get_llm_client('openai', model='gpt-4', retry_attempts=1) is mock_chatgpt_client.return_value
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_retry_stats_shared_across_clients(self, mock_chatgpt_client):
+        """Test that a freshly built client reports the retries of earlier clients for the same backend."""
+        from src.llms.llm_factory import get_llm_client
+        from src.llms.retry import clear_circuit_breakers
+
+        clear_circuit_breakers()
+        try:
+            mock_chatgpt_client.return_value.conv.side_effect = [TimeoutError("slow"), "ok"]
+            first = get_llm_client('openai', model='gpt-4', retry_attempts=3)
+            first._sleep = lambda seconds: None
+            assert first.conv("hi") == "ok"
+
+            stats = get_llm_client('openai', model='gpt-4', retry_attempts=3).retry_stats()
+            assert stats["calls"] == 1
+            assert stats["retries"] == 1
+            assert get_llm_client('openai', model='gpt-3.5', retry_attempts=3).retry_stats()["calls"] == 0
+        finally:
+            clear_circuit_breakers()
+
+
+class TestRouterClientType:
+    """Test suite for get_llm_client('router', ...)."""
+
+    @patch('src.llms.ollama_client.OllamaClient')
+    def test_router_builds_one_ollama_client_per_url(self, mock_ollama_client):
+        """Test that every base URL gets its own OllamaClient."""
+        from src.llms.llm_factory import get_llm_client
+        from src.llms.router_client import RouterClient
+
+        client = get_llm_client('router', model='llama2', base_urls=['http://a:11434', 'http://b:11434'],
+                                timeout=60, stream=True)
+
+        assert isinstance(client, RouterClient)
+        assert [b.name for b in client.backends] == ['http://a:11434', 'http://b:11434']
+        assert client.fallback is None
+        mock_ollama_client.assert_any_call(model='llama2', api_key=None, base_url='http://b:11434',
+                                           timeout=60, stream=True)
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    @patch('src.llms.ollama_client.OllamaClient')
+    @patch.dict('os.environ', {'OLLAMA_BASE_URLS': 'http://a:11434, http://b:11434'})
+    def test_router_reads_env_urls_and_fallback(self, mock_ollama_client, mock_chatgpt_client):
+        """Test OLLAMA_BASE_URLS parsing and the OpenAI fallback."""
+        from src.llms.llm_factory import get_llm_client
+
+        client = get_llm_client('router', model='llama2', fallback_model='gpt-4', failure_threshold=2)
+
+        assert [b.name for b in client.backends] == ['http://a:11434', 'http://b:11434']
+        assert client.fallback is mock_chatgpt_client.return_value
+        assert client.failure_threshold == 2
+        assert mock_chatgpt_client.call_args[1]['model'] == 'gpt-4'
+
+
+class TestHedgeWrapping:
+    """Test suite for get_llm_client(hedge_quantile=...)."""
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_hedging_wraps_outside_retries(self, mock_chatgpt_client):
+        """Test that each hedge goes through its own retries and a shared policy."""
+        from src.llms.hedging import HedgedLLMClient, clear_hedge_policies
+        from src.llms.llm_factory import get_llm_client
+        from src.llms.retry import RetryingLLMClient
+
+        clear_hedge_policies()
+        try:
+            client = get_llm_client('openai', model='gpt-4', hedge_quantile=0.9, hedge_budget=0.1, retry_attempts=3)
+            again = get_llm_client('openai', model='gpt-4', hedge_quantile=0.9)
+
+            assert isinstance(client, HedgedLLMClient)
+            assert isinstance(client.client, RetryingLLMClient)
+            assert client.policy is again.policy
+            assert client.policy.quantile == 0.9
+            assert client.policy.budget == 0.1
+        finally:
+            clear_hedge_policies()
+
+    @patch('src.llms.openai_api.ChatGPTClient')
+    def test_no_hedging_by_default(self, mock_chatgpt_client):
+        """Test that hedge_quantile=None leaves the client unwrapped."""
+        from src.llms.llm_factory import get_llm_client
+
+        assert get_llm_client('openai', model='gpt-4', hedge_quantile=None) is mock_chatgpt_client.return_value
@@ -0,0 +1,138 @@
+import pytest
+import json
+import os
+
+
+def write_record(directory, number, **doc):
+    """Helper writing a numbered record file."""
+    path = directory / f"{number}e.json"
+    path.write_text(json.dumps(doc))
+    return str(path)
+
+
+def bump_directory_mtime(directory):
+    """Helper moving a directory's mtime past the stamp, as the next clock tick would."""
+    from src.manifest import STAMP_NAME
+
+    stamp = int((directory / STAMP_NAME).read_bytes())
+    os.utime(directory, ns=(stamp + 10**9, stamp + 10**9))
+
+
+class TestManifest:
+    """Test suite for the output-directory Manifest."""
+
+    def test_builds_from_existing_files(self, tmp_path):
+        """Test that the first open indexes records and their completed stages."""
+        from src.manifest import Manifest
+
+        write_record(tmp_path, 1, call_id="a", summary={}, transcription=[])
+        write_record(tmp_path, 2, call_id="b", summary={})
+        write_record(tmp_path, 10, call_id="c", summary={})
+        (tmp_path / "notes.json").write_text("{}")
+
+        manifest = Manifest(str(tmp_path))
+
+        assert manifest.stats() == {"records": 3, "summary_complete": 3, "transcription_complete": 1}
+        assert manifest.pending("transcription") == [
+            os.path.join(str(tmp_path), "2e.json"), os.path.join(str(tmp_path), "10e.json")
+        ]
+        assert manifest.next_number() == 11
+        assert manifest.lookup("c")["number"] == 10
+        assert manifest.lookup("missing") is None
+
+    def test_mark_complete_removes_from_pending(self, tmp_path):
+        """Test that a finished stage is no longer listed as pending, also from another instance."""
+        from src.manifest import Manifest
+
+        path = write_record(tmp_path, 1, call_id="a", summary={})
+        manifest = Manifest(str(tmp_path))
+        manifest.mark_complete(os.path.join(str(tmp_path), "1e.json"), "transcription")
+
+        assert Manifest(str(tmp_path)).pending("transcription") == []
+        with pytest.raises(ValueError):
+            manifest.mark_complete(path, "review")
+
+    def test_is_not_rebuilt_on_reopen(self, tmp_path):
+        """Test that reopening with reconcile=False trusts the index instead of rescanning the files."""
+        from src.manifest import Manifest
+
+        Manifest(str(tmp_path))
+        write_record(tmp_path, 1, call_id="a", summary={})
+
+        assert Manifest(str(tmp_path), reconcile=False).stats()["records"] == 0
+        manifest = Manifest(str(tmp_path), reconcile=False)
+        assert manifest.rebuild() == 1
+        assert manifest.stats()["records"] == 1
+
+    def test_reopen_reconciles_files_changed_outside(self, tmp_path):
+        """Test that reopening indexes added and edited files and drops deleted ones."""
+        from src.manifest import Manifest
+
+        write_record(tmp_path, 1, call_id="a", summary={})
+        write_record(tmp_path, 2, call_id="b", summary={})
+        Manifest(str(tmp_path)).close()
+
+        write_record(tmp_path, 3, call_id="c", summary={})
+        edited = write_record(tmp_path, 1, call_id="a", summary={}, transcription=[])
+        os.utime(edited, ns=(10**18, 10**18))
+        os.remove(tmp_path / "2e.json")
+        bump_directory_mtime(tmp_path)
+
+        manifest = Manifest(str(tmp_path))
+
+        assert manifest.reconcile() == {"added": 0, "updated": 0, "removed": 0}
+        assert manifest.stats() == {"records": 2, "summary_complete": 2, "transcription_complete": 1}
+        assert manifest.pending("transcription") == [os.path.join(str(tmp_path), "3e.json")]
+        assert manifest.next_number() == 4
+
+    def test_unchanged_directory_is_not_listed(self, tmp_path):
+        """Test that reopening an unchanged directory skips reconcile() unless asked for."""
+        from src.manifest import Manifest
+
+        write_record(tmp_path, 1, call_id="a", summary={})
+        Manifest(str(tmp_path)).close()
+        # Edited in place: the directory itself is unchanged
+        write_record(tmp_path, 1, call_id="a", summary={}, transcription=[])
+        os.utime(tmp_path / "1e.json", ns=(10**18, 10**18))
+
+        manifest = Manifest(str(tmp_path))
+        assert manifest.stats()["transcription_complete"] == 0
+        manifest.close()
+
+        assert Manifest(str(tmp_path), reconcile=True).stats()["transcription_complete"] == 1
+
+    def test_rebuild_drops_deleted_files(self, tmp_path):
+        """Test that rebuild() reconstructs the index from the files alone."""
+        from src.manifest import Manifest
+
+        write_record(tmp_path, 1, call_id="a", summary={})
+        write_record(tmp_path, 2, call_id="b", summary={})
+        manifest = Manifest(str(tmp_path))
+        (tmp_path / "2e.json").unlink()
+        manifest.rebuild()
+
+        assert manifest.next_number() == 2
+        assert manifest.lookup("b") is None
+
+
+class TestSaveSummariesWithManifest:
+    """Test suite for save_summaries() numbering through the manifest."""
+
+    def test_numbers_and_indexes_new_files(self, tmp_path):
+        """Test that new files continue the indexed numbering and are recorded as summarized."""
+        from src.dataset_operations import save_summaries
+        from src.manifest import Manifest
+
+        write_record(tmp_path, 1, call_id="a", summary={})
+        manifest = Manifest(str(tmp_path))
+        # Written behind the manifest's back: must not be overwritten
+        write_record(tmp_path, 2, call_id="b", summary={})
+
+        save_summaries([{"summary": {"text": ["x"]}}], str(tmp_path), "e.json", manifest=manifest)
+
+        assert (tmp_path / "3e.json").exists()
+        assert json.loads((tmp_path / "2e.json").read_text())["call_id"] == "b"
+        assert manifest.pending("transcription") == [
+            os.path.join(str(tmp_path), "1e.json"), os.path.join(str(tmp_path), "3e.json")
+        ]
+        assert manifest.stats()["summary_complete"] == 2
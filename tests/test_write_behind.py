@@ -0,0 +1,127 @@
+import pytest
+import json
+import os
+import threading
+
+
+class TestWriteBehindWriter:
+    """Test suite for the background write-behind writer."""
+
+    def test_writes_documents_atomically(self, tmp_path):
+        """Test that every submitted document ends up complete and no temp files remain."""
+        from src.write_behind import WriteBehindWriter
+
+        with WriteBehindWriter(batch_size=4) as writer:
+            for i in range(10):
+                writer.submit(str(tmp_path / f"{i}e.json"), {"call_id": str(i), "text": "Тест"})
+
+        assert sorted(os.listdir(tmp_path)) == sorted(f"{i}e.json" for i in range(10))
+        with open(tmp_path / "3e.json", encoding="utf-8") as f:
+            assert json.load(f) == {"call_id": "3", "text": "Тест"}
+
+    def test_replaces_existing_file(self, tmp_path):
+        """Test that an existing target is replaced, not appended to."""
+        from src.write_behind import WriteBehindWriter
+
+        path = tmp_path / "1e.json"
+        path.write_text(json.dumps({"old": "x" * 1000}))
+        with WriteBehindWriter() as writer:
+            writer.submit(str(path), {"new": True})
+
+        assert json.loads(path.read_text()) == {"new": True}
+
+    def test_callback_runs_after_file_is_written(self, tmp_path):
+        """Test that callbacks see the file on disk and get no error."""
+        from src.write_behind import WriteBehindWriter
+
+        seen = []
+
+        def callback(path, error):
+            seen.append((os.path.basename(path), error, os.path.exists(path)))
+
+        with WriteBehindWriter() as writer:
+            writer.submit(str(tmp_path / "1e.json"), {"a": 1}, callback=callback)
+            writer.submit(str(tmp_path / "2e.json"), {"a": 2}, callback=callback)
+            writer.flush()
+            assert sorted(seen) == [("1e.json", None, True), ("2e.json", None, True)]
+
+    def test_failed_write_reports_error(self, tmp_path):
+        """Test that an unwritable path is reported to the callback and counted."""
+        from src.write_behind import WriteBehindWriter
+
+        errors = []
+        with WriteBehindWriter() as writer:
+            writer.submit(str(tmp_path / "missing" / "1e.json"), {"a": 1},
+                          callback=lambda path, error: errors.append(error))
+            writer.submit(str(tmp_path / "2e.json"), {"a": 2})
+
+        assert len(errors) == 1 and isinstance(errors[0], OSError)
+        stats = writer.stats()
+        assert stats["errors"] == 1
+        assert stats["written"] == 1
+        assert os.listdir(tmp_path) == ["2e.json"]
+
+    def test_batches_share_directory_fsync(self, tmp_path):
+        """Test that one batch fsyncs each file plus its directory once."""
+        from src.write_behind import WriteBehindWriter
+
+        release = threading.Event()
+        writer = WriteBehindWriter(batch_size=8)
+        # Hold the writer thread in a callback so the next documents queue up into one batch
+        writer.submit(str(tmp_path / "0e.json"), {}, callback=lambda path, error: release.wait(5))
+        writer.submit(str(tmp_path / "1e.json"), {})
+        writer.submit(str(tmp_path / "2e.json"), {})
+        writer.submit(str(tmp_path / "3e.json"), {})
+        release.set()
+        writer.close()
+
+        stats = writer.stats()
+        assert stats["written"] == 4
+        assert stats["batches"] <= 2
+        # 4 file fsyncs plus one directory fsync per batch
+        assert stats["fsyncs"] == 4 + stats["batches"]
+
+    def test_fsync_disabled(self, tmp_path):
+        """Test that fsync=False skips every fsync."""
+        from src.write_behind import WriteBehindWriter
+
+        with WriteBehindWriter(fsync=False) as writer:
+            writer.submit(str(tmp_path / "1e.json"), {"a": 1})
+
+        assert writer.stats()["fsyncs"] == 0
+        assert (tmp_path / "1e.json").exists()
+
+    def test_full_queue_blocks_submit(self, tmp_path):
+        """Test that submit() waits for room when max_queue writes are pending."""
+        from src.write_behind import WriteBehindWriter
+
+        release = threading.Event()
+        writer = WriteBehindWriter(max_queue=1, batch_size=1)
+        writer.submit(str(tmp_path / "0e.json"), {}, callback=lambda path, error: release.wait(5))
+        # Wait until the writer thread is busy with the first document
+        while writer.queue_depth():
+            pass
+        writer.submit(str(tmp_path / "1e.json"), {})
+
+        blocked = threading.Thread(target=writer.submit, args=(str(tmp_path / "2e.json"), {}))
+        blocked.start()
+        blocked.join(0.2)
+        assert blocked.is_alive()
+        release.set()
+        blocked.join(5)
+        writer.close()
+
+        stats = writer.stats()
+        assert stats["blocked_submits"] == 1
+        assert stats["max_queue_depth"] == 1
+        assert stats["written"] == 3
+
+    def test_submit_after_close_raises(self, tmp_path):
+        """Test that a closed writer refuses new documents."""
+        from src.write_behind import WriteBehindWriter
+
+        writer = WriteBehindWriter()
+        writer.close()
+        writer.close()
+        with pytest.raises(RuntimeError):
+            writer.submit(str(tmp_path / "1e.json"), {})